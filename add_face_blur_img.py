@@ -2,9 +2,16 @@
 and superimpose the blurrred face with the rest
 """
 from socialmediautils import blur
+from socialmediautils import cache
+from socialmediautils import imgio
+from socialmediautils import pipeline
+from socialmediautils import server
+from socialmediautils import trace
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 import argparse
+import cv2
 import os
 import numpy as np
 import random
@@ -51,21 +58,362 @@ def main(args: Any) -> None:
                 input_images.append(os.path.join(input_folder_path, file))
                 output_images.append(os.path.join(output_folder_path, file))
 
+    try:
+        blur.get_face_region_lut(args.face_regions)
+        encode_options = get_encode_options(args)
+    except ValueError as err:
+        print(err)
+        exit()
+
+    if args.batch_size > 1:
+        # The batches are parsed by the sequential mode only
+        batch_options = [('--workers', args.workers > 0), ('--processes', args.processes > 0),
+                         ('--server_address', args.server_address != '')]
+        unsupported_options = [option_name for option_name, option_set in batch_options if option_set]
+        if len(unsupported_options) != 0:
+            print('--batch_size does not support {}'.format(', '.join(unsupported_options)))
+            exit()
+
+    output_images = [encode_options.get_output_path(out_file) for out_file in output_images]
+
     if not os.path.exists(output_folder_path):
         os.makedirs(output_folder_path)
 
+    manifest = None
+    if args.manifest:
+        manifest = pipeline.FolderManifest(os.path.join(output_folder_path, pipeline.MANIFEST_FILE_NAME),
+                                           get_manifest_params(args))
+        input_images, output_images = manifest.filter_jobs(input_images, output_images)
+        print('Skipping {} up to date images out of the manifest'.format(manifest.stats()['skipped']))
+
     total_processing_images = len(input_images)
 
     if args.vdebug:
         blur.enable_visual_debug_fb(True)
 
-    model_session, dev_accl = blur.get_face_parser_model(args.model_name)
+    if args.server_address != '':
+        if args.face_detector != '':
+            print('The face detector runs only in this process, not on the model server')
+            exit()
+
+        run_on_server(args, input_images, output_images, manifest)
+        return
+
+    if args.processes > 0:
+        run_multi_process(args, input_images, output_images, manifest)
+        return
+
+    model_session, dev_accl = blur.get_face_parser_model(args.model_name, args.backend, args.num_threads)
+    mask_cache = cache.MaskCache(args.cache_dir) if args.cache_dir != '' else None
+    face_detector = blur.get_face_detector(args.face_detector, dev_accl) if args.face_detector != '' else None
+
+    if args.workers > 0:
+        run_pipelined(args, model_session, dev_accl, input_images, output_images, mask_cache, manifest,
+                      face_detector)
+        return
+
+    # The outputs of the async writes are marked done by the writer once they are on disk
+    manifest_jobs: dict = {}
+
+    def mark_written(out_file: str) -> None:
+        manifest.mark_done(*manifest_jobs.pop(out_file))
+
+    img_writer = None
+    if args.async_writes > 0:
+        img_writer = imgio.AsyncImgWriter(args.async_writes, on_written=mark_written if manifest is not None else None)
+
+    if args.batch_size > 1:
+        for img_index in range(0, total_processing_images, args.batch_size):
+            batch_end = min(img_index + args.batch_size, total_processing_images)
+            print('\nStarted processing files {}-{}/{}'.format(img_index + 1, batch_end, total_processing_images))
+
+            if manifest is not None:
+                for in_file, out_file in zip(input_images[img_index:batch_end], output_images[img_index:batch_end]):
+                    manifest_jobs[out_file] = (in_file, out_file)
+
+            blur.add_face_blur_batch(model_session, dev_accl, input_images[img_index:batch_end],
+                                     output_images[img_index:batch_end], args.blur_factor, mask_cache,
+                                     args.roi_blur, args.inference_policy, args.face_regions, encode_options,
+                                     img_writer, args.blur_kind, args.face_scaled, face_detector)
+
+            if manifest is not None and img_writer is None:
+                for out_file in output_images[img_index:batch_end]:
+                    manifest.mark_done(*manifest_jobs.pop(out_file))
+
+    else:
+        for img_index in range(total_processing_images):
+            print('\nStarted processing file named {} {}/{}'.format(input_images[img_index], img_index + 1,
+                  total_processing_images))
+
+            if manifest is not None:
+                manifest_jobs[output_images[img_index]] = (input_images[img_index], output_images[img_index])
+
+            blur.add_face_blur(model_session, dev_accl, input_images[img_index], output_images[img_index],
+                               args.blur_factor, mask_cache, args.roi_blur, args.inference_policy, args.face_regions,
+                               encode_options, img_writer, args.blur_kind, args.face_scaled, face_detector)
+
+            if manifest is not None and img_writer is None:
+                manifest.mark_done(*manifest_jobs.pop(output_images[img_index]))
+
+    if img_writer is not None:
+        img_writer.close()
+        for out_file, err in img_writer.failures:
+            print('Failed processing file named {}: {}'.format(out_file, err))
+            if manifest is not None:
+                manifest.mark_failed(*manifest_jobs.pop(out_file)[:2], err)
+
+    if mask_cache is not None:
+        print('\nParse map cache statistics: {}'.format(mask_cache.stats()))
+
+    if manifest is not None:
+        print('\nManifest statistics: {}'.format(manifest.stats()))
+
+
+def get_manifest_params(args: Any) -> dict:
+    '''
+    This function returns the parameters that define the blurred images, so that the manifest processes the images
+    again once any of them changes
+
+    :param args: It holds the user given arguments for controlling the program flow as per the
+    user expectation
+    :type args: Any
+    :return: Returns the parameters of the manifest
+    :rtype: dict
+    '''
+    return {'model_name': args.model_name, 'backend': args.backend, 'blur_factor': args.blur_factor,
+            'blur_kind': args.blur_kind, 'face_scaled': args.face_scaled, 'roi_blur': args.roi_blur,
+            'inference_policy': args.inference_policy, 'face_regions': args.face_regions,
+            'face_detector': args.face_detector, 'out_format': args.out_format, 'compression': args.compression,
+            'quality': args.quality}
+
+
+def get_encode_options(args: Any) -> Any:
+    '''
+    This function returns the format and the encoding parameters of the output images
+
+    :param args: It holds the user given arguments for controlling the program flow as per the
+    user expectation
+    :type args: Any
+    :return: Returns the EncodeOptions of the output images
+    :rtype: Any
+    '''
+    return imgio.EncodeOptions(args.out_format, args.compression, args.quality)
+
+
+def run_pipelined(args: Any, model_session: Any, dev_accl: str, input_images: list, output_images: list,
+                  mask_cache: Any = None, manifest: Any = None, face_detector: Any = None) -> None:
+    '''
+    This function executes the face blurring for the given set of images by overlapping the image reading, the model
+    inference and the image writing with each other
+
+    :param args: It holds the user given arguments for controlling the program flow as per the
+    user expectation
+    :type args: Any
+    :param model_session: This param holds the reference for the face parser net for inference
+    :type model_session: Any
+    :param dev_accl: It holds the cuda support if so for doing inference in the GPU, otherwise in CPU
+    :type dev_accl: str
+    :param input_images: The list of input image files
+    :type input_images: list
+    :param output_images: The list of output image files
+    :type output_images: list
+    :param mask_cache: The MaskCache that holds the already computed parse maps, defaults to None
+    :type mask_cache: Any, optional
+    :param manifest: The FolderManifest that records the processed images, defaults to None
+    :type manifest: Any, optional
+    :param face_detector: The face detector that gates the face parser, defaults to None
+    :type face_detector: Any, optional
+    '''
+    total_processing_images = len(input_images)
+    jobs = list(zip(range(total_processing_images), input_images, output_images))
+    encode_options = get_encode_options(args)
+
+    def decode(job: tuple) -> Any:
+        with trace.trace_stage('imread'):
+            img_org = cv2.imread(job[1])
+        if img_org is None:
+            raise IOError('Unable to read the image file {}'.format(job[1]))
 
-    for img_index in range(total_processing_images):
+        return img_org
+
+    def infer(job: tuple, img_org: Any) -> Any:
+        img_index, in_file, _ = job
+        print('\nStarted processing file named {} {}/{}'.format(in_file, img_index + 1, total_processing_images))
+
+        return blur.add_face_blur_array(model_session, dev_accl, img_org, args.blur_factor, mask_cache,
+                                        args.roi_blur, args.inference_policy, args.face_regions, args.blur_kind,
+                                        args.face_scaled, face_detector)
+
+    def encode(job: tuple, final_img: Any) -> None:
+        imgio.write_img(job[2], final_img, encode_options)
+
+        if manifest is not None:
+            manifest.mark_done(job[1], job[2])
+
+    failures = pipeline.run_folder_pipeline(jobs, decode, infer, encode, args.workers, args.queue_depth)
+    for job, err in failures:
+        print('Failed processing file named {}: {}'.format(job[1], err))
+        if manifest is not None:
+            manifest.mark_failed(job[1], job[2], err)
+
+    if mask_cache is not None:
+        print('\nParse map cache statistics: {}'.format(mask_cache.stats()))
+
+    if manifest is not None:
+        print('\nManifest statistics: {}'.format(manifest.stats()))
+
+
+def get_face_blur_models(model_name: str, backend: str, num_threads: int, detector_name: str,
+                         cache_dir: str = '') -> tuple:
+    '''
+    This function loads the face parser and the face detector inside the worker process of the multi-process mode
+    along with its own mask cache. The workers share the disk tier of the cache, whose files are replaced atomically
+
+    :param model_name: The face parser model name
+    :type model_name: str
+    :param backend: The backend of the face parser
+    :type backend: str
+    :param num_threads: Number of the intra-op threads of the onnxruntime backends. 0 is the number the worker
+    process is pinned to
+    :type num_threads: int
+    :param detector_name: The face detector name. Empty parses the whole images
+    :type detector_name: str
+    :param cache_dir: The folder of the parse map cache. Empty disables it, defaults to ''
+    :type cache_dir: str, optional
+    :return: Returns the face parser net, its device, the face detector or None and the MaskCache or None
+    :rtype: tuple
+    '''
+    model_session, dev_accl = blur.get_face_parser_model(model_name, backend,
+                                                         num_threads or pipeline.get_worker_threads())
+    face_detector = blur.get_face_detector(detector_name, dev_accl) if detector_name != '' else None
+    mask_cache = cache.MaskCache(cache_dir) if cache_dir != '' else None
+
+    return model_session, dev_accl, face_detector, mask_cache
+
+
+def face_blur_worker(model: Any, job: tuple) -> None:
+    '''
+    This function blurs the face of a single image inside the worker process of the multi-process mode
+
+    :param model: It holds the face parser net, the device, the face detector and the mask cache loaded by
+    get_face_blur_models
+    :type model: Any
+    :param job: It holds the input file, the output file, the blurring factor, the ROI blurring option, the inference
+    policy, the face regions, the encoding options of the output, the blur kind and the face scaled option
+    :type job: tuple
+    '''
+    model_session, dev_accl, face_detector, mask_cache = model
+    in_file, out_file, blur_factor, roi_blur, inference_policy, face_regions, encode_options, blur_kind, \
+        face_scaled = job
+    print('\nStarted processing file named {} in process {}'.format(in_file, os.getpid()))
+
+    blur.add_face_blur(model_session, dev_accl, in_file, out_file, blur_factor, mask_cache, roi_blur=roi_blur,
+                       inference_policy=inference_policy, face_regions=face_regions, encode_options=encode_options,
+                       blur_kind=blur_kind, face_scaled=face_scaled, face_detector=face_detector)
+
+
+def run_multi_process(args: Any, input_images: list, output_images: list, manifest: Any = None) -> None:
+    '''
+    This function executes the face blurring for the given set of images by sharding them across the worker
+    processes. Each worker loads the model only once.
+
+    :param args: It holds the user given arguments for controlling the program flow as per the
+    user expectation
+    :type args: Any
+    :param input_images: The list of input image files
+    :type input_images: list
+    :param output_images: The list of output image files
+    :type output_images: list
+    :param manifest: The FolderManifest that records the processed images, defaults to None
+    :type manifest: Any, optional
+    '''
+    encode_options = get_encode_options(args)
+    jobs = [(in_file, out_file, args.blur_factor, args.roi_blur, args.inference_policy, args.face_regions,
+             encode_options, args.blur_kind, args.face_scaled)
+            for in_file, out_file in zip(input_images, output_images)]
+
+    model_args = (args.model_name, args.backend, args.num_threads, args.face_detector, args.cache_dir)
+    results = pipeline.run_process_pool(jobs, get_face_blur_models, model_args, face_blur_worker,
+                                        args.processes, args.threads_per_process)
+    for job, _, err in results:
+        if err is not None:
+            print('Failed processing file named {}: {}'.format(job[0], err))
+            if manifest is not None:
+                manifest.mark_failed(job[0], job[1], err)
+        elif manifest is not None:
+            manifest.mark_done(job[0], job[1])
+
+    if manifest is not None:
+        print('\nManifest statistics: {}'.format(manifest.stats()))
+
+
+def run_on_server(args: Any, input_images: list, output_images: list, manifest: Any = None) -> None:
+    '''
+    This function sends the face blurring of the given set of images to the running model server, which holds the
+    warm model, instead of loading the model in this process. The workers argument sets the number of jobs in flight.
+
+    :param args: It holds the user given arguments for controlling the program flow as per the
+    user expectation
+    :type args: Any
+    :param input_images: The list of input image files
+    :type input_images: list
+    :param output_images: The list of output image files
+    :type output_images: list
+    :param manifest: The FolderManifest that records the processed images, defaults to None
+    :type manifest: Any, optional
+    '''
+    try:
+        token = server.read_token(args.server_address)
+    except PermissionError as err:
+        print(err)
+        exit()
+
+    def submit(img_index: int) -> None:
         print('\nStarted processing file named {} {}/{}'.format(input_images[img_index], img_index + 1,
-              total_processing_images))
+              len(input_images)))
+
+        params = {'input_file': os.path.abspath(input_images[img_index]),
+                  'output_file': os.path.abspath(output_images[img_index]), 'blur_factor': args.blur_factor,
+                  'blur_kind': args.blur_kind, 'face_scaled': args.face_scaled, 'roi_blur': args.roi_blur,
+                  'inference_policy': args.inference_policy, 'face_regions': args.face_regions,
+                  'out_format': args.out_format, 'compression': args.compression, 'quality': args.quality}
+        try:
+            server.submit_job(args.server_address, 'face_blur', params, token=token)
+        except (OSError, RuntimeError) as err:
+            print('Failed processing file named {}: {}'.format(input_images[img_index], err))
+            if manifest is not None:
+                manifest.mark_failed(input_images[img_index], output_images[img_index], err)
+            return
+
+        if manifest is not None:
+            manifest.mark_done(input_images[img_index], output_images[img_index])
+
+    with ThreadPoolExecutor(max(1, args.workers)) as executor:
+        list(executor.map(submit, range(len(input_images))))
+
+    if manifest is not None:
+        print('\nManifest statistics: {}'.format(manifest.stats()))
+
+
+def run_traced(args: Any) -> None:
+    '''
+    This function runs the program with the stage tracer active, stores the Chrome trace of it and prints the time
+    spent in each stage
+
+    :param args: It holds the user given arguments for controlling the program flow as per the
+    user expectation
+    :type args: Any
+    '''
+    with trace.tracing() as tracer:
+        main(args)
+
+    tracer.save_chrome_trace(args.trace_file)
 
-        blur.add_face_blur(model_session, dev_accl, input_images[img_index], output_images[img_index], 25)
+    print('\n{:<16}{:>8}{:>14}{:>12}'.format('stage', 'count', 'total ms', 'mean ms'))
+    for stage_name, stage_stats in tracer.summary().items():
+        print('{:<16}{:>8}{:>14.1f}{:>12.1f}'.format(stage_name, stage_stats['count'], stage_stats['total_ms'],
+                                                    stage_stats['mean_ms']))
+    print('\nChrome trace is stored in {}'.format(args.trace_file))
 
 
 def parse_args() -> Any:
@@ -84,6 +432,59 @@ def parse_args() -> Any:
     parser.add_argument('-o', '--output_folder', type=str,
                         default=datetime.now().strftime("%Y%m%d-%H%M%S"), help='Folder where the output is stored.')
     parser.add_argument('-b', '--blur_factor', type=int, default=33, help='Feed the blurring factor')
+    parser.add_argument('-g', '--blur_kind', type=str, default='box',
+                        choices=['box', 'gaussian', 'pixelate', 'stacked_box'],
+                        help='kernel of the blurring. stacked_box approximates the gaussian at the cost of the box')
+    parser.add_argument('-s', '--face_scaled', action='store_true',
+                        help='scale the blurring factor with the size of each face, the smaller faces blurred less')
+    parser.add_argument('-c', '--face_detector', type=str, default='',
+                        choices=['', 'retinaface_mobile0.25', 'retinaface_resnet50', 'haar'],
+                        help='detector that finds the faces to be cropped and parsed one by one, e.g. for the group '
+                        'photos. Empty parses the whole image at once')
+    parser.add_argument('-e', '--backend', type=str, default='torch', choices=['torch', 'onnx', 'onnx_int8'],
+                        help='backend of the face parser. onnx and onnx_int8 (INT8 quantized) run with onnxruntime on '
+                        'the CPU, the model is exported under ~/.iveu on the first run')
+    parser.add_argument('-u', '--num_threads', type=int, default=0,
+                        help='number of intra-op threads of the onnxruntime backends. 0 is the onnxruntime default')
+    parser.add_argument('-n', '--batch_size', type=int, default=1,
+                        help='number of images parsed together in a single forward pass of the face parser')
+    parser.add_argument('-w', '--workers', type=int, default=0,
+                        help='number of reading and writing threads for the pipelined mode. 0 processes sequentially')
+    parser.add_argument('-q', '--queue_depth', type=int, default=8,
+                        help='maximum number of images waiting in between the stages of the pipelined mode')
+    parser.add_argument('-x', '--processes', type=int, default=0,
+                        help='number of worker processes for the multi-process mode. 0 runs in this process only')
+    parser.add_argument('-t', '--threads_per_process', type=int, default=0,
+                        help='number of intra-op threads for each worker process. 0 splits the cores evenly')
+    parser.add_argument('-k', '--cache_dir', type=str, default='',
+                        help='folder of the parse map cache to skip parsing the already seen images. Empty disables it')
+    parser.add_argument('-a', '--roi_blur', action='store_true',
+                        help='blur only the face bounding boxes at the original resolution')
+    parser.add_argument('-l', '--inference_policy', type=str, default='default',
+                        choices=['default', 'speed', 'balanced', 'quality'],
+                        help='resolution of the face parser and the mask refinement of the ROI blur. speed parses at '
+                        '320x320, balanced and quality refine the face edges')
+    parser.add_argument('-f', '--face_regions', type=str, default='default',
+                        help='face regions to be blurred [default, skin, face, face_ears, skin_hair, no_neck, head] '
+                        'or the comma separated face parser labels, e.g. skin,nose,hair')
+    parser.add_argument('-r', '--server_address', type=str, default='',
+                        help='host:port or Unix socket of a running run_model_server.py that blurs the faces with '
+                        'its warm model. Empty loads the model in this process')
+    parser.add_argument('-j', '--trace_file', type=str, default='',
+                        help='Chrome trace JSON file of the stage timings. Empty disables the tracing')
+    parser.add_argument('-F', '--out_format', type=str, default='', choices=['', 'png', 'jpg', 'webp'],
+                        help='format of the output images. Empty keeps the format of the input images')
+    parser.add_argument('-C', '--compression', type=int, default=-1,
+                        help='PNG compression level from 0 (fastest) to 9 (smallest). -1 is the OpenCV default')
+    parser.add_argument('-Q', '--quality', type=int, default=-1,
+                        help='JPEG and WebP quality from 1 to 100, the WebP is lossless above 100. -1 is the OpenCV '
+                        'default')
+    parser.add_argument('-W', '--async_writes', type=int, default=0,
+                        help='number of output images waiting in the background writer of the sequential and the '
+                        'batch modes. 0 writes them right away')
+    parser.add_argument('-v', '--manifest', action='store_true',
+                        help='record the processed images in the manifest of the output folder and skip the up to '
+                        'date ones on the reruns')
     parser.add_argument('-p', '--vdebug', type=bool, default=False, help='storing the debug images in the debug folder')
 
     args = parser.parse_args()
@@ -97,4 +498,8 @@ if __name__ == '__main__':
     """
     This is the entry point of the program
     """
-    main(parse_args())
+    args = parse_args()
+    if args.trace_file != '':
+        run_traced(args)
+    else:
+        main(args)
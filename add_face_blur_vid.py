@@ -0,0 +1,131 @@
+""" This module is the usage example of the face blurring feature using face parser for human in the given videos
+and superimpose the blurrred face with the rest
+"""
+from socialmediautils import blur
+from typing import Any
+
+import argparse
+import os
+
+from datetime import datetime
+
+
+def main(args: Any) -> None:
+    '''
+    This function executes the process for making face blurring to the human face for either a
+    single video or the given set of videos in the folder
+
+    :param args: It holds the user given arguments for controlling the program flow as per the
+    user expectation
+    :type args: Any
+    '''
+    video_names: list = []
+    input_videos: list = []
+    output_videos: list = []
+    total_processing_videos = 0
+
+    input_folder_path = args.input_folder
+    input_file = args.input_file
+    output_folder_path = args.output_folder
+
+    if args.model_name not in ['bisenet']:
+        print('This model is not supported! Please check the correct model name')
+        exit()
+
+    elif input_folder_path == '':
+        if not os.path.isfile(input_file):
+            print('This input file is not valid! Please check the correct path with file name')
+            exit()
+        else:
+            input_videos.append(input_file)
+            output_videos.append(os.path.join(output_folder_path, os.path.basename(input_file)))
+
+    elif input_folder_path != '':
+
+        video_names = os.listdir(input_folder_path)
+
+        for file in video_names:
+            if file.endswith(('mp4', 'avi', 'mov', 'mkv')):
+                input_videos.append(os.path.join(input_folder_path, file))
+                output_videos.append(os.path.join(output_folder_path, file))
+
+    if not os.path.exists(output_folder_path):
+        os.makedirs(output_folder_path)
+
+    total_processing_videos = len(input_videos)
+
+    if args.vdebug:
+        blur.enable_visual_debug_fb(True)
+
+    try:
+        blur.get_face_region_lut(args.face_regions)
+    except ValueError as err:
+        print(err)
+        exit()
+
+    model_session, dev_accl = blur.get_face_parser_model(args.model_name, args.backend, args.num_threads)
+    diff_threshold = args.diff_threshold if args.diff_threshold > 0 else None
+
+    for video_index in range(total_processing_videos):
+        print('\nStarted processing file named {} {}/{}'.format(input_videos[video_index], video_index + 1,
+              total_processing_videos))
+
+        total_frames = blur.add_face_blur_video(model_session, dev_accl, input_videos[video_index],
+                                                output_videos[video_index], args.blur_factor, args.batch_size,
+                                                args.reparse_interval, diff_threshold, roi_blur=args.roi_blur,
+                                                face_regions=args.face_regions, blur_kind=args.blur_kind,
+                                                face_scaled=args.face_scaled)
+        print('Processed {} frames'.format(total_frames))
+
+
+def parse_args() -> Any:
+    """This function recieves and parses the input arguments.
+
+    :return: Argument parser that holds the user input to this program
+    :rtype: Any
+    """
+    parser = argparse.ArgumentParser(description='Add face blurring to the human face videos')
+    parser.add_argument('-m', '--model_name', type=str, default='bisenet',
+                        help='key in the supported model name [bisenet]')
+    parser.add_argument('-d', '--input_folder', type=str, default='',
+                        help='input directory path for human face videos.')
+    parser.add_argument('-i', '--input_file', default='',
+                        type=str, help='input file path for single human face video.')
+    parser.add_argument('-o', '--output_folder', type=str,
+                        default=datetime.now().strftime("%Y%m%d-%H%M%S"), help='Folder where the output is stored.')
+    parser.add_argument('-b', '--blur_factor', type=int, default=33, help='Feed the blurring factor')
+    parser.add_argument('-g', '--blur_kind', type=str, default='box',
+                        choices=['box', 'gaussian', 'pixelate', 'stacked_box'],
+                        help='kernel of the blurring. stacked_box approximates the gaussian at the cost of the box')
+    parser.add_argument('-s', '--face_scaled', action='store_true',
+                        help='scale the blurring factor with the size of each face, the smaller faces blurred less')
+    parser.add_argument('-e', '--backend', type=str, default='torch', choices=['torch', 'onnx', 'onnx_int8'],
+                        help='backend of the face parser. onnx and onnx_int8 (INT8 quantized) run with onnxruntime on '
+                        'the CPU, the model is exported under ~/.iveu on the first run')
+    parser.add_argument('-u', '--num_threads', type=int, default=0,
+                        help='number of intra-op threads of the onnxruntime backends. 0 is the onnxruntime default')
+    parser.add_argument('-n', '--batch_size', type=int, default=8,
+                        help='number of frames parsed together in a single forward pass of the face parser')
+    parser.add_argument('-r', '--reparse_interval', type=int, default=1,
+                        help='run the face parser at every given number of frames and reuse the face mask in between')
+    parser.add_argument('-t', '--diff_threshold', type=float, default=0,
+                        help='mean frame difference (0-255) that forces the face parser to run. 0 disables it')
+    parser.add_argument('-a', '--roi_blur', action='store_true',
+                        help='blur only the face bounding boxes at the original resolution')
+    parser.add_argument('-f', '--face_regions', type=str, default='default',
+                        help='face regions to be blurred [default, skin, face, face_ears, skin_hair, no_neck, head] '
+                        'or the comma separated face parser labels, e.g. skin,nose,hair')
+    parser.add_argument('-p', '--vdebug', type=bool, default=False, help='storing the debug images in the debug folder')
+
+    args = parser.parse_args()
+
+    print('\n\n\n!!! Face blurring functionality using face parser for the human videos !!!\n\n')
+    print('Starting the Application with instance ID:', datetime.now().strftime("%Y%m%d-%H%M%S"))
+    return args
+
+
+if __name__ == '__main__':
+    """
+    This is the entry point of the program
+    """
+    main(parse_args())
@@ -1,10 +1,17 @@
 """ This module is the usage example of the outline stroke feature for human in the given images and superimpose
 the stroked human with the background image
 """
+from socialmediautils import cache
+from socialmediautils import imgio
+from socialmediautils import pipeline
+from socialmediautils import server
 from socialmediautils import stroke
+from socialmediautils import trace
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 import argparse
+import cv2
 import os
 import numpy as np
 import random
@@ -70,28 +77,446 @@ def main(args: Any) -> None:
             if file.endswith(('png', 'jpg', 'jpeg')):
                 bg_images.append(os.path.join(bg_folder_path, file))
 
+    try:
+        encode_options = get_encode_options(args)
+    except ValueError as err:
+        print(err)
+        exit()
+
+    if args.memory_budget > 0:
+        # The tiled mode segments the proxy and writes each output synchronously in this process only
+        tiled_options = [('--inference_policy', args.inference_policy != 'default'),
+                         ('--async_writes', args.async_writes > 0), ('--batch_size', args.batch_size > 1),
+                         ('--workers', args.workers > 0), ('--processes', args.processes > 0),
+                         ('--server_address', args.server_address != '')]
+        unsupported_options = [option_name for option_name, option_set in tiled_options if option_set]
+        if len(unsupported_options) != 0:
+            print('The tiled mode of --memory_budget does not support {}'.format(', '.join(unsupported_options)))
+            exit()
+
+        if len(bg_images) != 0:
+            print('The tiled mode resizes the backgrounds strip by strip without the background cache')
+
+    if args.batch_size > 1:
+        # The batches are segmented by the sequential mode only
+        batch_options = [('--workers', args.workers > 0), ('--processes', args.processes > 0),
+                         ('--server_address', args.server_address != '')]
+        unsupported_options = [option_name for option_name, option_set in batch_options if option_set]
+        if len(unsupported_options) != 0:
+            print('--batch_size does not support {}'.format(', '.join(unsupported_options)))
+            exit()
+
+    output_images = [encode_options.get_output_path(out_file) for out_file in output_images]
+
     if not os.path.exists(output_folder_path):
         os.makedirs(output_folder_path)
 
+    manifest = None
+    if args.manifest:
+        manifest = pipeline.FolderManifest(os.path.join(output_folder_path, pipeline.MANIFEST_FILE_NAME),
+                                           get_manifest_params(args))
+        input_images, output_images = manifest.filter_jobs(input_images, output_images)
+        print('Skipping {} up to date images out of the manifest'.format(manifest.stats()['skipped']))
+
     total_processing_images = len(input_images)
     total_bg_images_max_index = len(bg_images)
 
+    if args.server_address != '':
+        run_on_server(args, input_images, bg_images, output_images, manifest)
+        return
+
+    if args.processes > 0:
+        run_multi_process(args, input_images, bg_images, output_images, manifest)
+        return
+
     model_session = stroke.get_stroke_session(args.model_name)
     if args.vdebug:
         stroke.enable_visual_debug(True)
 
-    for img_index in range(total_processing_images):
-        print('\nStarted processing file named {} {}/{}'.format(input_images[img_index], img_index + 1,
-              total_processing_images))
+    mask_cache = cache.MaskCache(args.cache_dir) if args.cache_dir != '' else None
+    bg_cache = None
+    if len(bg_images) != 0 and args.memory_budget == 0:
+        bg_cache = cache.BackgroundCache(args.bg_cache_size * 1024 * 1024)
+
+    if args.workers > 0:
+        run_pipelined(args, model_session, input_images, bg_images, output_images, mask_cache, bg_cache, manifest)
+        return
 
+    # The outputs of the async writes are marked done by the writer once they are on disk
+    manifest_jobs: dict = {}
+
+    def mark_written(out_file: str) -> None:
+        manifest.mark_done(*manifest_jobs.pop(out_file))
+
+    img_writer = None
+    if args.async_writes > 0:
+        img_writer = imgio.AsyncImgWriter(args.async_writes, on_written=mark_written if manifest is not None else None)
+
+    if args.batch_size > 1:
+        segmenter = stroke.BatchSegmenter(model_session, args.batch_size)
         stroke_color = np.interp(Color(args.color).get_rgb(), [0, 1], [0, 255]).astype('uint8').tolist()
 
+        for img_index in range(0, total_processing_images, args.batch_size):
+            batch_end = min(img_index + args.batch_size, total_processing_images)
+            print('\nStarted processing files {}-{}/{}'.format(img_index + 1, batch_end, total_processing_images))
+
+            batch_bg_images = None
+            if len(bg_images) != 0:
+                batch_bg_images = [bg_images[random.randrange(total_bg_images_max_index)]
+                                   for _ in range(img_index, batch_end)]
+
+            if manifest is not None:
+                for batch_index in range(img_index, batch_end):
+                    manifest_jobs[output_images[batch_index]] = (
+                        input_images[batch_index], output_images[batch_index],
+                        [batch_bg_images[batch_index - img_index]] if batch_bg_images else [])
+
+            stroke.add_img_stroke_batch(segmenter, input_images[img_index:batch_end],
+                                        output_images[img_index:batch_end], stroke_color, 1.03, mask_cache,
+                                        args.zoom_option, args.stroke_width, args.inference_policy, batch_bg_images,
+                                        bg_cache, encode_options, img_writer, args.kernel_shape, args.anti_alias)
+
+            if manifest is not None and img_writer is None:
+                for out_file in output_images[img_index:batch_end]:
+                    manifest.mark_done(*manifest_jobs.pop(out_file))
+
+    else:
+        for img_index in range(total_processing_images):
+            print('\nStarted processing file named {} {}/{}'.format(input_images[img_index], img_index + 1,
+                  total_processing_images))
+
+            stroke_color = np.interp(Color(args.color).get_rgb(), [0, 1], [0, 255]).astype('uint8').tolist()
+            bg_image = bg_images[random.randrange(total_bg_images_max_index)] if len(bg_images) != 0 else None
+
+            if manifest is not None:
+                manifest_jobs[output_images[img_index]] = (input_images[img_index], output_images[img_index],
+                                                           [bg_image])
+
+            if args.memory_budget > 0 and bg_image is not None:
+                stroke.add_img_stroke_with_bg_tiled(model_session, input_images[img_index], bg_image,
+                                                    output_images[img_index], stroke_color, 1.03, mask_cache,
+                                                    args.zoom_option, args.stroke_width, args.proxy_size,
+                                                    args.memory_budget, encode_options, args.kernel_shape,
+                                                    args.anti_alias)
+            elif args.memory_budget > 0:
+                stroke.add_img_stroke_tiled(model_session, input_images[img_index], output_images[img_index],
+                                            stroke_color, 1.03, mask_cache, args.zoom_option, args.stroke_width,
+                                            args.proxy_size, args.memory_budget, encode_options, args.kernel_shape,
+                                            args.anti_alias)
+            elif bg_image is not None:
+                stroke.add_img_stroke_with_bg(model_session, input_images[img_index], bg_image,
+                                              output_images[img_index], stroke_color, 1.03, mask_cache,
+                                              args.zoom_option, args.stroke_width, args.inference_policy, bg_cache,
+                                              encode_options, img_writer, args.kernel_shape, args.anti_alias)
+            else:
+                stroke.add_img_stroke(model_session, input_images[img_index], output_images[img_index], stroke_color,
+                                      1.03, mask_cache, args.zoom_option, args.stroke_width, args.inference_policy,
+                                      encode_options, img_writer, args.kernel_shape, args.anti_alias)
+
+            if manifest is not None and img_writer is None:
+                manifest.mark_done(*manifest_jobs.pop(output_images[img_index]))
+
+    if img_writer is not None:
+        img_writer.close()
+        for out_file, err in img_writer.failures:
+            print('Failed processing file named {}: {}'.format(out_file, err))
+            if manifest is not None:
+                manifest.mark_failed(*manifest_jobs.pop(out_file)[:2], err)
+
+    if mask_cache is not None:
+        print('\nMask cache statistics: {}'.format(mask_cache.stats()))
+    if bg_cache is not None:
+        print('\nBackground cache statistics: {}'.format(bg_cache.stats()))
+    if manifest is not None:
+        print('\nManifest statistics: {}'.format(manifest.stats()))
+
+
+def get_manifest_params(args: Any) -> dict:
+    '''
+    This function returns the parameters that define the stroked images, so that the manifest processes the images
+    again once any of them changes. The background chosen for each image is recorded as its dependency.
+
+    :param args: It holds the user given arguments for controlling the program flow as per the
+    user expectation
+    :type args: Any
+    :return: Returns the parameters of the manifest
+    :rtype: dict
+    '''
+    bg_source = args.bg_file if args.bg_file != '' else args.bg_folder
+
+    return {'model_name': args.model_name, 'color': args.color, 'zoom_factor': 1.03, 'zoom_option': args.zoom_option,
+            'stroke_width': args.stroke_width, 'kernel_shape': args.kernel_shape, 'anti_alias': args.anti_alias,
+            'inference_policy': args.inference_policy,
+            'background': os.path.abspath(bg_source) if bg_source != '' else '',
+            'proxy_size': args.proxy_size if args.memory_budget > 0 else 0, 'out_format': args.out_format,
+            'compression': args.compression, 'quality': args.quality}
+
+
+def get_encode_options(args: Any) -> Any:
+    '''
+    This function returns the format and the encoding parameters of the output images
+
+    :param args: It holds the user given arguments for controlling the program flow as per the
+    user expectation
+    :type args: Any
+    :return: Returns the EncodeOptions of the output images
+    :rtype: Any
+    '''
+    return imgio.EncodeOptions(args.out_format, args.compression, args.quality)
+
+
+def run_pipelined(args: Any, model_session: Any, input_images: list, bg_images: list, output_images: list,
+                  mask_cache: Any = None, bg_cache: Any = None, manifest: Any = None) -> None:
+    '''
+    This function executes the stroking for the given set of images by overlapping the image reading, the model
+    inference and the image writing with each other
+
+    :param args: It holds the user given arguments for controlling the program flow as per the
+    user expectation
+    :type args: Any
+    :param model_session: The session that holds what unet2 familiy of the model to be used
+    :type model_session: Any
+    :param input_images: The list of input image files
+    :type input_images: list
+    :param bg_images: The list of background image files. It is empty if there is no background
+    :type bg_images: list
+    :param output_images: The list of output image files
+    :type output_images: list
+    :param mask_cache: The MaskCache that holds the already computed human masks, defaults to None
+    :type mask_cache: Any, optional
+    :param bg_cache: The BackgroundCache that holds the already decoded and resized backgrounds, defaults to None
+    :type bg_cache: Any, optional
+    :param manifest: The FolderManifest that records the processed images, defaults to None
+    :type manifest: Any, optional
+    '''
+    total_processing_images = len(input_images)
+    stroke_color = np.interp(Color(args.color).get_rgb(), [0, 1], [0, 255]).astype('uint8').tolist()
+    encode_options = get_encode_options(args)
+
+    jobs = []
+    for img_index in range(total_processing_images):
+        bg_image = bg_images[random.randrange(len(bg_images))] if len(bg_images) != 0 else None
+        jobs.append((img_index, input_images[img_index], bg_image, output_images[img_index]))
+
+    def decode(job: tuple) -> tuple:
+        _, in_file, bg_file, _ = job
+        with trace.trace_stage('imread'):
+            img_org = cv2.imread(in_file)
+        if img_org is None:
+            raise IOError('Unable to read the image file {}'.format(in_file))
+
+        img_bg = None
+        if bg_file is not None and bg_cache is not None:
+            with trace.trace_stage('imread'):
+                img_bg = bg_cache.get(bg_file, (img_org.shape[1], img_org.shape[0]))
+        elif bg_file is not None:
+            with trace.trace_stage('imread'):
+                img_bg = cv2.imread(bg_file)
+            if img_bg is None:
+                raise IOError('Unable to read the background image file {}'.format(bg_file))
+
+        return img_org, img_bg
+
+    def infer(job: tuple, decoded: tuple) -> Any:
+        img_index, in_file, _, _ = job
+        img_org, img_bg = decoded
+        print('\nStarted processing file named {} {}/{}'.format(in_file, img_index + 1, total_processing_images))
+
+        if img_bg is not None:
+            return stroke.add_img_stroke_with_bg_array(model_session, img_org, img_bg, stroke_color, 1.03,
+                                                       mask_cache, args.zoom_option, args.stroke_width,
+                                                       args.inference_policy, args.kernel_shape, args.anti_alias)
+
+        return stroke.add_img_stroke_array(model_session, img_org, stroke_color, 1.03, mask_cache, args.zoom_option,
+                                           args.stroke_width, args.inference_policy, args.kernel_shape,
+                                           args.anti_alias)
+
+    def encode(job: tuple, img_blended: Any) -> None:
+        imgio.write_img(job[3], img_blended, encode_options)
+
+        if manifest is not None:
+            manifest.mark_done(job[1], job[3], [job[2]])
+
+    failures = pipeline.run_folder_pipeline(jobs, decode, infer, encode, args.workers, args.queue_depth)
+    for job, err in failures:
+        print('Failed processing file named {}: {}'.format(job[1], err))
+        if manifest is not None:
+            manifest.mark_failed(job[1], job[3], err)
+
+    if mask_cache is not None:
+        print('\nMask cache statistics: {}'.format(mask_cache.stats()))
+    if bg_cache is not None:
+        print('\nBackground cache statistics: {}'.format(bg_cache.stats()))
+    if manifest is not None:
+        print('\nManifest statistics: {}'.format(manifest.stats()))
+
+
+def get_stroke_worker_model(model_name: str, bg_cache_size: int = 512, cache_dir: str = '') -> tuple:
+    '''
+    This function loads the model session of a worker process of the multi-process mode along with its own
+    background cache, so that each worker decodes and resizes the backgrounds only once, and its own mask cache.
+    The workers share the disk tier of the mask cache, whose files are replaced atomically
+
+    :param model_name: The name of the rembg model
+    :type model_name: str
+    :param bg_cache_size: The MiB of the backgrounds kept in the memory of the worker, defaults to 512
+    :type bg_cache_size: int, optional
+    :param cache_dir: The folder of the mask cache. Empty disables it, defaults to ''
+    :type cache_dir: str, optional
+    :return: Returns the model session, the BackgroundCache and the MaskCache or None of the worker
+    :rtype: tuple
+    '''
+    model_session = stroke.get_stroke_session(model_name, pipeline.get_worker_threads())
+    mask_cache = cache.MaskCache(cache_dir) if cache_dir != '' else None
+
+    return model_session, cache.BackgroundCache(bg_cache_size * 1024 * 1024), mask_cache
+
+
+def stroke_worker(model: Any, job: tuple) -> None:
+    '''
+    This function strokes a single image inside the worker process of the multi-process mode
+
+    :param model: It holds the model session, the background cache and the mask cache loaded by
+    get_stroke_worker_model
+    :type model: Any
+    :param job: It holds the input file, the background file (None if there is no background), the output file,
+    the stroke color, the zoom option, the stroke width, the inference policy, the encoding options of the output,
+    the kernel shape and the anti-aliasing of the stroke
+    :type job: tuple
+    '''
+    model_session, bg_cache, mask_cache = model
+    (in_file, bg_file, out_file, stroke_color, zoom_option, stroke_width, inference_policy, encode_options,
+     kernel_shape, anti_alias) = job
+    print('\nStarted processing file named {} in process {}'.format(in_file, os.getpid()))
+
+    if bg_file is not None:
+        stroke.add_img_stroke_with_bg(model_session, in_file, bg_file, out_file, stroke_color, 1.03, mask_cache,
+                                      zoom_option, stroke_width, inference_policy, bg_cache, encode_options, None,
+                                      kernel_shape, anti_alias)
+    else:
+        stroke.add_img_stroke(model_session, in_file, out_file, stroke_color, 1.03, mask_cache, zoom_option,
+                              stroke_width, inference_policy, encode_options, None, kernel_shape, anti_alias)
+
+
+def run_multi_process(args: Any, input_images: list, bg_images: list, output_images: list,
+                      manifest: Any = None) -> None:
+    '''
+    This function executes the stroking for the given set of images by sharding them across the worker processes.
+    Each worker loads the model only once.
+
+    :param args: It holds the user given arguments for controlling the program flow as per the
+    user expectation
+    :type args: Any
+    :param input_images: The list of input image files
+    :type input_images: list
+    :param bg_images: The list of background image files. It is empty if there is no background
+    :type bg_images: list
+    :param output_images: The list of output image files
+    :type output_images: list
+    :param manifest: The FolderManifest that records the processed images, defaults to None
+    :type manifest: Any, optional
+    '''
+    stroke_color = np.interp(Color(args.color).get_rgb(), [0, 1], [0, 255]).astype('uint8').tolist()
+    encode_options = get_encode_options(args)
+
+    jobs = []
+    for img_index in range(len(input_images)):
+        bg_image = bg_images[random.randrange(len(bg_images))] if len(bg_images) != 0 else None
+        jobs.append((input_images[img_index], bg_image, output_images[img_index], stroke_color, args.zoom_option,
+                     args.stroke_width, args.inference_policy, encode_options, args.kernel_shape, args.anti_alias))
+
+    results = pipeline.run_process_pool(jobs, get_stroke_worker_model,
+                                        (args.model_name, args.bg_cache_size, args.cache_dir),
+                                        stroke_worker, args.processes, args.threads_per_process)
+    for job, _, err in results:
+        if err is not None:
+            print('Failed processing file named {}: {}'.format(job[0], err))
+            if manifest is not None:
+                manifest.mark_failed(job[0], job[2], err)
+        elif manifest is not None:
+            manifest.mark_done(job[0], job[2], [job[1]])
+
+    if manifest is not None:
+        print('\nManifest statistics: {}'.format(manifest.stats()))
+
+
+def run_on_server(args: Any, input_images: list, bg_images: list, output_images: list,
+                  manifest: Any = None) -> None:
+    '''
+    This function sends the stroking of the given set of images to the running model server, which holds the warm
+    model, instead of loading the model in this process. The workers argument sets the number of jobs in flight.
+
+    :param args: It holds the user given arguments for controlling the program flow as per the
+    user expectation
+    :type args: Any
+    :param input_images: The list of input image files
+    :type input_images: list
+    :param bg_images: The list of background image files. It is empty if there is no background
+    :type bg_images: list
+    :param output_images: The list of output image files
+    :type output_images: list
+    :param manifest: The FolderManifest that records the processed images, defaults to None
+    :type manifest: Any, optional
+    '''
+    try:
+        token = server.read_token(args.server_address)
+    except PermissionError as err:
+        print(err)
+        exit()
+
+    stroke_color = np.interp(Color(args.color).get_rgb(), [0, 1], [0, 255]).astype('uint8').tolist()
+
+    def submit(img_index: int) -> None:
+        print('\nStarted processing file named {} {}/{}'.format(input_images[img_index], img_index + 1,
+              len(input_images)))
+
+        params = {'input_file': os.path.abspath(input_images[img_index]),
+                  'output_file': os.path.abspath(output_images[img_index]), 'color': stroke_color,
+                  'zoom_factor': 1.03, 'zoom_option': args.zoom_option, 'stroke_width': args.stroke_width,
+                  'kernel_shape': args.kernel_shape, 'anti_alias': args.anti_alias,
+                  'inference_policy': args.inference_policy, 'out_format': args.out_format,
+                  'compression': args.compression, 'quality': args.quality}
         if len(bg_images) != 0:
-            stroke.add_img_stroke_with_bg(model_session, input_images[img_index],
-                                          bg_images[random.randrange(total_bg_images_max_index)],
-                                          output_images[img_index], stroke_color, 1.03)
-        else:
-            stroke.add_img_stroke(model_session, input_images[img_index], output_images[img_index], stroke_color, 1.03)
+            params['bg_file'] = os.path.abspath(bg_images[random.randrange(len(bg_images))])
+
+        try:
+            server.submit_job(args.server_address, 'stroke_with_bg' if len(bg_images) != 0 else 'stroke', params,
+                              token=token)
+        except (OSError, RuntimeError) as err:
+            print('Failed processing file named {}: {}'.format(input_images[img_index], err))
+            if manifest is not None:
+                manifest.mark_failed(input_images[img_index], output_images[img_index], err)
+            return
+
+        if manifest is not None:
+            manifest.mark_done(input_images[img_index], output_images[img_index], [params.get('bg_file')])
+
+    with ThreadPoolExecutor(max(1, args.workers)) as executor:
+        list(executor.map(submit, range(len(input_images))))
+
+    if manifest is not None:
+        print('\nManifest statistics: {}'.format(manifest.stats()))
+
+
+def run_traced(args: Any) -> None:
+    '''
+    This function runs the program with the stage tracer active, stores the Chrome trace of it and prints the time
+    spent in each stage
+
+    :param args: It holds the user given arguments for controlling the program flow as per the
+    user expectation
+    :type args: Any
+    '''
+    with trace.tracing() as tracer:
+        main(args)
+
+    tracer.save_chrome_trace(args.trace_file)
+
+    print('\n{:<16}{:>8}{:>14}{:>12}'.format('stage', 'count', 'total ms', 'mean ms'))
+    for stage_name, stage_stats in tracer.summary().items():
+        print('{:<16}{:>8}{:>14.1f}{:>12.1f}'.format(stage_name, stage_stats['count'], stage_stats['total_ms'],
+                                                    stage_stats['mean_ms']))
+    print('\nChrome trace is stored in {}'.format(args.trace_file))
 
 
 def parse_args() -> Any:
@@ -113,6 +538,55 @@ def parse_args() -> Any:
     parser.add_argument('-o', '--output_folder', type=str,
                         default=datetime.now().strftime("%Y%m%d-%H%M%S"), help='Folder where the output is stored.')
     parser.add_argument('-c', '--color', type=str, default='yellow', help='Feed the color as per W3C color naming')
+    parser.add_argument('-z', '--zoom_option', type=int, default=1,
+                        help='stroke algorithm [1: center zoom, 2: center crop, 3: dilation, 4: distance transform]')
+    parser.add_argument('-s', '--stroke_width', type=int, default=0,
+                        help='stroke thickness in pixels for the zoom options 3 and 4. 0 derives it from the zoom')
+    parser.add_argument('-K', '--kernel_shape', type=str, default='ellipse', choices=['ellipse', 'rect', 'cross'],
+                        help='shape that grows the mask for the zoom options 3 and 4')
+    parser.add_argument('--anti_alias', action=argparse.BooleanOptionalAction, default=True,
+                        help='anti-alias the stroke of the zoom option 4. --no-anti_alias keeps its edge binary')
+    parser.add_argument('-n', '--batch_size', type=int, default=1,
+                        help='number of images segmented together in a single run of the model')
+    parser.add_argument('-w', '--workers', type=int, default=0,
+                        help='number of reading and writing threads for the pipelined mode. 0 processes sequentially')
+    parser.add_argument('-q', '--queue_depth', type=int, default=8,
+                        help='maximum number of images waiting in between the stages of the pipelined mode')
+    parser.add_argument('-x', '--processes', type=int, default=0,
+                        help='number of worker processes for the multi-process mode. 0 runs in this process only')
+    parser.add_argument('-t', '--threads_per_process', type=int, default=0,
+                        help='number of intra-op threads for each worker process. 0 splits the cores evenly')
+    parser.add_argument('-k', '--cache_dir', type=str, default='',
+                        help='folder of the mask cache to skip segmenting the already seen images. Empty disables it')
+    parser.add_argument('-a', '--bg_cache_size', type=int, default=512,
+                        help='MiB of the decoded and resized backgrounds kept in the memory to reuse across the images')
+    parser.add_argument('-y', '--memory_budget', type=int, default=0,
+                        help='tiled mode for very large images with the temporaries bounded by this many MiB. '
+                        '0 processes the whole image at once')
+    parser.add_argument('-e', '--proxy_size', type=int, default=1024,
+                        help='long edge of the downscaled image that is segmented in the tiled mode')
+    parser.add_argument('-l', '--inference_policy', type=str, default='default',
+                        choices=['default', 'speed', 'balanced', 'quality'],
+                        help='resolution the human is segmented at and the mask refinement. speed segments at 1024, '
+                        'balanced at 2048 with refinement, quality at the original resolution with refinement')
+    parser.add_argument('-r', '--server_address', type=str, default='',
+                        help='host:port or Unix socket of a running run_model_server.py that strokes the images with '
+                        'its warm model. Empty loads the model in this process')
+    parser.add_argument('-j', '--trace_file', type=str, default='',
+                        help='Chrome trace JSON file of the stage timings. Empty disables the tracing')
+    parser.add_argument('-F', '--out_format', type=str, default='', choices=['', 'png', 'jpg', 'webp'],
+                        help='format of the output images. Empty keeps the format of the input images')
+    parser.add_argument('-C', '--compression', type=int, default=-1,
+                        help='PNG compression level from 0 (fastest) to 9 (smallest). -1 is the OpenCV default')
+    parser.add_argument('-Q', '--quality', type=int, default=-1,
+                        help='JPEG and WebP quality from 1 to 100, the WebP is lossless above 100. -1 is the OpenCV '
+                        'default')
+    parser.add_argument('-W', '--async_writes', type=int, default=0,
+                        help='number of output images waiting in the background writer of the sequential and the '
+                        'batch modes. 0 writes them right away')
+    parser.add_argument('-v', '--manifest', action='store_true',
+                        help='record the processed images in the manifest of the output folder and skip the up to '
+                        'date ones on the reruns')
     parser.add_argument('-p', '--vdebug', type=bool, default=False, help='storing the debug images in the debug folder')
 
     args = parser.parse_args()
@@ -126,4 +600,8 @@ if __name__ == '__main__':
     """
     This is the entry point of the program
     """
-    main(parse_args())
+    args = parse_args()
+    if args.trace_file != '':
+        run_traced(args)
+    else:
+        main(args)
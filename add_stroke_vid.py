@@ -0,0 +1,132 @@
+""" This module is the usage example of the outline stroke feature for human in the given videos and superimpose
+the stroked human with the background image or video
+"""
+from socialmediautils import stroke
+from typing import Any
+
+import argparse
+import os
+import numpy as np
+
+from colour import Color
+from datetime import datetime
+
+
+def main(args: Any) -> None:
+    '''
+    This function executes the process for making stroke over the border of human for either a
+    single video or the given set of videos in the folder
+
+    :param args: It holds the user given arguments for controlling the program flow as per the
+    user expectation
+    :type args: Any
+    '''
+    video_names: list = []
+    input_videos: list = []
+    output_videos: list = []
+    total_processing_videos = 0
+
+    input_folder_path = args.input_folder
+    input_file = args.input_file
+    bg_file = args.bg_file
+    output_folder_path = args.output_folder
+
+    if args.model_name not in ['u2net_human_seg', 'u2netp']:
+        print('This model is not supported! Please check the correct model name')
+        exit()
+
+    elif input_folder_path == '':
+        if not os.path.isfile(input_file):
+            print('This input file is not valid! Please check the correct path with file name')
+            exit()
+        else:
+            input_videos.append(input_file)
+            output_videos.append(os.path.join(output_folder_path, os.path.basename(input_file)))
+
+    elif input_folder_path != '':
+
+        video_names = os.listdir(input_folder_path)
+
+        for file in video_names:
+            if file.endswith(('mp4', 'avi', 'mov', 'mkv')):
+                input_videos.append(os.path.join(input_folder_path, file))
+                output_videos.append(os.path.join(output_folder_path, file))
+
+    if bg_file != '' and not os.path.isfile(bg_file):
+        print('This background file is not valid! Please check the correct path with file name')
+        exit()
+
+    if not os.path.exists(output_folder_path):
+        os.makedirs(output_folder_path)
+
+    total_processing_videos = len(input_videos)
+
+    model_session = stroke.get_stroke_session(args.model_name)
+    if args.vdebug:
+        stroke.enable_visual_debug(True)
+
+    stroke_color = np.interp(Color(args.color).get_rgb(), [0, 1], [0, 255]).astype('uint8').tolist()
+    diff_threshold = args.diff_threshold if args.diff_threshold > 0 else None
+
+    for video_index in range(total_processing_videos):
+        print('\nStarted processing file named {} {}/{}'.format(input_videos[video_index], video_index + 1,
+              total_processing_videos))
+
+        if bg_file != '':
+            total_frames = stroke.add_video_stroke_with_bg(model_session, input_videos[video_index], bg_file,
+                                                           output_videos[video_index], stroke_color, 1.03,
+                                                           args.resegment_interval, diff_threshold, 'mp4v',
+                                                           args.zoom_option, args.stroke_width, args.kernel_shape,
+                                                           args.anti_alias)
+        else:
+            total_frames = stroke.add_video_stroke(model_session, input_videos[video_index],
+                                                   output_videos[video_index], stroke_color, 1.03, None,
+                                                   args.resegment_interval, diff_threshold, 'mp4v',
+                                                   args.zoom_option, args.stroke_width, args.kernel_shape,
+                                                   args.anti_alias)
+        print('Processed {} frames'.format(total_frames))
+
+
+def parse_args() -> Any:
+    """This function recieves and parses the input arguments.
+
+    :return: Argument parser that holds the user input to this program
+    :rtype: Any
+    """
+    parser = argparse.ArgumentParser(description='Add outline stroking to the human video for appealing visual')
+    parser.add_argument('-m', '--model_name', type=str, default='u2net_human_seg',
+                        help='key in the supported model name [u2net_human_seg, u2netp]')
+    parser.add_argument('-d', '--input_folder', type=str, default='', help='input directory path for human videos.')
+    parser.add_argument('-i', '--input_file', default='',
+                        type=str, help='video file with human to be stroked.')
+    parser.add_argument('-b', '--bg_file', default='',
+                        type=str, help='background image or video file.')
+    parser.add_argument('-o', '--output_folder', type=str,
+                        default=datetime.now().strftime("%Y%m%d-%H%M%S"), help='Folder where the output is stored.')
+    parser.add_argument('-c', '--color', type=str, default='yellow', help='Feed the color as per W3C color naming')
+    parser.add_argument('-z', '--zoom_option', type=int, default=1,
+                        help='stroke algorithm [1: center zoom, 2: center crop, 3: dilation, 4: distance transform]')
+    parser.add_argument('-s', '--stroke_width', type=int, default=0,
+                        help='stroke thickness in pixels for the zoom options 3 and 4. 0 derives it from the zoom')
+    parser.add_argument('-K', '--kernel_shape', type=str, default='ellipse', choices=['ellipse', 'rect', 'cross'],
+                        help='shape that grows the mask for the zoom options 3 and 4')
+    parser.add_argument('--anti_alias', action=argparse.BooleanOptionalAction, default=True,
+                        help='anti-alias the stroke of the zoom option 4. --no-anti_alias keeps its edge binary')
+    parser.add_argument('-r', '--resegment_interval', type=int, default=1,
+                        help='run the segmentation at least at every given number of frames and warp the mask between')
+    parser.add_argument('-t', '--diff_threshold', type=float, default=0,
+                        help='mean frame difference (0-255) that forces the segmentation to run. 0 disables it')
+    parser.add_argument('-p', '--vdebug', type=bool, default=False, help='storing the debug images in the debug folder')
+
+    args = parser.parse_args()
+
+    print('\n\n\n!!! Outline stroking functionality for the human videos !!!\n\n')
+    print('Starting the Application with instance ID:', datetime.now().strftime("%Y%m%d-%H%M%S"))
+    return args
+
+
+if __name__ == '__main__':
+    """
+    This is the entry point of the program
+    """
+    main(parse_args())
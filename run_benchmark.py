@@ -0,0 +1,161 @@
+""" This module is the usage example of the benchmark of the stroke and the face blur pipelines over the synthetic
+images, which stores the results as JSON to be compared with the other commits
+"""
+from socialmediautils import benchmark
+from typing import Any
+
+import argparse
+import json
+import os
+import sys
+
+from datetime import datetime
+
+
+def main(args: Any) -> None:
+    '''
+    This function runs the benchmark as per the user given arguments, stores the results and compares them with the
+    baseline results if given
+
+    :param args: It holds the user given arguments for controlling the program flow as per the
+    user expectation
+    :type args: Any
+    '''
+    if args.import_time:
+        main_import_time(args)
+        return
+
+    model_names = {'stroke': args.stroke_model, 'stroke_with_bg': args.stroke_model, 'face_blur': args.blur_model,
+                   'face_blur_crops': args.blur_model}
+    options = {'zoom_option': args.zoom_option, 'roi_blur': args.roi_blur, 'inference_policy': args.inference_policy,
+               'blur_backend': args.blur_backend, 'blur_kind': args.blur_kind, 'face_detector': args.face_detector,
+               'out_ext': args.out_ext}
+
+    results = benchmark.run_benchmarks(args.pipelines.split(','), args.resolutions.split(','),
+                                       args.sessions.split(','), args.iterations, args.warmup, not args.no_isolate,
+                                       model_names, options)
+
+    output_folder_path = os.path.dirname(args.output_file)
+    if output_folder_path != '' and not os.path.exists(output_folder_path):
+        os.makedirs(output_folder_path)
+
+    with open(args.output_file, 'w') as output_file:
+        json.dump(results, output_file, indent=2)
+
+    print('\n{:<16}{:<8}{:<6}{:>12}{:>12}{:>12}{:>14}'.format('pipeline', 'res', 'model', 'p50 ms', 'p90 ms',
+                                                            'img/s', 'peak MiB'))
+    for result in results['results']:
+        if 'error' in result:
+            print('{:<16}{:<8}{:<6}  failed: {}'.format(result['pipeline'], result['resolution'], result['session'],
+                                                        result['error']))
+            continue
+
+        print('{:<16}{:<8}{:<6}{:>12}{:>12}{:>12}{:>14}'.format(result['pipeline'], result['resolution'],
+                                                                result['session'], result['total']['p50'],
+                                                                result['total']['p90'], result['throughput_ips'],
+                                                                str(result['peak_rss_mb'])))
+    print('\nResults are stored in {}'.format(args.output_file))
+
+    if args.compare != '':
+        with open(args.compare) as baseline_file:
+            regressions = benchmark.compare_results(json.load(baseline_file), results, args.tolerance)
+
+        for regression in regressions:
+            print('Regression in {pipeline} at {resolution} with the {session} model, {stage} p50 {baseline_p50} ms '
+                  '-> {current_p50} ms'.format(**regression))
+
+        if len(regressions) != 0:
+            sys.exit(1)
+
+        print('No regression compared to {}'.format(args.compare))
+
+
+def main_import_time(args: Any) -> None:
+    '''
+    This function measures the import time of the package and the startup time of the CLIs, and stores the results
+
+    :param args: It holds the user given arguments for controlling the program flow as per the
+    user expectation
+    :type args: Any
+    '''
+    commands = {case_name: ['-c', statement] for case_name, statement in benchmark.import_statements.items()}
+    for script_name in ('add_stroke_img.py', 'add_face_blur_img.py', 'add_stroke_vid.py', 'add_face_blur_vid.py'):
+        commands[script_name + ' --help'] = [script_name, '--help']
+
+    results = benchmark.measure_import_times(commands, args.iterations, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+    output_folder_path = os.path.dirname(args.output_file)
+    if output_folder_path != '' and not os.path.exists(output_folder_path):
+        os.makedirs(output_folder_path)
+
+    with open(args.output_file, 'w') as output_file:
+        json.dump(results, output_file, indent=2)
+
+    print('\n{:<32}{:>12}{:>12}{:>14}  {}'.format('case', 'wall ms', 'python ms', 'imports ms', 'slowest import'))
+    for case_name, result in results.items():
+        slowest_import = result['top_imports'][0] if len(result['top_imports']) != 0 else {'module': '-',
+                                                                                          'cumulative_ms': 0.}
+        print('{:<32}{:>12}{:>12}{:>14}  {} ({} ms)'.format(case_name, result['wall_ms'], result['baseline_ms'],
+                                                           result['import_ms'], slowest_import['module'],
+                                                           slowest_import['cumulative_ms']))
+    print('\nResults are stored in {}'.format(args.output_file))
+
+
+def parse_args() -> Any:
+    """This function recieves and parses the input arguments.
+
+    :return: Argument parser that holds the user input to this program
+    :rtype: Any
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the stroke and the face blur pipelines')
+    parser.add_argument('-l', '--pipelines', type=str, default='stroke,stroke_with_bg,face_blur',
+                        help='comma separated pipelines [stroke, stroke_with_bg, face_blur, face_blur_crops]')
+    parser.add_argument('-r', '--resolutions', type=str, default='512,1080p,4k,24mp',
+                        help='comma separated resolutions [512, 1080p, 4k, 24mp]')
+    parser.add_argument('-s', '--sessions', type=str, default='stub',
+                        help='comma separated models [stub, real]. The real models are downloaded if needed')
+    parser.add_argument('-n', '--iterations', type=int, default=5, help='number of the measured runs of each case')
+    parser.add_argument('-u', '--warmup', type=int, default=1, help='number of the unmeasured runs of each case')
+    parser.add_argument('-m', '--stroke_model', type=str, default='u2net_human_seg',
+                        help='rembg model name of the real stroke session')
+    parser.add_argument('-f', '--blur_model', type=str, default='bisenet',
+                        help='face parser model name of the real face blur session')
+    parser.add_argument('-b', '--blur_backend', type=str, default='torch', choices=['torch', 'onnx', 'onnx_int8'],
+                        help='backend of the real face parser session')
+    parser.add_argument('-d', '--face_detector', type=str, default='retinaface_mobile0.25',
+                        choices=['retinaface_mobile0.25', 'retinaface_resnet50', 'haar'],
+                        help='face detector of the real face_blur_crops session')
+    parser.add_argument('-z', '--zoom_option', type=int, default=1, help='zoom option of the stroke pipelines')
+    parser.add_argument('-a', '--roi_blur', action='store_true',
+                        help='blur only the face bounding boxes at the original resolution')
+    parser.add_argument('-k', '--blur_kind', type=str, default='box',
+                        choices=['box', 'gaussian', 'pixelate', 'stacked_box'],
+                        help='blurring kernel of the face blur pipeline')
+    parser.add_argument('-g', '--inference_policy', type=str, default='default',
+                        choices=['default', 'speed', 'balanced', 'quality'],
+                        help='inference resolution policy of the stroke and the face blur pipelines')
+    parser.add_argument('-e', '--out_ext', type=str, default='.jpg', help='output encoding format of the runs')
+    parser.add_argument('-i', '--no_isolate', action='store_true',
+                        help='run all the cases in this process. The peak RSS is then the peak of all the cases so far')
+    parser.add_argument('-o', '--output_file', type=str,
+                        default=os.path.join('benchmarks', datetime.now().strftime("%Y%m%d-%H%M%S") + '.json'),
+                        help='JSON file where the results are stored')
+    parser.add_argument('-c', '--compare', type=str, default='',
+                        help='JSON file of the baseline results. It exits with 1 if any case got slower')
+    parser.add_argument('-t', '--tolerance', type=float, default=0.1,
+                        help='allowed relative slowdown of the p50 latency compared to the baseline')
+    parser.add_argument('-p', '--import_time', action='store_true',
+                        help='measure the import time of the package and the startup of the CLIs instead')
+
+    args = parser.parse_args()
+
+    print('\n\n\n!!! Benchmark of the stroke and the face blur pipelines !!!\n\n')
+    print('Starting the Application with instance ID:', datetime.now().strftime("%Y%m%d-%H%M%S"))
+    return args
+
+
+if __name__ == '__main__':
+    """
+    This is the entry point of the program
+    """
+    main(parse_args())
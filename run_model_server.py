@@ -0,0 +1,84 @@
+""" This module is the usage example of the model server, which loads the stroke and the face blur models once and
+processes the jobs of the CLIs (--server_address) or any other client over the localhost HTTP or a Unix socket
+"""
+from socialmediautils import server
+from typing import Any
+
+import argparse
+import signal
+
+from datetime import datetime
+
+
+def main(args: Any) -> None:
+    '''
+    This function loads the models, serves the jobs until SIGINT, SIGTERM or POST /shutdown is received and then
+    finishes the queued jobs before exiting
+
+    :param args: It holds the user given arguments for controlling the program flow as per the
+    user expectation
+    :type args: Any
+    '''
+    model_server = server.ModelServer(args.stroke_model, args.blur_model, args.workers, args.queue_depth,
+                                      args.cache_dir, args.blur_backend)
+
+    def shutdown(signal_number: int, frame: Any) -> None:
+        print('\nShutting down after the queued jobs')
+        model_server.request_shutdown()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    print('Loading the models {}'.format(', '.join(name for name in (args.stroke_model, args.blur_model) if name)))
+    model_server.load_models(not args.no_warmup)
+    token_file = args.token_file if args.token_file != '' else server.get_token_file(args.address)
+    print('Serving the jobs at {} with the access token in {}'.format(args.address, token_file))
+    model_server.serve(args.address, args.job_timeout, False, args.allow_remote, args.max_request_mb, token_file)
+    print('Model server statistics: {}'.format(model_server.get_stats()))
+
+
+def parse_args() -> Any:
+    """This function recieves and parses the input arguments.
+
+    :return: Argument parser that holds the user input to this program
+    :rtype: Any
+    """
+    parser = argparse.ArgumentParser(description='Serve the stroke and the face blur jobs with the warm models')
+    parser.add_argument('-a', '--address', type=str, default='127.0.0.1:8765',
+                        help='host:port of the localhost or the path of the Unix socket, e.g. /tmp/iveu.sock')
+    parser.add_argument('-s', '--stroke_model', type=str, default='u2net_human_seg',
+                        help='rembg model of the stroke jobs [u2net_human_seg, u2netp]. Empty disables the stroke')
+    parser.add_argument('-f', '--blur_model', type=str, default='bisenet',
+                        help='face parser model of the face blur jobs [bisenet]. Empty disables the face blur')
+    parser.add_argument('-b', '--blur_backend', type=str, default='torch', choices=['torch', 'onnx', 'onnx_int8'],
+                        help='backend of the face parser. onnx and onnx_int8 (INT8 quantized) run with onnxruntime')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='number of worker threads sharing the models')
+    parser.add_argument('-q', '--queue_depth', type=int, default=8,
+                        help='maximum number of jobs waiting for a worker. The further jobs get 503 to retry later')
+    parser.add_argument('-k', '--cache_dir', type=str, default='',
+                        help='folder of the mask cache shared by the jobs. Empty disables it')
+    parser.add_argument('-t', '--job_timeout', type=float, default=300.,
+                        help='maximum number of seconds a request waits for its job')
+    parser.add_argument('-n', '--no_warmup', action='store_true',
+                        help='skip running the models once on a small image after loading them')
+    parser.add_argument('-r', '--allow_remote', action='store_true',
+                        help='serve on the hosts other than the loopback one. The jobs read and write the files of '
+                        'the server, so only for the trusted networks')
+    parser.add_argument('-m', '--max_request_mb', type=int, default=server.MAX_REQUEST_MB,
+                        help='largest request body in MiB. The larger requests get 413')
+    parser.add_argument('-o', '--token_file', type=str, default='',
+                        help='file of the access token generated at startup, readable by this user only. Empty is '
+                        'next to the Unix socket or under ~/.iveu for the host and the port')
+
+    args = parser.parse_args()
+
+    print('\n\n\n!!! Model server for the stroke and the face blur jobs !!!\n\n')
+    print('Starting the Application with instance ID:', datetime.now().strftime("%Y%m%d-%H%M%S"))
+    return args
+
+
+if __name__ == '__main__':
+    """
+    This is the entry point of the program
+    """
+    main(parse_args())
@@ -1,14 +1,73 @@
-""" This package implements the various utilities for making social media content
+""" This package implements the various utilities for making social media content. The subpackages and the public
+names are loaded lazily on their first access, so that importing the package does not import rembg, onnxruntime,
+torch or facexlib until the stroke or the face blur is used.
 """
+from typing import TYPE_CHECKING
 from .version import __version__
-from .stroke import get_stroke_session
-from .stroke.stroke_img import add_img_stroke
-from .stroke.stroke_img import add_img_stroke_with_bg
-from .stroke.stroke_img import enable_visual_debug
-from .blur.face_blur_img import get_face_parser_model
-from .blur.face_blur_img import add_face_blur
-from .blur.face_blur_img import enable_visual_debug_fb
+from .lazy_import import attach_lazy_names
 
+if TYPE_CHECKING:
+    from .cache import BackgroundCache
+    from .cache import MaskCache
+    from .imgio import AsyncImgWriter
+    from .imgio import EncodeOptions
+    from .imgio import decode_img
+    from .imgio import encode_img
+    from .imgio import write_img
+    from .stroke import get_stroke_session
+    from .stroke.stroke_batch import BatchSegmenter
+    from .stroke.stroke_batch import add_img_stroke_batch
+    from .stroke.stroke_img import add_img_stroke
+    from .stroke.stroke_img import add_img_stroke_array
+    from .stroke.stroke_img import add_img_stroke_bytes
+    from .stroke.stroke_img import add_img_stroke_with_bg
+    from .stroke.stroke_img import add_img_stroke_with_bg_array
+    from .stroke.stroke_img import add_img_stroke_with_bg_bytes
+    from .stroke.stroke_img import enable_visual_debug
+    from .stroke.stroke_tiled import add_img_stroke_tiled
+    from .stroke.stroke_tiled import add_img_stroke_with_bg_tiled
+    from .stroke.stroke_vid import add_video_stroke
+    from .stroke.stroke_vid import add_video_stroke_with_bg
+    from .blur.face_blur_img import get_face_parser_model
+    from .blur.face_blur_img import add_face_blur
+    from .blur.face_blur_img import add_face_blur_array
+    from .blur.face_blur_img import add_face_blur_bytes
+    from .blur.face_blur_img import add_face_blur_batch
+    from .blur.face_blur_img import add_face_blur_crops
+    from .blur.face_blur_img import enable_visual_debug_fb
+    from .blur.face_blur_vid import add_face_blur_video
+    from .blur.face_detector import get_face_detector
+    from .trace import Tracer
+    from .trace import debug_images
+    from .trace import tracing
 
-__all__ = ['__version__', 'get_stroke_session', 'add_img_stroke', 'add_img_stroke_with_bg', 'enable_visual_debug',
-           'get_face_parser_model', 'add_face_blur', 'enable_visual_debug_fb']
+lazy_names = {'BackgroundCache': '.cache', 'MaskCache': '.cache', 'AsyncImgWriter': '.imgio',
+              'EncodeOptions': '.imgio', 'decode_img': '.imgio', 'encode_img': '.imgio', 'write_img': '.imgio',
+              'get_stroke_session': '.stroke', 'BatchSegmenter': '.stroke.stroke_batch',
+              'add_img_stroke_batch': '.stroke.stroke_batch',
+              'add_img_stroke': '.stroke.stroke_img', 'add_img_stroke_array': '.stroke.stroke_img',
+              'add_img_stroke_bytes': '.stroke.stroke_img', 'add_img_stroke_with_bg': '.stroke.stroke_img',
+              'add_img_stroke_with_bg_array': '.stroke.stroke_img',
+              'add_img_stroke_with_bg_bytes': '.stroke.stroke_img',
+              'enable_visual_debug': '.stroke.stroke_img', 'add_img_stroke_tiled': '.stroke.stroke_tiled',
+              'add_img_stroke_with_bg_tiled': '.stroke.stroke_tiled', 'add_video_stroke': '.stroke.stroke_vid',
+              'add_video_stroke_with_bg': '.stroke.stroke_vid', 'get_face_parser_model': '.blur.face_blur_img',
+              'add_face_blur': '.blur.face_blur_img', 'add_face_blur_array': '.blur.face_blur_img',
+              'add_face_blur_bytes': '.blur.face_blur_img', 'add_face_blur_batch': '.blur.face_blur_img',
+              'add_face_blur_crops': '.blur.face_blur_img', 'enable_visual_debug_fb': '.blur.face_blur_img',
+              'add_face_blur_video': '.blur.face_blur_vid', 'get_face_detector': '.blur.face_detector',
+              'Tracer': '.trace', 'debug_images': '.trace', 'tracing': '.trace'}
+submodules = ('benchmark', 'blur', 'cache', 'composite', 'imgio', 'inference', 'pipeline', 'server', 'stroke',
+              'trace')
+
+__getattr__, __dir__ = attach_lazy_names(__name__, lazy_names, submodules)
+
+
+__all__ = ['__version__', 'BackgroundCache', 'MaskCache', 'AsyncImgWriter', 'EncodeOptions', 'decode_img',
+           'encode_img', 'write_img', 'get_stroke_session', 'BatchSegmenter', 'add_img_stroke_batch', 'add_img_stroke',
+           'add_img_stroke_array', 'add_img_stroke_bytes', 'add_img_stroke_with_bg', 'add_img_stroke_with_bg_array',
+           'add_img_stroke_with_bg_bytes',
+           'enable_visual_debug', 'add_img_stroke_tiled', 'add_img_stroke_with_bg_tiled', 'add_video_stroke',
+           'add_video_stroke_with_bg', 'get_face_parser_model', 'add_face_blur', 'add_face_blur_array',
+           'add_face_blur_bytes', 'add_face_blur_batch', 'add_face_blur_crops', 'enable_visual_debug_fb',
+           'add_face_blur_video', 'get_face_detector', 'Tracer', 'debug_images', 'tracing']
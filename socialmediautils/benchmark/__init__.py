@@ -0,0 +1,22 @@
+""" This module implements the benchmark of the stroke and the face blur pipelines and of the import time of the
+package. The pipeline benchmark is loaded lazily, so that measuring the import time does not import the models
+"""
+from typing import Any
+from typing import TYPE_CHECKING
+from ..lazy_import import attach_lazy_names
+from .bench_imports import import_statements
+from .bench_imports import measure_import_times
+
+if TYPE_CHECKING:
+    from .bench_pipelines import compare_results
+    from .bench_pipelines import resolutions
+    from .bench_pipelines import run_benchmarks
+    from .stub_models import StubFaceParser
+    from .stub_models import StubStrokeSession
+    from .stub_models import make_synthetic_img
+
+lazy_names = {'compare_results': '.bench_pipelines', 'resolutions': '.bench_pipelines',
+              'run_benchmarks': '.bench_pipelines', 'StubFaceParser': '.stub_models',
+              'StubStrokeSession': '.stub_models', 'make_synthetic_img': '.stub_models'}
+
+__getattr__, __dir__ = attach_lazy_names(__name__, lazy_names, ('bench_pipelines', 'stub_models'))
@@ -0,0 +1,127 @@
+""" This module implements the benchmark of the import time of the package. Each measurement runs in a fresh python
+process with -X importtime, so that the modules already imported by the caller do not hide the cost.
+"""
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import_statements = {'package': 'import socialmediautils',
+                     'stroke': 'from socialmediautils import stroke; stroke.add_img_stroke',
+                     'face_blur': 'from socialmediautils import blur; blur.add_face_blur'}
+
+
+def parse_import_times(importtime_log: str) -> List[Tuple[str, float]]:
+    """
+    It parses the -X importtime log and returns the cumulative import time of each top level import, i.e. the
+    imports that are not nested in another import.
+
+    :param importtime_log: The stderr of the python process that ran with -X importtime
+    :type importtime_log: str
+    :return: Returns the module names with their cumulative import time in milliseconds
+    :rtype: List[Tuple[str, float]]
+    """
+    import_times = []
+    for line in importtime_log.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+
+        _, cumulative_us, module_name = line[len('import time:'):].split('|', 2)
+        if not module_name.startswith(' ') or module_name.startswith('  '):
+            continue
+
+        import_times.append((module_name.strip(), int(cumulative_us) / 1000.))
+
+    return import_times
+
+
+def run_python(args: List[str], cwd: Optional[str] = None) -> Tuple[float, str]:
+    """
+    It runs python with the given arguments in a fresh process.
+
+    :param args: The arguments of python, e.g. ['-c', 'import socialmediautils']
+    :type args: List[str]
+    :param cwd: The working directory of the process. None selects the current one, defaults to None
+    :type cwd: Optional[str], optional
+    :return: Returns the wall clock time of the process in milliseconds and its stderr
+    :rtype: Tuple[float, str]
+    """
+    start_time = time.perf_counter()
+    completed = subprocess.run([sys.executable] + args, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                               universal_newlines=True)
+    wall_time_ms = (time.perf_counter() - start_time) * 1000.
+
+    if completed.returncode != 0:
+        raise RuntimeError('python {} failed: {}'.format(' '.join(args), completed.stderr.strip()[-500:]))
+
+    return wall_time_ms, completed.stderr
+
+
+def measure_import_time(args: List[str], repeats: int = 3, top: int = 10, cwd: Optional[str] = None
+                        ) -> Dict[str, Any]:
+    """
+    It measures the startup of python with the given arguments, e.g. an import statement or a CLI with --help. The
+    wall time includes the interpreter startup, which is reported separately as the baseline.
+
+    :param args: The arguments of python, e.g. ['-c', 'import socialmediautils'] or ['add_stroke_img.py', '--help']
+    :type args: List[str]
+    :param repeats: Number of the fresh processes. The median is reported, defaults to 3
+    :type repeats: int, optional
+    :param top: Number of the slowest top level imports that are reported, defaults to 10
+    :type top: int, optional
+    :param cwd: The working directory of the processes. None selects the current one, defaults to None
+    :type cwd: Optional[str], optional
+    :return: Returns the median wall time, the interpreter baseline, the import time and the slowest imports in
+    milliseconds
+    :rtype: Dict[str, Any]
+    """
+    wall_times_ms, baseline_times_ms, import_times_ms = [], [], []
+    import_times = []
+    for _ in range(repeats):
+        baseline_times_ms.append(run_python(['-c', 'pass'], cwd)[0])
+        wall_time_ms, importtime_log = run_python(['-X', 'importtime'] + args, cwd)
+        import_times = parse_import_times(importtime_log)
+        wall_times_ms.append(wall_time_ms)
+        import_times_ms.append(sum(import_time for _, import_time in import_times))
+
+    slowest_imports = sorted(import_times, key=lambda import_time: import_time[1], reverse=True)[:top]
+    return {'command': ' '.join(args), 'wall_ms': round(statistics.median(wall_times_ms), 3),
+            'baseline_ms': round(statistics.median(baseline_times_ms), 3),
+            'import_ms': round(statistics.median(import_times_ms), 3),
+            'top_imports': [{'module': module_name, 'cumulative_ms': round(import_time, 3)}
+                            for module_name, import_time in slowest_imports]}
+
+
+def measure_import_times(commands: Optional[Dict[str, List[str]]] = None, repeats: int = 3, top: int = 10,
+                         cwd: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    It measures the import time of the given commands. By default it measures importing the package and the first
+    access of the stroke and the face blur functions, which import their models.
+
+    :param commands: It maps each case name to the arguments of python. None selects the default import statements,
+    defaults to None
+    :type commands: Optional[Dict[str, List[str]]], optional
+    :param repeats: Number of the fresh processes of each case, defaults to 3
+    :type repeats: int, optional
+    :param top: Number of the slowest top level imports that are reported, defaults to 10
+    :type top: int, optional
+    :param cwd: The working directory of the processes. None selects the parent of the package so that the package
+    in this tree is imported, defaults to None
+    :type cwd: Optional[str], optional
+    :return: Returns the measurements of each case
+    :rtype: Dict[str, Dict[str, Any]]
+    """
+    if commands is None:
+        commands = {case_name: ['-c', statement] for case_name, statement in import_statements.items()}
+
+    if cwd is None:
+        cwd = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    return {case_name: measure_import_time(args, repeats, top, cwd) for case_name, args in commands.items()}
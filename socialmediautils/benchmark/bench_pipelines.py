@@ -0,0 +1,452 @@
+""" This module implements the benchmark of the stroke and the face blur pipelines. It runs each pipeline over the
+synthetic images of the given resolutions and measures the latency of each stage, the throughput and the peak memory.
+"""
+from ..blur.face_blur_img import FACE_CROP_BATCH_SIZE
+from ..blur.face_blur_img import apply_face_blur
+from ..blur.face_blur_img import blur_face_crops
+from ..blur.face_blur_img import get_face_mask
+from ..blur.face_blur_img import get_face_parser_model
+from ..blur.face_blur_img import parse_faces
+from ..blur.face_detector import crop_face
+from ..blur.face_detector import detect_faces
+from ..blur.face_detector import get_face_crop_box
+from ..blur.face_detector import get_face_detector
+from ..imgio.img_codec import decode_img
+from ..imgio.img_codec import encode_img
+from ..inference.inference_policy import get_inference_policy
+from ..stroke import get_stroke_session
+from ..stroke.stroke_engine import ZOOM_OPTION_DISTANCE
+from ..stroke.stroke_img import get_human_mask
+from ..stroke.stroke_img import get_stroke_mask
+from ..stroke.stroke_img import overlay_img
+from ..stroke.stroke_img import overlay_img_with_bg
+from ..stroke.stroke_img import zoom_mask
+from ..trace.tracer import get_peak_rss_mb
+from ..version import __version__
+from .stub_models import StubFaceDetector
+from .stub_models import StubFaceParser
+from .stub_models import StubStrokeSession
+from .stub_models import make_synthetic_img
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+
+import multiprocessing
+import os
+import platform
+import subprocess
+import time
+import cv2
+import numpy as np
+
+pipelines = ('stroke', 'stroke_with_bg', 'face_blur', 'face_blur_crops')
+resolutions = {'512': (512, 512), '1080p': (1920, 1080), '4k': (3840, 2160), '24mp': (6000, 4000)}
+stage_names = ('decode', 'inference', 'mask_ops', 'composite', 'encode')
+session_kinds = ('stub', 'real')
+
+
+class StageTimer:
+    """
+    It collects the wall clock durations of the pipeline stages over the iterations.
+    """
+
+    def __init__(self) -> None:
+        self.durations: Dict[str, List[float]] = {stage_name: [] for stage_name in stage_names}
+
+    @contextmanager
+    def stage(self, stage_name: str) -> Iterator[None]:
+        """
+        It measures the duration of the code block as the given stage.
+
+        :param stage_name: Name of the stage
+        :type stage_name: str
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[stage_name].append(time.perf_counter() - start_time)
+
+    def get_totals(self) -> List[float]:
+        """
+        It returns the sum of the stage durations of each iteration.
+
+        :return: Returns the duration of each iteration in seconds
+        :rtype: List[float]
+        """
+        return [sum(durations) for durations in zip(*self.durations.values())]
+
+
+def get_latency_stats(durations: List[float]) -> Dict[str, float]:
+    """
+    It summarizes the given durations as the latency percentiles in milliseconds.
+
+    :param durations: The durations in seconds
+    :type durations: List[float]
+    :return: Returns the p50, p90, p99, mean, min and max latency in milliseconds
+    :rtype: Dict[str, float]
+    """
+    durations_ms = np.asarray(durations, dtype='float64') * 1000.
+    p50, p90, p99 = np.percentile(durations_ms, [50, 90, 99])
+
+    return {'p50': round(float(p50), 3), 'p90': round(float(p90), 3), 'p99': round(float(p99), 3),
+            'mean': round(float(durations_ms.mean()), 3), 'min': round(float(durations_ms.min()), 3),
+            'max': round(float(durations_ms.max()), 3)}
+
+
+def load_model(pipeline: str, session_kind: str, model_name: str = '', blur_backend: str = 'torch',
+               face_detector: str = 'retinaface_mobile0.25') -> Any:
+    """
+    It loads the model of the given pipeline, either the stub or the real one.
+
+    :param pipeline: One of the pipelines, 'stroke', 'stroke_with_bg', 'face_blur' or 'face_blur_crops'
+    :type pipeline: str
+    :param session_kind: 'stub' for the stub model or 'real' for the real model
+    :type session_kind: str
+    :param model_name: The model name of the real model. Empty selects the default one, defaults to ''
+    :type model_name: str, optional
+    :param blur_backend: The backend of the real face parser, 'torch', 'onnx' or 'onnx_int8', defaults to 'torch'
+    :type blur_backend: str, optional
+    :param face_detector: The real face detector of the face_blur_crops, defaults to 'retinaface_mobile0.25'
+    :type face_detector: str, optional
+    :return: Returns the rembg session for the stroke, the (net, device) for the face blur or the (net, device,
+    detector) for the face blur of the crops
+    :rtype: Any
+    """
+    if pipeline == 'face_blur_crops':
+        if session_kind == 'stub':
+            return StubFaceParser().eval(), 'cpu', StubFaceDetector()
+
+        net, dev_acc = get_face_parser_model(model_name or 'bisenet', blur_backend)
+        return net, dev_acc, get_face_detector(face_detector, dev_acc)
+
+    if pipeline == 'face_blur':
+        if session_kind == 'stub':
+            return StubFaceParser().eval(), 'cpu'
+
+        return get_face_parser_model(model_name or 'bisenet', blur_backend)
+
+    if session_kind == 'stub':
+        return StubStrokeSession()
+
+    return get_stroke_session(model_name or 'u2net_human_seg')
+
+
+def run_stroke_iteration(timer: StageTimer, model_session: Any, img_data: bytes, bg_data: Optional[bytes],
+                         options: Dict[str, Any]) -> None:
+    """
+    It runs the stroke pipeline once over the given encoded image, stage by stage like apply_img_stroke and
+    apply_img_stroke_with_bg.
+
+    :param timer: The timer of the stages
+    :type timer: StageTimer
+    :param model_session: The rembg session
+    :type model_session: Any
+    :param img_data: The encoded image with human
+    :type img_data: bytes
+    :param bg_data: The encoded background image. None runs the stroke without the background
+    :type bg_data: Optional[bytes]
+    :param options: The color, zooming_factor, zoom_option, stroke_width, inference_policy and out_ext of the run
+    :type options: Dict[str, Any]
+    """
+    RChannel, GChannel, BChannel = options['color']
+
+    with timer.stage('decode'):
+        img_org = decode_img(img_data)
+        img_bg = decode_img(bg_data) if bg_data is not None else None
+
+    with timer.stage('inference'):
+        img_org_mask = get_human_mask(model_session, img_org, None, options['inference_policy'])
+
+    with timer.stage('mask_ops'):
+        img_scale_mask = zoom_mask(img_org_mask, options['zooming_factor'], zoom_option=options['zoom_option'],
+                                   stroke_width=options['stroke_width'])
+        img_overlay_mask = get_stroke_mask(img_org_mask, img_scale_mask, options['zoom_option'])
+
+    with timer.stage('composite'):
+        if img_bg is None:
+            img_blended = overlay_img(img_org, (BChannel, GChannel, RChannel), img_overlay_mask,
+                                      partial_blend=options['zoom_option'] == ZOOM_OPTION_DISTANCE)
+        else:
+            img_bg = cv2.resize(img_bg, (img_org.shape[1], img_org.shape[0]), interpolation=cv2.INTER_LINEAR)
+            img_blended = overlay_img_with_bg(img_org, img_bg, (BChannel, GChannel, RChannel), img_org_mask,
+                                              img_scale_mask, img_overlay_mask, img_bg, options['zoom_option'])
+
+    with timer.stage('encode'):
+        encode_img(img_blended, options['out_ext'])
+
+
+def run_face_blur_iteration(timer: StageTimer, model: Any, img_data: bytes, options: Dict[str, Any]) -> None:
+    """
+    It runs the face blur pipeline once over the given encoded image, stage by stage like add_face_blur_array.
+
+    :param timer: The timer of the stages
+    :type timer: StageTimer
+    :param model: The face parser net and its device
+    :type model: Any
+    :param img_data: The encoded image with face
+    :type img_data: bytes
+    :param options: The blurring_factor, blur_kind, roi_blur, inference_policy, face_regions and out_ext of the run
+    :type options: Dict[str, Any]
+    """
+    net, dev_acc = model
+    parse_size = get_inference_policy(options['inference_policy']).face_parse_size
+
+    with timer.stage('decode'):
+        img_org = decode_img(img_data)
+
+    with timer.stage('inference'):
+        img_resized = cv2.resize(img_org, (parse_size, parse_size), interpolation=cv2.INTER_LINEAR)
+        face_parsed = parse_faces(net, dev_acc, [img_resized])[0]
+
+    with timer.stage('mask_ops'):
+        mask_face = get_face_mask(face_parsed, options['face_regions'])
+
+    with timer.stage('composite'):
+        final_img = apply_face_blur(img_org, img_resized, mask_face, options['blurring_factor'], options['roi_blur'],
+                                    options['inference_policy'], options['blur_kind'])
+
+    with timer.stage('encode'):
+        encode_img(final_img, options['out_ext'])
+
+
+def run_face_blur_crops_iteration(timer: StageTimer, model: Any, img_data: bytes, options: Dict[str, Any]) -> None:
+    """
+    It runs the face blur pipeline of the detected face crops once over the given encoded image, stage by stage like
+    add_face_blur_crops.
+
+    :param timer: The timer of the stages
+    :type timer: StageTimer
+    :param model: The face parser net, its device and the face detector
+    :type model: Any
+    :param img_data: The encoded image with face
+    :type img_data: bytes
+    :param options: The blurring_factor, blur_kind, inference_policy, face_regions and out_ext of the run
+    :type options: Dict[str, Any]
+    """
+    net, dev_acc, face_detector = model
+    parse_size = get_inference_policy(options['inference_policy']).face_parse_size
+
+    with timer.stage('decode'):
+        img_org = decode_img(img_data)
+
+    with timer.stage('inference'):
+        crop_boxes = [get_face_crop_box(face_box) for face_box in detect_faces(face_detector, img_org)]
+        imgs_crop = [crop_face(img_org, crop_box, parse_size) for crop_box in crop_boxes]
+        faces_parsed: List[Any] = []
+        for crop_index in range(0, len(imgs_crop), FACE_CROP_BATCH_SIZE):
+            faces_parsed.extend(parse_faces(net, dev_acc, imgs_crop[crop_index:crop_index + FACE_CROP_BATCH_SIZE]))
+
+    with timer.stage('mask_ops'):
+        masks_face = [get_face_mask(face_parsed, options['face_regions']) for face_parsed in faces_parsed]
+
+    with timer.stage('composite'):
+        final_img = blur_face_crops(img_org, crop_boxes, masks_face, options['blurring_factor'], None,
+                                    options['inference_policy'], options['blur_kind'])
+
+    with timer.stage('encode'):
+        encode_img(final_img, options['out_ext'])
+
+
+def run_case(case: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    It runs a single benchmark case, i.e. a pipeline over the synthetic image of a resolution with the stub or the
+    real model, and returns its measurements.
+
+    :param case: The pipeline, resolution, session, iterations, warmup, model_name and options of the case
+    :type case: Dict[str, Any]
+    :return: Returns the case along with the stage latencies, the total latency, the throughput and the peak RSS
+    :rtype: Dict[str, Any]
+    """
+    width, height = resolutions[case['resolution']]
+    options = case['options']
+
+    img_data = encode_img(make_synthetic_img(width, height, seed=0), options['in_ext'])
+    bg_data = encode_img(make_synthetic_img(width, height, seed=1), options['in_ext']) \
+        if case['pipeline'] == 'stroke_with_bg' else None
+
+    start_time = time.perf_counter()
+    model = load_model(case['pipeline'], case['session'], case['model_name'], options['blur_backend'],
+                       options['face_detector'])
+    model_load_time = time.perf_counter() - start_time
+
+    def run_iteration(timer: StageTimer) -> None:
+        if case['pipeline'] == 'face_blur':
+            run_face_blur_iteration(timer, model, img_data, options)
+        elif case['pipeline'] == 'face_blur_crops':
+            run_face_blur_crops_iteration(timer, model, img_data, options)
+        else:
+            run_stroke_iteration(timer, model, img_data, bg_data, options)
+
+    for _ in range(case['warmup']):
+        run_iteration(StageTimer())
+
+    timer = StageTimer()
+    start_time = time.perf_counter()
+    for _ in range(case['iterations']):
+        run_iteration(timer)
+    elapsed_time = time.perf_counter() - start_time
+
+    result = dict(case)
+    result.update({'width': width, 'height': height, 'model_load_s': round(model_load_time, 3),
+                   'stages': {stage_name: get_latency_stats(durations)
+                              for stage_name, durations in timer.durations.items()},
+                   'total': get_latency_stats(timer.get_totals()),
+                   'throughput_ips': round(case['iterations'] / elapsed_time, 3),
+                   'peak_rss_mb': get_peak_rss_mb()})
+
+    return result
+
+
+def get_git_commit() -> Optional[str]:
+    """
+    It returns the git commit of the source tree, so that the results of the different commits can be compared.
+
+    :return: Returns the commit hash, None if it is not a git checkout
+    :rtype: Optional[str]
+    """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_meta() -> Dict[str, Any]:
+    """
+    It returns the description of the environment of the benchmark run.
+
+    :return: Returns the versions, the platform and the commit of the run
+    :rtype: Dict[str, Any]
+    """
+    import torch
+
+    return {'timestamp': datetime.now().isoformat(timespec='seconds'), 'commit': get_git_commit(),
+            'version': __version__, 'python': platform.python_version(), 'numpy': np.__version__,
+            'opencv': cv2.__version__, 'torch': torch.__version__, 'platform': platform.platform(),
+            'processor': platform.processor(), 'cpu_count': os.cpu_count()}
+
+
+def run_benchmarks(pipeline_names: Optional[List[str]] = None, resolution_names: Optional[List[str]] = None,
+                   sessions: Optional[List[str]] = None, iterations: int = 5, warmup: int = 1, isolate: bool = True,
+                   model_names: Optional[Dict[str, str]] = None, options: Optional[Dict[str, Any]] = None
+                   ) -> Dict[str, Any]:
+    """
+    It runs every combination of the given pipelines, resolutions and sessions. Each case runs in its own process
+    when isolate is set, so that the peak RSS belongs to that case alone. A failing case, e.g. the real model that
+    cannot be downloaded, is reported with its error instead of stopping the benchmark.
+
+    :param pipeline_names: The pipelines out of 'stroke', 'stroke_with_bg', 'face_blur' and 'face_blur_crops'. None
+    selects all, defaults to None
+    :type pipeline_names: Optional[List[str]], optional
+    :param resolution_names: The resolutions out of '512', '1080p', '4k' and '24mp'. None selects all, defaults to
+    None
+    :type resolution_names: Optional[List[str]], optional
+    :param sessions: The models out of 'stub' and 'real'. None selects the stub only, defaults to None
+    :type sessions: Optional[List[str]], optional
+    :param iterations: Number of the measured runs of each case, defaults to 5
+    :type iterations: int, optional
+    :param warmup: Number of the unmeasured runs before the measured ones, defaults to 1
+    :type warmup: int, optional
+    :param isolate: It runs each case in a fresh process, defaults to True
+    :type isolate: bool, optional
+    :param model_names: The real model name of each pipeline. The missing ones use the default models, defaults to
+    None
+    :type model_names: Optional[Dict[str, str]], optional
+    :param options: It overrides the color, zooming_factor, zoom_option, stroke_width, blurring_factor, blur_kind,
+    roi_blur, inference_policy (preset name), face_regions, blur_backend, face_detector, in_ext and out_ext of the
+    runs, defaults to None
+    :type options: Optional[Dict[str, Any]], optional
+    :return: Returns the meta information of the run and the results of the cases
+    :rtype: Dict[str, Any]
+    """
+    pipeline_names = list(pipelines) if pipeline_names is None else pipeline_names
+    resolution_names = list(resolutions) if resolution_names is None else resolution_names
+    sessions = ['stub'] if sessions is None else sessions
+    model_names = {} if model_names is None else model_names
+
+    for pipeline in pipeline_names:
+        if pipeline not in pipelines:
+            raise ValueError('Unknown pipeline {}, it has to be one of {}'.format(pipeline, pipelines))
+    for resolution in resolution_names:
+        if resolution not in resolutions:
+            raise ValueError('Unknown resolution {}, it has to be one of {}'.format(resolution, list(resolutions)))
+    for session in sessions:
+        if session not in session_kinds:
+            raise ValueError('Unknown session {}, it has to be one of {}'.format(session, session_kinds))
+
+    case_options = {'color': [255, 255, 0], 'zooming_factor': 1.03, 'zoom_option': 1, 'stroke_width': 0,
+                    'blurring_factor': 33, 'blur_kind': 'box', 'roi_blur': False, 'inference_policy': 'default',
+                    'face_regions': 'default', 'blur_backend': 'torch', 'face_detector': 'retinaface_mobile0.25',
+                    'in_ext': '.jpg', 'out_ext': '.jpg'}
+    case_options.update(options or {})
+
+    results = []
+    for session in sessions:
+        for pipeline in pipeline_names:
+            for resolution in resolution_names:
+                case = {'pipeline': pipeline, 'resolution': resolution, 'session': session, 'iterations': iterations,
+                        'warmup': warmup, 'model_name': model_names.get(pipeline, ''), 'options': case_options}
+                print('Benchmarking {} at {} with the {} model'.format(pipeline, resolution, session))
+
+                try:
+                    if isolate:
+                        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                            result = executor.submit(run_case, case).result()
+                    else:
+                        result = run_case(case)
+                except Exception as err:
+                    result = dict(case)
+                    result['error'] = '{}: {}'.format(type(err).__name__, err)
+
+                results.append(result)
+
+    return {'meta': get_meta(), 'results': results}
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = 0.1,
+                    min_delta_ms: float = 1.0) -> List[Dict[str, Any]]:
+    """
+    It compares the p50 latencies of the current run with the baseline run and returns the regressions. The cases are
+    matched by the pipeline, the resolution and the session. The slowdowns below min_delta_ms are ignored, so that
+    the noise of the very short stages is not reported.
+
+    :param baseline: The benchmark results of the baseline, as returned by run_benchmarks
+    :type baseline: Dict[str, Any]
+    :param current: The benchmark results to be checked
+    :type current: Dict[str, Any]
+    :param tolerance: The allowed relative slowdown, e.g. 0.1 allows 10%, defaults to 0.1
+    :type tolerance: float, optional
+    :param min_delta_ms: The smallest slowdown in milliseconds to be reported, defaults to 1.0
+    :type min_delta_ms: float, optional
+    :return: Returns the case, the stage, the baseline and the current p50 of each regression
+    :rtype: List[Dict[str, Any]]
+    """
+    def get_case_key(result: Dict[str, Any]) -> tuple:
+        return result['pipeline'], result['resolution'], result['session']
+
+    baseline_results = {get_case_key(result): result for result in baseline['results'] if 'error' not in result}
+
+    regressions = []
+    for result in current['results']:
+        if 'error' in result or get_case_key(result) not in baseline_results:
+            continue
+
+        baseline_result = baseline_results[get_case_key(result)]
+        latencies = [('total', baseline_result['total'], result['total'])]
+        latencies += [(stage_name, baseline_result['stages'][stage_name], result['stages'][stage_name])
+                      for stage_name in stage_names]
+
+        for stage_name, baseline_latency, current_latency in latencies:
+            slowdown = current_latency['p50'] - baseline_latency['p50']
+            if slowdown > baseline_latency['p50'] * tolerance and slowdown > min_delta_ms:
+                regressions.append({'pipeline': result['pipeline'], 'resolution': result['resolution'],
+                                    'session': result['session'], 'stage': stage_name,
+                                    'baseline_p50': baseline_latency['p50'], 'current_p50': current_latency['p50']})
+
+    return regressions
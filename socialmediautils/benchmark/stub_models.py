@@ -0,0 +1,145 @@
+""" This module implements the synthetic inputs and the stub models of the benchmark. The stubs return a fixed
+human shape without running any network, so that the cost of the rest of the pipeline can be measured alone.
+"""
+from PIL import Image
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+import cv2
+import numpy as np
+import torch
+
+
+def make_synthetic_img(width: int, height: int, seed: int = 0) -> Any:
+    """
+    It generates a photo like image of the given size with a smooth background, a human shaped silhouette and a
+    face in it. The image is the same for the same seed.
+
+    :param width: Width of the image
+    :type width: int
+    :param height: Height of the image
+    :type height: int
+    :param seed: Seed of the noise, defaults to 0
+    :type seed: int, optional
+    :return: Returns the decoded (BGR) image
+    :rtype: Any
+    """
+    rng = np.random.default_rng(seed)
+
+    ramp_x = np.linspace(40, 200, width, dtype='float32')
+    ramp_y = np.linspace(60, 180, height, dtype='float32')
+    synthetic_img = np.empty((height, width, 3), dtype='uint8')
+    synthetic_img[:, :, 0] = (ramp_x[None, :] * 0.5 + ramp_y[:, None] * 0.5).astype('uint8')
+    synthetic_img[:, :, 1] = ramp_y[:, None].astype('uint8')
+    synthetic_img[:, :, 2] = ramp_x[None, :].astype('uint8')
+
+    # The low resolution noise scaled up gives the texture to the image without the cost of the full size noise
+    noise = rng.integers(0, 24, size=(max(1, height // 16), max(1, width // 16), 3), dtype='uint8')
+    synthetic_img = cv2.add(synthetic_img, cv2.resize(noise, (width, height), interpolation=cv2.INTER_LINEAR))
+
+    centerX, centerY, scale = width // 2, height // 2, min(width, height)
+    cv2.ellipse(synthetic_img, (centerX, centerY + scale // 6), (scale // 5, scale // 3), 0, 0, 360, (90, 60, 160),
+                -1)
+    cv2.circle(synthetic_img, (centerX, centerY - scale // 5), scale // 8, (120, 150, 210), -1)
+
+    return synthetic_img
+
+
+def get_stub_mask(width: int, height: int) -> Any:
+    """
+    It returns the human shaped mask that matches the silhouette drawn by make_synthetic_img.
+
+    :param width: Width of the mask
+    :type width: int
+    :param height: Height of the mask
+    :type height: int
+    :return: Returns the uint8 mask
+    :rtype: Any
+    """
+    mask_img = np.zeros((height, width), dtype='uint8')
+
+    centerX, centerY, scale = width // 2, height // 2, min(width, height)
+    cv2.ellipse(mask_img, (centerX, centerY + scale // 6), (scale // 5, scale // 3), 0, 0, 360, 255, -1)
+    cv2.circle(mask_img, (centerX, centerY - scale // 5), scale // 8, 255, -1)
+
+    return mask_img
+
+
+class StubStrokeSession:
+    """
+    It stands in for the rembg session. The predict returns the human shaped mask of the input size, so that the
+    rembg pre and post processing still runs.
+    """
+
+    model_name = 'stub'
+
+    def __init__(self) -> None:
+        self.masks: Dict[Tuple[int, int], Any] = {}
+
+    def predict(self, img: Any, *args: Any, **kwargs: Any) -> Any:
+        """
+        It returns the human mask of the given image.
+
+        :param img: The PIL image given by rembg
+        :type img: Any
+        :return: Returns the list of the PIL masks
+        :rtype: Any
+        """
+        if img.size not in self.masks:
+            self.masks[img.size] = Image.fromarray(get_stub_mask(*img.size), 'L')
+
+        return [self.masks[img.size]]
+
+
+class StubFaceDetector:
+    """
+    It stands in for the face detector. The detect returns the box of the face drawn by make_synthetic_img.
+    """
+
+    model_name = 'stub'
+
+    def detect(self, img: Any) -> List[Tuple[float, float, float, float]]:
+        """
+        It returns the face box of the given image.
+
+        :param img: The BGR image
+        :type img: Any
+        :return: Returns the (minX, minY, maxX, maxY) box of the face
+        :rtype: List[Tuple[float, float, float, float]]
+        """
+        height, width = img.shape[:2]
+        centerX, centerY, scale = width // 2, height // 2, min(width, height)
+
+        return [(centerX - scale / 8, centerY - scale / 5 - scale / 8, centerX + scale / 8,
+                 centerY - scale / 5 + scale / 8)]
+
+
+class StubFaceParser(torch.nn.Module):
+    """
+    It stands in for the BiSeNet face parser. The forward returns the logits that label the face of
+    make_synthetic_img as the skin.
+    """
+
+    def __init__(self, num_classes: int = 19, size: int = 512) -> None:
+        super().__init__()
+
+        face_mask = np.zeros((size, size), dtype='uint8')
+        cv2.circle(face_mask, (size // 2, size // 2 - size // 5), size // 8, 1, -1)
+
+        logits = np.zeros((num_classes, size, size), dtype='float32')
+        logits[0] = 1 - face_mask
+        logits[1] = face_mask
+        self.logits = torch.from_numpy(logits)
+
+    def forward(self, imgs: Any) -> Tuple[Any]:
+        """
+        It returns the face logits for each of the given images.
+
+        :param imgs: The batch of the normalized images
+        :type imgs: Any
+        :return: Returns the tuple that holds the logits as the first element like BiSeNet
+        :rtype: Tuple[Any]
+        """
+        return (self.logits.to(imgs.device).unsqueeze(0).repeat(imgs.shape[0], 1, 1, 1),)
@@ -1,6 +1,39 @@
-""" This module implements the face blurring feature for the given human faces
+""" This module implements the face blurring feature for the given human faces. The face blur functions are loaded
+lazily on their first access, so that torch and facexlib are imported only when the face blur is used.
 """
 from typing import Any
-from .face_blur_img import get_face_parser_model
-from .face_blur_img import add_face_blur
-from .face_blur_img import enable_visual_debug_fb
+from typing import TYPE_CHECKING
+from ..lazy_import import attach_lazy_names
+
+if TYPE_CHECKING:
+    from .face_blur_img import get_face_parser_model
+    from .face_blur_img import add_face_blur
+    from .face_blur_img import add_face_blur_array
+    from .face_blur_img import add_face_blur_bytes
+    from .face_blur_img import add_face_blur_batch
+    from .face_blur_img import add_face_blur_crops
+    from .face_blur_img import enable_visual_debug_fb
+    from .face_blur_vid import add_face_blur_video
+    from .blur_engine import blur_kinds
+    from .blur_engine import blur_img
+    from .face_detector import face_detectors
+    from .face_detector import get_face_detector
+    from .face_detector import detect_faces
+    from .face_parser_onnx import face_parser_backends
+    from .face_parser_onnx import export_face_parser_onnx
+    from .face_parser_onnx import quantize_face_parser_onnx
+    from .face_regions import face_region_sets
+    from .face_regions import get_face_region_lut
+
+lazy_names = {'get_face_parser_model': '.face_blur_img', 'add_face_blur': '.face_blur_img',
+              'add_face_blur_array': '.face_blur_img', 'add_face_blur_bytes': '.face_blur_img',
+              'add_face_blur_batch': '.face_blur_img', 'add_face_blur_crops': '.face_blur_img',
+              'enable_visual_debug_fb': '.face_blur_img',
+              'add_face_blur_video': '.face_blur_vid', 'face_parser_backends': '.face_parser_onnx',
+              'export_face_parser_onnx': '.face_parser_onnx', 'quantize_face_parser_onnx': '.face_parser_onnx',
+              'face_region_sets': '.face_regions', 'get_face_region_lut': '.face_regions',
+              'blur_kinds': '.blur_engine', 'blur_img': '.blur_engine', 'face_detectors': '.face_detector',
+              'get_face_detector': '.face_detector', 'detect_faces': '.face_detector'}
+
+__getattr__, __dir__ = attach_lazy_names(__name__, lazy_names, ('face_blur_img', 'face_blur_vid', 'face_parser_onnx',
+                                                                'face_regions', 'blur_engine', 'face_detector'))
@@ -0,0 +1,229 @@
+""" This module implements the blurring kernels of the face blur. Only the regions of the faces are blurred, each
+reading just the neighbourhood the kernel needs, and the kernel can be scaled with the size of each face.
+"""
+from ..inference.inference_policy import FACE_PARSER_REFERENCE_SIZE
+from typing import Any
+from typing import List
+from typing import Tuple
+
+import cv2
+import numpy as np
+
+blur_kinds = ('box', 'gaussian', 'pixelate', 'stacked_box')
+
+# The face that spans this fraction of the image is blurred with the blurring factor as it is when the kernel is
+# scaled with the face size, the smaller faces with the smaller kernel and the larger faces with the larger one
+FACE_REFERENCE_FRACTION = 0.25
+
+# The largest standard deviation the Gaussian kernel runs with at the full resolution. The stronger blurs run at the
+# downscaled image, which they barely change, so that their cost does not grow with the kernel size
+GAUSSIAN_MAX_SIGMA = 8.
+
+
+def get_blur_ksize(blurring_factor: int, width: int, height: int, face_fraction: float = 0.) -> Tuple[int, int]:
+    """
+    It returns the kernel size of the blurring factor for the image of the given size.
+
+    :param blurring_factor: The kernal window size for the blurring filter at the 512x512 face parser resolution
+    :type blurring_factor: int
+    :param width: The width of the image to be blurred
+    :type width: int
+    :param height: The height of the image to be blurred
+    :type height: int
+    :param face_fraction: The size of the face relative to the image, i.e. the larger of its width and height
+    fractions. 0 does not scale the kernel with the face size, defaults to 0.
+    :type face_fraction: float, optional
+    :return: Returns the width and the height of the kernel
+    :rtype: Tuple[int, int]
+    """
+    scale = face_fraction / FACE_REFERENCE_FRACTION if face_fraction > 0 else 1.
+
+    return (max(1, round(blurring_factor * scale * width / FACE_PARSER_REFERENCE_SIZE)),
+            max(1, round(blurring_factor * scale * height / FACE_PARSER_REFERENCE_SIZE)))
+
+
+def get_box_sigma(box_size: int) -> float:
+    """
+    It returns the standard deviation of the box kernel of the given size, so that the Gaussian kernels blur as much
+    as the box kernel of the same blurring factor.
+
+    :param box_size: The size of the box kernel
+    :type box_size: int
+    :return: Returns the standard deviation in pixels
+    :rtype: float
+    """
+    return float(np.sqrt((box_size * box_size - 1) / 12.))
+
+
+def get_stacked_box_sizes(sigma: float, passes: int = 3) -> List[int]:
+    """
+    It returns the sizes of the box kernels whose repeated application approximates the Gaussian kernel of the given
+    standard deviation (W. Jarosz, Fast Image Convolutions, 2001). Each pass costs the same regardless of its size.
+
+    :param sigma: The standard deviation of the Gaussian kernel
+    :type sigma: float
+    :param passes: The number of the box passes, defaults to 3
+    :type passes: int, optional
+    :return: Returns the odd sizes of the box kernels
+    :rtype: List[int]
+    """
+    ideal_size = np.sqrt(12. * sigma * sigma / passes + 1.)
+    lower_size = int(np.floor(ideal_size))
+    if lower_size % 2 == 0:
+        lower_size -= 1
+    upper_size = lower_size + 2
+
+    lower_passes = round((12. * sigma * sigma - passes * lower_size * lower_size - 4. * passes * lower_size -
+                          3. * passes) / (-4. * lower_size - 4.))
+
+    return [lower_size if pass_index < lower_passes else upper_size for pass_index in range(passes)]
+
+
+def stacked_box_blur(img: Any, ksize: Tuple[int, int], passes: int = 3) -> Any:
+    """
+    It approximates the Gaussian blur of the same strength as the box kernel of the given size by the repeated box
+    blur, which costs the same regardless of the kernel size.
+
+    :param img: The image to be blurred
+    :type img: Any
+    :param ksize: The width and the height of the box kernel it is as strong as
+    :type ksize: Tuple[int, int]
+    :param passes: The number of the box passes, defaults to 3
+    :type passes: int, optional
+    :return: Returns the blurred image
+    :rtype: Any
+    """
+    sizes_x = get_stacked_box_sizes(get_box_sigma(ksize[0]), passes)
+    sizes_y = get_stacked_box_sizes(get_box_sigma(ksize[1]), passes)
+
+    img_blur = img
+    for size_x, size_y in zip(sizes_x, sizes_y):
+        img_blur = cv2.blur(img_blur, (max(1, size_x), max(1, size_y)))
+
+    return img_blur
+
+
+def gaussian_blur(img: Any, ksize: Tuple[int, int]) -> Any:
+    """
+    It blurs the image with the Gaussian kernel of the same strength as the box kernel of the given size. The
+    Gaussian kernel is truncated at 3 sigma. The kernels larger than GAUSSIAN_MAX_SIGMA run at the image downscaled
+    by the integer factor that brings them below it.
+
+    :param img: The image to be blurred
+    :type img: Any
+    :param ksize: The width and the height of the box kernel it is as strong as
+    :type ksize: Tuple[int, int]
+    :return: Returns the blurred image
+    :rtype: Any
+    """
+    height, width = img.shape[:2]
+    sigma_x, sigma_y = get_box_sigma(ksize[0]), get_box_sigma(ksize[1])
+
+    downscale = max(1, int(np.ceil(min(sigma_x, sigma_y) / GAUSSIAN_MAX_SIGMA)))
+    if downscale > 1 and min(width, height) >= 2 * downscale:
+        img_small = cv2.resize(img, (width // downscale, height // downscale), interpolation=cv2.INTER_AREA)
+        img_blur = gaussian_blur_sigma(img_small, sigma_x / downscale, sigma_y / downscale)
+
+        return cv2.resize(img_blur, (width, height), interpolation=cv2.INTER_LINEAR)
+
+    return gaussian_blur_sigma(img, sigma_x, sigma_y)
+
+
+def gaussian_blur_sigma(img: Any, sigma_x: float, sigma_y: float) -> Any:
+    """
+    It blurs the image with the Gaussian kernel of the given standard deviations truncated at 3 sigma.
+
+    :param img: The image to be blurred
+    :type img: Any
+    :param sigma_x: The horizontal standard deviation in pixels
+    :type sigma_x: float
+    :param sigma_y: The vertical standard deviation in pixels
+    :type sigma_y: float
+    :return: Returns the blurred image
+    :rtype: Any
+    """
+    if sigma_x <= 0 and sigma_y <= 0:
+        return img.copy()
+
+    gauss_ksize = (2 * int(np.ceil(3 * sigma_x)) + 1, 2 * int(np.ceil(3 * sigma_y)) + 1)
+
+    return cv2.GaussianBlur(img, gauss_ksize, max(sigma_x, 1e-3), sigmaY=max(sigma_y, 1e-3))
+
+
+def pixelate(img: Any, ksize: Tuple[int, int]) -> Any:
+    """
+    It replaces the image with the mosaic of the cells of the given size, each filled with its mean color.
+
+    :param img: The image to be pixelated
+    :type img: Any
+    :param ksize: The width and the height of the cells
+    :type ksize: Tuple[int, int]
+    :return: Returns the pixelated image
+    :rtype: Any
+    """
+    height, width = img.shape[:2]
+    cells = (max(1, int(round(width / ksize[0]))), max(1, int(round(height / ksize[1]))))
+
+    img_cells = cv2.resize(img, cells, interpolation=cv2.INTER_AREA)
+    return cv2.resize(img_cells, (width, height), interpolation=cv2.INTER_NEAREST)
+
+
+def blur_img(img: Any, ksize: Tuple[int, int], blur_kind: str = 'box') -> Any:
+    """
+    It blurs the image with the given kind of kernel. The box blur runs over the running sums of the rows and the
+    columns, so that it costs the same regardless of the kernel size, the same as the stacked box.
+
+    :param img: The image to be blurred
+    :type img: Any
+    :param ksize: The width and the height of the kernel, or of the cells of the pixelation
+    :type ksize: Tuple[int, int]
+    :param blur_kind: The kind of the kernel out of 'box', 'gaussian', 'pixelate' and 'stacked_box',
+    defaults to 'box'
+    :type blur_kind: str, optional
+    :raises ValueError: If the kind of the kernel is unknown
+    :return: Returns the blurred image
+    :rtype: Any
+    """
+    if blur_kind == 'box':
+        return cv2.blur(img, ksize)
+    if blur_kind == 'gaussian':
+        return gaussian_blur(img, ksize)
+    if blur_kind == 'stacked_box':
+        return stacked_box_blur(img, ksize)
+    if blur_kind == 'pixelate':
+        return pixelate(img, ksize)
+
+    raise ValueError('Unknown blur kind {}, it has to be one of {}'.format(blur_kind, blur_kinds))
+
+
+def blur_region(img: Any, box: Tuple[int, int, int, int], ksize: Tuple[int, int], blur_kind: str = 'box') -> Any:
+    """
+    It blurs only the given box of the image. The blurring reads the neighbourhood of the box that the kernel
+    reaches, so that the box is blurred the same as it is within the whole blurred image. The pixelation is aligned
+    to the box instead.
+
+    :param img: The image to be blurred
+    :type img: Any
+    :param box: The (minX, minY, maxX, maxY) box to be blurred
+    :type box: Tuple[int, int, int, int]
+    :param ksize: The width and the height of the kernel, or of the cells of the pixelation
+    :type ksize: Tuple[int, int]
+    :param blur_kind: The kind of the kernel out of 'box', 'gaussian', 'pixelate' and 'stacked_box',
+    defaults to 'box'
+    :type blur_kind: str, optional
+    :return: Returns the blurred box
+    :rtype: Any
+    """
+    height, width = img.shape[:2]
+    minX, minY, maxX, maxY = box
+
+    if blur_kind == 'pixelate':
+        return pixelate(img[minY:maxY, minX:maxX], ksize)
+
+    # Neither of the kernels reaches farther than its box size
+    ctxMinX, ctxMinY = max(0, minX - ksize[0]), max(0, minY - ksize[1])
+    ctxMaxX, ctxMaxY = min(width, maxX + ksize[0]), min(height, maxY + ksize[1])
+
+    img_blur = blur_img(img[ctxMinY:ctxMaxY, ctxMinX:ctxMaxX], ksize, blur_kind)
+
+    return img_blur[minY - ctxMinY:maxY - ctxMinY, minX - ctxMinX:maxX - ctxMinX]
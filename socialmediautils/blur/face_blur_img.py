@@ -1,54 +1,93 @@
 """ This module implements the face blurring feature for the given human face in the given images
 """
-from facexlib.parsing import init_parsing_model
-from facexlib.utils.misc import img2tensor
-from torchvision.transforms.functional import normalize
+from ..cache.mask_cache import get_model_name
+from ..composite.composite_img import composite_img
+from ..composite.composite_img import get_output_buffer
+from ..imgio.img_codec import decode_img
+from ..imgio.img_codec import encode_img
+from ..imgio.img_writer import write_img
+from ..inference.inference_policy import get_inference_policy
+from ..inference.inference_policy import get_refine_radius
+from ..inference.inference_policy import refine_mask
+from ..trace.tracer import DebugImageSink
+from ..trace.tracer import dump_debug_img
+from ..trace.tracer import trace_stage
+from .blur_engine import blur_region
+from .blur_engine import get_blur_ksize
+from .face_detector import FACE_CROP_MARGIN
+from .face_detector import crop_face
+from .face_detector import detect_faces
+from .face_detector import get_face_crop_box
+from .face_parser_onnx import OnnxFaceParser
+from .face_parser_onnx import face_parser_backends
+from .face_parser_onnx import face_parser_root_path
+from .face_parser_onnx import get_onnx_face_parser
+from .face_regions import get_face_region_lut
+from .face_regions import select_face_regions
 from typing import Any
 from typing import Tuple
 from typing import List
+from typing import Optional
 from typing import Union
 
-import os
 import cv2
 import numpy as np
-import torch
 
-visual_debug = False
+visual_debug_sink: Optional[DebugImageSink] = None
 
+# The maximum number of the face crops given to the face parser in a single forward pass
+FACE_CROP_BATCH_SIZE = 8
 
-def get_face_parser_model(model_type: str = 'bisenet') -> Any:
+
+def get_face_parser_model(model_type: str = 'bisenet', backend: str = 'torch', num_threads: int = 0) -> Any:
     """
-    This function sets the model during the start and get the session for continuous inference in the later process
+    This function sets the model during the start and get the session for continuous inference in the later process.
+    The onnxruntime backends run on the CPU without torch, the ONNX model is exported and cached under ~/.iveu on
+    the first use.
 
     :param model_type: Name of the model, i.e., face parsing model is bisenet by default, defaults to 'bisenet'
     :type model_type: str, optional
-    :return: returns the model net for the given model type. It is usually Bisenet in this case
+    :param backend: The backend out of face_parser_backends, i.e. 'torch', 'onnx' or 'onnx_int8' for the INT8
+    dynamically quantized model, defaults to 'torch'
+    :type backend: str, optional
+    :param num_threads: Number of the intra-op threads of the onnxruntime backends. 0 is the onnxruntime default,
+    defaults to 0
+    :type num_threads: int, optional
+    :raises ValueError: If the backend is unknown
+    :return: returns the model net for the given model type along with the device. It is usually Bisenet in this case
     :rtype: Any
     """
+    if backend not in face_parser_backends:
+        raise ValueError('Unknown backend {}, it has to be one of {}'.format(backend, list(face_parser_backends)))
+
+    if backend != 'torch':
+        return get_onnx_face_parser(model_type, backend == 'onnx_int8', num_threads), 'cpu'
+
+    from facexlib.parsing import init_parsing_model
+    import torch
+
     dev_acc = 'cuda' if torch.cuda.is_available() else 'cpu'
-    net = init_parsing_model(model_name=model_type, device=dev_acc,
-                             model_rootpath=os.path.join(os.path.expanduser('~'), '.iveu'))
+    net = init_parsing_model(model_name=model_type, device=dev_acc, model_rootpath=face_parser_root_path)
 
     return net, dev_acc
 
 
 def enable_visual_debug_fb(enable: bool) -> None:
     """
-    This function invokes the visual debug infomration to be stored or not as image files.
+    This function invokes the visual debug infomration to be stored or not as image files. The images of every call
+    are stored in the debug folder under unique names. Use trace.debug_images to enable it only for a single call.
 
     :param enable: It activates the visual debugging for testin purpose.
     :type enable: bool
     """
-    global visual_debug
-    visual_debug = enable
-    if (visual_debug is True):
-        if not os.path.exists('debug'):
-            os.makedirs('debug')
+    global visual_debug_sink
+    visual_debug_sink = DebugImageSink('debug') if enable else None
 
 
-def overlay_blurred_face(base_img: Any, face_blur_img: Any, mask: Any) -> Any:
+def overlay_blurred_face(base_img: Any, face_blur_img: Any, mask: Any, out: Any = None) -> Any:
     """
-    It merges the background and the forground based on the orignal, face blurred and mask image.
+    It merges the background and the forground based on the orignal, face blurred and mask image in a single pass
+    over the output buffer.
 
     :param base_img: This image is the original image to be processed
     :type base_img: Any
@@ -56,30 +95,585 @@ def overlay_blurred_face(base_img: Any, face_blur_img: Any, mask: Any) -> Any:
     :type face_blur_img: Any
     :param mask: This image is the mask image that holds the face mask
     :type mask: Any
+    :param out: The preallocated output buffer. It can be the original image itself for the in-place merging,
+    defaults to None
+    :type out: Any, optional
     :return: It returns the merged image
     :rtype: Any
     """
-    global visual_debug
+    with trace_stage('overlay', base_img, mask):
+        overlaid_img = composite_img(base_img, face_blur_img, mask, out)
 
-    fg_img = cv2.bitwise_or(face_blur_img, face_blur_img, mask=mask)
+    dump_debug_img('d005_01_foreground_image_mask', mask, visual_debug_sink)
+    dump_debug_img('d005_05_output_resized', overlaid_img, visual_debug_sink)
 
-    mask_inv = cv2.bitwise_not(mask)
-    bg_img = cv2.bitwise_or(base_img, base_img, mask=mask_inv)
+    return overlaid_img
 
-    overlaid_img = cv2.bitwise_or(fg_img, bg_img)
 
-    if (visual_debug is True):
-        cv2.imwrite(os.path.join('debug', 'd005_01_foreground_image_mask.png'), mask)
-        cv2.imwrite(os.path.join('debug', 'd005_02_foreground_image.png'), fg_img)
-        cv2.imwrite(os.path.join('debug', 'd005_03_background_image_mask.png'), mask_inv)
-        cv2.imwrite(os.path.join('debug', 'd005_04_background_image.png'), bg_img)
-        cv2.imwrite(os.path.join('debug', 'd005_05_output_resized.png'), overlaid_img)
+def preprocess_face_img(img_resized: Any) -> Any:
+    """
+    It converts the image resized to the face parser input resolution into the normalized tensor.
 
-    return overlaid_img
+    :param img_resized: This image is the original image resized to the face parser resolution
+    :type img_resized: Any
+    :return: Returns the normalized tensor of shape 3x512x512
+    :rtype: Any
+    """
+    from facexlib.utils.misc import img2tensor
+    from torchvision.transforms.functional import normalize
+
+    img = img2tensor(img_resized.astype('float32') / 255., bgr2rgb=True, float32=True)
+    normalize(img, (0.485, 0.456, 0.406), (0.229, 0.224, 0.225), inplace=True)
+
+    return img
+
+
+def parse_faces(net: Any, dev_acc: str, imgs_resized: List[Any], mask_cache: Any = None) -> List[Any]:
+    """
+    It runs the face parser over the given resized images in a single forward pass and returns their label images.
+    If the mask cache is given, the images which are already parsed are skipped from the forward pass.
+
+    :param net: This param holds the reference for the face parser net for inference
+    :type net: Any
+    :param dev_acc: It holds the cuda support if so for doing inference in the GPU, otherwise in CPU
+    :type dev_acc: str
+    :param imgs_resized: The images resized to the face parser resolution
+    :type imgs_resized: List[Any]
+    :param mask_cache: The MaskCache that holds the already computed parse maps, defaults to None
+    :type mask_cache: Any, optional
+    :return: Returns the uint8 label image (512x512) for each of the given images
+    :rtype: List[Any]
+    """
+    faces_parsed: List[Any] = [None] * len(imgs_resized)
+    keys: List[Any] = [None] * len(imgs_resized)
+
+    if mask_cache is not None:
+        for img_index, img_resized in enumerate(imgs_resized):
+            keys[img_index] = mask_cache.make_key(img_resized, get_model_name(net))
+            faces_parsed[img_index] = mask_cache.get(keys[img_index])
+
+    missing = [img_index for img_index, face_parsed in enumerate(faces_parsed) if face_parsed is None]
+    if len(missing) == 0:
+        return faces_parsed
+
+    if isinstance(net, OnnxFaceParser):
+        with trace_stage('net_forward'):
+            parsed = net.parse([imgs_resized[img_index] for img_index in missing])
+    else:
+        parsed = parse_faces_torch(net, dev_acc, [imgs_resized[img_index] for img_index in missing])
+
+    for parsed_index, img_index in enumerate(missing):
+        faces_parsed[img_index] = parsed[parsed_index]
+        if mask_cache is not None:
+            mask_cache.put(keys[img_index], parsed[parsed_index])
+
+    return faces_parsed
+
+
+def parse_faces_torch(net: Any, dev_acc: str, imgs_resized: List[Any]) -> Any:
+    """
+    It runs the torch face parser over the given resized images in a single forward pass.
+
+    :param net: This param holds the reference for the face parser net for inference
+    :type net: Any
+    :param dev_acc: It holds the cuda support if so for doing inference in the GPU, otherwise in CPU
+    :type dev_acc: str
+    :param imgs_resized: The images resized to the face parser resolution
+    :type imgs_resized: List[Any]
+    :return: Returns the NxHxW uint8 label images
+    :rtype: Any
+    """
+    import torch
+
+    with trace_stage('preprocess'):
+        imgs = torch.stack([preprocess_face_img(img_resized) for img_resized in imgs_resized], 0)
+        if dev_acc == 'cuda':
+            imgs = imgs.cuda()
+
+    # The argmax runs on the inference device, so that only the uint8 labels are transferred
+    with trace_stage('net_forward', imgs), torch.no_grad():
+        return net(imgs)[0].argmax(1).to(torch.uint8).cpu().numpy()
+
+
+def get_face_mask(face_parsed: Any, face_regions: Any = None) -> Any:
+    """
+    It builds the face mask out of the face parser labels by selecting the face regions through the lookup table.
+
+    :param face_parsed: Label image (512x512) which is the argmax of the face parser output
+    :type face_parsed: Any
+    :param face_regions: The region set out of face_region_sets (e.g. 'skin', 'face', 'no_neck'), the comma
+    separated label names or the lookup table of get_face_region_lut. None selects every label except the
+    background, the cloth and the hat, defaults to None
+    :type face_regions: Any, optional
+    :return: Returns the face mask where the face regions are 255
+    :rtype: Any
+    """
+    return select_face_regions(face_parsed, face_regions)
+
+
+def blur_face_img(img_org: Any, img_resized: Any, mask_face: Any, blurring_factor: int = 33, blur_kind: str = 'box',
+                  face_scaled: bool = False) -> Any:
+    """
+    It blurs the faces of the resized image, merges them with the face mask and scales the result back to the
+    original size. Only the bounding boxes of the faces are blurred.
+
+    :param img_org: This image is the original image to be processed
+    :type img_org: Any
+    :param img_resized: This image is the original image resized to the face parser resolution
+    :type img_resized: Any
+    :param mask_face: This image is the mask image that holds the face mask
+    :type mask_face: Any
+    :param blurring_factor: The kernal window size for the blurring filter at the 512x512 face parser resolution.
+    It is scaled with the resolution of the resized image, defaults to 33
+    :type blurring_factor: int, optional
+    :param blur_kind: The kind of the blurring kernel out of 'box', 'gaussian', 'pixelate' and 'stacked_box',
+    defaults to 'box'
+    :type blur_kind: str, optional
+    :param face_scaled: It scales the blurring kernel with the size of each face, so that the large faces are
+    blurred stronger than the small ones, defaults to False
+    :type face_scaled: bool, optional
+    :return: Returns the face blurred image in the Original image resolution
+    :rtype: Any
+    """
+    height, width = img_org.shape[:2]
+    resized_height, resized_width = img_resized.shape[:2]
+
+    img_input_blur = img_resized.copy()
+    with trace_stage('blur', img_resized):
+        for minX, minY, maxX, maxY in get_face_boxes(mask_face, resized_width, resized_height):
+            face_fraction = max((maxX - minX) / resized_width, (maxY - minY) / resized_height) if face_scaled else 0.
+            ksize = get_blur_ksize(blurring_factor, resized_width, resized_height, face_fraction)
+            img_input_blur[minY:maxY, minX:maxX] = blur_region(img_resized, (minX, minY, maxX, maxY), ksize,
+                                                               blur_kind)
+
+    overlaid_img = overlay_blurred_face(img_resized, img_input_blur, mask_face)
+
+    with trace_stage('resize', img_org):
+        final_img = cv2.resize(overlaid_img, (width, height), interpolation=cv2.INTER_LINEAR)
+
+    dump_debug_img('d001_input_image', img_org, visual_debug_sink)
+    dump_debug_img('d002_input_resized', img_resized, visual_debug_sink)
+    dump_debug_img('d003_face_mask', mask_face, visual_debug_sink)
+    dump_debug_img('d004_input_blurred', img_input_blur, visual_debug_sink)
+    dump_debug_img('d006_final', final_img, visual_debug_sink)
+
+    return final_img
+
+
+def get_face_boxes(mask_face: Any, width: int, height: int, margin: int = 0) -> List[Tuple[int, int, int, int]]:
+    """
+    It finds the bounding box of each face region in the face mask and scales it to the original image resolution.
+
+    :param mask_face: This image is the mask image that holds the face mask in the face parser resolution
+    :type mask_face: Any
+    :param width: The width of the original image
+    :type width: int
+    :param height: The height of the original image
+    :type height: int
+    :param margin: The number of pixels the boxes are grown by on every side, defaults to 0
+    :type margin: int, optional
+    :return: Returns the (minX, minY, maxX, maxY) boxes in the original image resolution
+    :rtype: List[Tuple[int, int, int, int]]
+    """
+    num_labels, _, stats, _ = cv2.connectedComponentsWithStats(mask_face.astype('uint8'), connectivity=8)
+    scale_x, scale_y = width / mask_face.shape[1], height / mask_face.shape[0]
+
+    face_boxes = []
+    for label in range(1, num_labels):
+        box_x, box_y, box_width, box_height = stats[label, :4]
+        minX = max(0, int(np.floor(box_x * scale_x)) - margin)
+        minY = max(0, int(np.floor(box_y * scale_y)) - margin)
+        maxX = min(width, int(np.ceil((box_x + box_width) * scale_x)) + margin)
+        maxY = min(height, int(np.ceil((box_y + box_height) * scale_y)) + margin)
+        face_boxes.append((minX, minY, maxX, maxY))
+
+    return face_boxes
+
+
+def blur_face_img_roi(img_org: Any, mask_face: Any, blurring_factor: int = 33, out: Any = None,
+                      inference_policy: Any = None, blur_kind: str = 'box', face_scaled: bool = False) -> Any:
+    """
+    It blurs the faces of the original image at its own resolution. Only the face mask is scaled up to the original
+    size within the bounding boxes of the faces, and the blurring and the merging happen only within these boxes, so
+    that the rest of the image is left untouched. The blurring kernel is scaled with the image, so that the blur
+    looks the same as the one of blur_face_img. The upscaled mask is refined along the face edges if the inference
+    policy says so.
+
+    :param img_org: This image is the original image to be processed
+    :type img_org: Any
+    :param mask_face: This image is the mask image that holds the face mask in the face parser resolution
+    :type mask_face: Any
+    :param blurring_factor: The kernal window size for the blurring filter at the 512x512 face parser resolution,
+    defaults to 33
+    :type blurring_factor: int, optional
+    :param out: The preallocated output buffer. It can be the original image itself for the in-place blurring,
+    defaults to None
+    :type out: Any, optional
+    :param inference_policy: The preset name or the InferencePolicy that tells whether the mask is refined,
+    defaults to None
+    :type inference_policy: Any, optional
+    :param blur_kind: The kind of the blurring kernel out of 'box', 'gaussian', 'pixelate' and 'stacked_box',
+    defaults to 'box'
+    :type blur_kind: str, optional
+    :param face_scaled: It scales the blurring kernel with the size of each face, so that the large faces are
+    blurred stronger than the small ones, defaults to False
+    :type face_scaled: bool, optional
+    :return: Returns the face blurred image in the Original image resolution
+    :rtype: Any
+    """
+    height, width = img_org.shape[:2]
+    mask_height, mask_width = mask_face.shape[:2]
+
+    policy = get_inference_policy(inference_policy)
+    final_img = get_output_buffer(img_org, out)
+
+    # The linear upscaling spreads the mask by about one face parser pixel around the scaled box
+    mask_margin = int(np.ceil(max(width / mask_width, height / mask_height))) + 1
+    if policy.refine:
+        refine_radius = get_refine_radius(policy, max(width / mask_width, height / mask_height))
+        mask_margin += 2 * refine_radius
+    face_boxes = get_face_boxes(mask_face, width, height, mask_margin)
+    scale_x, scale_y = mask_width / width, mask_height / height
+
+    for minX, minY, maxX, maxY in face_boxes:
+        # Only the box of the face mask is scaled up, with the same pixel center mapping as cv2.resize
+        box_mat = np.float32([[scale_x, 0, (minX + 0.5) * scale_x - 0.5], [0, scale_y, (minY + 0.5) * scale_y - 0.5]])
+        mask_box = cv2.warpAffine(mask_face.astype('uint8'), box_mat, (maxX - minX, maxY - minY),
+                                  flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP, borderMode=cv2.BORDER_REPLICATE)
+        if policy.refine:
+            with trace_stage('refine_mask', mask_box):
+                refine_mask(mask_box, img_org[minY:maxY, minX:maxX], refine_radius, policy.refine_eps)
+
+        face_fraction = 0.
+        if face_scaled:
+            _, _, face_width, face_height = cv2.boundingRect(mask_box)
+            face_fraction = max(face_width / width, face_height / height)
+        ksize = get_blur_ksize(blurring_factor, width, height, face_fraction)
+
+        blur_face_box(img_org, final_img, (minX, minY, maxX, maxY), mask_box, ksize, blur_kind)
+
+    dump_debug_img('d001_input_image', img_org, visual_debug_sink)
+    dump_debug_img('d003_face_mask', mask_face, visual_debug_sink)
+    dump_debug_img('d006_final', final_img, visual_debug_sink)
+
+    return final_img
+
+
+def blur_face_box(img_org: Any, final_img: Any, box: Tuple[int, int, int, int], mask_box: Any,
+                  ksize: Tuple[int, int], blur_kind: str = 'box') -> None:
+    """
+    It blurs the given box of the original image and merges it into the output image through the face mask of the
+    box.
+
+    :param img_org: This image is the original image to be processed
+    :type img_org: Any
+    :param final_img: The output image the blurred box is merged into
+    :type final_img: Any
+    :param box: The (minX, minY, maxX, maxY) box to be blurred
+    :type box: Tuple[int, int, int, int]
+    :param mask_box: The face mask of the box at the original resolution
+    :type mask_box: Any
+    :param ksize: The width and the height of the blurring kernel
+    :type ksize: Tuple[int, int]
+    :param blur_kind: The kind of the blurring kernel out of 'box', 'gaussian', 'pixelate' and 'stacked_box',
+    defaults to 'box'
+    :type blur_kind: str, optional
+    """
+    minX, minY, maxX, maxY = box
+
+    with trace_stage('blur', mask_box):
+        img_blur = blur_region(img_org, box, ksize, blur_kind)
+
+    final_roi = final_img[minY:maxY, minX:maxX]
+    with trace_stage('overlay', final_roi, mask_box):
+        composite_img(final_roi, img_blur, mask_box, final_roi)
+
+
+def blur_face_crops(img_org: Any, crop_boxes: List[Tuple[int, int, int, int]], masks_face: List[Any],
+                    blurring_factor: int = 33, out: Any = None, inference_policy: Any = None,
+                    blur_kind: str = 'box') -> Any:
+    """
+    It blurs the faces of the original image out of the face masks of their crops. Each face mask is scaled up to
+    the original resolution only within the bounding box of the face, and the blurring kernel is scaled with the
+    crop, so that every face of a group photo is blurred as strong as a single face filling the image. The faces
+    are merged one after the other, so that the overlapping crops blur the union of their faces.
+
+    :param img_org: This image is the original image to be processed
+    :type img_org: Any
+    :param crop_boxes: The (minX, minY, maxX, maxY) square crop of each face
+    :type crop_boxes: List[Tuple[int, int, int, int]]
+    :param masks_face: The face mask of each crop in the face parser resolution
+    :type masks_face: List[Any]
+    :param blurring_factor: The kernal window size for the blurring filter at the face parser resolution of the
+    crop, defaults to 33
+    :type blurring_factor: int, optional
+    :param out: The preallocated output buffer. It can be the original image itself for the in-place blurring,
+    defaults to None
+    :type out: Any, optional
+    :param inference_policy: The preset name or the InferencePolicy that tells whether the mask is refined,
+    defaults to None
+    :type inference_policy: Any, optional
+    :param blur_kind: The kind of the blurring kernel out of 'box', 'gaussian', 'pixelate' and 'stacked_box',
+    defaults to 'box'
+    :type blur_kind: str, optional
+    :return: Returns the face blurred image in the Original image resolution
+    :rtype: Any
+    """
+    height, width = img_org.shape[:2]
+
+    policy = get_inference_policy(inference_policy)
+    final_img = get_output_buffer(img_org, out)
+
+    for (cropMinX, cropMinY, cropMaxX, _), mask_face in zip(crop_boxes, masks_face):
+        mask_face = mask_face.astype('uint8')
+        face_x, face_y, face_width, face_height = cv2.boundingRect(mask_face)
+        if face_width == 0 or face_height == 0:
+            continue
+
+        crop_size = cropMaxX - cropMinX
+        scale = crop_size / mask_face.shape[1]
+
+        # The linear upscaling spreads the mask by about one face parser pixel around the scaled box
+        mask_margin = int(np.ceil(scale)) + 1
+        if policy.refine:
+            refine_radius = get_refine_radius(policy, scale)
+            mask_margin += 2 * refine_radius
+
+        minX = max(0, cropMinX + int(np.floor(face_x * scale)) - mask_margin)
+        minY = max(0, cropMinY + int(np.floor(face_y * scale)) - mask_margin)
+        maxX = min(width, cropMinX + int(np.ceil((face_x + face_width) * scale)) + mask_margin)
+        maxY = min(height, cropMinY + int(np.ceil((face_y + face_height) * scale)) + mask_margin)
+        if maxX <= minX or maxY <= minY:
+            continue
+
+        box_mat = np.float32([[1 / scale, 0, (minX - cropMinX + 0.5) / scale - 0.5],
+                              [0, 1 / scale, (minY - cropMinY + 0.5) / scale - 0.5]])
+        mask_box = cv2.warpAffine(mask_face, box_mat, (maxX - minX, maxY - minY),
+                                  flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP, borderMode=cv2.BORDER_CONSTANT)
+        if policy.refine:
+            with trace_stage('refine_mask', mask_box):
+                refine_mask(mask_box, img_org[minY:maxY, minX:maxX], refine_radius, policy.refine_eps)
+
+        ksize = get_blur_ksize(blurring_factor, crop_size, crop_size)
+        blur_face_box(img_org, final_img, (minX, minY, maxX, maxY), mask_box, ksize, blur_kind)
+
+    dump_debug_img('d001_input_image', img_org, visual_debug_sink)
+    dump_debug_img('d006_final', final_img, visual_debug_sink)
+
+    return final_img
+
+
+def add_face_blur_crops(net: Any, dev_acc: str, face_detector: Any, imgs_org: List[Any], blurring_factor: int = 33,
+                        mask_cache: Any = None, inference_policy: Any = None, face_regions: Any = None,
+                        blur_kind: str = 'box', crop_margin: float = FACE_CROP_MARGIN) -> List[Any]:
+    """
+    It blurs the faces of the given images by parsing only the faces found by the face detector. Each face is
+    cropped with the margin, the crops of all the images are parsed in batches at the face parser resolution and
+    their masks are merged back at the original resolution. The cost follows the number of the faces instead of the
+    size of the images, and the small faces of the group photos are parsed at their own scale.
+
+    :param net: This param holds the reference for the face parser net for inference
+    :type net: Any
+    :param dev_acc: It holds the cuda support if so for doing inference in the GPU, otherwise in CPU
+    :type dev_acc: str
+    :param face_detector: The face detector of get_face_detector
+    :type face_detector: Any
+    :param imgs_org: The decoded (BGR) images that have the faces in them
+    :type imgs_org: List[Any]
+    :param blurring_factor: The kernal window size for the blurring filter at the face parser resolution of each
+    face crop, defaults to 33
+    :type blurring_factor: int, optional
+    :param mask_cache: The MaskCache that holds the already computed parse maps of the crops, defaults to None
+    :type mask_cache: Any, optional
+    :param inference_policy: The preset name ('speed', 'balanced', 'quality') or the InferencePolicy of the face
+    parser resolution and the mask refinement. None parses at 512x512, defaults to None
+    :type inference_policy: Any, optional
+    :param face_regions: The face regions to be blurred, i.e. the region set ('default', 'skin', 'face',
+    'face_ears', 'skin_hair', 'no_neck', 'head') or the comma separated label names, defaults to None
+    :type face_regions: Any, optional
+    :param blur_kind: The kind of the blurring kernel out of 'box', 'gaussian', 'pixelate' and 'stacked_box',
+    defaults to 'box'
+    :type blur_kind: str, optional
+    :param crop_margin: The margin of the face crops on every side as the fraction of the face size, defaults to
+    FACE_CROP_MARGIN
+    :type crop_margin: float, optional
+    :return: Returns the face blurred images in the Original image resolution
+    :rtype: List[Any]
+    """
+    parse_size = get_inference_policy(inference_policy).face_parse_size
+
+    crop_boxes = [[get_face_crop_box(face_box, crop_margin) for face_box in detect_faces(face_detector, img_org)]
+                  for img_org in imgs_org]
+
+    with trace_stage('crop'):
+        imgs_crop = [crop_face(img_org, crop_box, parse_size)
+                     for img_org, img_crop_boxes in zip(imgs_org, crop_boxes) for crop_box in img_crop_boxes]
+
+    faces_parsed: List[Any] = []
+    for crop_index in range(0, len(imgs_crop), FACE_CROP_BATCH_SIZE):
+        faces_parsed.extend(parse_faces(net, dev_acc, imgs_crop[crop_index:crop_index + FACE_CROP_BATCH_SIZE],
+                                        mask_cache))
+
+    face_lut = get_face_region_lut(face_regions)
+    with trace_stage('face_mask'):
+        masks_face = [get_face_mask(face_parsed, face_lut) for face_parsed in faces_parsed]
+
+    final_imgs = []
+    crop_index = 0
+    for img_org, img_crop_boxes in zip(imgs_org, crop_boxes):
+        final_imgs.append(blur_face_crops(img_org, img_crop_boxes,
+                                          masks_face[crop_index:crop_index + len(img_crop_boxes)], blurring_factor,
+                                          None, inference_policy, blur_kind))
+        crop_index += len(img_crop_boxes)
+
+    return final_imgs
+
+
+def apply_face_blur(img_org: Any, img_resized: Any, mask_face: Any, blurring_factor: int = 33,
+                    roi_blur: bool = False, inference_policy: Any = None, blur_kind: str = 'box',
+                    face_scaled: bool = False) -> Any:
+    """
+    It blurs the faces of the original image using the already computed face mask, either over the whole resized
+    image or only within the face bounding boxes at the original resolution.
+
+    :param img_org: This image is the original image to be processed
+    :type img_org: Any
+    :param img_resized: This image is the original image resized to the face parser resolution
+    :type img_resized: Any
+    :param mask_face: This image is the mask image that holds the face mask
+    :type mask_face: Any
+    :param blurring_factor: The kernal window size for the blurring filter, defaults to 33
+    :type blurring_factor: int, optional
+    :param roi_blur: It blurs only the face bounding boxes at the original resolution, defaults to False
+    :type roi_blur: bool, optional
+    :param inference_policy: The preset name or the InferencePolicy. Its mask refinement applies to the ROI blur
+    only, since the other blur is done at the face parser resolution, defaults to None
+    :type inference_policy: Any, optional
+    :param blur_kind: The kind of the blurring kernel out of 'box', 'gaussian', 'pixelate' and 'stacked_box',
+    defaults to 'box'
+    :type blur_kind: str, optional
+    :param face_scaled: It scales the blurring kernel with the size of each face, so that the large faces are
+    blurred stronger than the small ones, defaults to False
+    :type face_scaled: bool, optional
+    :return: Returns the face blurred image in the Original image resolution
+    :rtype: Any
+    """
+    if roi_blur:
+        return blur_face_img_roi(img_org, mask_face, blurring_factor, None, inference_policy, blur_kind, face_scaled)
+
+    return blur_face_img(img_org, img_resized, mask_face, blurring_factor, blur_kind, face_scaled)
+
+
+def add_face_blur_array(net: Any, dev_acc: str, img_org: Any, blurring_factor: int = 33,
+                        mask_cache: Any = None, roi_blur: bool = False,
+                        inference_policy: Any = None, face_regions: Any = None, blur_kind: str = 'box',
+                        face_scaled: bool = False, face_detector: Any = None) -> Any:
+    """
+    This function adds the blur to the face of the given image array using face mask by face parser and
+    blurred input image
+
+    :param net: This param holds the reference for the face parser net for inference
+    :type net: Any
+    :param dev_acc: It holds the cuda support if so for doing inference in the GPU, otherwise in CPU
+    :type dev_acc: str
+    :param img_org: The decoded (BGR) image or the encoded image bytes that has the face in it
+    :type img_org: Any
+    :param blurring_factor: The kernal window size for the blurring filter, defaults to 33
+    :type blurring_factor: int, optional
+    :param mask_cache: The MaskCache that holds the already computed parse maps, defaults to None
+    :type mask_cache: Any, optional
+    :param roi_blur: It blurs only the face bounding boxes at the original resolution and leaves the rest of the
+    image untouched, defaults to False
+    :type roi_blur: bool, optional
+    :param inference_policy: The preset name ('speed', 'balanced', 'quality') or the InferencePolicy of the face
+    parser resolution and the mask refinement. None parses at 512x512, defaults to None
+    :type inference_policy: Any, optional
+    :param face_regions: The face regions to be blurred, i.e. the region set ('default', 'skin', 'face',
+    'face_ears', 'skin_hair', 'no_neck', 'head') or the comma separated label names, defaults to None
+    :type face_regions: Any, optional
+    :param blur_kind: The kind of the blurring kernel out of 'box', 'gaussian', 'pixelate' and 'stacked_box',
+    defaults to 'box'
+    :type blur_kind: str, optional
+    :param face_scaled: It scales the blurring kernel with the size of each face, so that the large faces are
+    blurred stronger than the small ones, defaults to False
+    :type face_scaled: bool, optional
+    :param face_detector: The face detector of get_face_detector. If it is given, only the detected faces are
+    cropped and parsed at the face parser resolution, and roi_blur and face_scaled do not apply, defaults to None
+    :type face_detector: Any, optional
+    :return: Returns the face blurred image in the Original image resolution
+    :rtype: Any
+    """
+    with trace_stage('decode'):
+        img_org = decode_img(img_org)
+    if face_detector is not None:
+        return add_face_blur_crops(net, dev_acc, face_detector, [img_org], blurring_factor, mask_cache,
+                                   inference_policy, face_regions, blur_kind)[0]
+
+    parse_size = get_inference_policy(inference_policy).face_parse_size
+    with trace_stage('resize', img_org):
+        img_resized = cv2.resize(img_org, (parse_size, parse_size), interpolation=cv2.INTER_LINEAR)
+
+    face_parsed = parse_faces(net, dev_acc, [img_resized], mask_cache)[0]
+    with trace_stage('face_mask', face_parsed):
+        mask_face = get_face_mask(face_parsed, face_regions)
+
+    return apply_face_blur(img_org, img_resized, mask_face, blurring_factor, roi_blur, inference_policy, blur_kind,
+                           face_scaled)
+
+
+def add_face_blur_bytes(net: Any, dev_acc: str, img_data: bytes, blurring_factor: int = 33,
+                        out_ext: str = '.png', mask_cache: Any = None, roi_blur: bool = False,
+                        inference_policy: Any = None, face_regions: Any = None, blur_kind: str = 'box',
+                        face_scaled: bool = False, face_detector: Any = None) -> bytes:
+    """
+    This function adds the blur to the face of the given encoded image bytes and returns the encoded result, so
+    that no file has to be touched.
+
+    :param net: This param holds the reference for the face parser net for inference
+    :type net: Any
+    :param dev_acc: It holds the cuda support if so for doing inference in the GPU, otherwise in CPU
+    :type dev_acc: str
+    :param img_data: The encoded image (png, jpg, etc.) that has the face in it
+    :type img_data: bytes
+    :param blurring_factor: The kernal window size for the blurring filter, defaults to 33
+    :type blurring_factor: int, optional
+    :param out_ext: The extension of the output format, defaults to '.png'
+    :type out_ext: str, optional
+    :param mask_cache: The MaskCache that holds the already computed parse maps, defaults to None
+    :type mask_cache: Any, optional
+    :param roi_blur: It blurs only the face bounding boxes at the original resolution and leaves the rest of the
+    image untouched, defaults to False
+    :type roi_blur: bool, optional
+    :param inference_policy: The preset name ('speed', 'balanced', 'quality') or the InferencePolicy of the face
+    parser resolution and the mask refinement. None parses at 512x512, defaults to None
+    :type inference_policy: Any, optional
+    :param face_regions: The face regions to be blurred, i.e. the region set ('default', 'skin', 'face',
+    'face_ears', 'skin_hair', 'no_neck', 'head') or the comma separated label names, defaults to None
+    :type face_regions: Any, optional
+    :param blur_kind: The kind of the blurring kernel out of 'box', 'gaussian', 'pixelate' and 'stacked_box',
+    defaults to 'box'
+    :type blur_kind: str, optional
+    :param face_scaled: It scales the blurring kernel with the size of each face, so that the large faces are
+    blurred stronger than the small ones, defaults to False
+    :type face_scaled: bool, optional
+    :param face_detector: The face detector of get_face_detector. If it is given, only the detected faces are
+    cropped and parsed at the face parser resolution, and roi_blur and face_scaled do not apply, defaults to None
+    :type face_detector: Any, optional
+    :return: Returns the encoded face blurred image in the Original image resolution
+    :rtype: bytes
+    """
+    final_img = add_face_blur_array(net, dev_acc, img_data, blurring_factor, mask_cache, roi_blur, inference_policy,
+                                    face_regions, blur_kind, face_scaled, face_detector)
+
+    with trace_stage('encode', final_img):
+        return encode_img(final_img, out_ext)
 
 
 def add_face_blur(net: Any, dev_acc: str, in_file_path: str, out_file_path: str,
-                  blurring_factor: int = 33) -> None:
+                  blurring_factor: int = 33, mask_cache: Any = None, roi_blur: bool = False,
+                  inference_policy: Any = None, face_regions: Any = None, encode_options: Any = None,
+                  img_writer: Any = None, blur_kind: str = 'box', face_scaled: bool = False,
+                  face_detector: Any = None) -> None:
     """
     This function adds the blur to the face using face mask by face parser and blurred input image
 
@@ -93,43 +687,126 @@ def add_face_blur(net: Any, dev_acc: str, in_file_path: str, out_file_path: str,
     :type out_file_path: str
     :param blurring_factor: The kernal window size for the blurring filter, defaults to 33
     :type blurring_factor: int, optional
+    :param mask_cache: The MaskCache that holds the already computed parse maps, defaults to None
+    :type mask_cache: Any, optional
+    :param roi_blur: It blurs only the face bounding boxes at the original resolution and leaves the rest of the
+    image untouched, defaults to False
+    :type roi_blur: bool, optional
+    :param inference_policy: The preset name ('speed', 'balanced', 'quality') or the InferencePolicy of the face
+    parser resolution and the mask refinement. None parses at 512x512, defaults to None
+    :type inference_policy: Any, optional
+    :param face_regions: The face regions to be blurred, i.e. the region set ('default', 'skin', 'face',
+    'face_ears', 'skin_hair', 'no_neck', 'head') or the comma separated label names, defaults to None
+    :type face_regions: Any, optional
+    :param encode_options: The EncodeOptions of the output format and its compression or quality. None keeps the
+    extension of the output file with the OpenCV defaults, defaults to None
+    :type encode_options: Any, optional
+    :param img_writer: The AsyncImgWriter that encodes and writes the output in the background. None writes it
+    right away, defaults to None
+    :type img_writer: Any, optional
+    :param blur_kind: The kind of the blurring kernel out of 'box', 'gaussian', 'pixelate' and 'stacked_box',
+    defaults to 'box'
+    :type blur_kind: str, optional
+    :param face_scaled: It scales the blurring kernel with the size of each face, so that the large faces are
+    blurred stronger than the small ones, defaults to False
+    :type face_scaled: bool, optional
+    :param face_detector: The face detector of get_face_detector. If it is given, only the detected faces are
+    cropped and parsed at the face parser resolution, and roi_blur and face_scaled do not apply, defaults to None
+    :type face_detector: Any, optional
     :return: Returns the face blurred image in the Original image resolution
     :rtype: Any
     """
-    global visual_debug
+    with trace_stage('imread'):
+        img_org = cv2.imread(in_file_path)
 
-    img_org = cv2.imread(in_file_path)
-    height, width = img_org.shape[:2]
+    final_img = add_face_blur_array(net, dev_acc, img_org, blurring_factor, mask_cache, roi_blur, inference_policy,
+                                    face_regions, blur_kind, face_scaled, face_detector)
 
-    img_resized = cv2.resize(img_org, (512, 512), interpolation=cv2.INTER_LINEAR)
-    img = img2tensor(img_resized.astype('float32') / 255., bgr2rgb=True, float32=True)
-    normalize(img, (0.485, 0.456, 0.406), (0.229, 0.224, 0.225), inplace=True)
+    if img_writer is not None:
+        img_writer.write(out_file_path, final_img, encode_options)
+    else:
+        write_img(out_file_path, final_img, encode_options)
 
-    if dev_acc == 'cuda':
-        img = torch.unsqueeze(img, 0).cuda()
-    elif dev_acc == 'cpu':
-        img = torch.unsqueeze(img, 0)
 
-    with torch.no_grad():
-        face_parsed = net(img)[0]
-    face_parsed = face_parsed.squeeze(0).cpu().numpy().argmax(0)
+def add_face_blur_batch(net: Any, dev_acc: str, in_file_paths: List[str], out_file_paths: List[str],
+                        blurring_factor: int = 33, mask_cache: Any = None, roi_blur: bool = False,
+                        inference_policy: Any = None, face_regions: Any = None, encode_options: Any = None,
+                        img_writer: Any = None, blur_kind: str = 'box', face_scaled: bool = False,
+                        face_detector: Any = None) -> None:
+    """
+    This function adds the blur to the faces of the given set of images. The images are stacked into a single
+    batch so that the face parser runs only one forward pass for all of them. The output of each image is same
+    as the one from add_face_blur.
+
+    :param net: This param holds the reference for the face parser net for inference
+    :type net: Any
+    :param dev_acc: It holds the cuda support if so for doing inference in the GPU, otherwise in CPU
+    :type dev_acc: str
+    :param in_file_paths: The input files with path that have the face in those images
+    :type in_file_paths: List[str]
+    :param out_file_paths: The ouptut paths with filename to store the processed face blurred images. It has to
+    be in the same order as the input files
+    :type out_file_paths: List[str]
+    :param blurring_factor: The kernal window size for the blurring filter, defaults to 33
+    :type blurring_factor: int, optional
+    :param mask_cache: The MaskCache that holds the already computed parse maps, defaults to None
+    :type mask_cache: Any, optional
+    :param roi_blur: It blurs only the face bounding boxes at the original resolution and leaves the rest of the
+    image untouched, defaults to False
+    :type roi_blur: bool, optional
+    :param inference_policy: The preset name ('speed', 'balanced', 'quality') or the InferencePolicy of the face
+    parser resolution and the mask refinement. None parses at 512x512, defaults to None
+    :type inference_policy: Any, optional
+    :param face_regions: The face regions to be blurred, i.e. the region set ('default', 'skin', 'face',
+    'face_ears', 'skin_hair', 'no_neck', 'head') or the comma separated label names, defaults to None
+    :type face_regions: Any, optional
+    :param encode_options: The EncodeOptions of the output format and its compression or quality. None keeps the
+    extension of the output file with the OpenCV defaults, defaults to None
+    :type encode_options: Any, optional
+    :param img_writer: The AsyncImgWriter that encodes and writes the outputs in the background. None writes
+    them right away, defaults to None
+    :type img_writer: Any, optional
+    :param blur_kind: The kind of the blurring kernel out of 'box', 'gaussian', 'pixelate' and 'stacked_box',
+    defaults to 'box'
+    :type blur_kind: str, optional
+    :param face_scaled: It scales the blurring kernel with the size of each face, so that the large faces are
+    blurred stronger than the small ones, defaults to False
+    :type face_scaled: bool, optional
+    :param face_detector: The face detector of get_face_detector. If it is given, only the detected faces are
+    cropped and parsed at the face parser resolution, and roi_blur and face_scaled do not apply, defaults to None
+    :type face_detector: Any, optional
+    """
+    if len(in_file_paths) != len(out_file_paths):
+        raise ValueError('The number of input files and output files has to be the same')
 
-    mask_face = np.zeros((face_parsed.shape[0], face_parsed.shape[1]), dtype="uint8")
-    rep = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 17]
-    mask_face = np.where(np.isin(face_parsed, rep), 255, mask_face)
+    if len(in_file_paths) == 0:
+        return
 
-    ksize = (blurring_factor, blurring_factor)
-    img_input_blur = cv2.blur(img_resized, ksize)
+    with trace_stage('imread'):
+        imgs_org = [decode_img(cv2.imread(in_file_path)) for in_file_path in in_file_paths]
 
-    overlaid_img = overlay_blurred_face(img_resized, img_input_blur, mask_face)
+    if face_detector is not None:
+        # The crops of all the images are parsed together
+        final_imgs = add_face_blur_crops(net, dev_acc, face_detector, imgs_org, blurring_factor, mask_cache,
+                                         inference_policy, face_regions, blur_kind)
+    else:
+        parse_size = get_inference_policy(inference_policy).face_parse_size
+        imgs_resized = [cv2.resize(img_org, (parse_size, parse_size), interpolation=cv2.INTER_LINEAR)
+                        for img_org in imgs_org]
 
-    final_img = cv2.resize(overlaid_img, (width, height), interpolation=cv2.INTER_LINEAR)
+        faces_parsed = parse_faces(net, dev_acc, imgs_resized, mask_cache)
+        face_lut = get_face_region_lut(face_regions)
 
-    if (visual_debug is True):
-        cv2.imwrite(os.path.join('debug', 'd001_input_image.png'), img_org)
-        cv2.imwrite(os.path.join('debug', 'd002_input_resized.png'), img_resized)
-        cv2.imwrite(os.path.join('debug', 'd003_face_mask.png'), mask_face)
-        cv2.imwrite(os.path.join('debug', 'd004_input_blurred.png'), img_input_blur)
-        cv2.imwrite(os.path.join('debug', 'd006_final.png'), final_img)
+    for img_index, out_file_path in enumerate(out_file_paths):
+        if face_detector is not None:
+            final_img = final_imgs[img_index]
+        else:
+            with trace_stage('face_mask', faces_parsed[img_index]):
+                mask_face = get_face_mask(faces_parsed[img_index], face_lut)
+            final_img = apply_face_blur(imgs_org[img_index], imgs_resized[img_index], mask_face, blurring_factor,
+                                        roi_blur, inference_policy, blur_kind, face_scaled)
 
-    cv2.imwrite(out_file_path, final_img)
+        if img_writer is not None:
+            img_writer.write(out_file_path, final_img, encode_options)
+        else:
+            write_img(out_file_path, final_img, encode_options)
@@ -0,0 +1,144 @@
+""" This module implements the face blurring feature for the given human face in the given videos
+"""
+from ..imgio.video_io import get_frame_signature
+from ..imgio.video_io import get_video_info
+from ..imgio.video_io import open_video_writer
+from ..imgio.video_io import read_video_frames
+from .face_blur_img import apply_face_blur
+from .face_blur_img import get_face_mask
+from .face_blur_img import parse_faces
+from .face_regions import get_face_region_lut
+from typing import Any
+from typing import List
+from typing import Optional
+
+import cv2
+import numpy as np
+
+
+def select_frames_to_parse(signatures: List[Any], last_signature: Optional[Any], frames_since_parse: int,
+                           reparse_interval: int, diff_threshold: Optional[float]) -> List[int]:
+    """
+    It decides which of the frames in the batch have to be parsed. A frame is parsed if there is no previously
+    parsed frame, if reparse_interval frames passed since the last parse or if its mean absolute difference to the
+    last parsed frame is above the diff_threshold. The other frames reuse the face mask of the last parsed frame.
+
+    :param signatures: The frame signatures of the batch
+    :type signatures: List[Any]
+    :param last_signature: The signature of the last parsed frame before this batch, None if there is no such frame
+    :type last_signature: Optional[Any]
+    :param frames_since_parse: Number of frames passed since the last parsed frame before this batch
+    :type frames_since_parse: int
+    :param reparse_interval: The frame interval at which the face parser is run again
+    :type reparse_interval: int
+    :param diff_threshold: The mean absolute difference (0-255) that triggers the face parser. None disables it
+    :type diff_threshold: Optional[float]
+    :return: Returns the indices of the frames in the batch to be parsed
+    :rtype: List[int]
+    """
+    parse_indices = []
+
+    for frame_index, signature in enumerate(signatures):
+        frames_since_parse += 1
+
+        parse_frame = last_signature is None or frames_since_parse >= reparse_interval
+        if not parse_frame and diff_threshold is not None:
+            parse_frame = float(np.mean(np.abs(signature - last_signature))) > diff_threshold
+
+        if parse_frame:
+            parse_indices.append(frame_index)
+            last_signature = signature
+            frames_since_parse = 0
+
+    return parse_indices
+
+
+def add_face_blur_video(net: Any, dev_acc: str, in_file_path: str, out_file_path: str, blurring_factor: int = 33,
+                        batch_size: int = 8, reparse_interval: int = 1, diff_threshold: Optional[float] = None,
+                        fourcc: str = 'mp4v', roi_blur: bool = False, face_regions: Any = None,
+                        blur_kind: str = 'box', face_scaled: bool = False) -> int:
+    """
+    This function adds the blur to the faces in the given video. The frames are streamed from the input video,
+    parsed in batches and streamed into the output video, so that the memory usage does not depend on the length of
+    the video. The face parser can be run only at every reparse_interval frames or when the frame changes more than
+    the diff_threshold, reusing the previous face mask in between.
+
+    :param net: This param holds the reference for the face parser net for inference
+    :type net: Any
+    :param dev_acc: It holds the cuda support if so for doing inference in the GPU, otherwise in CPU
+    :type dev_acc: str
+    :param in_file_path: The input video file with path that has the faces in it
+    :type in_file_path: str
+    :param out_file_path: The ouptut path with filename to store the processed face blurred video
+    :type out_file_path: str
+    :param blurring_factor: The kernal window size for the blurring filter, defaults to 33
+    :type blurring_factor: int, optional
+    :param batch_size: Number of frames given to the face parser in a single forward pass, defaults to 8
+    :type batch_size: int, optional
+    :param reparse_interval: The frame interval at which the face parser is run. 1 parses every frame, defaults to 1
+    :type reparse_interval: int, optional
+    :param diff_threshold: The mean absolute frame difference (0-255) to the last parsed frame that forces the face
+    parser to run before the reparse_interval is reached. None disables it, defaults to None
+    :type diff_threshold: Optional[float], optional
+    :param fourcc: The four character code of the output video codec, defaults to 'mp4v'
+    :type fourcc: str, optional
+    :param roi_blur: It blurs only the face bounding boxes at the original resolution and leaves the rest of the
+    frame untouched, defaults to False
+    :type roi_blur: bool, optional
+    :param face_regions: The face regions to be blurred, i.e. the region set ('default', 'skin', 'face',
+    'face_ears', 'skin_hair', 'no_neck', 'head') or the comma separated label names, defaults to None
+    :type face_regions: Any, optional
+    :param blur_kind: The kind of the blurring kernel out of 'box', 'gaussian', 'pixelate' and 'stacked_box',
+    defaults to 'box'
+    :type blur_kind: str, optional
+    :param face_scaled: It scales the blurring kernel with the size of each face, defaults to False
+    :type face_scaled: bool, optional
+    :return: Returns the number of frames written
+    :rtype: int
+    """
+    fps, width, height, _ = get_video_info(in_file_path)
+    video_writer = open_video_writer(out_file_path, fps, width, height, fourcc)
+
+    total_frames = 0
+    last_signature = None
+    last_mask_face = None
+    frames_since_parse = 0
+    face_lut = get_face_region_lut(face_regions)
+
+    def process_batch(frames: List[Any]) -> None:
+        nonlocal last_signature, last_mask_face, frames_since_parse
+
+        imgs_resized = [cv2.resize(frame, (512, 512), interpolation=cv2.INTER_LINEAR) for frame in frames]
+        signatures = [get_frame_signature(img_resized) for img_resized in imgs_resized]
+
+        parse_indices = select_frames_to_parse(signatures, last_signature, frames_since_parse, reparse_interval,
+                                               diff_threshold)
+        faces_parsed = parse_faces(net, dev_acc, [imgs_resized[frame_index] for frame_index in parse_indices])
+        masks_face = dict(zip(parse_indices, [get_face_mask(face_parsed, face_lut) for face_parsed in faces_parsed]))
+
+        for frame_index, frame in enumerate(frames):
+            frames_since_parse += 1
+            if frame_index in masks_face:
+                last_mask_face = masks_face[frame_index]
+                last_signature = signatures[frame_index]
+                frames_since_parse = 0
+
+            video_writer.write(apply_face_blur(frame, imgs_resized[frame_index], last_mask_face, blurring_factor,
+                                               roi_blur, blur_kind=blur_kind, face_scaled=face_scaled))
+
+    try:
+        frames: List[Any] = []
+        for frame in read_video_frames(in_file_path):
+            frames.append(frame)
+            total_frames += 1
+
+            if len(frames) == batch_size:
+                process_batch(frames)
+                frames = []
+
+        if len(frames) != 0:
+            process_batch(frames)
+    finally:
+        video_writer.release()
+
+    return total_frames
@@ -0,0 +1,215 @@
+""" This module implements the face detectors that gate the face parser. The faces found by the detector are cropped
+with a margin and parsed one by one at the face parser resolution, so that the faces of the group photos are parsed
+at their own scale instead of a few pixels of the whole image squeezed to 512x512.
+"""
+from ..trace.tracer import trace_stage
+from .face_parser_onnx import face_parser_root_path
+from typing import Any
+from typing import List
+from typing import Tuple
+
+import os
+import cv2
+import numpy as np
+
+face_detectors = ('retinaface_mobile0.25', 'retinaface_resnet50', 'haar')
+
+# The images are downscaled so that their longer side is at most this size before the detection, which bounds its
+# cost regardless of the image size
+FACE_DETECT_SIZE = 1024
+
+# The margin of the face crop on every side as the fraction of the face size. The face parser expects the whole
+# head with some of the hair and the neck around the face
+FACE_CROP_MARGIN = 0.5
+
+
+class RetinaFaceDetector:
+    """
+    It detects the faces with the RetinaFace net of facexlib. The weights are downloaded under ~/.iveu on the first
+    use.
+    """
+
+    def __init__(self, model_name: str = 'retinaface_mobile0.25', device: str = 'cpu',
+                 conf_threshold: float = 0.8) -> None:
+        """
+        :param model_name: The facexlib detection model, 'retinaface_mobile0.25' or 'retinaface_resnet50', defaults
+        to 'retinaface_mobile0.25'
+        :type model_name: str, optional
+        :param device: The inference device, 'cpu' or 'cuda', defaults to 'cpu'
+        :type device: str, optional
+        :param conf_threshold: The minimum confidence of the detected faces, defaults to 0.8
+        :type conf_threshold: float, optional
+        """
+        from facexlib.detection import init_detection_model
+
+        self.model_name = model_name
+        self.conf_threshold = conf_threshold
+        self.net = init_detection_model(model_name, device=device, model_rootpath=face_parser_root_path)
+
+    def detect(self, img: Any) -> List[Tuple[float, float, float, float]]:
+        """
+        It detects the faces of the given image.
+
+        :param img: The BGR image
+        :type img: Any
+        :return: Returns the (minX, minY, maxX, maxY) box of each face
+        :rtype: List[Tuple[float, float, float, float]]
+        """
+        import torch
+
+        with torch.no_grad():
+            detections = self.net.detect_faces(img, self.conf_threshold)
+
+        return [tuple(detection[:4]) for detection in detections]
+
+
+class HaarFaceDetector:
+    """
+    It detects the frontal faces with the Haar cascade shipped with OpenCV. It needs neither torch nor any download,
+    but it misses more of the profile and the small faces than RetinaFace.
+    """
+
+    model_name = 'haar'
+
+    def __init__(self, cascade_file: str = 'haarcascade_frontalface_default.xml', min_neighbors: int = 5,
+                 min_size: int = 16) -> None:
+        """
+        :param cascade_file: The cascade out of the cv2.data.haarcascades folder, defaults to
+        'haarcascade_frontalface_default.xml'
+        :type cascade_file: str, optional
+        :param min_neighbors: The number of the overlapping detections a face needs, defaults to 5
+        :type min_neighbors: int, optional
+        :param min_size: The smallest face in pixels, defaults to 16
+        :type min_size: int, optional
+        """
+        if not hasattr(cv2, 'CascadeClassifier'):
+            raise ImportError('The Haar cascades need the objdetect module of OpenCV 4, e.g. opencv_python_headless')
+
+        self.cascade = cv2.CascadeClassifier(os.path.join(cv2.data.haarcascades, cascade_file))
+        if self.cascade.empty():
+            raise IOError('Unable to load the face cascade {}'.format(cascade_file))
+
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+
+    def detect(self, img: Any) -> List[Tuple[float, float, float, float]]:
+        """
+        It detects the faces of the given image.
+
+        :param img: The BGR image
+        :type img: Any
+        :return: Returns the (minX, minY, maxX, maxY) box of each face
+        :rtype: List[Tuple[float, float, float, float]]
+        """
+        img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        faces = self.cascade.detectMultiScale(img_gray, scaleFactor=1.1, minNeighbors=self.min_neighbors,
+                                              minSize=(self.min_size, self.min_size))
+
+        return [(face_x, face_y, face_x + face_width, face_y + face_height)
+                for face_x, face_y, face_width, face_height in faces]
+
+
+def get_face_detector(detector_name: str = 'retinaface_mobile0.25', device: str = 'cpu') -> Any:
+    """
+    It loads the face detector of the given name.
+
+    :param detector_name: The detector out of face_detectors, defaults to 'retinaface_mobile0.25'
+    :type detector_name: str, optional
+    :param device: The inference device of the RetinaFace detectors, defaults to 'cpu'
+    :type device: str, optional
+    :raises ValueError: If the detector is unknown
+    :return: Returns the face detector, whose detect returns the face boxes of the given BGR image
+    :rtype: Any
+    """
+    if detector_name not in face_detectors:
+        raise ValueError('Unknown face detector {}, it has to be one of {}'.format(detector_name, face_detectors))
+
+    if detector_name == 'haar':
+        return HaarFaceDetector()
+
+    return RetinaFaceDetector(detector_name, device)
+
+
+def detect_faces(face_detector: Any, img_org: Any, detect_size: int = FACE_DETECT_SIZE
+                 ) -> List[Tuple[int, int, int, int]]:
+    """
+    It detects the faces of the given image at most at the detection size and scales their boxes back to the
+    original resolution.
+
+    :param face_detector: The face detector of get_face_detector
+    :type face_detector: Any
+    :param img_org: This image is the original image to be processed
+    :type img_org: Any
+    :param detect_size: The longer side of the image the detector runs on, defaults to FACE_DETECT_SIZE
+    :type detect_size: int, optional
+    :return: Returns the (minX, minY, maxX, maxY) box of each face in the original image resolution
+    :rtype: List[Tuple[int, int, int, int]]
+    """
+    height, width = img_org.shape[:2]
+
+    img_detect = img_org
+    if max(width, height) > detect_size:
+        scale = detect_size / max(width, height)
+        with trace_stage('resize', img_org):
+            img_detect = cv2.resize(img_org, (max(1, round(width * scale)), max(1, round(height * scale))),
+                                    interpolation=cv2.INTER_AREA)
+
+    with trace_stage('detect', img_detect):
+        detections = face_detector.detect(img_detect)
+
+    scale_x, scale_y = width / img_detect.shape[1], height / img_detect.shape[0]
+
+    face_boxes = []
+    for box_minX, box_minY, box_maxX, box_maxY in detections:
+        minX, minY = max(0, int(np.floor(box_minX * scale_x))), max(0, int(np.floor(box_minY * scale_y)))
+        maxX, maxY = min(width, int(np.ceil(box_maxX * scale_x))), min(height, int(np.ceil(box_maxY * scale_y)))
+        if maxX > minX and maxY > minY:
+            face_boxes.append((minX, minY, maxX, maxY))
+
+    return face_boxes
+
+
+def get_face_crop_box(face_box: Tuple[int, int, int, int], crop_margin: float = FACE_CROP_MARGIN
+                      ) -> Tuple[int, int, int, int]:
+    """
+    It returns the square crop around the given face box grown by the margin, so that the face parser sees the face
+    without distorting it. The crop can reach beyond the image.
+
+    :param face_box: The (minX, minY, maxX, maxY) box of the face
+    :type face_box: Tuple[int, int, int, int]
+    :param crop_margin: The margin on every side as the fraction of the face size, defaults to FACE_CROP_MARGIN
+    :type crop_margin: float, optional
+    :return: Returns the (minX, minY, maxX, maxY) square crop
+    :rtype: Tuple[int, int, int, int]
+    """
+    minX, minY, maxX, maxY = face_box
+    crop_size = max(1, int(np.ceil(max(maxX - minX, maxY - minY) * (1 + 2 * crop_margin))))
+
+    cropMinX = int(round((minX + maxX - crop_size) / 2))
+    cropMinY = int(round((minY + maxY - crop_size) / 2))
+
+    return cropMinX, cropMinY, cropMinX + crop_size, cropMinY + crop_size
+
+
+def crop_face(img_org: Any, crop_box: Tuple[int, int, int, int], parse_size: int) -> Any:
+    """
+    It scales the given square crop of the image to the face parser resolution, reading only the pixels of the crop.
+    The parts of the crop beyond the image are black.
+
+    :param img_org: This image is the original image to be processed
+    :type img_org: Any
+    :param crop_box: The (minX, minY, maxX, maxY) square crop of get_face_crop_box
+    :type crop_box: Tuple[int, int, int, int]
+    :param parse_size: The face parser resolution
+    :type parse_size: int
+    :return: Returns the crop resized to parse_size x parse_size
+    :rtype: Any
+    """
+    cropMinX, cropMinY, cropMaxX, _ = crop_box
+    scale = (cropMaxX - cropMinX) / parse_size
+
+    # The same pixel center mapping as cv2.resize
+    crop_mat = np.float32([[scale, 0, cropMinX + 0.5 * scale - 0.5], [0, scale, cropMinY + 0.5 * scale - 0.5]])
+
+    return cv2.warpAffine(img_org, crop_mat, (parse_size, parse_size), flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP,
+                          borderMode=cv2.BORDER_CONSTANT)
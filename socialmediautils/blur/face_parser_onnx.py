@@ -0,0 +1,291 @@
+""" This module implements the onnxruntime backend of the face parser. The facexlib net is exported to ONNX once,
+optionally quantized to INT8, and cached under ~/.iveu, so that the later runs load neither torch nor facexlib.
+"""
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import inspect
+import os
+import tempfile
+import threading
+import cv2
+import numpy as np
+
+face_parser_backends = ('torch', 'onnx', 'onnx_int8')
+face_parser_root_path = os.path.join(os.path.expanduser('~'), '.iveu')
+
+# The normalization of the face parser input folded into a single scale and offset of the RGB channels
+face_parser_scale = np.float32([1. / (255. * 0.229), 1. / (255. * 0.224), 1. / (255. * 0.225)])
+face_parser_offset = -np.float32([0.485 / 0.229, 0.456 / 0.224, 0.406 / 0.225])
+
+
+def get_onnx_model_path(model_type: str = 'bisenet', height: int = 512, width: int = 512, quantize: bool = False
+                        ) -> str:
+    """
+    It returns the path of the cached ONNX model of the given face parser and input resolution.
+
+    :param model_type: Name of the face parser model, defaults to 'bisenet'
+    :type model_type: str, optional
+    :param height: The height of the face parser input, defaults to 512
+    :type height: int, optional
+    :param width: The width of the face parser input, defaults to 512
+    :type width: int, optional
+    :param quantize: Whether it is the INT8 quantized model, defaults to False
+    :type quantize: bool, optional
+    :return: Returns the path of the ONNX model under ~/.iveu
+    :rtype: str
+    """
+    return os.path.join(face_parser_root_path, 'parsing_{}_{}x{}{}.onnx'.format(model_type, width, height,
+                                                                               '_int8' if quantize else ''))
+
+
+def get_temp_model_path(model_path: str) -> str:
+    """
+    It returns a unique temporary path next to the given model path. The model is written there and renamed at the
+    end, so that the concurrent processes never load a partially written model.
+
+    :param model_path: The path of the model to be written
+    :type model_path: str
+    :return: Returns the temporary path in the same folder
+    :rtype: str
+    """
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+    temp_file, temp_path = tempfile.mkstemp(suffix='.onnx', dir=os.path.dirname(model_path))
+    os.close(temp_file)
+
+    return temp_path
+
+
+def export_face_parser_onnx(model_type: str = 'bisenet', height: int = 512, width: int = 512,
+                            model_path: Optional[str] = None) -> str:
+    """
+    It exports the face parser of facexlib to ONNX unless it is already exported. The argmax over the classes and the
+    conversion to uint8 are part of the exported graph, so that only the label image leaves the session. The input
+    shape is fixed to a single image of the given resolution, as the net pools over the whole feature map whose size
+    has to be constant in the graph. It needs torch, facexlib and onnx.
+
+    :param model_type: Name of the face parser model, defaults to 'bisenet'
+    :type model_type: str, optional
+    :param height: The height of the face parser input, defaults to 512
+    :type height: int, optional
+    :param width: The width of the face parser input, defaults to 512
+    :type width: int, optional
+    :param model_path: The path of the ONNX model. None is the cache under ~/.iveu, defaults to None
+    :type model_path: Optional[str], optional
+    :return: Returns the path of the ONNX model
+    :rtype: str
+    """
+    model_path = get_onnx_model_path(model_type, height, width) if model_path is None else model_path
+    if os.path.isfile(model_path):
+        return model_path
+
+    from facexlib.parsing import init_parsing_model
+    import torch
+
+    class FaceParserLabels(torch.nn.Module):
+        def __init__(self, net: Any) -> None:
+            super().__init__()
+            self.net = net
+
+        def forward(self, imgs: Any) -> Any:
+            return self.net(imgs)[0].argmax(1).to(torch.uint8)
+
+    net = init_parsing_model(model_name=model_type, device='cpu', model_rootpath=face_parser_root_path)
+
+    # The newer torch defaults to the dynamo exporter, the TorchScript one is enough for this net
+    export_kwargs = {'dynamo': False} if 'dynamo' in inspect.signature(torch.onnx.export).parameters else {}
+
+    temp_path = get_temp_model_path(model_path)
+    try:
+        with torch.no_grad():
+            torch.onnx.export(FaceParserLabels(net).eval(), torch.zeros(1, 3, height, width), temp_path,
+                              input_names=['input'], output_names=['labels'], opset_version=13, **export_kwargs)
+        os.replace(temp_path, model_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    return model_path
+
+
+def quantize_face_parser_onnx(model_path: str, quant_model_path: Optional[str] = None) -> str:
+    """
+    It quantizes the weights of the exported face parser to INT8 with the dynamic quantization of onnxruntime unless
+    it is already quantized. The convolutions become ConvInteger, which takes the unsigned weights on the CPU.
+
+    :param model_path: The path of the float ONNX model
+    :type model_path: str
+    :param quant_model_path: The path of the quantized model. None adds _int8 to the model path, defaults to None
+    :type quant_model_path: Optional[str], optional
+    :return: Returns the path of the quantized model
+    :rtype: str
+    """
+    if quant_model_path is None:
+        quant_model_path = '{}_int8.onnx'.format(os.path.splitext(model_path)[0])
+    if os.path.isfile(quant_model_path):
+        return quant_model_path
+
+    from onnxruntime.quantization import QuantType
+    from onnxruntime.quantization import quantize_dynamic
+
+    temp_path = get_temp_model_path(quant_model_path)
+    try:
+        quantize_dynamic(model_path, temp_path, weight_type=QuantType.QUInt8)
+        os.replace(temp_path, quant_model_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    return quant_model_path
+
+
+def preprocess_face_img_array(img_resized: Any) -> Any:
+    """
+    It converts the image resized to the face parser input resolution into the normalized CHW float32 array, the
+    same as preprocess_face_img does for torch.
+
+    :param img_resized: This image is the original image resized to the face parser resolution
+    :type img_resized: Any
+    :return: Returns the normalized array of shape 3xHxW
+    :rtype: Any
+    """
+    img = cv2.cvtColor(img_resized, cv2.COLOR_BGR2RGB).astype('float32')
+    img *= face_parser_scale
+    img += face_parser_offset
+
+    return img.transpose(2, 0, 1)
+
+
+class OnnxFaceParser:
+    """
+    It runs the exported face parser with onnxruntime on the CPU and returns the uint8 label images of the given
+    batch. The exported models have a fixed shape, so the model of each input resolution is exported, quantized and
+    loaded on its first use, and the images of a batch run one by one. It is safe to be shared between threads.
+    """
+
+    def __init__(self, model_type: str = 'bisenet', quantize: bool = False, intra_op_threads: int = 0,
+                 inter_op_threads: int = 0) -> None:
+        """
+        :param model_type: Name of the face parser model, defaults to 'bisenet'
+        :type model_type: str, optional
+        :param quantize: Whether to run the INT8 dynamically quantized model, defaults to False
+        :type quantize: bool, optional
+        :param intra_op_threads: Number of threads within an operator. 0 is the onnxruntime default, defaults to 0
+        :type intra_op_threads: int, optional
+        :param inter_op_threads: Number of threads across the operators. 0 is the onnxruntime default, defaults to 0
+        :type inter_op_threads: int, optional
+        """
+        self.model_type = model_type
+        self.quantize = quantize
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.model_name = '{}_{}'.format(model_type, 'onnx_int8' if quantize else 'onnx')
+
+        self._lock = threading.Lock()
+        self._sessions: Dict[Tuple[int, int], Any] = {}
+
+    def get_model_path(self, height: int, width: int) -> str:
+        """
+        It returns the path of the model of the given input resolution, exporting and quantizing it if it is not
+        cached yet.
+
+        :param height: The height of the face parser input
+        :type height: int
+        :param width: The width of the face parser input
+        :type width: int
+        :return: Returns the path of the ONNX model
+        :rtype: str
+        """
+        model_path = get_onnx_model_path(self.model_type, height, width, self.quantize)
+        if os.path.isfile(model_path):
+            return model_path
+
+        model_path = export_face_parser_onnx(self.model_type, height, width)
+        if self.quantize:
+            model_path = quantize_face_parser_onnx(model_path,
+                                                   get_onnx_model_path(self.model_type, height, width, True))
+
+        return model_path
+
+    def get_session(self, height: int, width: int) -> Any:
+        """
+        It returns the onnxruntime session of the given input resolution, loading it on the first use.
+
+        :param height: The height of the face parser input
+        :type height: int
+        :param width: The width of the face parser input
+        :type width: int
+        :return: Returns the inference session
+        :rtype: Any
+        """
+        with self._lock:
+            session = self._sessions.get((height, width))
+            if session is None:
+                import onnxruntime as ort
+
+                options = ort.SessionOptions()
+                options.intra_op_num_threads = self.intra_op_threads
+                options.inter_op_num_threads = self.inter_op_threads
+                options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+                session = ort.InferenceSession(self.get_model_path(height, width), sess_options=options,
+                                               providers=['CPUExecutionProvider'])
+                self._sessions[(height, width)] = session
+
+        return session
+
+    def __call__(self, imgs: Any) -> Any:
+        """
+        It parses the given batch of the normalized images.
+
+        :param imgs: The NCHW float32 batch of preprocess_face_img_array
+        :type imgs: Any
+        :return: Returns the NxHxW uint8 label images
+        :rtype: Any
+        """
+        session = self.get_session(imgs.shape[2], imgs.shape[3])
+        input_name = session.get_inputs()[0].name
+
+        return np.concatenate([session.run(None, {input_name: imgs[img_index:img_index + 1]})[0]
+                               for img_index in range(imgs.shape[0])], 0)
+
+    def parse(self, imgs_resized: List[Any]) -> Any:
+        """
+        It preprocesses and parses the given images resized to the face parser resolution.
+
+        :param imgs_resized: The BGR images of the same size
+        :type imgs_resized: List[Any]
+        :return: Returns the NxHxW uint8 label images
+        :rtype: Any
+        """
+        return self(np.stack([preprocess_face_img_array(img_resized) for img_resized in imgs_resized], 0))
+
+
+def get_onnx_face_parser(model_type: str = 'bisenet', quantize: bool = False, intra_op_threads: int = 0,
+                         inter_op_threads: int = 0) -> OnnxFaceParser:
+    """
+    It loads the onnxruntime face parser along with the session of the 512x512 reference resolution, exporting and
+    quantizing the model first if it is not cached yet.
+
+    :param model_type: Name of the face parser model, defaults to 'bisenet'
+    :type model_type: str, optional
+    :param quantize: Whether to run the INT8 dynamically quantized model, defaults to False
+    :type quantize: bool, optional
+    :param intra_op_threads: Number of threads within an operator. 0 is the OMP_NUM_THREADS if set, e.g. by the
+    worker processes, otherwise the onnxruntime default, defaults to 0
+    :type intra_op_threads: int, optional
+    :param inter_op_threads: Number of threads across the operators. 0 is the onnxruntime default, defaults to 0
+    :type inter_op_threads: int, optional
+    :return: Returns the face parser
+    :rtype: OnnxFaceParser
+    """
+    if intra_op_threads == 0:
+        intra_op_threads = int(os.environ.get('OMP_NUM_THREADS', '0') or 0)
+
+    net = OnnxFaceParser(model_type, quantize, intra_op_threads, inter_op_threads)
+    net.get_session(512, 512)
+
+    return net
@@ -0,0 +1,97 @@
+""" This module implements the selection of the face regions to be blurred out of the labels of the face parser. The
+labels are mapped to the mask through a 256 entry lookup table in a single pass.
+"""
+from typing import Any
+from typing import Iterable
+from typing import Optional
+from typing import Union
+
+import cv2
+import numpy as np
+
+# The labels of the BiSeNet face parser trained on CelebAMask-HQ
+face_parsing_labels = ('background', 'skin', 'l_brow', 'r_brow', 'l_eye', 'r_eye', 'eye_g', 'l_ear', 'r_ear', 'ear_r',
+                       'nose', 'mouth', 'u_lip', 'l_lip', 'neck', 'neck_l', 'cloth', 'hair', 'hat')
+
+face_features = ('skin', 'l_brow', 'r_brow', 'l_eye', 'r_eye', 'eye_g', 'nose', 'mouth', 'u_lip', 'l_lip')
+face_ears = ('l_ear', 'r_ear', 'ear_r')
+face_neck = ('neck', 'neck_l')
+
+# The default is every label except the background, the cloth and the hat
+face_region_sets = {'default': face_features + face_ears + face_neck + ('hair',),
+                    'skin': ('skin',),
+                    'face': face_features,
+                    'face_ears': face_features + face_ears,
+                    'skin_hair': ('skin', 'hair'),
+                    'no_neck': face_features + face_ears + ('hair',),
+                    'head': face_features + face_ears + face_neck + ('hair', 'hat')}
+
+
+def get_face_region_labels(face_regions: Optional[Union[str, Iterable[Union[str, int]]]] = None) -> list:
+    """
+    It returns the label indices of the given face regions.
+
+    :param face_regions: The name of the region set out of face_region_sets, the comma separated label names, e.g.
+    'skin,nose,hair', or the iterable of the label names or indices. None is the default set, defaults to None
+    :type face_regions: Optional[Union[str, Iterable[Union[str, int]]]], optional
+    :raises ValueError: If a region set or a label is unknown
+    :return: Returns the sorted label indices
+    :rtype: list
+    """
+    if face_regions is None:
+        face_regions = 'default'
+
+    if isinstance(face_regions, str):
+        if face_regions in face_region_sets:
+            face_regions = face_region_sets[face_regions]
+        else:
+            face_regions = [label.strip() for label in face_regions.split(',') if label.strip() != '']
+
+    labels = set()
+    for label in face_regions:
+        if isinstance(label, str) and label in face_parsing_labels:
+            labels.add(face_parsing_labels.index(label))
+        elif not isinstance(label, str) and 0 <= int(label) < 256:
+            labels.add(int(label))
+        else:
+            raise ValueError('Unknown face region {}, it has to be one of {} or the labels {}'.format(
+                label, list(face_region_sets), list(face_parsing_labels)))
+
+    return sorted(labels)
+
+
+def get_face_region_lut(face_regions: Optional[Union[str, Iterable[Union[str, int]]]] = None) -> Any:
+    """
+    It returns the lookup table that maps the labels of the given face regions to 255 and the others to 0.
+
+    :param face_regions: The region set, the label names or the label indices, see get_face_region_labels,
+    defaults to None
+    :type face_regions: Optional[Union[str, Iterable[Union[str, int]]]], optional
+    :return: Returns the uint8 lookup table of 256 entries
+    :rtype: Any
+    """
+    lut = np.zeros(256, dtype='uint8')
+    lut[get_face_region_labels(face_regions)] = 255
+
+    return lut
+
+
+def select_face_regions(face_parsed: Any, face_regions: Optional[Union[str, Iterable[Union[str, int]], Any]] = None
+                        ) -> Any:
+    """
+    It builds the mask of the given face regions out of the uint8 label image of the face parser.
+
+    :param face_parsed: The uint8 label image which is the argmax of the face parser output
+    :type face_parsed: Any
+    :param face_regions: The region set, the label names or the label indices, see get_face_region_labels, or the
+    lookup table of get_face_region_lut, defaults to None
+    :type face_regions: Optional[Union[str, Iterable[Union[str, int]], Any]], optional
+    :return: Returns the mask where the selected regions are 255
+    :rtype: Any
+    """
+    if isinstance(face_regions, np.ndarray) and face_regions.shape == (256,):
+        lut = face_regions
+    else:
+        lut = get_face_region_lut(face_regions)
+
+    return cv2.LUT(np.ascontiguousarray(face_parsed, dtype='uint8'), lut)
@@ -0,0 +1,6 @@
+""" This module implements the caching of the segmentation masks, the face parse maps and the background images
+"""
+from typing import Any
+from .bg_cache import BackgroundCache
+from .mask_cache import MaskCache
+from .mask_cache import get_model_name
@@ -0,0 +1,128 @@
+""" This module implements the in-memory cache of the decoded and resized background images, so that the few
+backgrounds of a batch are decoded once and resized once per image size instead of once per image
+"""
+from collections import OrderedDict
+from typing import Any
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+
+import os
+import threading
+import cv2
+
+
+class BackgroundCache:
+    """
+    It caches the background images keyed by the file path, its modification time and the target size in an
+    in-memory LRU bounded by size. The decoded original of each background is cached too, so that resizing it to
+    a new size skips the decoding. It is safe to be shared between threads.
+    """
+
+    def __init__(self, max_memory_bytes: int = 512 * 1024 * 1024) -> None:
+        """
+        :param max_memory_bytes: The maximum size of the backgrounds kept in the memory, defaults to 512 MiB
+        :type max_memory_bytes: int, optional
+        """
+        self.max_memory_bytes = max_memory_bytes
+
+        self.hits = 0
+        self.decodes = 0
+        self.resizes = 0
+
+        self._lock = threading.Lock()
+        self._memory: OrderedDict = OrderedDict()
+        self._memory_bytes = 0
+
+    @staticmethod
+    def make_key(bg_file_path: str, size: Optional[Tuple[int, int]] = None) -> tuple:
+        """
+        It builds the cache key out of the background file and the target size. The modification time makes the
+        key change when the file is replaced.
+
+        :param bg_file_path: The path of the background image file
+        :type bg_file_path: str
+        :param size: The (width, height) of the resized background. None is the decoded original, defaults to None
+        :type size: Optional[Tuple[int, int]], optional
+        :return: Returns the key that identifies the background
+        :rtype: tuple
+        """
+        bg_file_path = os.path.abspath(bg_file_path)
+        return bg_file_path, os.stat(bg_file_path).st_mtime_ns, None if size is None else tuple(size)
+
+    def get(self, bg_file_path: str, size: Optional[Tuple[int, int]] = None) -> Any:
+        """
+        It returns the background of the given file resized to the given size, decoding and resizing it only if it
+        is not cached. The returned image is read-only as it is shared with the cache.
+
+        :param bg_file_path: The path of the background image file
+        :type bg_file_path: str
+        :param size: The (width, height) of the resized background. None is the decoded original, defaults to None
+        :type size: Optional[Tuple[int, int]], optional
+        :raises IOError: If the background image file can not be read
+        :return: Returns the decoded (BGR) background
+        :rtype: Any
+        """
+        try:
+            key = self.make_key(bg_file_path, size)
+        except OSError:
+            raise IOError('Unable to read the background image file {}'.format(bg_file_path))
+
+        with self._lock:
+            img_bg = self._memory.get(key)
+            if img_bg is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return img_bg
+
+        if size is None:
+            img_bg = cv2.imread(bg_file_path)
+            if img_bg is None:
+                raise IOError('Unable to read the background image file {}'.format(bg_file_path))
+        else:
+            img_bg = self.get(bg_file_path, None)
+            if img_bg.shape[1::-1] != tuple(size):
+                img_bg = cv2.resize(img_bg, tuple(size), interpolation=cv2.INTER_LINEAR)
+
+        with self._lock:
+            if size is None:
+                self.decodes += 1
+            else:
+                self.resizes += 1
+            return self._put_memory(key, img_bg)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        It returns the hit, decode and resize counters along with the size of the cache.
+
+        :return: Returns the counters of the cache
+        :rtype: Dict[str, int]
+        """
+        with self._lock:
+            return {'hits': self.hits, 'decodes': self.decodes, 'resizes': self.resizes,
+                    'memory_entries': len(self._memory), 'memory_bytes': self._memory_bytes}
+
+    def clear(self) -> None:
+        """
+        It removes all the backgrounds from the cache.
+        """
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    def _put_memory(self, key: tuple, img_bg: Any) -> Any:
+        if key in self._memory:
+            self._memory_bytes -= self._memory.pop(key).nbytes
+
+        img_bg.setflags(write=False)
+        if img_bg.nbytes > self.max_memory_bytes:
+            return img_bg
+
+        self._memory[key] = img_bg
+        self._memory_bytes += img_bg.nbytes
+
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+
+        return img_bg
@@ -0,0 +1,272 @@
+""" This module implements the two tier (memory and disk) cache for the masks produced by the models, so that
+re-styling an already segmented image skips the model inference
+"""
+from ..composite.compact_mask import CompactMask
+from collections import OrderedDict
+from typing import Any
+from typing import Dict
+from typing import Optional
+
+import hashlib
+import os
+import threading
+import cv2
+import numpy as np
+
+
+def get_model_name(model: Any) -> str:
+    """
+    It returns the name of the given model session or net to be used as part of the cache key.
+
+    :param model: The rembg session or the face parser net
+    :type model: Any
+    :return: Returns the model name of the rembg session, otherwise the class name of the model
+    :rtype: str
+    """
+    return str(getattr(model, 'model_name', type(model).__name__))
+
+
+class MaskCache:
+    """
+    It caches the masks keyed by the content hash of the input image, the model name and the post-processing
+    options. The masks are kept in an in-memory LRU tier as CompactMask (only the bounding box, bit-packed if
+    binary) and optionally in an on-disk tier as PNG files, both bounded by size. It is safe to be shared between
+    threads.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = os.path.join(os.path.expanduser('~'), '.iveu', 'cache'),
+                 max_memory_bytes: int = 256 * 1024 * 1024, max_disk_bytes: int = 2 * 1024 * 1024 * 1024) -> None:
+        """
+        :param cache_dir: The folder of the disk tier. If None then only the memory tier is used, defaults to
+        '~/.iveu/cache'
+        :type cache_dir: Optional[str], optional
+        :param max_memory_bytes: The maximum size of the masks kept in the memory, defaults to 256 MiB
+        :type max_memory_bytes: int, optional
+        :param max_disk_bytes: The maximum size of the mask files kept in the disk, defaults to 2 GiB
+        :type max_disk_bytes: int, optional
+        """
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._memory: OrderedDict = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._disk_bytes = sum(entry.stat().st_size for entry in os.scandir(self.cache_dir)
+                                   if entry.name.endswith('.png'))
+
+    @staticmethod
+    def make_key(img: Any, model_name: str, **options: Any) -> str:
+        """
+        It builds the cache key out of the image content, the model name and the post-processing options.
+
+        :param img: The decoded image array given to the model
+        :type img: Any
+        :param model_name: The name of the model that produces the mask
+        :type model_name: str
+        :return: Returns the hex digest that identifies the mask
+        :rtype: str
+        """
+        img = np.ascontiguousarray(img)
+        hasher = hashlib.blake2b(digest_size=20)
+        hasher.update('{}|{}|{}|'.format(model_name, img.shape, img.dtype).encode())
+        hasher.update(','.join('{}={}'.format(name, options[name]) for name in sorted(options)).encode())
+        hasher.update(memoryview(img).cast('B'))
+
+        return hasher.hexdigest()
+
+    def get(self, key: str, compact: bool = False) -> Optional[Any]:
+        """
+        It looks up the mask of the given key in the memory tier first and then in the disk tier. The returned mask
+        is read-only.
+
+        :param key: The cache key built by make_key
+        :type key: str
+        :param compact: Whether the single channel uint8 mask is returned as the CompactMask instead of the array,
+        defaults to False
+        :type compact: bool, optional
+        :return: Returns the cached mask, otherwise None
+        :rtype: Optional[Any]
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+
+        if entry is not None:
+            return self._get_mask(entry, compact)
+
+        mask = None
+        if self.cache_dir is not None:
+            mask_path = self._get_path(key)
+            if os.path.isfile(mask_path):
+                mask = cv2.imread(mask_path, cv2.IMREAD_UNCHANGED)
+
+        entry = self._get_entry(mask) if mask is not None else None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.disk_hits += 1
+            self._put_memory(key, entry)
+
+        try:
+            os.utime(mask_path)
+        except OSError:
+            pass
+
+        return self._get_mask(entry, compact)
+
+    def put(self, key: str, mask: Any) -> None:
+        """
+        It stores the given mask in both the memory tier and the disk tier and evicts the least recently used masks
+        if the tiers are full.
+
+        :param key: The cache key built by make_key
+        :type key: str
+        :param mask: The uint8 single channel mask or the CompactMask to be cached
+        :type mask: Any
+        """
+        entry = self._get_entry(mask)
+        with self._lock:
+            self._put_memory(key, entry)
+
+        if self.cache_dir is None:
+            return
+
+        if isinstance(mask, CompactMask):
+            mask = mask.to_array()
+
+        success, encoded = cv2.imencode('.png', mask, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+        if not success:
+            return
+
+        mask_path = self._get_path(key)
+        tmp_path = '{}.{}.{}.tmp'.format(mask_path, os.getpid(), threading.get_ident())
+        with open(tmp_path, 'wb') as mask_file:
+            mask_file.write(encoded.tobytes())
+
+        with self._lock:
+            # An overwritten key replaces its old file, whose size is not on the disk anymore
+            try:
+                old_size = os.stat(mask_path).st_size
+            except OSError:
+                old_size = 0
+            os.replace(tmp_path, mask_path)
+
+            self._disk_bytes += len(encoded) - old_size
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def get_or_compute(self, key: str, compute_fn: Any) -> Any:
+        """
+        It returns the cached mask of the given key or computes, caches and returns it in case of a miss.
+
+        :param key: The cache key built by make_key
+        :type key: str
+        :param compute_fn: It computes the mask when it is not cached
+        :type compute_fn: Any
+        :return: Returns the mask
+        :rtype: Any
+        """
+        mask = self.get(key)
+        if mask is None:
+            mask = compute_fn()
+            self.put(key, mask)
+
+        return mask
+
+    def stats(self) -> Dict[str, int]:
+        """
+        It returns the hit and miss counters along with the size of the tiers.
+
+        :return: Returns the counters of the cache
+        :rtype: Dict[str, int]
+        """
+        with self._lock:
+            return {'memory_hits': self.memory_hits, 'disk_hits': self.disk_hits, 'misses': self.misses,
+                    'memory_entries': len(self._memory), 'memory_bytes': self._memory_bytes,
+                    'disk_bytes': self._disk_bytes}
+
+    def clear(self) -> None:
+        """
+        It removes all the masks from both the tiers.
+        """
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+            if self.cache_dir is not None:
+                for entry in os.scandir(self.cache_dir):
+                    if entry.name.endswith('.png'):
+                        os.remove(entry.path)
+                self._disk_bytes = 0
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + '.png')
+
+    @staticmethod
+    def _get_entry(mask: Any) -> Any:
+        # The single channel uint8 masks are kept compact, the other arrays as the read-only copies
+        if isinstance(mask, CompactMask):
+            return mask
+
+        if mask.ndim == 2 and mask.dtype == np.uint8:
+            return CompactMask.from_array(mask)
+
+        mask = mask.copy()
+        mask.setflags(write=False)
+
+        return mask
+
+    @staticmethod
+    def _get_mask(entry: Any, compact: bool) -> Any:
+        if not isinstance(entry, CompactMask):
+            return entry
+
+        if compact:
+            return entry
+
+        mask = entry.to_array()
+        mask.setflags(write=False)
+
+        return mask
+
+    def _put_memory(self, key: str, entry: Any) -> None:
+        if key in self._memory:
+            self._memory_bytes -= self._memory.pop(key).nbytes
+
+        if entry.nbytes > self.max_memory_bytes:
+            return
+
+        self._memory[key] = entry
+        self._memory_bytes += entry.nbytes
+
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+
+    def _evict_disk(self) -> None:
+        entries = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith('.png')]
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+
+        self._disk_bytes = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if self._disk_bytes <= self.max_disk_bytes * 0.9:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self._disk_bytes -= size
+            except OSError:
+                pass
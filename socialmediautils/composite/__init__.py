@@ -0,0 +1,9 @@
+""" This module implements the compositing of the images with the masks
+"""
+from typing import Any
+from .compact_mask import CompactMask
+from .compact_mask import get_mask_roi
+from .composite_img import blend_partial
+from .composite_img import composite_img
+from .composite_img import get_output_buffer
+from .composite_img import merge_nonzero
@@ -0,0 +1,294 @@
+""" This module implements the compact representation of the uint8 masks. Only the bounding box of the nonzero pixels
+is kept, bit-packed (1 bit per pixel) if the mask is binary, i.e. only 0 and 255, otherwise as it is, so that the
+anti-aliased masks and the label maps stay exact. The mask algebra works on the bounding boxes only.
+"""
+from typing import Any
+from typing import Optional
+from typing import Tuple
+
+import cv2
+import numpy as np
+
+
+class CompactMask:
+    """
+    It holds a uint8 mask as the bounding box of its nonzero pixels along with the bit-packed or the raw pixels of
+    that box. It is immutable and picklable, so that it can be cached and sent to the other processes.
+    """
+
+    def __init__(self, shape: Tuple[int, int], bbox: Tuple[int, int, int, int], data: Any, packed: bool) -> None:
+        """
+        :param shape: The (height, width) of the mask
+        :type shape: Tuple[int, int]
+        :param bbox: The (minX, minY, width, height) of the nonzero pixels
+        :type bbox: Tuple[int, int, int, int]
+        :param data: The np.packbits of the box rows if packed, otherwise the uint8 pixels of the box
+        :type data: Any
+        :param packed: Whether the data is bit-packed
+        :type packed: bool
+        """
+        self.shape = (int(shape[0]), int(shape[1]))
+        self.bbox = tuple(int(value) for value in bbox)
+        self.data = data
+        self.data.setflags(write=False)
+        self.packed = packed
+
+    @classmethod
+    def from_array(cls, mask: Any) -> 'CompactMask':
+        """
+        It builds the compact mask out of the uint8 mask array.
+
+        :param mask: The single channel uint8 mask
+        :type mask: Any
+        :raises ValueError: If the mask is not a single channel uint8 array
+        :return: Returns the compact mask
+        :rtype: CompactMask
+        """
+        mask = np.asarray(mask)
+        if mask.ndim != 2 or mask.dtype != np.uint8:
+            raise ValueError('The mask has to be a single channel uint8 array')
+
+        return cls.from_roi(mask.shape, (0, 0), mask)
+
+    @classmethod
+    def from_roi(cls, shape: Tuple[int, int], offset: Tuple[int, int], roi: Any) -> 'CompactMask':
+        """
+        It builds the compact mask of the given shape out of the uint8 region of interest at the given offset. The
+        mask is zero outside the region.
+
+        :param shape: The (height, width) of the mask
+        :type shape: Tuple[int, int]
+        :param offset: The (x, y) of the top left corner of the region in the mask
+        :type offset: Tuple[int, int]
+        :param roi: The uint8 pixels of the region
+        :type roi: Any
+        :return: Returns the compact mask
+        :rtype: CompactMask
+        """
+        minX, minY, box_width, box_height = cv2.boundingRect(roi)
+        if box_width == 0 or box_height == 0:
+            return cls(shape, (0, 0, 0, 0), np.zeros((0, 0), dtype='uint8'), True)
+
+        roi = roi[minY:minY + box_height, minX:minX + box_width]
+        bbox = (offset[0] + minX, offset[1] + minY, box_width, box_height)
+
+        if cv2.countNonZero(cv2.inRange(roi, 1, 254)) == 0:
+            return cls(shape, bbox, np.packbits(roi, axis=1), True)
+
+        return cls(shape, bbox, roi.copy(), False)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        It returns the number of bytes held by the mask pixels.
+
+        :return: Returns the size of the data
+        :rtype: int
+        """
+        return self.data.nbytes
+
+    def is_empty(self) -> bool:
+        """
+        It tells whether the mask has no nonzero pixel.
+
+        :return: Returns True if the mask is all zero
+        :rtype: bool
+        """
+        return self.bbox[2] == 0 or self.bbox[3] == 0
+
+    def get_roi(self) -> Any:
+        """
+        It returns the uint8 pixels of the bounding box.
+
+        :return: Returns the mask pixels of the bounding box
+        :rtype: Any
+        """
+        if not self.packed:
+            return self.data
+
+        roi = np.unpackbits(self.data, axis=1, count=self.bbox[2])
+        roi *= 255
+
+        return roi
+
+    def crop(self, box: Tuple[int, int, int, int]) -> Any:
+        """
+        It returns the uint8 pixels of the given box of the mask.
+
+        :param box: The (minX, minY, width, height) of the box
+        :type box: Tuple[int, int, int, int]
+        :return: Returns the mask pixels of the box
+        :rtype: Any
+        """
+        minX, minY, box_width, box_height = box
+        roi = np.zeros((box_height, box_width), dtype='uint8')
+        if self.is_empty():
+            return roi
+
+        mask_minX, mask_minY, mask_width, mask_height = self.bbox
+        startX, startY = max(minX, mask_minX), max(minY, mask_minY)
+        endX = min(minX + box_width, mask_minX + mask_width)
+        endY = min(minY + box_height, mask_minY + mask_height)
+        if startX < endX and startY < endY:
+            roi[startY - minY:endY - minY, startX - minX:endX - minX] = \
+                self.get_roi()[startY - mask_minY:endY - mask_minY, startX - mask_minX:endX - mask_minX]
+
+        return roi
+
+    def to_array(self, out: Optional[Any] = None) -> Any:
+        """
+        It returns the mask as the full size uint8 array.
+
+        :param out: The preallocated mask buffer of the mask shape, defaults to None
+        :type out: Optional[Any], optional
+        :return: Returns the mask array
+        :rtype: Any
+        """
+        if out is None:
+            out = np.zeros(self.shape, dtype='uint8')
+        else:
+            out[:] = 0
+
+        if not self.is_empty():
+            minX, minY, box_width, box_height = self.bbox
+            out[minY:minY + box_height, minX:minX + box_width] = self.get_roi()
+
+        return out
+
+    def get_union_box(self, other: 'CompactMask') -> Tuple[int, int, int, int]:
+        """
+        It returns the box that holds the bounding boxes of both the masks.
+
+        :param other: The other mask of the same shape
+        :type other: CompactMask
+        :raises ValueError: If the masks are not of the same shape
+        :return: Returns the (minX, minY, width, height) of the union
+        :rtype: Tuple[int, int, int, int]
+        """
+        if self.shape != other.shape:
+            raise ValueError('The masks have to be of the same shape')
+
+        boxes = [mask.bbox for mask in (self, other) if not mask.is_empty()]
+        if len(boxes) == 0:
+            return 0, 0, 0, 0
+
+        minX, minY = min(box[0] for box in boxes), min(box[1] for box in boxes)
+        maxX, maxY = max(box[0] + box[2] for box in boxes), max(box[1] + box[3] for box in boxes)
+
+        return minX, minY, maxX - minX, maxY - minY
+
+    def xor(self, other: 'CompactMask') -> 'CompactMask':
+        """
+        It returns the bitwise XOR of the masks, e.g. the stroke area out of the human mask and the scaled mask.
+        Only the union of the bounding boxes is computed.
+
+        :param other: The other mask of the same shape
+        :type other: CompactMask
+        :return: Returns the XOR of the masks
+        :rtype: CompactMask
+        """
+        box = self.get_union_box(other)
+        if self.packed and other.packed and self.bbox == other.bbox:
+            return CompactMask.from_roi(self.shape, box[:2], np.unpackbits(np.bitwise_xor(self.data, other.data),
+                                                                           axis=1, count=box[2]) * np.uint8(255))
+
+        return CompactMask.from_roi(self.shape, box[:2], cv2.bitwise_xor(self.crop(box), other.crop(box)))
+
+    def subtract(self, other: 'CompactMask') -> 'CompactMask':
+        """
+        It returns the saturated difference of the masks, e.g. the stroke area out of the grown mask and the human
+        mask. Only the bounding box of this mask is computed.
+
+        :param other: The mask of the same shape to be subtracted
+        :type other: CompactMask
+        :return: Returns the difference of the masks
+        :rtype: CompactMask
+        """
+        if self.shape != other.shape:
+            raise ValueError('The masks have to be of the same shape')
+
+        return CompactMask.from_roi(self.shape, self.bbox[:2], cv2.subtract(self.get_roi(), other.crop(self.bbox)))
+
+    def invert(self) -> 'CompactMask':
+        """
+        It returns the inverted mask, i.e. 255 minus the mask. The inverted mask of a small region covers the most
+        of the image, so it is compact only when it is binary.
+
+        :return: Returns the inverted mask
+        :rtype: CompactMask
+        """
+        return CompactMask.from_array(cv2.bitwise_not(self.to_array()))
+
+    def scale(self, width: int, height: int, interpolation: int = cv2.INTER_LINEAR) -> 'CompactMask':
+        """
+        It resizes the mask to the given size like cv2.resize, but only the bounding box is interpolated. The binary
+        masks match cv2.resize, the anti-aliased ones may differ by a gray level due to the interpolation precision
+        of cv2.warpAffine.
+
+        :param width: The width of the resized mask
+        :type width: int
+        :param height: The height of the resized mask
+        :type height: int
+        :param interpolation: The interpolation of cv2.warpAffine, defaults to cv2.INTER_LINEAR
+        :type interpolation: int, optional
+        :return: Returns the resized mask
+        :rtype: CompactMask
+        """
+        if self.is_empty():
+            return CompactMask((height, width), (0, 0, 0, 0), self.data, True)
+
+        scale_x, scale_y = width / self.shape[1], height / self.shape[0]
+        minX, minY, box_width, box_height = self.bbox
+
+        # The resized box is grown by a pixel on every side to hold the interpolated edges
+        scaled_minX = max(0, int(np.floor(minX * scale_x)) - 1)
+        scaled_minY = max(0, int(np.floor(minY * scale_y)) - 1)
+        scaled_maxX = min(width, int(np.ceil((minX + box_width) * scale_x)) + 1)
+        scaled_maxY = min(height, int(np.ceil((minY + box_height) * scale_y)) + 1)
+
+        # It maps the pixel centers of the resized box to the ones of the original box as cv2.resize does
+        box_mat = np.float32([[1. / scale_x, 0., (scaled_minX + 0.5) / scale_x - 0.5 - minX],
+                              [0., 1. / scale_y, (scaled_minY + 0.5) / scale_y - 0.5 - minY]])
+        scaled_roi = cv2.warpAffine(self.get_roi(), box_mat, (scaled_maxX - scaled_minX, scaled_maxY - scaled_minY),
+                                    flags=interpolation | cv2.WARP_INVERSE_MAP, borderMode=cv2.BORDER_CONSTANT,
+                                    borderValue=0)
+
+        return CompactMask.from_roi((height, width), (scaled_minX, scaled_minY), scaled_roi)
+
+    def apply(self, base_img: Any, overlay: Any, out: Optional[Any] = None) -> Any:
+        """
+        It puts the overlay over the base image within the mask, see composite_img.
+
+        :param base_img: This image is the original image to be processed
+        :type base_img: Any
+        :param overlay: The overlay image of the same size as the base image or the scalar (BGR) color
+        :type overlay: Any
+        :param out: The preallocated output buffer, defaults to None
+        :type out: Optional[Any], optional
+        :return: Returns the composited image
+        :rtype: Any
+        """
+        from .composite_img import composite_img
+
+        return composite_img(base_img, overlay, self, out)
+
+    def __repr__(self) -> str:
+        return 'CompactMask(shape={}, bbox={}, packed={}, nbytes={})'.format(self.shape, self.bbox, self.packed,
+                                                                            self.nbytes)
+
+
+def get_mask_roi(mask: Any) -> Tuple[Tuple[int, int, int, int], Any]:
+    """
+    It returns the bounding box of the nonzero pixels of the mask array or the compact mask along with the mask
+    pixels of that box.
+
+    :param mask: The uint8 mask array or the CompactMask
+    :type mask: Any
+    :return: Returns the (minX, minY, width, height) box and its mask pixels
+    :rtype: Tuple[Tuple[int, int, int, int], Any]
+    """
+    if isinstance(mask, CompactMask):
+        return mask.bbox, mask.get_roi()
+
+    minX, minY, box_width, box_height = cv2.boundingRect(mask)
+    return (minX, minY, box_width, box_height), mask[minY:minY + box_height, minX:minX + box_width]
@@ -0,0 +1,172 @@
+""" This module implements the single pass masked select and alpha blending of the images. It writes into the
+given output buffer in place instead of building the foreground, the background and the inverted mask as separate
+full size images.
+"""
+from .compact_mask import get_mask_roi
+from typing import Any
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+import cv2
+import numpy as np
+
+
+def get_output_buffer(base_img: Any, out: Optional[Any] = None) -> Any:
+    """
+    It returns the buffer to write the composited image into. It is a copy of the base image unless the reusable
+    output buffer is given, in which case the base image is copied into it. If the output buffer is the base image
+    itself, the compositing happens in place.
+
+    :param base_img: This image is the original image to be processed
+    :type base_img: Any
+    :param out: The preallocated output buffer of the same shape and type as the base image, defaults to None
+    :type out: Optional[Any], optional
+    :return: Returns the output buffer holding the base image
+    :rtype: Any
+    """
+    if out is None:
+        return base_img.copy()
+
+    if out.shape != base_img.shape or out.dtype != base_img.dtype:
+        raise ValueError('The output buffer has to be of the same shape and type as the base image')
+
+    if out is not base_img:
+        np.copyto(out, base_img)
+
+    return out
+
+
+def blend_partial(out: Any, overlay: Union[Any, List[int], Tuple[int, int, int]], mask: Any) -> Any:
+    """
+    It alpha blends the overlay over the output buffer only at the pixels where the mask is neither 0 nor 255, e.g.
+    the anti-aliased edges of the mask. These are usually a small fraction of the image.
+
+    :param out: The output buffer (or its region of interest) to be blended in place
+    :type out: Any
+    :param overlay: The overlay image of the same size as the output buffer or the scalar (BGR) color
+    :type overlay: Union[Any, List[int], Tuple[int, int, int]]
+    :param mask: The uint8 mask that holds the opacity of the overlay
+    :type mask: Any
+    :return: Returns the output buffer
+    :rtype: Any
+    """
+    partial_points = cv2.findNonZero(cv2.inRange(mask, 1, 254))
+    if partial_points is None:
+        return out
+
+    partial_points = partial_points.reshape(-1, 2)
+    partial_x, partial_y = partial_points[:, 0], partial_points[:, 1]
+
+    alpha = mask[partial_y, partial_x].astype('float32')
+    alpha = alpha[:, None] / 255. if out.ndim == 3 else alpha / 255.
+    if is_overlay_img(out, overlay):
+        overlay_pixels = overlay[partial_y, partial_x].astype('float32')
+    else:
+        overlay_pixels = np.asarray(overlay, dtype='float32')
+
+    blended = overlay_pixels * alpha + out[partial_y, partial_x].astype('float32') * (1. - alpha) + 0.5
+    out[partial_y, partial_x] = blended.astype(out.dtype)
+
+    return out
+
+
+def merge_nonzero(out: Any, overlay: Union[Any, List[int], Tuple[int, int, int]], mask: Any) -> Any:
+    """
+    It bitwise ORs the overlay into the output buffer at the pixels where the mask is nonzero, which is how the
+    overlay functions merged the foreground and the background before the alpha blending. Only the bounding box of
+    the mask is touched.
+
+    :param out: The output buffer to be merged in place
+    :type out: Any
+    :param overlay: The overlay image of the same size as the output buffer or the scalar (BGR) color
+    :type overlay: Union[Any, List[int], Tuple[int, int, int]]
+    :param mask: The uint8 mask or the CompactMask that selects the overlay pixels
+    :type mask: Any
+    :return: Returns the output buffer
+    :rtype: Any
+    """
+    (minX, minY, roi_width, roi_height), mask_roi = get_mask_roi(mask)
+    if roi_width == 0 or roi_height == 0:
+        return out
+
+    maxX, maxY = minX + roi_width, minY + roi_height
+    out_roi = out[minY:maxY, minX:maxX]
+
+    if is_overlay_img(out, overlay):
+        cv2.bitwise_or(out_roi, overlay[minY:maxY, minX:maxX], dst=out_roi, mask=mask_roi)
+    else:
+        cv2.bitwise_or(out_roi, tuple(overlay) if np.ndim(overlay) else overlay, dst=out_roi, mask=mask_roi)
+
+    return out
+
+
+def is_overlay_img(out: Any, overlay: Any) -> bool:
+    """
+    It tells whether the overlay is an image rather than the scalar color.
+
+    :param out: The output buffer
+    :type out: Any
+    :param overlay: The overlay image or the scalar (BGR) color
+    :type overlay: Any
+    :return: Returns True if the overlay is an image
+    :rtype: bool
+    """
+    return isinstance(overlay, np.ndarray) and overlay.ndim == out.ndim
+
+
+def composite_img(base_img: Any, overlay: Union[Any, List[int], Tuple[int, int, int]], mask: Any,
+                  out: Optional[Any] = None, partial_blend: bool = True) -> Any:
+    """
+    It puts the overlay over the base image where the mask is 255, keeps the base image where the mask is 0 and
+    alpha blends both in between. Only the bounding box of the mask is touched after the base image is in the
+    output buffer, and no full size temporary image is created.
+
+    Without the partial blending, any nonzero mask value selects the overlay as the bitwise overlay functions did,
+    i.e. the overlay is ORed with the base image where the mask is neither 0 nor 255.
+
+    :param base_img: This image is the original image to be processed
+    :type base_img: Any
+    :param overlay: The overlay image of the same size as the base image or the scalar (BGR) color
+    :type overlay: Union[Any, List[int], Tuple[int, int, int]]
+    :param mask: The uint8 mask or the CompactMask that holds the opacity of the overlay
+    :type mask: Any
+    :param out: The preallocated output buffer. It can be the base image itself for the in-place compositing,
+    defaults to None
+    :type out: Optional[Any], optional
+    :param partial_blend: If True then the partial mask values are alpha blended, otherwise the base image and the
+    overlay are ORed there, defaults to True
+    :type partial_blend: bool, optional
+    :return: Returns the composited image
+    :rtype: Any
+    """
+    out = get_output_buffer(base_img, out)
+
+    (minX, minY, roi_width, roi_height), mask_roi = get_mask_roi(mask)
+    if roi_width == 0 or roi_height == 0:
+        return out
+
+    maxX, maxY = minX + roi_width, minY + roi_height
+    out_roi = out[minY:maxY, minX:maxX]
+    mask_full = cv2.threshold(mask_roi, 254, 255, cv2.THRESH_BINARY)[1]
+
+    if is_overlay_img(out, overlay):
+        overlay = overlay[minY:maxY, minX:maxX]
+
+    if not partial_blend:
+        # Clearing the pixels where the mask is 255 first, so that the OR leaves the overlay alone there
+        cv2.bitwise_and(out_roi, 0, dst=out_roi, mask=mask_full)
+        merge_nonzero(out_roi, overlay, mask_roi)
+        return out
+
+    if is_overlay_img(out, overlay):
+        cv2.copyTo(overlay, mask_full, out_roi)
+    else:
+        # Setting the scalar color under the mask without the color plane, the masked writes keep the rest intact
+        cv2.bitwise_and(out_roi, 0, dst=out_roi, mask=mask_full)
+        cv2.bitwise_or(out_roi, tuple(overlay) if np.ndim(overlay) else overlay, dst=out_roi, mask=mask_full)
+
+    blend_partial(out_roi, overlay, mask_roi)
+
+    return out
@@ -0,0 +1,14 @@
+""" This module implements the in-memory decoding and encoding of the images, the writing of the output images and the
+streaming of the videos
+"""
+from typing import Any
+from .img_codec import decode_img
+from .img_codec import encode_img
+from .img_writer import AsyncImgWriter
+from .img_writer import EncodeOptions
+from .img_writer import get_encode_options
+from .img_writer import output_formats
+from .img_writer import write_img
+from .video_io import get_video_info
+from .video_io import open_video_writer
+from .video_io import read_video_frames
@@ -0,0 +1,52 @@
+""" This module implements the conversion between the encoded image bytes and the decoded image arrays
+"""
+from typing import Any
+from typing import List
+from typing import Optional
+from typing import Union
+
+import cv2
+import numpy as np
+
+
+def decode_img(img_data: Union[bytes, bytearray, memoryview, Any]) -> Any:
+    """
+    It decodes the given encoded image (png, jpg, etc.) into the BGR image array like cv2.imread does for files.
+    The already decoded image array is returned as it is.
+
+    :param img_data: The encoded image bytes or the decoded image array
+    :type img_data: Union[bytes, bytearray, memoryview, Any]
+    :return: Returns the decoded BGR image array
+    :rtype: Any
+    """
+    if isinstance(img_data, np.ndarray):
+        return img_data
+
+    if img_data is None:
+        raise ValueError('There is no image data to be decoded')
+
+    img = cv2.imdecode(np.frombuffer(img_data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError('Unable to decode the given image data')
+
+    return img
+
+
+def encode_img(img: Any, ext: str = '.png', params: Optional[List[int]] = None) -> bytes:
+    """
+    It encodes the given image array into the bytes of the given format like cv2.imwrite does for files.
+
+    :param img: The BGR image array to be encoded
+    :type img: Any
+    :param ext: The extension of the output format, e.g. '.png' or '.jpg', defaults to '.png'
+    :type ext: str, optional
+    :param params: The OpenCV encoding parameters, e.g. [cv2.IMWRITE_PNG_COMPRESSION, 1], defaults to None
+    :type params: Optional[List[int]], optional
+    :return: Returns the encoded image bytes
+    :rtype: bytes
+    """
+    success, encoded = cv2.imencode(ext, img, params if params is not None else [])
+    if not success:
+        raise ValueError('Unable to encode the given image as {}'.format(ext))
+
+    return encoded.tobytes()
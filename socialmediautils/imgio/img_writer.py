@@ -0,0 +1,215 @@
+""" This module implements the writing of the output images with the chosen format and encoding parameters, either
+synchronously or off the hot path in a background writer with the bounded buffering
+"""
+from ..trace.tracer import trace_stage
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from typing import Callable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import contextvars
+import os
+import threading
+import cv2
+
+# The extension of each output format
+output_formats = {'png': '.png', 'jpg': '.jpg', 'jpeg': '.jpg', 'webp': '.webp'}
+
+
+class EncodeOptions:
+    """
+    It holds the format of the output images and its encoding parameters, which trade the file size for the encoding
+    speed. The PNG compression of 1 encodes a 24MP image several times faster than 9, the JPEG and the WebP encode
+    faster still at the loss of some quality.
+    """
+
+    def __init__(self, img_format: str = '', compression: int = -1, quality: int = -1) -> None:
+        """
+        :param img_format: The output format out of 'png', 'jpg' and 'webp'. Empty keeps the extension of the output
+        file, defaults to ''
+        :type img_format: str, optional
+        :param compression: The zlib compression level of the PNG from 0 (fastest, largest) to 9 (slowest,
+        smallest). -1 is the OpenCV default, defaults to -1
+        :type compression: int, optional
+        :param quality: The quality of the JPEG and the WebP from 1 to 100. The WebP is lossless above 100. -1 is the
+        OpenCV default, defaults to -1
+        :type quality: int, optional
+        """
+        if img_format != '' and img_format.lower() not in output_formats:
+            raise ValueError('Unknown output format {}, it has to be one of {}'.format(img_format,
+                                                                                      list(output_formats)))
+        if compression > 9:
+            raise ValueError('The PNG compression has to be from 0 to 9')
+
+        self.img_format = img_format.lower()
+        self.compression = compression
+        self.quality = quality
+
+    def __repr__(self) -> str:
+        return 'EncodeOptions(img_format={!r}, compression={}, quality={})'.format(self.img_format, self.compression,
+                                                                                self.quality)
+
+    def get_output_path(self, out_file_path: str) -> str:
+        """
+        It returns the given output path with the extension of the output format.
+
+        :param out_file_path: The output file with path
+        :type out_file_path: str
+        :return: Returns the output file with the extension of the format, or as it is if there is no format
+        :rtype: str
+        """
+        if self.img_format == '':
+            return out_file_path
+
+        return os.path.splitext(out_file_path)[0] + output_formats[self.img_format]
+
+    def get_params(self, out_file_path: str) -> List[int]:
+        """
+        It returns the OpenCV encoding parameters of the format of the given output file.
+
+        :param out_file_path: The output file with path, whose extension defines the format
+        :type out_file_path: str
+        :return: Returns the parameters for cv2.imwrite and cv2.imencode
+        :rtype: List[int]
+        """
+        ext = os.path.splitext(out_file_path)[1].lower()
+
+        if ext == '.png' and self.compression >= 0:
+            return [cv2.IMWRITE_PNG_COMPRESSION, self.compression]
+        if ext in ('.jpg', '.jpeg') and self.quality >= 0:
+            return [cv2.IMWRITE_JPEG_QUALITY, min(100, self.quality)]
+        if ext == '.webp' and self.quality >= 0:
+            return [cv2.IMWRITE_WEBP_QUALITY, self.quality]
+
+        return []
+
+
+def get_encode_options(encode_options: Optional[EncodeOptions] = None) -> EncodeOptions:
+    """
+    It returns the given encoding options or the default ones, i.e. the format of the output file with the OpenCV
+    default parameters.
+
+    :param encode_options: The encoding options, defaults to None
+    :type encode_options: Optional[EncodeOptions], optional
+    :return: Returns the encoding options
+    :rtype: EncodeOptions
+    """
+    return encode_options if encode_options is not None else EncodeOptions()
+
+
+def write_img(out_file_path: str, img: Any, encode_options: Optional[EncodeOptions] = None) -> str:
+    """
+    It writes the given image with the given encoding options.
+
+    :param out_file_path: The output file with path. Its extension is replaced by the one of the output format
+    :type out_file_path: str
+    :param img: The BGR image array to be written
+    :type img: Any
+    :param encode_options: The format and the encoding parameters. None keeps the extension of the output file with
+    the OpenCV default parameters, defaults to None
+    :type encode_options: Optional[EncodeOptions], optional
+    :raises IOError: If the image can not be written
+    :return: Returns the path of the written file
+    :rtype: str
+    """
+    encode_options = get_encode_options(encode_options)
+    out_file_path = encode_options.get_output_path(out_file_path)
+
+    with trace_stage('imwrite', img):
+        img_written = cv2.imwrite(out_file_path, img, encode_options.get_params(out_file_path))
+    if not img_written:
+        raise IOError('Unable to write the image file {}'.format(out_file_path))
+
+    return out_file_path
+
+
+class AsyncImgWriter:
+    """
+    It encodes and writes the images in the background threads, so that the caller goes on with the next image
+    right away. At most max_pending images wait in the writer and the write blocks once they are reached, which
+    bounds the memory held by the writer. The given images must not be modified after they are given to the writer.
+    The writes run in a copy of the context of the caller, so that the active tracer applies to them too.
+    """
+
+    def __init__(self, max_pending: int = 4, workers: int = 1, on_written: Optional[Callable[[str], Any]] = None
+                 ) -> None:
+        """
+        :param max_pending: Maximum number of images waiting to be written, defaults to 4
+        :type max_pending: int, optional
+        :param workers: Number of the writing threads. cv2.imwrite releases the GIL, so more than one writer encodes
+        in parallel, defaults to 1
+        :type workers: int, optional
+        :param on_written: It is called in the writing thread with the output path given to write once the image is
+        on disk, e.g. to record it in the manifest, defaults to None
+        :type on_written: Optional[Callable[[str], Any]], optional
+        """
+        self.max_pending = max(1, max_pending)
+        self.on_written = on_written
+        self.failures: List[Tuple[str, Exception]] = []
+
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers))
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+
+    def write(self, out_file_path: str, img: Any, encode_options: Optional[EncodeOptions] = None) -> Future:
+        """
+        It queues the given image to be written, waiting first if max_pending images are already waiting.
+
+        :param out_file_path: The output file with path
+        :type out_file_path: str
+        :param img: The BGR image array to be written
+        :type img: Any
+        :param encode_options: The format and the encoding parameters, defaults to None
+        :type encode_options: Optional[EncodeOptions], optional
+        :return: Returns the future of the path of the written file
+        :rtype: Future
+        """
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(contextvars.copy_context().run, self._write, out_file_path, img,
+                                           encode_options)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        future.add_done_callback(lambda _: self._slots.release())
+
+        return future
+
+    def flush(self) -> None:
+        """
+        It waits until all the queued images are written.
+        """
+        for _ in range(self.max_pending):
+            self._slots.acquire()
+        for _ in range(self.max_pending):
+            self._slots.release()
+
+    def close(self) -> None:
+        """
+        It writes the queued images and stops the writing threads.
+        """
+        self.flush()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> 'AsyncImgWriter':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _write(self, out_file_path: str, img: Any, encode_options: Optional[EncodeOptions]) -> str:
+        try:
+            written_file_path = write_img(out_file_path, img, encode_options)
+        except (IOError, ValueError, cv2.error) as err:
+            with self._lock:
+                self.failures.append((out_file_path, err))
+            raise
+
+        if self.on_written is not None:
+            self.on_written(out_file_path)
+
+        return written_file_path
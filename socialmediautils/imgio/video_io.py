@@ -0,0 +1,90 @@
+""" This module implements the streaming decoding and encoding of the videos
+"""
+from typing import Any
+from typing import Iterator
+from typing import Tuple
+
+import cv2
+
+
+def read_video_frames(in_file_path: str) -> Iterator[Any]:
+    """
+    It streams the frames of the given video one by one, so that the video is never held in the memory as a whole.
+
+    :param in_file_path: The input video file with path
+    :type in_file_path: str
+    :return: Yields the decoded (BGR) frames
+    :rtype: Iterator[Any]
+    """
+    video_capture = cv2.VideoCapture(in_file_path)
+    if not video_capture.isOpened():
+        raise IOError('Unable to open the video file {}'.format(in_file_path))
+
+    try:
+        while True:
+            success, frame = video_capture.read()
+            if not success:
+                break
+            yield frame
+    finally:
+        video_capture.release()
+
+
+def get_video_info(in_file_path: str) -> Tuple[float, int, int, int]:
+    """
+    It returns the frame rate, the frame size and the number of frames of the given video.
+
+    :param in_file_path: The input video file with path
+    :type in_file_path: str
+    :return: Returns the frame rate, the width, the height and the number of frames (0 if unknown)
+    :rtype: Tuple[float, int, int, int]
+    """
+    video_capture = cv2.VideoCapture(in_file_path)
+    if not video_capture.isOpened():
+        raise IOError('Unable to open the video file {}'.format(in_file_path))
+
+    fps = video_capture.get(cv2.CAP_PROP_FPS) or 25.0
+    width = int(video_capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(video_capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    frame_count = max(0, int(video_capture.get(cv2.CAP_PROP_FRAME_COUNT)))
+    video_capture.release()
+
+    return fps, width, height, frame_count
+
+
+def open_video_writer(out_file_path: str, fps: float, width: int, height: int, fourcc: str = 'mp4v') -> Any:
+    """
+    It opens the video writer for the given output video file.
+
+    :param out_file_path: The output video file with path
+    :type out_file_path: str
+    :param fps: The frame rate of the output video
+    :type fps: float
+    :param width: The frame width of the output video
+    :type width: int
+    :param height: The frame height of the output video
+    :type height: int
+    :param fourcc: The four character code of the output video codec, defaults to 'mp4v'
+    :type fourcc: str, optional
+    :return: Returns the opened cv2.VideoWriter
+    :rtype: Any
+    """
+    video_writer = cv2.VideoWriter(out_file_path, cv2.VideoWriter_fourcc(*fourcc), fps, (width, height))
+    if not video_writer.isOpened():
+        raise IOError('Unable to open the video file {} for writing'.format(out_file_path))
+
+    return video_writer
+
+
+def get_frame_signature(frame: Any) -> Any:
+    """
+    It returns the small grayscale version of the frame that is used to measure the difference between the frames.
+
+    :param frame: The decoded (BGR) frame
+    :type frame: Any
+    :return: Returns the 64x64 grayscale frame as float32
+    :rtype: Any
+    """
+    frame_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+    return cv2.resize(frame_gray, (64, 64), interpolation=cv2.INTER_AREA).astype('float32')
@@ -0,0 +1,10 @@
+""" This module implements the inference resolution policy of the stroke and the face blur pipelines
+"""
+from typing import Any
+from .inference_policy import InferencePolicy
+from .inference_policy import downscale_img
+from .inference_policy import get_inference_policy
+from .inference_policy import get_refine_radius
+from .inference_policy import inference_presets
+from .inference_policy import refine_mask
+from .inference_policy import upsample_mask
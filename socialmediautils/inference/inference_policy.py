@@ -0,0 +1,241 @@
+""" This module implements the inference resolution policy of the stroke and the face blur pipelines. The image is
+downscaled before the segmentation, and the mask is upsampled back to the original resolution with the optional
+edge-aware refinement (guided filter), so that the accuracy can be traded for the speed.
+"""
+from ..composite.compact_mask import CompactMask
+from typing import Any
+from typing import Optional
+from typing import Union
+
+import cv2
+import numpy as np
+
+# The face parser resolution that the blurring factor of the face blur is defined for
+FACE_PARSER_REFERENCE_SIZE = 512
+
+
+class InferencePolicy:
+    """
+    It holds the resolution the models run at and how the masks are brought back to the original resolution.
+    """
+
+    def __init__(self, stroke_long_edge: int = 0, face_parse_size: int = FACE_PARSER_REFERENCE_SIZE,
+                 refine: bool = False, refine_radius: int = 0, refine_eps: float = 1e-4) -> None:
+        """
+        :param stroke_long_edge: The long edge the image is downscaled to before the human segmentation. 0 segments
+        the original resolution, defaults to 0
+        :type stroke_long_edge: int, optional
+        :param face_parse_size: The square resolution of the face parser input, defaults to 512
+        :type face_parse_size: int, optional
+        :param refine: Whether the upsampled masks are refined along the image edges by the guided filter at the
+        original resolution, defaults to False
+        :type refine: bool, optional
+        :param refine_radius: The radius of the guided filter in the pixels of the original image. 0 derives it from
+        the upsampling factor, defaults to 0
+        :type refine_radius: int, optional
+        :param refine_eps: The regularization of the guided filter. The smaller it is the more the mask follows the
+        image edges, defaults to 1e-4
+        :type refine_eps: float, optional
+        """
+        self.stroke_long_edge = stroke_long_edge
+        self.face_parse_size = face_parse_size
+        self.refine = refine
+        self.refine_radius = refine_radius
+        self.refine_eps = refine_eps
+
+    def __repr__(self) -> str:
+        return ('InferencePolicy(stroke_long_edge={}, face_parse_size={}, refine={}, refine_radius={}, '
+                'refine_eps={})'.format(self.stroke_long_edge, self.face_parse_size, self.refine,
+                                        self.refine_radius, self.refine_eps))
+
+
+# The speed preset is meant for the high volume thumbnails, the quality preset for the print resolution output
+inference_presets = {'default': InferencePolicy(),
+                     'speed': InferencePolicy(stroke_long_edge=1024, face_parse_size=320),
+                     'balanced': InferencePolicy(stroke_long_edge=2048, face_parse_size=512, refine=True),
+                     'quality': InferencePolicy(stroke_long_edge=0, face_parse_size=512, refine=True)}
+
+
+def get_inference_policy(inference_policy: Optional[Union[str, InferencePolicy]] = None) -> InferencePolicy:
+    """
+    It returns the inference policy of the given preset name. None is the default policy, i.e. the original
+    resolution for the stroke and 512x512 for the face parser without the refinement.
+
+    :param inference_policy: The preset name out of 'default', 'speed', 'balanced' and 'quality', or the policy
+    itself, defaults to None
+    :type inference_policy: Optional[Union[str, InferencePolicy]], optional
+    :return: Returns the inference policy
+    :rtype: InferencePolicy
+    """
+    if inference_policy is None:
+        return inference_presets['default']
+
+    if isinstance(inference_policy, InferencePolicy):
+        return inference_policy
+
+    if inference_policy not in inference_presets:
+        raise ValueError('Unknown inference policy {}, it has to be one of {}'.format(inference_policy,
+                                                                                     list(inference_presets)))
+
+    return inference_presets[inference_policy]
+
+
+def downscale_img(img: Any, long_edge: int = 0) -> Any:
+    """
+    It downscales the image so that its long edge is the given one. The smaller images are returned as they are.
+
+    :param img: It is the decoded (BGR) image
+    :type img: Any
+    :param long_edge: The long edge of the downscaled image. 0 keeps the original resolution, defaults to 0
+    :type long_edge: int, optional
+    :return: Returns the downscaled image
+    :rtype: Any
+    """
+    height, width = img.shape[:2]
+    if long_edge <= 0 or max(height, width) <= long_edge:
+        return img
+
+    scale = long_edge / max(height, width)
+    return cv2.resize(img, (max(1, int(round(width * scale))), max(1, int(round(height * scale)))),
+                      interpolation=cv2.INTER_AREA)
+
+
+def guided_filter(guide: Any, src: Any, radius: int, eps: float = 1e-4, subsample: int = 1) -> Any:
+    """
+    It is the fast guided filter (He and Sun, 2015) of the single channel source guided by the single channel
+    image, both float32 in [0, 1]. The linear coefficients are computed at the subsampled resolution and only
+    upsampled and applied at the full resolution.
+
+    :param guide: The float32 guidance image, e.g. the gray image
+    :type guide: Any
+    :param src: The float32 image to be filtered, e.g. the mask
+    :type src: Any
+    :param radius: The radius of the box window in the full resolution pixels
+    :type radius: int
+    :param eps: The regularization, defaults to 1e-4
+    :type eps: float, optional
+    :param subsample: The subsampling factor of the coefficients, defaults to 1
+    :type subsample: int, optional
+    :return: Returns the filtered image
+    :rtype: Any
+    """
+    height, width = guide.shape[:2]
+    if subsample > 1:
+        low_size = (max(1, width // subsample), max(1, height // subsample))
+        guide_low = cv2.resize(guide, low_size, interpolation=cv2.INTER_AREA)
+        src_low = cv2.resize(src, low_size, interpolation=cv2.INTER_AREA)
+    else:
+        guide_low, src_low = guide, src
+
+    ksize = (2 * max(1, radius // subsample) + 1,) * 2
+    mean_guide = cv2.boxFilter(guide_low, -1, ksize)
+    mean_src = cv2.boxFilter(src_low, -1, ksize)
+    var_guide = cv2.boxFilter(guide_low * guide_low, -1, ksize) - mean_guide * mean_guide
+    cov_guide_src = cv2.boxFilter(guide_low * src_low, -1, ksize) - mean_guide * mean_src
+
+    coef_a = cov_guide_src / (var_guide + eps)
+    coef_b = mean_src - coef_a * mean_guide
+    mean_a = cv2.boxFilter(coef_a, -1, ksize)
+    mean_b = cv2.boxFilter(coef_b, -1, ksize)
+
+    if subsample > 1:
+        mean_a = cv2.resize(mean_a, (width, height), interpolation=cv2.INTER_LINEAR)
+        mean_b = cv2.resize(mean_b, (width, height), interpolation=cv2.INTER_LINEAR)
+
+    return mean_a * guide + mean_b
+
+
+def get_refine_radius(inference_policy: InferencePolicy, upscale: float) -> int:
+    """
+    It returns the radius of the guided filter, which is the one of the policy or twice the upsampling factor of the
+    mask, so that the window spans the blurry edge of the upsampled mask.
+
+    :param inference_policy: The inference policy
+    :type inference_policy: InferencePolicy
+    :param upscale: The upsampling factor of the mask
+    :type upscale: float
+    :return: Returns the radius in pixels
+    :rtype: int
+    """
+    if inference_policy.refine_radius > 0:
+        return inference_policy.refine_radius
+
+    return max(4, int(round(2 * upscale)))
+
+
+def refine_mask(mask: Any, img: Any, radius: int, eps: float = 1e-4) -> Any:
+    """
+    It refines the mask along the edges of the image by the guided filter. Only the bounding box of the mask edges,
+    i.e. the pixels next to a different mask value, padded by the radius is filtered and the rest of the mask is
+    kept. So the binary masks, e.g. the ones of rembg at the original resolution, are refined as well as the
+    upsampled ones.
+
+    :param mask: The uint8 mask of the image size
+    :type mask: Any
+    :param img: It is the decoded (BGR) image that guides the refinement
+    :type img: Any
+    :param radius: The radius of the guided filter in pixels
+    :type radius: int
+    :param eps: The regularization of the guided filter, defaults to 1e-4
+    :type eps: float, optional
+    :return: Returns the refined mask, which is the given mask refined in place
+    :rtype: Any
+    """
+    height, width = mask.shape[:2]
+    minX, minY, box_width, box_height = cv2.boundingRect(mask)
+    if box_width == 0 or box_height == 0:
+        return mask
+
+    # The morphological gradient is nonzero on both sides of the mask boundary and at its partial values. The box
+    # of the nonzero mask grown by a pixel bounds it, and the border of the image is not taken as a boundary
+    maxX, maxY = min(width, minX + box_width + 1), min(height, minY + box_height + 1)
+    minX, minY = max(0, minX - 1), max(0, minY - 1)
+    mask_edges = cv2.morphologyEx(mask[minY:maxY, minX:maxX], cv2.MORPH_GRADIENT, np.ones((3, 3), np.uint8))
+    edgeX, edgeY, box_width, box_height = cv2.boundingRect(mask_edges)
+    if box_width == 0 or box_height == 0:
+        return mask
+    minX, minY = minX + edgeX, minY + edgeY
+
+    # The padding covers the box window of the coefficients and the one of their mean
+    maxX, maxY = min(width, minX + box_width + 2 * radius), min(height, minY + box_height + 2 * radius)
+    minX, minY = max(0, minX - 2 * radius), max(0, minY - 2 * radius)
+
+    guide = cv2.cvtColor(img[minY:maxY, minX:maxX], cv2.COLOR_BGR2GRAY).astype('float32') / 255.
+    src = mask[minY:maxY, minX:maxX].astype('float32') / 255.
+    refined = guided_filter(guide, src, radius, eps, max(1, radius // 4))
+
+    mask[minY:maxY, minX:maxX] = np.clip(refined * 255. + 0.5, 0, 255).astype('uint8')
+
+    return mask
+
+
+def upsample_mask(mask: Any, img: Any, inference_policy: Optional[Union[str, InferencePolicy]] = None) -> Any:
+    """
+    It brings the mask computed at the inference resolution back to the resolution of the image and refines it
+    along the image edges if the policy says so.
+
+    :param mask: The uint8 mask or the CompactMask at the inference resolution
+    :type mask: Any
+    :param img: It is the decoded (BGR) image at the original resolution
+    :type img: Any
+    :param inference_policy: The preset name or the policy, see get_inference_policy, defaults to None
+    :type inference_policy: Optional[Union[str, InferencePolicy]], optional
+    :return: Returns the mask of the image size
+    :rtype: Any
+    """
+    policy = get_inference_policy(inference_policy)
+    height, width = img.shape[:2]
+
+    if isinstance(mask, CompactMask):
+        mask = mask.to_array()
+
+    upscale = max(width / mask.shape[1], height / mask.shape[0])
+    if mask.shape[:2] != (height, width):
+        mask = cv2.resize(mask, (width, height), interpolation=cv2.INTER_LINEAR)
+    elif policy.refine:
+        mask = mask.copy()
+
+    if policy.refine:
+        mask = refine_mask(mask, img, get_refine_radius(policy, upscale), policy.refine_eps)
+
+    return mask
@@ -0,0 +1,44 @@
+""" This module implements the lazy loading of the submodules of a package, so that importing the package does not
+import the heavy backends (rembg, onnxruntime, torch, facexlib) until they are used
+"""
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+import importlib
+import sys
+
+
+def attach_lazy_names(package_name: str, lazy_names: Dict[str, str],
+                      submodules: Tuple[str, ...] = ()) -> Tuple[Callable[[str], Any], Callable[[], List[str]]]:
+    """
+    It returns the module level __getattr__ and __dir__ of the given package. The names are imported from their
+    modules on the first access only and then stored in the package, so that the later accesses cost nothing.
+
+    :param package_name: The name of the package, i.e. __name__ of its __init__
+    :type package_name: str
+    :param lazy_names: It maps each public name to the relative module that defines it, e.g. '.stroke_img'
+    :type lazy_names: Dict[str, str]
+    :param submodules: The submodules that are imported on their first access as the package attribute,
+    defaults to ()
+    :type submodules: Tuple[str, ...], optional
+    :return: Returns the __getattr__ and the __dir__ functions of the package
+    :rtype: Tuple[Callable[[str], Any], Callable[[], List[str]]]
+    """
+    def lazy_getattr(name: str) -> Any:
+        if name in lazy_names:
+            value = getattr(importlib.import_module(lazy_names[name], package_name), name)
+        elif name in submodules:
+            value = importlib.import_module('.' + name, package_name)
+        else:
+            raise AttributeError('module {!r} has no attribute {!r}'.format(package_name, name))
+
+        setattr(sys.modules[package_name], name, value)
+        return value
+
+    def lazy_dir() -> List[str]:
+        return sorted(set(vars(sys.modules[package_name])) | set(lazy_names) | set(submodules))
+
+    return lazy_getattr, lazy_dir
@@ -0,0 +1,9 @@
+""" This module implements the execution strategies for processing the given set of images
+"""
+from typing import Any
+from .folder_pipeline import run_folder_pipeline
+from .manifest import MANIFEST_FILE_NAME
+from .manifest import FolderManifest
+from .process_pool import get_worker_threads
+from .process_pool import pin_worker_threads
+from .process_pool import run_process_pool
@@ -0,0 +1,92 @@
+""" This module implements the producer/consumer pipeline that overlaps the image decoding, the model inference and
+the image encoding for the given set of images
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from typing import Callable
+from typing import List
+from typing import Tuple
+
+import contextvars
+import queue
+import threading
+
+
+def run_folder_pipeline(jobs: List[Any], decode_fn: Callable[[Any], Any], infer_fn: Callable[[Any, Any], Any],
+                        encode_fn: Callable[[Any, Any], Any], workers: int = 4,
+                        queue_depth: int = 8) -> List[Tuple[Any, Exception]]:
+    """
+    It processes the given jobs in three stages connected by bounded queues. The decoding stage and the encoding
+    stage run in their own thread pools whereas the inference stage runs in the calling thread, so that the model
+    session is owned by a single thread only. The jobs are inferred in the given order. The decoding and encoding
+    run in a copy of the context of the caller, so that the active tracer and debug image sink apply to them too.
+
+    :param jobs: The list of jobs, usually the tuple of input and output file paths
+    :type jobs: List[Any]
+    :param decode_fn: It reads the input of the given job and returns the decoded data
+    :type decode_fn: Callable[[Any], Any]
+    :param infer_fn: It runs the model and the compositing for the given job and its decoded data and returns the
+    result to be encoded
+    :type infer_fn: Callable[[Any, Any], Any]
+    :param encode_fn: It encodes and writes the result of the given job
+    :type encode_fn: Callable[[Any, Any], Any]
+    :param workers: Number of threads in each of the decoding and encoding thread pools, defaults to 4
+    :type workers: int, optional
+    :param queue_depth: Maximum number of jobs waiting in between the stages, defaults to 8
+    :type queue_depth: int, optional
+    :return: Returns the list of failed jobs along with the error raised for them
+    :rtype: List[Tuple[Any, Exception]]
+    """
+    failures: List[Tuple[Any, Exception]] = []
+    encoded_futures: list = []
+
+    decoded_queue: queue.Queue = queue.Queue(maxsize=queue_depth)
+    encode_slots = threading.BoundedSemaphore(queue_depth)
+    stop_event = threading.Event()
+    context = contextvars.copy_context()
+
+    with ThreadPoolExecutor(max_workers=workers) as decode_pool, \
+            ThreadPoolExecutor(max_workers=workers) as encode_pool:
+
+        def feed_jobs() -> None:
+            for job in jobs:
+                if stop_event.is_set():
+                    break
+                decoded_queue.put((job, decode_pool.submit(context.copy().run, decode_fn, job)))
+            decoded_queue.put(None)
+
+        feeder = threading.Thread(target=feed_jobs, daemon=True)
+        feeder.start()
+
+        try:
+            while True:
+                item = decoded_queue.get()
+                if item is None:
+                    break
+
+                job, decoded_future = item
+                try:
+                    result = infer_fn(job, decoded_future.result())
+                except Exception as err:
+                    failures.append((job, err))
+                    continue
+
+                encode_slots.acquire()
+                encoded_future = encode_pool.submit(context.copy().run, encode_fn, job, result)
+                encoded_future.add_done_callback(lambda _: encode_slots.release())
+                encoded_futures.append((job, encoded_future))
+        finally:
+            stop_event.set()
+            while feeder.is_alive():
+                try:
+                    decoded_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            feeder.join()
+
+    for job, encoded_future in encoded_futures:
+        err = encoded_future.exception()
+        if err is not None:
+            failures.append((job, err))
+
+    return failures
@@ -0,0 +1,257 @@
+""" This module implements the manifest of a processed folder, a SQLite index in the output folder that records each
+input file, the parameters it was processed with and the status of its output, so that the reruns process only the
+new, changed or failed inputs
+"""
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+MANIFEST_FILE_NAME = '.iveu_manifest.sqlite'
+
+
+def get_file_stat(file_path: str) -> Tuple[int, int]:
+    """
+    It returns the size and the modification time of the given file.
+
+    :param file_path: The path of the file
+    :type file_path: str
+    :return: Returns the size in bytes and the modification time in nanoseconds
+    :rtype: Tuple[int, int]
+    """
+    file_stat = os.stat(file_path)
+    return file_stat.st_size, file_stat.st_mtime_ns
+
+
+def get_file_hash(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    It returns the content hash of the given file.
+
+    :param file_path: The path of the file
+    :type file_path: str
+    :param chunk_size: The number of bytes read at once, defaults to 1 MiB
+    :type chunk_size: int, optional
+    :return: Returns the hex digest of the file content
+    :rtype: str
+    """
+    hasher = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as in_file:
+        for chunk in iter(lambda: in_file.read(chunk_size), b''):
+            hasher.update(chunk)
+
+    return hasher.hexdigest()
+
+
+class FolderManifest:
+    """
+    It records the processed inputs of a folder in a SQLite database. An output is up to date if it exists, it was
+    processed successfully with the same parameters and neither its input nor its dependencies (e.g. the background)
+    changed since then. The inputs whose size or modification time changed are hashed, so that the touched but
+    unchanged files are not processed again. The inputs to be processed are hashed once when they are claimed by
+    filter_jobs, before they are read for the processing, and mark_done records that hash, so that an input changed
+    during its processing is processed again on the next run. It is safe to be shared between threads.
+    """
+
+    def __init__(self, manifest_path: str, params: Dict[str, Any]) -> None:
+        """
+        :param manifest_path: The path of the SQLite file, usually MANIFEST_FILE_NAME in the output folder
+        :type manifest_path: str
+        :param params: The parameters that define the outputs, e.g. the model, the color and the zooming factor.
+        They have to be JSON serializable
+        :type params: Dict[str, Any]
+        """
+        self.manifest_path = manifest_path
+        self.params = json.dumps(params, sort_keys=True)
+        self.counts = {'skipped': 0, 'done': 0, 'failed': 0}
+
+        manifest_folder_path = os.path.dirname(manifest_path)
+        if manifest_folder_path != '' and not os.path.exists(manifest_folder_path):
+            os.makedirs(manifest_folder_path)
+
+        self._claims: Dict[Tuple[str, str], Tuple[int, int, str]] = {}
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(manifest_path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute('CREATE TABLE IF NOT EXISTS outputs (input_path TEXT NOT NULL, '
+                                     'output_path TEXT NOT NULL, input_size INTEGER, input_mtime_ns INTEGER, '
+                                     'input_hash TEXT, params TEXT, dependencies TEXT, status TEXT, error TEXT, '
+                                     'updated REAL, PRIMARY KEY (input_path, output_path))')
+
+    def get_entry(self, in_file_path: str, out_file_path: str) -> Optional[tuple]:
+        """
+        It returns the recorded entry of the given input and output.
+
+        :param in_file_path: The path of the input file
+        :type in_file_path: str
+        :param out_file_path: The path of the output file
+        :type out_file_path: str
+        :return: Returns the input size, the input modification time, the input hash, the parameters, the
+        dependencies and the status, otherwise None
+        :rtype: Optional[tuple]
+        """
+        with self._lock:
+            return self._connection.execute(
+                'SELECT input_size, input_mtime_ns, input_hash, params, dependencies, status FROM outputs '
+                'WHERE input_path = ? AND output_path = ?',
+                (os.path.abspath(in_file_path), os.path.abspath(out_file_path))).fetchone()
+
+    def is_up_to_date(self, in_file_path: str, out_file_path: str) -> bool:
+        """
+        It tells whether the output of the given input has to be processed again.
+
+        :param in_file_path: The path of the input file
+        :type in_file_path: str
+        :param out_file_path: The path of the output file
+        :type out_file_path: str
+        :return: Returns True if the output exists and is up to date
+        :rtype: bool
+        """
+        return self._check(in_file_path, out_file_path)[0]
+
+    def claim(self, in_file_path: str, out_file_path: str, input_hash: Optional[str] = None) -> None:
+        """
+        It records the size, the modification time and the hash of the given input before it is processed, which
+        mark_done records then instead of hashing the input after the processing.
+
+        :param in_file_path: The path of the input file
+        :type in_file_path: str
+        :param out_file_path: The path of the output file
+        :type out_file_path: str
+        :param input_hash: The hash of the input if it is already known, defaults to None
+        :type input_hash: Optional[str], optional
+        """
+        try:
+            input_stat = get_file_stat(in_file_path)
+            input_hash = get_file_hash(in_file_path) if input_hash is None else input_hash
+        except OSError:
+            return
+
+        with self._lock:
+            self._claims[(os.path.abspath(in_file_path), os.path.abspath(out_file_path))] = input_stat + (input_hash,)
+
+    def filter_jobs(self, in_file_paths: List[str], out_file_paths: List[str]) -> Tuple[List[str], List[str]]:
+        """
+        It drops the inputs whose outputs are up to date out of the given lists.
+
+        :param in_file_paths: The input files
+        :type in_file_paths: List[str]
+        :param out_file_paths: The output files in the same order as the input files
+        :type out_file_paths: List[str]
+        :return: Returns the input files and the output files to be processed
+        :rtype: Tuple[List[str], List[str]]
+        """
+        pending_in_file_paths: List[str] = []
+        pending_out_file_paths: List[str] = []
+
+        for in_file_path, out_file_path in zip(in_file_paths, out_file_paths):
+            up_to_date, input_hash = self._check(in_file_path, out_file_path)
+            if up_to_date:
+                with self._lock:
+                    self.counts['skipped'] += 1
+            else:
+                self.claim(in_file_path, out_file_path, input_hash)
+                pending_in_file_paths.append(in_file_path)
+                pending_out_file_paths.append(out_file_path)
+
+        return pending_in_file_paths, pending_out_file_paths
+
+    def mark_done(self, in_file_path: str, out_file_path: str, dependencies: Iterable[Optional[str]] = ()) -> None:
+        """
+        It records the output of the given input as processed successfully with the parameters of the manifest. The
+        input is recorded as it was claimed, it is only hashed here if it was not claimed.
+
+        :param in_file_path: The path of the input file
+        :type in_file_path: str
+        :param out_file_path: The path of the output file
+        :type out_file_path: str
+        :param dependencies: The other files the output depends on, e.g. the background. None is skipped,
+        defaults to ()
+        :type dependencies: Iterable[Optional[str]], optional
+        """
+        dependency_stats = [[os.path.abspath(dependency_path)] + list(get_file_stat(dependency_path))
+                            for dependency_path in dependencies if dependency_path is not None]
+        input_claim = self._pop_claim(in_file_path, out_file_path)
+        if input_claim is None:
+            input_claim = get_file_stat(in_file_path) + (get_file_hash(in_file_path),)
+
+        self._put(in_file_path, out_file_path, input_claim + (self.params, json.dumps(dependency_stats), 'done', None))
+
+    def mark_failed(self, in_file_path: str, out_file_path: str, error: Any) -> None:
+        """
+        It records the output of the given input as failed, so that it is processed again on the next run.
+
+        :param in_file_path: The path of the input file
+        :type in_file_path: str
+        :param out_file_path: The path of the output file
+        :type out_file_path: str
+        :param error: The error raised for the input
+        :type error: Any
+        """
+        self._pop_claim(in_file_path, out_file_path)
+        self._put(in_file_path, out_file_path, (None, None, None, self.params, '[]', 'failed', str(error)))
+
+    def stats(self) -> Dict[str, int]:
+        """
+        It returns the number of the skipped, done and failed inputs of this run.
+
+        :return: Returns the counters of the run
+        :rtype: Dict[str, int]
+        """
+        with self._lock:
+            return dict(self.counts)
+
+    def close(self) -> None:
+        """
+        It closes the database.
+        """
+        with self._lock:
+            self._connection.close()
+
+    def _check(self, in_file_path: str, out_file_path: str) -> Tuple[bool, Optional[str]]:
+        entry = self.get_entry(in_file_path, out_file_path)
+        if entry is None or entry[5] != 'done' or entry[3] != self.params or not os.path.isfile(out_file_path):
+            return False, None
+
+        try:
+            for dependency_path, dependency_size, dependency_mtime_ns in json.loads(entry[4]):
+                if get_file_stat(dependency_path) != (dependency_size, dependency_mtime_ns):
+                    return False, None
+
+            input_stat = get_file_stat(in_file_path)
+            if input_stat == (entry[0], entry[1]):
+                return True, None
+
+            input_hash = get_file_hash(in_file_path)
+            if input_hash != entry[2]:
+                # The input is hashed already, so that its claim reuses the hash
+                return False, input_hash
+        except OSError:
+            return False, None
+
+        # The input is only touched, so the new modification time is recorded to skip the hashing next time
+        with self._lock, self._connection:
+            self._connection.execute('UPDATE outputs SET input_size = ?, input_mtime_ns = ? '
+                                     'WHERE input_path = ? AND output_path = ?',
+                                     input_stat + (os.path.abspath(in_file_path), os.path.abspath(out_file_path)))
+
+        return True, None
+
+    def _pop_claim(self, in_file_path: str, out_file_path: str) -> Optional[Tuple[int, int, str]]:
+        with self._lock:
+            return self._claims.pop((os.path.abspath(in_file_path), os.path.abspath(out_file_path)), None)
+
+    def _put(self, in_file_path: str, out_file_path: str, values: tuple) -> None:
+        with self._lock, self._connection:
+            self._connection.execute('INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                     (os.path.abspath(in_file_path), os.path.abspath(out_file_path)) + values +
+                                     (time.time(),))
+            self.counts[values[5]] += 1
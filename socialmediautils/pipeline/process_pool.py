@@ -0,0 +1,140 @@
+""" This module implements the multi-process execution that shards the given set of images across the worker
+processes, each of them holding its own copy of the model
+"""
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import as_completed
+from typing import Any
+from typing import Callable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import multiprocessing
+import os
+import sys
+
+worker_model = None
+worker_threads = 0
+
+
+def pin_worker_threads(num_threads: int) -> None:
+    """
+    It limits the intra-op threads of the numerical backends so that the worker processes do not oversubscribe the
+    cores. The environment variables have to be set before the onnxruntime session is created, but rembg does not
+    map them to the intra-op threads, so the onnxruntime sessions take get_worker_threads explicitly too.
+
+    :param num_threads: Number of threads allowed for each of the backends in this process
+    :type num_threads: int
+    """
+    global worker_threads
+
+    worker_threads = num_threads
+    for env_name in ['OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'NUMEXPR_NUM_THREADS']:
+        os.environ[env_name] = str(num_threads)
+
+    import cv2
+    cv2.setNumThreads(num_threads)
+
+    if 'torch' in sys.modules:
+        import torch
+        torch.set_num_threads(num_threads)
+
+
+def get_worker_threads() -> int:
+    """
+    It returns the number of the intra-op threads the worker process is pinned to, e.g. for the session options of
+    the onnxruntime sessions the init_fn creates.
+
+    :return: Returns the number of threads, which is 0 outside of the worker processes
+    :rtype: int
+    """
+    return worker_threads
+
+
+def init_worker(num_threads: int, init_fn: Callable[..., Any], init_args: tuple) -> None:
+    """
+    It is the initializer of each worker process. It pins the threads and loads the model only once per process.
+
+    :param num_threads: Number of intra-op threads allowed for this process
+    :type num_threads: int
+    :param init_fn: It loads and returns the model, e.g. get_stroke_session or get_face_parser_model
+    :type init_fn: Callable[..., Any]
+    :param init_args: The arguments to the init_fn
+    :type init_args: tuple
+    """
+    global worker_model
+
+    pin_worker_threads(num_threads)
+    worker_model = init_fn(*init_args)
+
+
+def run_shard(process_fn: Callable[[Any, Any], Any], shard: List[Any]) -> List[Tuple[Any, Any, Optional[str]]]:
+    """
+    It processes the given shard of jobs in the worker process with the model loaded by the initializer.
+
+    :param process_fn: It processes a single job with the given model and returns the result of the job
+    :type process_fn: Callable[[Any, Any], Any]
+    :param shard: The list of jobs to be processed by this worker
+    :type shard: List[Any]
+    :return: Returns the job, its result and the error message if the job failed, otherwise None
+    :rtype: List[Tuple[Any, Any, Optional[str]]]
+    """
+    results: List[Tuple[Any, Any, Optional[str]]] = []
+
+    for job in shard:
+        try:
+            results.append((job, process_fn(worker_model, job), None))
+        except Exception as err:
+            results.append((job, None, '{}: {}'.format(type(err).__name__, err)))
+
+    return results
+
+
+def run_process_pool(jobs: List[Any], init_fn: Callable[..., Any], init_args: tuple,
+                     process_fn: Callable[[Any, Any], Any], processes: int = 0, threads_per_process: int = 0,
+                     shard_size: int = 0) -> List[Tuple[Any, Any, Optional[str]]]:
+    """
+    It shards the given jobs across the worker processes. Each worker loads the model once in its initializer and
+    processes the shards handed over to it. The functions given have to be picklable, i.e., defined at the module
+    level, since the workers are spawned.
+
+    :param jobs: The list of jobs, usually the tuple of input and output file paths
+    :type jobs: List[Any]
+    :param init_fn: It loads and returns the model, e.g. get_stroke_session or get_face_parser_model
+    :type init_fn: Callable[..., Any]
+    :param init_args: The arguments to the init_fn
+    :type init_args: tuple
+    :param process_fn: It processes a single job with the given model and returns the result of the job
+    :type process_fn: Callable[[Any, Any], Any]
+    :param processes: Number of worker processes. If 0 then it is the number of cores, defaults to 0
+    :type processes: int, optional
+    :param threads_per_process: Number of intra-op threads for each worker. If 0 then the cores are evenly split
+    among the workers, defaults to 0
+    :type threads_per_process: int, optional
+    :param shard_size: Number of jobs handed over to a worker at once. If 0 then it is chosen so that every worker
+    gets about four shards, defaults to 0
+    :type shard_size: int, optional
+    :return: Returns the job, its result and the error message if the job failed, otherwise None, in the order of
+    the given jobs
+    :rtype: List[Tuple[Any, Any, Optional[str]]]
+    """
+    if len(jobs) == 0:
+        return []
+
+    cpu_count = os.cpu_count() or 1
+    processes = processes if processes > 0 else cpu_count
+    processes = min(processes, len(jobs))
+    threads_per_process = threads_per_process if threads_per_process > 0 else max(1, cpu_count // processes)
+    shard_size = shard_size if shard_size > 0 else max(1, -(-len(jobs) // (processes * 4)))
+
+    shards = [jobs[index:index + shard_size] for index in range(0, len(jobs), shard_size)]
+    shard_results: List[Any] = [None] * len(shards)
+
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=init_worker, initargs=(threads_per_process, init_fn, init_args)) as pool:
+        futures = {pool.submit(run_shard, process_fn, shard): index for index, shard in enumerate(shards)}
+
+        for future in as_completed(futures):
+            shard_results[futures[future]] = future.result()
+
+    return [result for results in shard_results for result in results]
@@ -0,0 +1,11 @@
+""" This module implements the long lived model server that keeps the models warm and processes the jobs sent over
+the localhost HTTP or a Unix socket, along with its client
+"""
+from typing import Any
+from .model_client import get_server_stats
+from .model_client import read_token
+from .model_client import shutdown_server
+from .model_client import submit_job
+from .model_server import MAX_REQUEST_MB
+from .model_server import ModelServer
+from .model_server import get_token_file
@@ -0,0 +1,198 @@
+""" This module implements the client of the model server job API, which sends the jobs to the running server
+instead of loading the models in the calling process. The POST requests carry the access token of the server, which
+is read from its token file unless it is given.
+"""
+from .model_server import get_token_file
+from .model_server import npy_content_type
+from .model_server import parse_address
+from .model_server import token_header
+from typing import Any
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+from urllib.parse import urlencode
+
+import http.client
+import io
+import json
+import socket
+import time
+import numpy as np
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """
+    It is the HTTP connection over the Unix socket.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 300.) -> None:
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def read_token(address: str, token: Optional[str] = None) -> str:
+    """
+    It returns the access token of the server at the given address.
+
+    :param address: The host:port of the localhost or the path of the Unix socket of the server
+    :type address: str
+    :param token: The access token. None reads it from the token file of the address, defaults to None
+    :type token: Optional[str], optional
+    :raises PermissionError: If the token file of the address does not exist or can not be read
+    :return: Returns the access token
+    :rtype: str
+    """
+    if token is not None:
+        return token
+
+    token_file = get_token_file(address)
+    try:
+        with open(token_file) as token_fd:
+            return token_fd.read().strip()
+    except OSError as err:
+        raise PermissionError('The access token file {} of the server can not be read: {}'.format(
+            token_file, err)) from err
+
+
+def send_request(address: str, method: str, path: str, body: Optional[bytes] = None,
+                 content_type: str = 'application/json', timeout: float = 300.,
+                 token: str = '') -> Tuple[int, Dict[str, str], bytes]:
+    """
+    It sends a single request to the model server.
+
+    :param address: The host:port of the localhost or the path of the Unix socket of the server
+    :type address: str
+    :param method: The HTTP method, GET or POST
+    :type method: str
+    :param path: The path with the query string, e.g. '/jobs/stroke?zoom_option=3'
+    :type path: str
+    :param body: The body of the request, defaults to None
+    :type body: Optional[bytes], optional
+    :param content_type: The content type of the body, defaults to 'application/json'
+    :type content_type: str, optional
+    :param timeout: Maximum number of seconds to wait for the response, defaults to 300.
+    :type timeout: float, optional
+    :param token: The access token of the server. Empty sends none, defaults to ''
+    :type token: str, optional
+    :return: Returns the status, the headers and the body of the response
+    :rtype: Tuple[int, Dict[str, str], bytes]
+    """
+    server_address = parse_address(address)
+    if isinstance(server_address, str):
+        connection: http.client.HTTPConnection = UnixHTTPConnection(server_address, timeout)
+    else:
+        connection = http.client.HTTPConnection(*server_address, timeout=timeout)
+
+    headers = {'Content-Type': content_type} if body is not None else {}
+    if token != '':
+        headers[token_header] = token
+
+    try:
+        try:
+            connection.request(method, path, body, headers)
+        except (BrokenPipeError, ConnectionResetError):
+            # The server responds to the refused requests, e.g. 403 and 413, without reading their body, so the
+            # response is read even if the body could not be sent whole
+            pass
+
+        response = connection.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        connection.close()
+
+
+def submit_job(address: str, kind: str, params: Dict[str, Any], img: Any = None, retries: int = 10,
+               timeout: float = 300., token: Optional[str] = None) -> Any:
+    """
+    It sends the job to the model server and waits for its result. The job is retried after the Retry-After
+    seconds while the queue of the server is full.
+
+    :param address: The host:port of the localhost or the path of the Unix socket of the server
+    :type address: str
+    :param kind: The kind of the job, one of 'stroke', 'stroke_with_bg' and 'face_blur'
+    :type kind: str
+    :param params: The job parameters. The input_file and the output_file have to be given without the img, and
+    they are resolved by the server, so better use the absolute paths
+    :type params: Dict[str, Any]
+    :param img: The image array, which returns the output image array, or the encoded image bytes, which returns
+    the encoded output image of the out_ext parameter. None sends the file job, defaults to None
+    :type img: Any, optional
+    :param retries: Number of the retries while the server is busy, defaults to 10
+    :type retries: int, optional
+    :param timeout: Maximum number of seconds to wait for the response, defaults to 300.
+    :type timeout: float, optional
+    :param token: The access token of the server. None reads it from the token file of the address, defaults to
+    None
+    :type token: Optional[str], optional
+    :return: Returns the response of the file job, i.e. the output_file and the timings, or the output image
+    :rtype: Any
+    """
+    token = read_token(address, token)
+    if img is None:
+        path, body, content_type = '/jobs/' + kind, json.dumps(params).encode(), 'application/json'
+    else:
+        path = '/jobs/{}?{}'.format(kind, urlencode({name: ','.join(str(channel) for channel in value)
+                                                     if isinstance(value, (list, tuple)) else value
+                                                     for name, value in params.items()}))
+        if isinstance(img, np.ndarray):
+            img_file = io.BytesIO()
+            np.save(img_file, img, allow_pickle=False)
+            body, content_type = img_file.getvalue(), npy_content_type
+        else:
+            body, content_type = bytes(img), 'application/octet-stream'
+
+    for attempt in range(retries + 1):
+        status, headers, response = send_request(address, 'POST', path, body, content_type, timeout, token)
+        if status != 503 or attempt == retries or 'Retry-After' not in headers:
+            break
+
+        time.sleep(float(headers['Retry-After']))
+
+    if status != 200:
+        raise RuntimeError('The {} job failed with {}: {}'.format(kind, status, json.loads(response)['error']))
+
+    if img is None:
+        return json.loads(response)
+
+    if content_type == npy_content_type:
+        return np.load(io.BytesIO(response), allow_pickle=False)
+
+    return response
+
+
+def get_server_stats(address: str, timeout: float = 10.) -> Dict[str, Any]:
+    """
+    It returns the state of the model server, i.e. the loaded models, the queue and the job counts.
+
+    :param address: The host:port of the localhost or the path of the Unix socket of the server
+    :type address: str
+    :param timeout: Maximum number of seconds to wait for the response, defaults to 10.
+    :type timeout: float, optional
+    :return: Returns the state of the server
+    :rtype: Dict[str, Any]
+    """
+    return json.loads(send_request(address, 'GET', '/health', timeout=timeout)[2])
+
+
+def shutdown_server(address: str, timeout: float = 10., token: Optional[str] = None) -> None:
+    """
+    It asks the model server to finish the queued jobs and shut down.
+
+    :param address: The host:port of the localhost or the path of the Unix socket of the server
+    :type address: str
+    :param timeout: Maximum number of seconds to wait for the response, defaults to 10.
+    :type timeout: float, optional
+    :param token: The access token of the server. None reads it from the token file of the address, defaults to
+    None
+    :type token: Optional[str], optional
+    :raises RuntimeError: If the server refuses to shut down
+    """
+    status, _, response = send_request(address, 'POST', '/shutdown', b'', timeout=timeout,
+                                       token=read_token(address, token))
+    if status != 202:
+        raise RuntimeError('The shutdown failed with {}: {}'.format(status, json.loads(response)['error']))
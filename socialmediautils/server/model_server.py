@@ -0,0 +1,718 @@
+""" This module implements the long lived worker that loads the models once, keeps them warm and processes the jobs
+sent over the localhost HTTP or a Unix socket. The jobs wait in a bounded queue, so that a busy server rejects the
+new jobs instead of piling them up, and the queued jobs are finished before the server shuts down. The POST requests
+have to carry the access token, which the server generates at startup into a file that only its user may read.
+"""
+from ..blur.blur_engine import blur_kinds
+from ..blur.face_regions import get_face_region_lut
+from ..imgio.img_codec import decode_img
+from ..imgio.img_codec import encode_img
+from ..imgio.img_writer import EncodeOptions
+from ..inference.inference_policy import get_inference_policy
+from ..stroke.stroke_engine import kernel_shapes
+from concurrent.futures import CancelledError
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+from urllib.parse import parse_qsl
+from urllib.parse import urlsplit
+
+import hmac
+import io
+import ipaddress
+import json
+import os
+import queue
+import secrets
+import socketserver
+import stat
+import tempfile
+import threading
+import time
+import numpy as np
+
+job_kinds = ('stroke', 'stroke_with_bg', 'face_blur')
+npy_content_type = 'application/x-npy'
+token_header = 'X-Iveu-Token'
+
+# The largest request body the server reads. The .npy array of a 24MP image is about 72 MB
+MAX_REQUEST_MB = 512
+
+
+def parse_address(address: str) -> Union[str, Tuple[str, int]]:
+    """
+    It parses the address of the server. A path, i.e. anything with the path separator or the .sock extension, is
+    the Unix socket, otherwise it is the host:port or only the port of the localhost.
+
+    :param address: The address, e.g. '127.0.0.1:8765', '8765' or '/tmp/iveu.sock'
+    :type address: str
+    :return: Returns the path of the Unix socket or the host and the port
+    :rtype: Union[str, Tuple[str, int]]
+    """
+    if os.sep in address or address.endswith('.sock'):
+        return address
+
+    host, _, port = address.rpartition(':')
+    return host if host != '' else '127.0.0.1', int(port)
+
+
+def get_token_file(address: str) -> str:
+    """
+    It returns the path of the access token file of the server at the given address, i.e. next to the Unix socket or
+    under ~/.iveu for the host and the port.
+
+    :param address: The host:port of the localhost or the path of the Unix socket of the server
+    :type address: str
+    :return: Returns the path of the token file
+    :rtype: str
+    """
+    server_address = parse_address(address)
+    if isinstance(server_address, str):
+        return server_address + '.token'
+
+    host, port = server_address
+    return os.path.join(os.path.expanduser('~'), '.iveu', 'server_{}_{}.token'.format(
+        host.strip('[]').replace(':', '_'), port))
+
+
+def write_token_file(token_file: str) -> str:
+    """
+    It generates a new access token and writes it to the given file, which only the current user may read. The token
+    is written to a temporary file first, so that the clients never read a partially written token.
+
+    :param token_file: The path of the token file
+    :type token_file: str
+    :return: Returns the access token
+    :rtype: str
+    """
+    token_folder = os.path.dirname(os.path.abspath(token_file))
+    os.makedirs(token_folder, mode=0o700, exist_ok=True)
+
+    token = secrets.token_hex(32)
+    temp_file, temp_path = tempfile.mkstemp(suffix='.token', dir=token_folder)
+    try:
+        with os.fdopen(temp_file, 'w') as token_fd:
+            token_fd.write(token)
+        os.replace(temp_path, token_file)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    return token
+
+
+def is_loopback_host(host: str) -> bool:
+    """
+    It tells whether the given host is the localhost, i.e. 'localhost' or the loopback IP address.
+
+    :param host: The host name or the IP address
+    :type host: str
+    :return: Returns True if the host is the loopback one
+    :rtype: bool
+    """
+    if host == 'localhost':
+        return True
+
+    try:
+        return ipaddress.ip_address(host.strip('[]')).is_loopback
+    except ValueError:
+        return False
+
+
+def get_bool(value: Any) -> bool:
+    """
+    It converts the job parameter into bool, where the query string gives '1', 'true' or 'yes' for True.
+
+    :param value: The value of the parameter
+    :type value: Any
+    :return: Returns the bool value
+    :rtype: bool
+    """
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes')
+
+    return bool(value)
+
+
+def get_job_options(kind: str, params: Dict[str, Any], has_bg: bool = False) -> Dict[str, Any]:
+    """
+    It validates the parameters of the job and converts them into the arguments of the stroke or the face blur
+    functions. The values may be the strings of the query string.
+
+    :param kind: The kind of the job, one of 'stroke', 'stroke_with_bg' and 'face_blur'
+    :type kind: str
+    :param params: The job parameters, i.e. color ([R, G, B] or 'R,G,B'), zoom_factor, zoom_option, stroke_width,
+    kernel_shape, anti_alias, blur_factor, blur_kind, face_scaled, roi_blur, inference_policy (preset name),
+    face_regions, bg_file, out_ext and the encoding of the output, i.e. out_format, compression and quality
+    :type params: Dict[str, Any]
+    :param has_bg: Whether the background image is given along with the job instead of the bg_file,
+    defaults to False
+    :type has_bg: bool, optional
+    :return: Returns the validated options of the job
+    :rtype: Dict[str, Any]
+    """
+    if kind not in job_kinds:
+        raise ValueError('Unknown job {}, it has to be one of {}'.format(kind, job_kinds))
+
+    color = params.get('color', [255, 255, 0])
+    if isinstance(color, str):
+        color = color.split(',')
+
+    options = {'color': [int(channel) for channel in color], 'zoom_factor': float(params.get('zoom_factor', 1.03)),
+               'zoom_option': int(params.get('zoom_option', 1)), 'stroke_width': int(params.get('stroke_width', 0)),
+               'kernel_shape': str(params.get('kernel_shape', 'ellipse')),
+               'anti_alias': get_bool(params.get('anti_alias', True)),
+               'blur_factor': int(params.get('blur_factor', 33)), 'blur_kind': str(params.get('blur_kind', 'box')),
+               'face_scaled': get_bool(params.get('face_scaled', False)),
+               'roi_blur': get_bool(params.get('roi_blur', False)),
+               'bg_file': str(params.get('bg_file', '')), 'out_ext': str(params.get('out_ext', '.png'))}
+
+    options['inference_policy'] = get_inference_policy(params.get('inference_policy') or None)
+    options['face_regions'] = get_face_region_lut(params.get('face_regions') or None)
+    options['encode_options'] = EncodeOptions(str(params.get('out_format', '')), int(params.get('compression', -1)),
+                                              int(params.get('quality', -1)))
+
+    if len(options['color']) != 3:
+        raise ValueError('The color has to be of 3 channels')
+
+    if options['kernel_shape'] not in kernel_shapes:
+        raise ValueError('Unknown kernel shape {}, it has to be one of {}'.format(options['kernel_shape'],
+                                                                              tuple(kernel_shapes)))
+
+    if options['blur_kind'] not in blur_kinds:
+        raise ValueError('Unknown blur kind {}, it has to be one of {}'.format(options['blur_kind'], blur_kinds))
+
+    if kind == 'stroke_with_bg' and options['bg_file'] == '' and not has_bg:
+        raise ValueError('The stroke with background job needs the bg_file')
+
+    return options
+
+
+class ServerJob:
+    """
+    It holds a single job of the server along with the future of its result and its timings.
+    """
+
+    def __init__(self, kind: str, options: Dict[str, Any], params: Dict[str, Any], img: Any = None,
+                 bg: Any = None) -> None:
+        self.kind = kind
+        self.options = options
+        self.input_file = str(params.get('input_file', ''))
+        self.output_file = str(params.get('output_file', ''))
+        self.img = img
+        self.bg = bg
+        self.future: Future = Future()
+        self.submit_time = time.perf_counter()
+        self.start_time = 0.
+        self.end_time = 0.
+
+        if img is None and (self.input_file == '' or self.output_file == ''):
+            raise ValueError('The job needs either the image data or the input_file and the output_file')
+
+        if img is None and not os.path.isfile(self.input_file):
+            raise ValueError('The input file {} does not exist'.format(self.input_file))
+
+    def get_timings(self) -> Dict[str, float]:
+        """
+        It returns the time the job waited in the queue and the time it ran, in milliseconds.
+
+        :return: Returns the queue_ms and the run_ms of the job
+        :rtype: Dict[str, float]
+        """
+        return {'queue_ms': round((self.start_time - self.submit_time) * 1000., 3),
+                'run_ms': round((self.end_time - self.start_time) * 1000., 3)}
+
+
+class ModelServer:
+    """
+    It loads the stroke and the face blur models once and processes the submitted jobs with them in the worker
+    threads. The jobs are either the file paths, where the output is written by the server, or the image data,
+    where the output image array is returned.
+    """
+
+    def __init__(self, stroke_model: str = 'u2net_human_seg', blur_model: str = 'bisenet', workers: int = 1,
+                 queue_depth: int = 8, cache_dir: str = '', blur_backend: str = 'torch') -> None:
+        """
+        :param stroke_model: The rembg model of the stroke jobs. Empty disables the stroke jobs,
+        defaults to 'u2net_human_seg'
+        :type stroke_model: str, optional
+        :param blur_model: The face parser model of the face blur jobs. Empty disables the face blur jobs,
+        defaults to 'bisenet'
+        :type blur_model: str, optional
+        :param workers: Number of the worker threads that share the models, defaults to 1
+        :type workers: int, optional
+        :param queue_depth: Maximum number of the jobs waiting for a worker. The further jobs are rejected,
+        defaults to 8
+        :type queue_depth: int, optional
+        :param cache_dir: Folder of the mask cache shared by the jobs. Empty disables it, defaults to ''
+        :type cache_dir: str, optional
+        :param blur_backend: The backend of the face parser, 'torch', 'onnx' or 'onnx_int8', defaults to 'torch'
+        :type blur_backend: str, optional
+        """
+        self.model_names = {'stroke': stroke_model, 'face_blur': blur_model}
+        self.models: Dict[str, Any] = {}
+        self.workers = max(1, workers)
+        self.jobs: queue.Queue = queue.Queue(max(1, queue_depth))
+        self.cache_dir = cache_dir
+        self.blur_backend = blur_backend
+        self.mask_cache: Any = None
+        self.bg_cache: Any = None
+        self.threads: List[threading.Thread] = []
+        self.accepting = False
+        self.http_server: Any = None
+        self.start_time = time.time()
+        self.counts = {'processed': 0, 'failed': 0, 'rejected': 0}
+        self.run_ms = 0.
+        self._lock = threading.Lock()
+
+    def load_models(self, warmup: bool = True) -> None:
+        """
+        It loads the models and runs each of them once on a small image, so that the first job does not pay for the
+        lazy initialization of the backends.
+
+        :param warmup: Whether to run the models once after loading them, defaults to True
+        :type warmup: bool, optional
+        """
+        if self.model_names['stroke'] != '' and 'stroke' not in self.models:
+            from ..stroke import get_stroke_session
+            self.models['stroke'] = get_stroke_session(self.model_names['stroke'])
+
+        if 'stroke' in self.models and self.bg_cache is None:
+            from ..cache.bg_cache import BackgroundCache
+            self.bg_cache = BackgroundCache()
+
+        if self.model_names['face_blur'] != '' and 'face_blur' not in self.models:
+            from ..blur.face_blur_img import get_face_parser_model
+            self.models['face_blur'] = get_face_parser_model(self.model_names['face_blur'], self.blur_backend)
+
+        if self.cache_dir != '' and self.mask_cache is None:
+            from ..cache.mask_cache import MaskCache
+            self.mask_cache = MaskCache(self.cache_dir)
+
+        if warmup:
+            warmup_img = np.zeros((256, 256, 3), dtype='uint8')
+            if 'stroke' in self.models:
+                from ..stroke.stroke_img import add_img_stroke_array
+                add_img_stroke_array(self.models['stroke'], warmup_img, [255, 255, 0], 1.03)
+
+            if 'face_blur' in self.models:
+                from ..blur.face_blur_img import add_face_blur_array
+                add_face_blur_array(*self.models['face_blur'], warmup_img)
+
+    def start(self, warmup: bool = True) -> None:
+        """
+        It loads the models if not yet and starts the worker threads.
+
+        :param warmup: Whether to run the models once after loading them, defaults to True
+        :type warmup: bool, optional
+        """
+        self.load_models(warmup)
+
+        self.threads = [threading.Thread(target=self.run_worker, name='model-worker-{}'.format(worker_index))
+                        for worker_index in range(self.workers)]
+        for thread in self.threads:
+            thread.start()
+
+        self.accepting = True
+
+    def stop(self, drain: bool = True) -> None:
+        """
+        It stops accepting the jobs and stops the worker threads once the queued jobs are done. Without drain, the
+        queued jobs are cancelled instead.
+
+        :param drain: Whether to finish the queued jobs before stopping, defaults to True
+        :type drain: bool, optional
+        """
+        self.accepting = False
+
+        if not drain:
+            while True:
+                try:
+                    job = self.jobs.get_nowait()
+                except queue.Empty:
+                    break
+
+                if job is not None:
+                    job.future.cancel()
+
+        for _ in self.threads:
+            self.jobs.put(None)
+
+        for thread in self.threads:
+            thread.join()
+
+        self.threads = []
+
+    def submit(self, kind: str, params: Dict[str, Any], img: Any = None, bg: Any = None) -> ServerJob:
+        """
+        It validates the job and queues it without blocking. It raises queue.Full when the queue is full, which the
+        caller has to retry later.
+
+        :param kind: The kind of the job, one of 'stroke', 'stroke_with_bg' and 'face_blur'
+        :type kind: str
+        :param params: The job parameters, see get_job_options, and the input_file and the output_file when no image
+        data is given
+        :type params: Dict[str, Any]
+        :param img: The decoded (BGR) image or the encoded image bytes. None processes the input_file, defaults to
+        None
+        :type img: Any, optional
+        :param bg: The background image of the stroke_with_bg job. None reads the bg_file, defaults to None
+        :type bg: Any, optional
+        :return: Returns the queued job, whose future holds the output image, or None for the file jobs
+        :rtype: ServerJob
+        """
+        options = get_job_options(kind, params, bg is not None)
+        if ('face_blur' if kind == 'face_blur' else 'stroke') not in self.models:
+            raise ValueError('The model of the {} jobs is not loaded in this server'.format(kind))
+
+        job = ServerJob(kind, options, params, img, bg)
+        if not self.accepting:
+            raise queue.Full('The server is shutting down')
+
+        try:
+            self.jobs.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self.counts['rejected'] += 1
+            raise
+
+        return job
+
+    def run_job(self, job: ServerJob) -> Any:
+        """
+        It runs the given job with the loaded models.
+
+        :param job: The job to be processed
+        :type job: ServerJob
+        :return: Returns the output image of the image data job, otherwise None
+        :rtype: Any
+        """
+        options = job.options
+
+        if job.kind == 'face_blur':
+            from ..blur.face_blur_img import add_face_blur
+            from ..blur.face_blur_img import add_face_blur_array
+
+            net, dev_acc = self.models['face_blur']
+            if job.img is None:
+                return add_face_blur(net, dev_acc, job.input_file, job.output_file, options['blur_factor'],
+                                     self.mask_cache, options['roi_blur'], options['inference_policy'],
+                                     options['face_regions'], options['encode_options'], None, options['blur_kind'],
+                                     options['face_scaled'])
+
+            return add_face_blur_array(net, dev_acc, job.img, options['blur_factor'], self.mask_cache,
+                                       options['roi_blur'], options['inference_policy'], options['face_regions'],
+                                       options['blur_kind'], options['face_scaled'])
+
+        from ..stroke.stroke_img import add_img_stroke
+        from ..stroke.stroke_img import add_img_stroke_array
+        from ..stroke.stroke_img import add_img_stroke_with_bg
+        from ..stroke.stroke_img import add_img_stroke_with_bg_array
+
+        stroke_args = (options['color'], options['zoom_factor'], self.mask_cache, options['zoom_option'],
+                       options['stroke_width'], options['inference_policy'])
+        stroke_kwargs = {'kernel_shape': options['kernel_shape'], 'anti_alias': options['anti_alias']}
+        if job.kind == 'stroke':
+            if job.img is None:
+                return add_img_stroke(self.models['stroke'], job.input_file, job.output_file, *stroke_args,
+                                      options['encode_options'], **stroke_kwargs)
+
+            return add_img_stroke_array(self.models['stroke'], job.img, *stroke_args, **stroke_kwargs)
+
+        if job.img is None:
+            return add_img_stroke_with_bg(self.models['stroke'], job.input_file, options['bg_file'], job.output_file,
+                                          *stroke_args, self.bg_cache, options['encode_options'], **stroke_kwargs)
+
+        img = decode_img(job.img)
+        bg = job.bg
+        if bg is None:
+            bg = self.bg_cache.get(options['bg_file'], (img.shape[1], img.shape[0]))
+
+        return add_img_stroke_with_bg_array(self.models['stroke'], img, bg, *stroke_args, **stroke_kwargs)
+
+    def run_worker(self) -> None:
+        """
+        It is the loop of the worker thread, which processes the queued jobs until it gets None.
+        """
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+
+            if not job.future.set_running_or_notify_cancel():
+                continue
+
+            job.start_time = time.perf_counter()
+            try:
+                result = self.run_job(job)
+            except Exception as err:
+                job.end_time = time.perf_counter()
+                job.future.set_exception(err)
+                count_name = 'failed'
+            else:
+                job.end_time = time.perf_counter()
+                job.future.set_result(result)
+                count_name = 'processed'
+
+            with self._lock:
+                self.counts[count_name] += 1
+                self.run_ms += (job.end_time - job.start_time) * 1000.
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        It returns the state of the server.
+
+        :return: Returns the loaded models, the queue, the job counts, the mean run time of the jobs and the background
+        cache counters
+        :rtype: Dict[str, Any]
+        """
+        with self._lock:
+            counts = dict(self.counts)
+            finished = counts['processed'] + counts['failed']
+            mean_run_ms = round(self.run_ms / finished, 3) if finished != 0 else 0.
+
+        return dict(counts, status='running' if self.accepting else 'stopped',
+                    models={kind: self.model_names[kind] for kind in self.models}, workers=self.workers,
+                    queued=self.jobs.qsize(), queue_depth=self.jobs.maxsize, mean_run_ms=mean_run_ms,
+                    uptime_s=round(time.time() - self.start_time, 3),
+                    bg_cache=self.bg_cache.stats() if self.bg_cache is not None else None)
+
+    def serve(self, address: str = '127.0.0.1:8765', job_timeout: float = 300., warmup: bool = True,
+              allow_remote: bool = False, max_request_mb: int = MAX_REQUEST_MB, token_file: str = '') -> None:
+        """
+        It starts the workers and serves the HTTP job API at the given address until request_shutdown is called.
+        It then stops accepting the connections, finishes the queued jobs and returns. The access token of the POST
+        requests is generated into the token file, which is removed when the server returns.
+
+        :param address: The host:port of the localhost or the path of the Unix socket, defaults to '127.0.0.1:8765'
+        :type address: str, optional
+        :param job_timeout: Maximum number of seconds a request waits for its job, defaults to 300.
+        :type job_timeout: float, optional
+        :param warmup: Whether to run the models once after loading them, defaults to True
+        :type warmup: bool, optional
+        :param allow_remote: Whether the host may be other than the loopback one. The jobs read and write the files
+        of the server, so it is meant for the trusted networks only, defaults to False
+        :type allow_remote: bool, optional
+        :param max_request_mb: The largest request body in MiB. The larger requests get 413, defaults to
+        MAX_REQUEST_MB
+        :type max_request_mb: int, optional
+        :param token_file: The path of the access token file. Empty is the one of get_token_file, defaults to ''
+        :type token_file: str, optional
+        """
+        token_file = token_file if token_file != '' else get_token_file(address)
+        self.http_server = make_http_server(parse_address(address), allow_remote)
+        self.http_server.model_server = self
+        self.http_server.job_timeout = job_timeout
+        self.http_server.max_request_bytes = max_request_mb * 1024 * 1024
+        self.http_server.token = write_token_file(token_file)
+        self.start(warmup)
+
+        try:
+            self.http_server.serve_forever(poll_interval=0.2)
+        finally:
+            self.accepting = False
+            self.http_server.server_close()
+            self.stop(drain=True)
+
+            if isinstance(self.http_server.server_address, str) and is_socket(self.http_server.server_address):
+                os.remove(self.http_server.server_address)
+
+            if os.path.isfile(token_file):
+                os.remove(token_file)
+
+    def request_shutdown(self) -> None:
+        """
+        It asks the serving loop to shut down gracefully. It is safe to call from the signal handlers and from the
+        request handlers.
+        """
+        self.accepting = False
+        if self.http_server is not None:
+            threading.Thread(target=self.http_server.shutdown, daemon=True).start()
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    It is the threading HTTP server on the Unix socket.
+    """
+    daemon_threads = False
+
+
+class ModelRequestHandler(BaseHTTPRequestHandler):
+    """
+    It handles the requests of the job API, i.e. GET /health, POST /jobs/<kind> and POST /shutdown. The job is
+    either the JSON of the parameters with the input_file and the output_file, or the encoded image (or the .npy
+    array with the application/x-npy content type) with the parameters in the query string. The image job responds
+    with the output image of the same type. The POST requests without the access token of the server get 403.
+    """
+
+    def address_string(self) -> str:
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def send_body(self, status: int, body: bytes, content_type: str,
+                  headers: Optional[Dict[str, str]] = None) -> None:
+        """
+        It sends the response with the given body.
+
+        :param status: The HTTP status code
+        :type status: int
+        :param body: The body of the response
+        :type body: bytes
+        :param content_type: The content type of the body
+        :type content_type: str
+        :param headers: The additional headers, defaults to None
+        :type headers: Optional[Dict[str, str]], optional
+        """
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for header_name, header_value in (headers or {}).items():
+            self.send_header(header_name, header_value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status: int, content: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_body(status, json.dumps(content).encode(), 'application/json', headers)
+
+    def do_GET(self) -> None:
+        if urlsplit(self.path).path == '/health':
+            self.send_json(200, self.server.model_server.get_stats())
+        else:
+            self.send_json(404, {'error': 'Unknown path {}'.format(self.path)})
+
+    def do_POST(self) -> None:
+        model_server = self.server.model_server
+        url = urlsplit(self.path)
+
+        if not hmac.compare_digest(self.headers.get(token_header, '').encode(), self.server.token.encode()):
+            # The body is left unread, so the connection can not be reused
+            self.close_connection = True
+            self.send_json(403, {'error': 'The request needs the access token of the server in {}'.format(
+                token_header)})
+            return
+
+        try:
+            content_length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            content_length = -1
+        if content_length < 0 or content_length > self.server.max_request_bytes:
+            # The body is left unread, so the connection can not be reused
+            self.close_connection = True
+            if content_length < 0:
+                self.send_json(400, {'error': 'Invalid Content-Length'})
+            else:
+                self.send_json(413, {'error': 'The request body is larger than {} bytes'.format(
+                    self.server.max_request_bytes)})
+            return
+
+        body = self.rfile.read(content_length)
+
+        if url.path == '/shutdown':
+            self.send_json(202, {'status': 'shutting down'})
+            model_server.request_shutdown()
+            return
+
+        if not url.path.startswith('/jobs/'):
+            self.send_json(404, {'error': 'Unknown path {}'.format(self.path)})
+            return
+
+        content_type = self.headers.get('Content-Type', '').split(';')[0].strip()
+        try:
+            if content_type == 'application/json':
+                params, img = json.loads(body.decode() or '{}'), None
+            else:
+                params = dict(parse_qsl(url.query))
+                img = np.load(io.BytesIO(body), allow_pickle=False) if content_type == npy_content_type else body
+
+            job = model_server.submit(url.path[len('/jobs/'):], params, img)
+        except queue.Full as err:
+            self.send_json(503, {'error': str(err) or 'The job queue is full'}, {'Retry-After': '1'})
+            return
+        except ValueError as err:
+            self.send_json(400, {'error': str(err)})
+            return
+
+        try:
+            result = job.future.result(self.server.job_timeout)
+        except CancelledError:
+            self.send_json(503, {'error': 'The job was cancelled by the shutdown'})
+            return
+        except TimeoutError:
+            self.send_json(504, {'error': 'The job did not finish in {} seconds'.format(self.server.job_timeout)})
+            return
+        except ValueError as err:
+            self.send_json(400, {'error': str(err)})
+            return
+        except Exception as err:
+            self.send_json(500, {'error': '{}: {}'.format(type(err).__name__, err)})
+            return
+
+        timings = job.get_timings()
+        if img is None:
+            self.send_json(200, dict(timings,
+                                     output_file=job.options['encode_options'].get_output_path(job.output_file)))
+            return
+
+        timing_headers = {'X-Queue-Ms': str(timings['queue_ms']), 'X-Run-Ms': str(timings['run_ms'])}
+        if content_type == npy_content_type:
+            result_file = io.BytesIO()
+            np.save(result_file, result, allow_pickle=False)
+            self.send_body(200, result_file.getvalue(), npy_content_type, timing_headers)
+        else:
+            out_ext = job.options['out_ext']
+            self.send_body(200, encode_img(result, out_ext, job.options['encode_options'].get_params(out_ext)),
+                           'image/' + out_ext.lstrip('.'), timing_headers)
+
+
+def is_socket(file_path: str) -> bool:
+    """
+    It tells whether the given path is an existing Unix socket.
+
+    :param file_path: The path
+    :type file_path: str
+    :return: Returns True if the path is a socket
+    :rtype: bool
+    """
+    try:
+        return stat.S_ISSOCK(os.lstat(file_path).st_mode)
+    except OSError:
+        return False
+
+
+def make_http_server(address: Union[str, Tuple[str, int]], allow_remote: bool = False) -> Any:
+    """
+    It creates the threading HTTP server of the job API on the given address. The stale socket of a previous server
+    is replaced, but no other file is.
+
+    :param address: The path of the Unix socket or the host and the port
+    :type address: Union[str, Tuple[str, int]]
+    :param allow_remote: Whether the host may be other than the loopback one, defaults to False
+    :type allow_remote: bool, optional
+    :raises FileExistsError: If the path of the Unix socket is taken by a file other than a socket
+    :raises ValueError: If the host is not the loopback one and the remote hosts are not allowed
+    :return: Returns the HTTP server, which does not serve yet
+    :rtype: Any
+    """
+    if isinstance(address, str):
+        if is_socket(address):
+            os.remove(address)
+        elif os.path.lexists(address):
+            raise FileExistsError('The socket path {} is taken by a file other than a socket'.format(address))
+        return UnixHTTPServer(address, ModelRequestHandler)
+
+    if not allow_remote and not is_loopback_host(address[0]):
+        raise ValueError('The host {} is not the loopback one, the remote hosts have to be allowed '
+                         'explicitly'.format(address[0]))
+
+    http_server = ThreadingHTTPServer(address, ModelRequestHandler)
+    http_server.daemon_threads = False
+    return http_server
@@ -1,11 +1,74 @@
-""" This module implements the outline stroke feature for human in the given images
+""" This module implements the outline stroke feature for human in the given images. The stroke functions are loaded
+lazily on their first access, so that rembg and onnxruntime are imported only when the stroke is used.
 """
 from typing import Any
-from .stroke_img import add_img_stroke
-from .stroke_img import add_img_stroke_with_bg
-from .stroke_img import enable_visual_debug
+from typing import TYPE_CHECKING
+from ..lazy_import import attach_lazy_names
 
+import os
+import inspect
 
-def get_stroke_session(model_type: str) -> Any:
+if TYPE_CHECKING:
+    from .stroke_batch import BatchSegmenter
+    from .stroke_batch import add_img_stroke_batch
+    from .stroke_img import add_img_stroke
+    from .stroke_img import add_img_stroke_array
+    from .stroke_img import add_img_stroke_bytes
+    from .stroke_img import add_img_stroke_with_bg
+    from .stroke_img import add_img_stroke_with_bg_array
+    from .stroke_img import add_img_stroke_with_bg_bytes
+    from .stroke_img import enable_visual_debug
+    from .stroke_tiled import add_img_stroke_tiled
+    from .stroke_tiled import add_img_stroke_with_bg_tiled
+    from .stroke_vid import add_video_stroke
+    from .stroke_vid import add_video_stroke_with_bg
+
+lazy_names = {'BatchSegmenter': '.stroke_batch', 'add_img_stroke_batch': '.stroke_batch',
+              'add_img_stroke': '.stroke_img', 'add_img_stroke_array': '.stroke_img',
+              'add_img_stroke_bytes': '.stroke_img', 'add_img_stroke_with_bg': '.stroke_img',
+              'add_img_stroke_with_bg_array': '.stroke_img', 'add_img_stroke_with_bg_bytes': '.stroke_img',
+              'enable_visual_debug': '.stroke_img', 'add_img_stroke_tiled': '.stroke_tiled',
+              'add_img_stroke_with_bg_tiled': '.stroke_tiled', 'add_video_stroke': '.stroke_vid',
+              'add_video_stroke_with_bg': '.stroke_vid'}
+
+__getattr__, __dir__ = attach_lazy_names(__name__, lazy_names,
+                                         ('stroke_batch', 'stroke_engine', 'stroke_img', 'stroke_tiled', 'stroke_vid'))
+
+
+def get_stroke_session(model_type: str, num_threads: int = 0) -> Any:
+    """
+    It loads the rembg session of the given model.
+
+    :param model_type: The rembg model name, e.g. 'u2net_human_seg'
+    :type model_type: str
+    :param num_threads: Number of the intra-op threads of the onnxruntime session. 0 is the onnxruntime default,
+    defaults to 0
+    :type num_threads: int, optional
+    :return: Returns the rembg session
+    :rtype: Any
+    """
     from rembg.session_factory import new_session
-    return new_session(model_type)
+    if num_threads <= 0:
+        return new_session(model_type)
+
+    import onnxruntime as ort
+    sess_opts = ort.SessionOptions()
+    sess_opts.intra_op_num_threads = num_threads
+    sess_opts.inter_op_num_threads = 1
+
+    if 'sess_opts' in inspect.signature(new_session).parameters:
+        return new_session(model_type, sess_opts=sess_opts)
+
+    # The older rembg (e.g. 2.0.25) takes no session options and maps OMP_NUM_THREADS to the inter-op threads only,
+    # so its session is built here on the inference session with the intra-op threads. Its session factory is used
+    # only to download the model on its first use
+    from rembg.session_cloth import ClothSession
+    from rembg.session_simple import SimpleSession
+    u2net_home = os.getenv('U2NET_HOME', os.path.join(os.getenv('XDG_DATA_HOME', '~'), '.u2net'))
+    model_path = os.path.join(os.path.expanduser(u2net_home), model_type + '.onnx')
+    if not os.path.isfile(model_path):
+        new_session(model_type)
+
+    session_class = ClothSession if model_type == 'u2net_cloth_seg' else SimpleSession
+    return session_class(model_type, ort.InferenceSession(model_path, sess_options=sess_opts,
+                                                          providers=ort.get_available_providers()))
@@ -0,0 +1,315 @@
+""" This module implements the batched human segmentation of the stroke pipeline. The images of a batch are
+preprocessed into a single input tensor, segmented in a single run of the u2net family session of rembg and
+post-processed with OpenCV, all over buffers that are reused across the batches.
+"""
+from ..cache.mask_cache import get_model_name
+from ..composite.compact_mask import CompactMask
+from ..imgio.img_codec import decode_img
+from ..imgio.img_writer import write_img
+from ..inference.inference_policy import downscale_img
+from ..inference.inference_policy import get_inference_policy
+from ..inference.inference_policy import upsample_mask
+from ..trace.tracer import trace_stage
+from .stroke_img import apply_img_stroke
+from .stroke_img import apply_img_stroke_with_bg
+from typing import Any
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+import threading
+import cv2
+import numpy as np
+
+# The normalization of the u2net family input, see rembg BaseSession.normalize
+u2net_mean = np.float32([0.485, 0.456, 0.406])
+u2net_std = np.float32([0.229, 0.224, 0.225])
+u2net_input_size = 320
+
+# The morphological opening and the gaussian smoothing (sigma 2, truncated at 4 sigma) of rembg post_process
+post_process_kernel = cv2.getStructuringElement(cv2.MORPH_CROSS, (3, 3))
+post_process_sigma = 2
+
+
+class BatchSegmenter:
+    """
+    It segments the human in the batches of images with the rembg session like remove(only_mask=True,
+    post_process_mask=True) does for a single image. The input, output and resizing buffers of the largest batch are
+    allocated once and the model output is written straight into the output buffer through the IO binding of
+    onnxruntime. The models exported with a fixed batch size of 1 run the images of a batch one by one over the same
+    buffers. It is safe to be shared between threads, the batches run one at a time.
+    """
+
+    def __init__(self, model_session: Any, batch_size: int = 8) -> None:
+        """
+        :param model_session: The rembg session of the u2net family, e.g. u2net_human_seg or u2netp
+        :type model_session: Any
+        :param batch_size: The maximum number of images segmented in a single run, defaults to 8
+        :type batch_size: int, optional
+        """
+        self.model_session = model_session
+        self.model_name = get_model_name(model_session)
+        self.batch_size = max(1, batch_size)
+
+        self.inner_session = model_session.inner_session
+        model_input = self.inner_session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.output_name = self.inner_session.get_outputs()[0].name
+
+        input_height, input_width = [dim if isinstance(dim, int) else u2net_input_size for dim in model_input.shape[2:]]
+        self.input_size = (input_width, input_height)
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+
+        self._resized = np.empty((self.batch_size, input_height, input_width, 3), dtype='uint8')
+        self._input = np.empty((self.batch_size, 3, input_height, input_width), dtype='float32')
+        self._output = np.empty((self.batch_size, 1, input_height, input_width), dtype='float32')
+        self._binding = self.inner_session.io_binding()
+        self._lock = threading.Lock()
+
+    def preprocess(self, imgs: List[Any]) -> Any:
+        """
+        It resizes the given images into the resizing buffer and normalizes them into the input buffer. Each image is
+        divided by its own maximum like rembg does.
+
+        :param imgs: The 3 channel uint8 images in the channel order the rembg session gets them from get_human_mask
+        :type imgs: List[Any]
+        :return: Returns the NCHW float32 view of the input buffer
+        :rtype: Any
+        """
+        batch_size = len(imgs)
+        input_width, input_height = self.input_size
+
+        for img_index, img in enumerate(imgs):
+            downscale = img.shape[0] >= input_height and img.shape[1] >= input_width
+            interpolation = cv2.INTER_AREA if downscale else cv2.INTER_LANCZOS4
+            cv2.resize(img, self.input_size, dst=self._resized[img_index], interpolation=interpolation)
+
+        resized = self._resized[:batch_size]
+        img_max = np.maximum(resized.reshape(batch_size, -1).max(1).astype('float32'), 1e-6)
+
+        # (img / max - mean) / std is folded into a single scale and offset of each image and channel
+        img_scale = 1. / (img_max[:, None] * u2net_std[None, :])
+        imgs_input = self._input[:batch_size]
+        np.multiply(resized.transpose(0, 3, 1, 2), img_scale[:, :, None, None], out=imgs_input)
+        imgs_input -= (u2net_mean / u2net_std)[None, :, None, None]
+
+        return imgs_input
+
+    def run(self, start: int, end: int) -> None:
+        """
+        It runs the session over the given range of the input buffer and writes the first model output into the same
+        range of the output buffer.
+
+        :param start: The index of the first image in the buffers
+        :type start: int
+        :param end: The index after the last image in the buffers
+        :type end: int
+        """
+        output = self._output[start:end]
+
+        self._binding.bind_cpu_input(self.input_name, self._input[start:end])
+        self._binding.bind_output(self.output_name, 'cpu', 0, np.float32, list(output.shape), output.ctypes.data)
+        self.inner_session.run_with_iobinding(self._binding)
+
+    def predict(self, imgs: List[Any]) -> List[Any]:
+        """
+        It segments the given images and returns the raw masks scaled to the image sizes, like the predict of the
+        rembg session.
+
+        :param imgs: The images of at most batch_size
+        :type imgs: List[Any]
+        :return: Returns the uint8 mask of each image
+        :rtype: List[Any]
+        """
+        batch_size = len(imgs)
+
+        with trace_stage('preprocess'):
+            self.preprocess(imgs)
+
+        with trace_stage('net_forward'):
+            if self.dynamic_batch:
+                self.run(0, batch_size)
+            else:
+                for img_index in range(batch_size):
+                    self.run(img_index, img_index + 1)
+
+        with trace_stage('resize_mask'):
+            # The min-max normalization of each mask is done for the whole batch at once
+            preds = self._output[:batch_size, 0]
+            pred_min = preds.min(axis=(1, 2), keepdims=True)
+            pred_range = np.maximum(preds.max(axis=(1, 2), keepdims=True) - pred_min, 1e-12)
+            preds_small = ((preds - pred_min) * (255. / pred_range)).astype('uint8')
+
+            return [cv2.resize(preds_small[img_index], (img.shape[1], img.shape[0]),
+                               interpolation=cv2.INTER_LANCZOS4) for img_index, img in enumerate(imgs)]
+
+    def segment(self, imgs: List[Any]) -> List[Any]:
+        """
+        It segments the given images of any number in the batches of batch_size and post-processes the masks.
+
+        :param imgs: The decoded (BGR) images to be segmented
+        :type imgs: List[Any]
+        :return: Returns the human mask of each image, which is 0 or 255
+        :rtype: List[Any]
+        """
+        masks: List[Any] = []
+
+        with self._lock:
+            for start in range(0, len(imgs), self.batch_size):
+                masks.extend(self.predict(imgs[start:start + self.batch_size]))
+
+        with trace_stage('postprocess'):
+            return [post_process_mask(mask) for mask in masks]
+
+
+def post_process_mask(mask: Any) -> Any:
+    """
+    It smooths the boundary of the mask like the post_process of rembg, i.e. the morphological opening with the
+    disk of radius 1, the gaussian smoothing and the thresholding at 127, with OpenCV instead of scikit-image and
+    SciPy.
+
+    :param mask: The uint8 mask predicted by the model
+    :type mask: Any
+    :return: Returns the mask which is 0 or 255
+    :rtype: Any
+    """
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, post_process_kernel)
+
+    ksize = 2 * int(4 * post_process_sigma + 0.5) + 1
+    mask = cv2.GaussianBlur(mask.astype('float32'), (ksize, ksize), post_process_sigma,
+                            borderType=cv2.BORDER_REFLECT)
+
+    return cv2.compare(mask, 127, cv2.CMP_GE)
+
+
+def get_human_masks(segmenter: BatchSegmenter, imgs_org: List[Any], mask_cache: Any = None,
+                    inference_policy: Any = None) -> List[Any]:
+    """
+    It segments the human in the given images with the batch segmenter and returns their masks, like get_human_mask
+    does for a single image. If the mask cache is given, only the images that are not segmented yet are batched.
+    The masks are returned as the CompactMask, so that the masks of a whole batch take only their bounding boxes
+    while the images are stroked one by one.
+
+    :param segmenter: The BatchSegmenter of the rembg session
+    :type segmenter: BatchSegmenter
+    :param imgs_org: The decoded (BGR) images to be segmented
+    :type imgs_org: List[Any]
+    :param mask_cache: The MaskCache that holds the already computed masks, defaults to None
+    :type mask_cache: Any, optional
+    :param inference_policy: The preset name ('speed', 'balanced', 'quality') or the InferencePolicy. None segments
+    the original resolution, defaults to None
+    :type inference_policy: Any, optional
+    :return: Returns the human CompactMask of each image
+    :rtype: List[Any]
+    """
+    policy = get_inference_policy(inference_policy)
+    with trace_stage('downscale'):
+        imgs_infer = [downscale_img(img_org, policy.stroke_long_edge) for img_org in imgs_org]
+
+    masks: List[Any] = [None] * len(imgs_infer)
+    keys: List[Any] = [None] * len(imgs_infer)
+
+    if mask_cache is not None:
+        for img_index, img_infer in enumerate(imgs_infer):
+            keys[img_index] = mask_cache.make_key(img_infer, segmenter.model_name, alpha_matting=False,
+                                                  post_process_mask=True, segmenter='batch')
+            masks[img_index] = mask_cache.get(keys[img_index], compact=True)
+
+    missing = [img_index for img_index, mask in enumerate(masks) if mask is None]
+    for img_index, mask in zip(missing, segmenter.segment([imgs_infer[img_index] for img_index in missing])):
+        masks[img_index] = CompactMask.from_array(mask)
+        if mask_cache is not None:
+            mask_cache.put(keys[img_index], masks[img_index])
+
+    for img_index, img_org in enumerate(imgs_org):
+        if imgs_infer[img_index] is not img_org or policy.refine:
+            with trace_stage('upsample_mask', img_org):
+                masks[img_index] = CompactMask.from_array(upsample_mask(masks[img_index], img_org, policy))
+
+    return masks
+
+
+def add_img_stroke_batch(segmenter: BatchSegmenter, in_file_paths: List[str], out_file_paths: List[str],
+                         color: Union[List[int], Tuple[int, int, int]], zooming_factor: float,
+                         mask_cache: Any = None, zoom_option: int = 1, stroke_width: int = 0,
+                         inference_policy: Any = None, bg_file_paths: Optional[List[str]] = None,
+                         bg_cache: Any = None, encode_options: Any = None, img_writer: Any = None,
+                         kernel_shape: str = 'ellipse', anti_alias: bool = True) -> None:
+    """
+    This utility function implements the outline stroking feature for the given set of images, optionally
+    superimposed with the background images. The humans of all the images are segmented in batches, the rest is
+    the same as add_img_stroke and add_img_stroke_with_bg.
+
+    :param segmenter: The BatchSegmenter of the rembg session, which keeps its buffers across the calls
+    :type segmenter: BatchSegmenter
+    :param in_file_paths: The input files with path that have the human in those images
+    :type in_file_paths: List[str]
+    :param out_file_paths: The ouptut paths with filename to store the stroked images. It has to be in the same
+    order as the input files
+    :type out_file_paths: List[str]
+    :param color: This color indicated the color of the stroke area
+    :type color: Union[List[int], Tuple[int, int, int]]
+    :param zooming_factor: It is the scaling factor to determing the outline stroke thickness.
+    Always use the value between 1.01 to 1.09
+    :type zooming_factor: float
+    :param mask_cache: The MaskCache that holds the already computed human masks, defaults to None
+    :type mask_cache: Any, optional
+    :param zoom_option: The zoom option of zoom_mask that selects the stroke algorithm. Use 3 (dilation) or
+    4 (anti-aliased distance transform) for the uniform stroke thickness, defaults to 1
+    :type zoom_option: int, optional
+    :param stroke_width: The stroke thickness in pixels for the zoom options 3 and 4. If 0 then it is
+    derived from the zooming factor, defaults to 0
+    :type stroke_width: int, optional
+    :param inference_policy: The preset name ('speed', 'balanced', 'quality') or the InferencePolicy of the
+    segmentation resolution. None segments the original resolution, defaults to None
+    :type inference_policy: Any, optional
+    :param bg_file_paths: The background file of each image in the same order as the input files. None strokes
+    without the background, defaults to None
+    :type bg_file_paths: Optional[List[str]], optional
+    :param bg_cache: The BackgroundCache that holds the already decoded and resized backgrounds, defaults to None
+    :type bg_cache: Any, optional
+    :param encode_options: The EncodeOptions of the output format and its compression or quality. None keeps the
+    extension of the output file with the OpenCV defaults, defaults to None
+    :type encode_options: Any, optional
+    :param img_writer: The AsyncImgWriter that encodes and writes the outputs in the background. None writes
+    them right away, defaults to None
+    :type img_writer: Any, optional
+    :param kernel_shape: The shape that grows the mask for the zoom options 3 and 4, i.e. 'ellipse', 'rect' or
+    'cross', defaults to 'ellipse'
+    :type kernel_shape: str, optional
+    :param anti_alias: Whether the stroke of the zoom option 4 is anti-aliased, defaults to True
+    :type anti_alias: bool, optional
+    """
+    if len(in_file_paths) != len(out_file_paths):
+        raise ValueError('The number of input files and output files has to be the same')
+
+    if bg_file_paths is not None and len(bg_file_paths) != len(in_file_paths):
+        raise ValueError('The number of input files and background files has to be the same')
+
+    with trace_stage('imread'):
+        imgs_org = [decode_img(cv2.imread(in_file_path)) for in_file_path in in_file_paths]
+
+    imgs_org_mask = get_human_masks(segmenter, imgs_org, mask_cache, inference_policy)
+
+    for img_index, out_file_path in enumerate(out_file_paths):
+        img_org = imgs_org[img_index]
+
+        if bg_file_paths is None:
+            img_blended = apply_img_stroke(img_org, imgs_org_mask[img_index], color, zooming_factor, zoom_option,
+                                           stroke_width, kernel_shape=kernel_shape, anti_alias=anti_alias)
+        else:
+            with trace_stage('imread'):
+                if bg_cache is None:
+                    img_bg = cv2.imread(bg_file_paths[img_index])
+                else:
+                    img_bg = bg_cache.get(bg_file_paths[img_index], (img_org.shape[1], img_org.shape[0]))
+
+            img_blended = apply_img_stroke_with_bg(img_org, img_bg, imgs_org_mask[img_index], color, zooming_factor,
+                                                   zoom_option, stroke_width, kernel_shape=kernel_shape,
+                                                   anti_alias=anti_alias)
+
+        if img_writer is not None:
+            img_writer.write(out_file_path, img_blended, encode_options)
+        else:
+            write_img(out_file_path, img_blended, encode_options)
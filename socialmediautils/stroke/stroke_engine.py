@@ -0,0 +1,87 @@
+""" This module implements the outline stroke engine that grows the human mask by a fixed number of pixels using the
+morphological dilation or the distance transform, instead of scaling the whole mask about the image center
+"""
+from typing import Any
+
+import cv2
+import numpy as np
+
+ZOOM_OPTION_DILATE = 3
+ZOOM_OPTION_DISTANCE = 4
+
+kernel_shapes = {'ellipse': cv2.MORPH_ELLIPSE, 'rect': cv2.MORPH_RECT, 'cross': cv2.MORPH_CROSS}
+distance_types = {'ellipse': cv2.DIST_L2, 'rect': cv2.DIST_C, 'cross': cv2.DIST_L1}
+
+
+def get_stroke_width(mask_img: Any, zooming_factor: float) -> int:
+    """
+    It converts the zooming factor used by zoom_mask into the stroke width in pixels, so that both the engines give
+    a stroke of about the same thickness for the same zooming factor.
+
+    :param mask_img: Numpy array that holds the mask image
+    :type mask_img: Any
+    :param zooming_factor: It is the scaling factor to determing the outline stroke thickness.
+    :type zooming_factor: float
+    :return: Returns the stroke width in pixels
+    :rtype: int
+    """
+    return max(1, int(round((zooming_factor - 1) * min(mask_img.shape[:2]) / 2)))
+
+
+def grow_mask(mask_img: Any, stroke_width: int, method: str = 'dilate', kernel_shape: str = 'ellipse',
+              anti_alias: bool = False) -> Any:
+    """
+    It grows the given mask by the stroke width in every direction, so that the stroke has the same thickness all
+    around the human regardless of its position in the image. Only the bounding box of the mask padded by the
+    stroke width is processed.
+
+    :param mask_img: Numpy array that holds the mask image
+    :type mask_img: Any
+    :param stroke_width: The thickness of the stroke in pixels
+    :type stroke_width: int
+    :param method: It is either 'dilate' for the morphological dilation or 'distance' for the distance transform,
+    defaults to 'dilate'
+    :type method: str, optional
+    :param kernel_shape: The shape of the structuring element, i.e., 'ellipse' (round corners), 'rect' or 'cross'.
+    For the distance transform it selects the euclidean, chessboard or manhattan distance, defaults to 'ellipse'
+    :type kernel_shape: str, optional
+    :param anti_alias: It smooths the outer edge of the grown mask over a pixel. It is only applicable to the
+    distance transform, defaults to False
+    :type anti_alias: bool, optional
+    :return: Returns the grown mask. It is binary (0 or 255) unless anti-aliased
+    :rtype: Any
+    """
+    if kernel_shape not in kernel_shapes:
+        raise ValueError('The kernel shape {} is not supported'.format(kernel_shape))
+
+    if method not in ['dilate', 'distance']:
+        raise ValueError('The stroke method {} is not supported'.format(method))
+
+    _, mask_bin = cv2.threshold(mask_img, 127, 255, cv2.THRESH_BINARY)
+    grown_mask = np.zeros_like(mask_bin)
+
+    box = cv2.boundingRect(mask_bin)
+    if box[2] == 0 or box[3] == 0:
+        return grown_mask
+
+    height, width = mask_bin.shape[:2]
+    minX, minY = max(0, box[0] - stroke_width - 1), max(0, box[1] - stroke_width - 1)
+    maxX, maxY = min(width, box[0] + box[2] + stroke_width + 1), min(height, box[1] + box[3] + stroke_width + 1)
+    mask_roi = mask_bin[minY:maxY, minX:maxX]
+
+    if method == 'dilate':
+        kernel = cv2.getStructuringElement(kernel_shapes[kernel_shape], (2 * stroke_width + 1, 2 * stroke_width + 1))
+        grown_mask[minY:maxY, minX:maxX] = cv2.dilate(mask_roi, kernel)
+
+    else:
+        mask_size = cv2.DIST_MASK_PRECISE if kernel_shape == 'ellipse' else cv2.DIST_MASK_3
+        distance = cv2.distanceTransform(cv2.bitwise_not(mask_roi), distance_types[kernel_shape], mask_size)
+
+        if anti_alias:
+            alpha = np.clip(stroke_width + 0.5 - distance, 0, 1, out=distance)
+            grown_mask[minY:maxY, minX:maxX] = (alpha * 255).astype('uint8')
+        else:
+            grown_mask[minY:maxY, minX:maxX] = np.where(distance <= stroke_width, 255, 0)
+
+    return grown_mask
+
@@ -1,38 +1,94 @@
 """ This module implements the outline stroke feature for human in the given images
 """
+from ..cache.mask_cache import get_model_name
+from ..composite.compact_mask import CompactMask
+from ..composite.composite_img import composite_img
+from ..composite.composite_img import merge_nonzero
+from ..imgio.img_codec import decode_img
+from ..imgio.img_codec import encode_img
+from ..imgio.img_writer import write_img
+from ..inference.inference_policy import downscale_img
+from ..inference.inference_policy import get_inference_policy
+from ..inference.inference_policy import upsample_mask
+from ..trace.tracer import DebugImageSink
+from ..trace.tracer import dump_debug_img
+from ..trace.tracer import trace_stage
+from .stroke_engine import ZOOM_OPTION_DILATE
+from .stroke_engine import ZOOM_OPTION_DISTANCE
+from .stroke_engine import get_stroke_width
+from .stroke_engine import grow_mask
 from rembg import remove
 from typing import Any
 from typing import Tuple
 from typing import List
+from typing import Optional
 from typing import Union
 
-import os
 import cv2
-import numpy as np
 
-visual_debug = False
+visual_debug_sink: Optional[DebugImageSink] = None
 
 
 def enable_visual_debug(enable: bool) -> None:
     """
-    This function invokes the visual debug infomration to be stored or not as image files.
+    This function invokes the visual debug infomration to be stored or not as image files. The images of every call
+    are stored in the debug folder under unique names. Use trace.debug_images to enable it only for a single call.
 
     :param enable: It activates the visual debugging for testin purpose.
     :type enable: bool
     """
-    global visual_debug
-    visual_debug = enable
-    if (visual_debug is True):
-        if not os.path.exists('debug'):
-            os.makedirs('debug')
+    global visual_debug_sink
+    visual_debug_sink = DebugImageSink('debug') if enable else None
 
 
-def zoom_mask(mask_img: Any, zoom_factor: float = 1.05, angle: int = 0, zoom_option: int = 1) -> Any:
+def get_human_mask(model_session: Any, img_org: Any, mask_cache: Any = None, inference_policy: Any = None) -> Any:
+    """
+    It segments the human in the given image and returns its mask. If the mask cache is given, the segmentation is
+    skipped for the images that are already segmented with the same model. The inference policy may downscale the
+    image before the segmentation, in which case the mask is upsampled (and refined) back to the image size.
+
+    :param model_session: The session that holds what unet2 familiy of the model to be used
+    :type model_session: Any
+    :param img_org: It is the decoded (BGR) image to be segmented
+    :type img_org: Any
+    :param mask_cache: The MaskCache that holds the already computed masks, defaults to None
+    :type mask_cache: Any, optional
+    :param inference_policy: The preset name ('speed', 'balanced', 'quality') or the InferencePolicy. None segments
+    the original resolution, defaults to None
+    :type inference_policy: Any, optional
+    :return: Returns the human mask
+    :rtype: Any
+    """
+    policy = get_inference_policy(inference_policy)
+    with trace_stage('downscale', img_org):
+        img_infer = downscale_img(img_org, policy.stroke_long_edge)
+
+    with trace_stage('remove', img_infer):
+        if mask_cache is None:
+            mask = remove(img_infer, session=model_session, alpha_matting=False, only_mask=True,
+                          post_process_mask=True)
+        else:
+            key = mask_cache.make_key(img_infer, get_model_name(model_session), alpha_matting=False,
+                                      post_process_mask=True)
+            mask = mask_cache.get_or_compute(key, lambda: remove(img_infer, session=model_session,
+                                                                 alpha_matting=False, only_mask=True,
+                                                                 post_process_mask=True))
+
+    if img_infer is img_org and not policy.refine:
+        return mask
+
+    with trace_stage('upsample_mask', img_org):
+        return upsample_mask(mask, img_org, policy)
+
+
+def zoom_mask(mask_img: Any, zoom_factor: float = 1.05, angle: int = 0, zoom_option: int = 1,
+              stroke_width: int = 0, kernel_shape: str = 'ellipse', anti_alias: bool = True) -> Any:
     """
     It scales the mask image to the given zoom factor as per the zoom option algorithm. This scaling
-    is center focused regardles of the zoom option provided.
+    is center focused for the zoom options 1 and 2. The zoom options 3 and 4 grow the mask by the
+    stroke width in every direction instead, so that the stroke is uniform for off-center humans too.
 
-    :param mask_img: Numpy array that holds the mask image
+    :param mask_img: Numpy array or CompactMask that holds the mask image
     :type mask_img: Any
     :param zoom_factor: Scaling factor of the image. If 2 is provided, it scales the image twice,
     defaults to 1.05
@@ -41,11 +97,24 @@ def zoom_mask(mask_img: Any, zoom_factor: float = 1.05, angle: int = 0, zoom_opt
     :type angle: int, optional
     :param zoom_option: It gives the option to select the zooming algorithm. If 1 then it is zooming
     with rotation of the image capability. If 2 then it just zooming. In both cases the zooming is
-    centered around the midpoint of the image, defaults to 1
+    centered around the midpoint of the image. If 3 then it is the morphological dilation and if 4
+    then it is the anti-aliased distance transform, defaults to 1
     :type zoom_option: int, optional
-    :return: Returns the scaled mask image
+    :param stroke_width: The stroke thickness in pixels for the zoom options 3 and 4. If 0 then it is
+    derived from the zoom factor, defaults to 0
+    :type stroke_width: int, optional
+    :param kernel_shape: The shape of the structuring element of grow_mask for the zoom options 3 and 4, i.e.
+    'ellipse', 'rect' or 'cross', defaults to 'ellipse'
+    :type kernel_shape: str, optional
+    :param anti_alias: Whether the distance transform of the zoom option 4 smooths the outer edge, defaults to True
+    :type anti_alias: bool, optional
+    :return: Returns the scaled mask image, which is the CompactMask if the mask image is
     :rtype: Any
     """
+    compact = isinstance(mask_img, CompactMask)
+    if compact:
+        mask_img = mask_img.to_array()
+
     height, width = mask_img.shape
 
     if (zoom_option == 1):
@@ -62,89 +131,223 @@ def zoom_mask(mask_img: Any, zoom_factor: float = 1.05, angle: int = 0, zoom_opt
         cropped = mask_img[minX:maxX, minY:maxY]
         result = cv2.resize(cropped, (width, height))
 
+    elif (zoom_option == ZOOM_OPTION_DILATE or zoom_option == ZOOM_OPTION_DISTANCE):
+        stroke_width = stroke_width if stroke_width > 0 else get_stroke_width(mask_img, zoom_factor)
+        if (zoom_option == ZOOM_OPTION_DILATE):
+            result = grow_mask(mask_img, stroke_width, 'dilate', kernel_shape)
+        else:
+            result = grow_mask(mask_img, stroke_width, 'distance', kernel_shape, anti_alias)
+
     else:
+        centerY, centerX = [i / 2 for i in mask_img.shape[:]]
         rot_mat = cv2.getRotationMatrix2D((centerX, centerY), angle, zoom_factor)
-        result = cv2.warpAffine(mask_img, rot_mat, (height, width), flags=cv2.INTER_LANCZOS4)
+        result = cv2.warpAffine(mask_img, rot_mat, (width, height), flags=cv2.INTER_LANCZOS4)
 
-    return result
+    return CompactMask.from_array(result) if compact else result
 
 
-def overlay_img(base_img: Any, overlay_img: Any, mask: Any) -> Any:
+def get_stroke_mask(mask_img: Any, scale_mask: Any, zoom_option: int = 1) -> Any:
     """
-    It merges the background and the forground based on the orignal, colored and mask image.
+    It returns the mask of the stroke area out of the human mask and the scaled mask.
+
+    :param mask_img: Numpy array or CompactMask that holds the human mask image
+    :type mask_img: Any
+    :param scale_mask: Numpy array or CompactMask that holds the scaled mask image returned by zoom_mask
+    :type scale_mask: Any
+    :param zoom_option: The zoom option used for the scaled mask, defaults to 1
+    :type zoom_option: int, optional
+    :return: Returns the stroke mask, which is the CompactMask if both the masks are
+    :rtype: Any
+    """
+    if isinstance(mask_img, CompactMask) and isinstance(scale_mask, CompactMask):
+        if (zoom_option == ZOOM_OPTION_DILATE or zoom_option == ZOOM_OPTION_DISTANCE):
+            return scale_mask.subtract(mask_img)
+
+        return mask_img.xor(scale_mask)
+
+    if (zoom_option == ZOOM_OPTION_DILATE or zoom_option == ZOOM_OPTION_DISTANCE):
+        return cv2.subtract(scale_mask, mask_img)
+
+    return cv2.bitwise_xor(mask_img, scale_mask)
+
+
+def overlay_img(base_img: Any, overlay_img: Any, mask: Any, out: Any = None, partial_blend: bool = False) -> Any:
+    """
+    It merges the background and the forground based on the orignal, colored and mask image. The merging happens
+    in a single pass over the output buffer. Any nonzero mask value selects the overlay unless the partial mask
+    values (anti-aliased edges) are alpha blended.
 
     :param base_img: This image is the original image to be processed
     :type base_img: Any
-    :param overlay_img: This is the generated image based on the stroke color
+    :param overlay_img: This is the image or the scalar (BGR) stroke color to be placed over the base image
     :type overlay_img: Any
     :param mask: This image is the mask image that holds the stroke area
     :type mask: Any
+    :param out: The preallocated output buffer. It can be the base image itself for the in-place merging,
+    defaults to None
+    :type out: Any, optional
+    :param partial_blend: If True then the partial mask values are alpha blended as for the zoom option 4,
+    defaults to False
+    :type partial_blend: bool, optional
     :return: It returns the merged image
     :rtype: Any
     """
-    global visual_debug
-
-    fg_img = cv2.bitwise_or(overlay_img, overlay_img, mask=mask)
+    with trace_stage('overlay', base_img, mask):
+        overlaid_img = composite_img(base_img, overlay_img, mask, out, partial_blend)
 
-    mask_inv = cv2.bitwise_not(mask)
-    bg_img = cv2.bitwise_or(base_img, base_img, mask=mask_inv)
-
-    overlaid_img = cv2.bitwise_or(fg_img, bg_img)
-
-    if (visual_debug is True):
-        cv2.imwrite(os.path.join('debug', 'd004_01_foreground_image_mask.png'), mask)
-        cv2.imwrite(os.path.join('debug', 'd004_02_foreground_image.png'), fg_img)
-        cv2.imwrite(os.path.join('debug', 'd004_03_background_image_mask.png'), mask_inv)
-        cv2.imwrite(os.path.join('debug', 'd004_04_background_image.png'), bg_img)
+    dump_debug_img('d004_01_foreground_image_mask', mask, visual_debug_sink)
+    dump_debug_img('d004_02_overlaid_image', overlaid_img, visual_debug_sink)
 
     return overlaid_img
 
 
-def overlay_img_with_bg(base_img: Any, bg_img: Any, stroke_color_img: Any, base_mask: Any, bg_inv_mask: Any,
-                        stroke_mask: Any) -> Any:
+def overlay_img_with_bg(base_img: Any, bg_img: Any, stroke_color: Any, base_mask: Any, bg_inv_mask: Any,
+                        stroke_mask: Any = None, out: Any = None, zoom_option: int = 1) -> Any:
     """
-    It merges the background and the forground based on the orignal, backgound, colored and mask images.
+    It merges the background and the forground based on the orignal, backgound, stroke color and mask images.
+    The background is kept outside the scaled mask and the stroke color and the human are ORed over it within the
+    stroke mask and the human mask, all in place over the same output buffer. For the zoom option 4 the stroke
+    color is alpha blended over the background within the scaled mask and the human is put over it instead.
 
     :param base_img: This image that holds the human in it.
     :type base_img: Any
-    :param bg_img: It is the image that holds the scenic background.
+    :param bg_img: It is the image that holds the scenic background of the same size as the base image.
     :type bg_img: Any
-    :param stroke_color_img: This is the colored image based on stroke color.
-    :type stroke_color_img: Any
+    :param stroke_color: This is the scalar (BGR) stroke color or the colored image based on stroke color.
+    :type stroke_color: Any
     :param base_mask: This is the mask image which is the segmented version of human without scaling
     :type base_mask: Any
     :param bg_inv_mask: This is the mask image which is the segmented version of human with scaling
     :type bg_inv_mask: Any
-    :param stroke_mask: it is the mask of the stroke area
-    :type stroke_mask: Any
+    :param stroke_mask: This is the mask image of the stroke area. None derives it from the other masks by
+    get_stroke_mask, it is not used for the zoom option 4, defaults to None
+    :type stroke_mask: Any, optional
+    :param out: The preallocated output buffer. It can be the background image itself for the in-place merging,
+    defaults to None
+    :type out: Any, optional
+    :param zoom_option: The zoom option the scaled mask is made with, defaults to 1
+    :type zoom_option: int, optional
     :return: It returns the final image that has both stroked human with background
     :rtype: Any
     """
-    global visual_debug
-
-    stroke_img = cv2.bitwise_or(stroke_color_img, stroke_color_img, mask=stroke_mask)
-    human_img = cv2.bitwise_or(base_img, base_img, mask=base_mask)
-    stroke_human_img = cv2.bitwise_or(human_img, stroke_img)
+    with trace_stage('overlay', bg_img, bg_inv_mask):
+        if (zoom_option == ZOOM_OPTION_DISTANCE):
+            overlaid_img = composite_img(bg_img, stroke_color, bg_inv_mask, out)
+        else:
+            stroke_mask = get_stroke_mask(base_mask, bg_inv_mask, zoom_option) if stroke_mask is None else stroke_mask
+            overlaid_img = composite_img(bg_img, 0, bg_inv_mask, out, partial_blend=False)
+            merge_nonzero(overlaid_img, stroke_color, stroke_mask)
 
-    bg_mask = cv2.bitwise_not(bg_inv_mask)
-    bg_img_filtered = cv2.bitwise_or(bg_img, bg_img, mask=bg_mask)
+    dump_debug_img('d004_01_background_stroke_image', overlaid_img, visual_debug_sink)
 
-    overlaid_img = cv2.bitwise_or(stroke_human_img, bg_img_filtered)
+    with trace_stage('overlay', base_img, base_mask):
+        if (zoom_option == ZOOM_OPTION_DISTANCE):
+            overlaid_img = composite_img(overlaid_img, base_img, base_mask, overlaid_img, partial_blend=False)
+        else:
+            overlaid_img = merge_nonzero(overlaid_img, base_img, base_mask)
 
-    if (visual_debug is True):
-        cv2.imwrite(os.path.join('debug', 'd004_01_foreground_stroke_image.png'), stroke_img)
-        cv2.imwrite(os.path.join('debug', 'd004_02_foreground_human_image.png'), human_img)
-        cv2.imwrite(os.path.join('debug', 'd004_03_background_stroke_human_image.png'), stroke_human_img)
-        cv2.imwrite(os.path.join('debug', 'd004_04_background_image.png'), bg_img)
-        cv2.imwrite(os.path.join('debug', 'd004_04_background_image_mask.png'), bg_mask)
-        cv2.imwrite(os.path.join('debug', 'd004_04_background_filtered_image.png'), bg_img_filtered)
+    dump_debug_img('d004_02_background_stroke_human_image', overlaid_img, visual_debug_sink)
 
     return overlaid_img
 
 
+def apply_img_stroke(img_org: Any, img_org_mask: Any, color: Union[List[int], Tuple[int, int, int]],
+                     zooming_factor: float, zoom_option: int = 1, stroke_width: int = 0, out: Any = None,
+                     kernel_shape: str = 'ellipse', anti_alias: bool = True) -> Any:
+    """
+    It strokes the outline of the human in the given image using the already computed human mask.
+
+    :param img_org: It is the decoded (BGR) image to be processed
+    :type img_org: Any
+    :param img_org_mask: It is the human mask of the image
+    :type img_org_mask: Any
+    :param color: This color indicated the color of the stroke area
+    :type color: Union[List[int], Tuple[int, int, int]]
+    :param zooming_factor: It is the scaling factor to determing the outline stroke thickness.
+    Always use the value between 1.01 to 1.09
+    :type zooming_factor: float
+    :param zoom_option: The zoom option of zoom_mask that selects the stroke algorithm, defaults to 1
+    :type zoom_option: int, optional
+    :param stroke_width: The stroke thickness in pixels for the zoom options 3 and 4, defaults to 0
+    :type stroke_width: int, optional
+    :param out: The preallocated output buffer of the image size to reuse across the images. It can be the
+    image itself for the in-place stroking, defaults to None
+    :type out: Any, optional
+    :param kernel_shape: The shape that grows the mask for the zoom options 3 and 4, i.e. 'ellipse', 'rect' or
+    'cross', defaults to 'ellipse'
+    :type kernel_shape: str, optional
+    :param anti_alias: Whether the stroke of the zoom option 4 is anti-aliased, defaults to True
+    :type anti_alias: bool, optional
+    :return: Returns the stroked image
+    :rtype: Any
+    """
+    RChannel, GChannel, BChannel = color
+
+    with trace_stage('zoom_mask', img_org_mask):
+        img_scale_mask = zoom_mask(img_org_mask, zooming_factor, zoom_option=zoom_option, stroke_width=stroke_width,
+                                   kernel_shape=kernel_shape, anti_alias=anti_alias)
+        Img_overlay_mask = get_stroke_mask(img_org_mask, img_scale_mask, zoom_option)
+
+    img_blended = overlay_img(img_org, (BChannel, GChannel, RChannel), Img_overlay_mask, out,
+                              zoom_option == ZOOM_OPTION_DISTANCE)
+
+    dump_debug_img('d002_unet2_mask_image', img_org_mask, visual_debug_sink)
+    dump_debug_img('d003_unet2_mask_scaled_image', img_scale_mask, visual_debug_sink)
+    dump_debug_img('d004_overlay_mask_image', Img_overlay_mask, visual_debug_sink)
+    dump_debug_img('d005_overlay_image', img_blended, visual_debug_sink)
+
+    return img_blended
+
+
+def add_img_stroke_array(model_session: Any, img_org: Any, color: Union[List[int], Tuple[int, int, int]],
+                         zooming_factor: float, mask_cache: Any = None, zoom_option: int = 1,
+                         stroke_width: int = 0, inference_policy: Any = None, kernel_shape: str = 'ellipse',
+                         anti_alias: bool = True) -> Any:
+    """
+    This utility function implements the outline stroking feature for any human in the given
+    image array.
+
+    :param model_session: The session that holds what unet2 familiy of the model to be used
+    :type model_session: Any
+    :param img_org: It is the decoded (BGR) image or the encoded image bytes to be processed
+    :type img_org: Any
+    :param color: This color indicated the color of the stroke area
+    :type color: Union[List[int], Tuple[int, int, int]]
+    :param zooming_factor: It is the scaling factor to determing the outline stroke thickness.
+    Always use the value between 1.01 to 1.09
+    :type zooming_factor: float
+    :param mask_cache: The MaskCache that holds the already computed human masks, defaults to None
+    :type mask_cache: Any, optional
+    :param zoom_option: The zoom option of zoom_mask that selects the stroke algorithm. Use 3 (dilation) or
+    4 (anti-aliased distance transform) for the uniform stroke thickness, defaults to 1
+    :type zoom_option: int, optional
+    :param stroke_width: The stroke thickness in pixels for the zoom options 3 and 4. If 0 then it is
+    derived from the zooming factor, defaults to 0
+    :type stroke_width: int, optional
+    :param inference_policy: The preset name ('speed', 'balanced', 'quality') or the InferencePolicy of the
+    segmentation resolution. None segments the original resolution, defaults to None
+    :type inference_policy: Any, optional
+    :param kernel_shape: The shape that grows the mask for the zoom options 3 and 4, i.e. 'ellipse', 'rect' or
+    'cross', defaults to 'ellipse'
+    :type kernel_shape: str, optional
+    :param anti_alias: Whether the stroke of the zoom option 4 is anti-aliased, defaults to True
+    :type anti_alias: bool, optional
+    :return: Returns the stroked image
+    :rtype: Any
+    """
+    with trace_stage('decode'):
+        img_org = decode_img(img_org)
+    img_org_mask = get_human_mask(model_session, img_org, mask_cache, inference_policy)
+
+    return apply_img_stroke(img_org, img_org_mask, color, zooming_factor, zoom_option, stroke_width,
+                            kernel_shape=kernel_shape, anti_alias=anti_alias)
+
+
 def add_img_stroke(model_session: Any, in_file_path: str, out_file_path: str,
                    color: Union[List[int], Tuple[int, int, int]],
-                   zooming_factor: float) -> None:
+                   zooming_factor: float, mask_cache: Any = None, zoom_option: int = 1,
+                   stroke_width: int = 0, inference_policy: Any = None, encode_options: Any = None,
+                   img_writer: Any = None, kernel_shape: str = 'ellipse', anti_alias: bool = True) -> None:
     """
     This utility function implements the outline stroking feature for any human in the given
     image.
@@ -160,37 +363,200 @@ def add_img_stroke(model_session: Any, in_file_path: str, out_file_path: str,
     :param zooming_factor: It is the scaling factor to determing the outline stroke thickness.
     Always use the value between 1.01 to 1.09
     :type zooming_factor: float
+    :param mask_cache: The MaskCache that holds the already computed human masks, defaults to None
+    :type mask_cache: Any, optional
+    :param zoom_option: The zoom option of zoom_mask that selects the stroke algorithm. Use 3 (dilation) or
+    4 (anti-aliased distance transform) for the uniform stroke thickness, defaults to 1
+    :type zoom_option: int, optional
+    :param stroke_width: The stroke thickness in pixels for the zoom options 3 and 4. If 0 then it is
+    derived from the zooming factor, defaults to 0
+    :type stroke_width: int, optional
+    :param inference_policy: The preset name ('speed', 'balanced', 'quality') or the InferencePolicy of the
+    segmentation resolution. None segments the original resolution, defaults to None
+    :type inference_policy: Any, optional
+    :param encode_options: The EncodeOptions of the output format and its compression or quality. None keeps the
+    extension of the output file with the OpenCV defaults, defaults to None
+    :type encode_options: Any, optional
+    :param img_writer: The AsyncImgWriter that encodes and writes the output in the background. None writes it
+    right away, defaults to None
+    :type img_writer: Any, optional
+    :param kernel_shape: The shape that grows the mask for the zoom options 3 and 4, i.e. 'ellipse', 'rect' or
+    'cross', defaults to 'ellipse'
+    :type kernel_shape: str, optional
+    :param anti_alias: Whether the stroke of the zoom option 4 is anti-aliased, defaults to True
+    :type anti_alias: bool, optional
+    """
+    with trace_stage('imread'):
+        img_org = cv2.imread(in_file_path)
+
+    img_blended = add_img_stroke_array(model_session, img_org, color, zooming_factor, mask_cache, zoom_option,
+                                       stroke_width, inference_policy, kernel_shape, anti_alias)
+
+    if img_writer is not None:
+        img_writer.write(out_file_path, img_blended, encode_options)
+    else:
+        write_img(out_file_path, img_blended, encode_options)
+
+
+def add_img_stroke_bytes(model_session: Any, img_data: bytes, color: Union[List[int], Tuple[int, int, int]],
+                         zooming_factor: float, out_ext: str = '.png', mask_cache: Any = None,
+                         zoom_option: int = 1, stroke_width: int = 0, inference_policy: Any = None,
+                         kernel_shape: str = 'ellipse', anti_alias: bool = True) -> bytes:
+    """
+    This utility function implements the outline stroking feature for any human in the given encoded
+    image bytes and returns the encoded result, so that no file has to be touched.
+
+    :param model_session: The session that holds what unet2 familiy of the model to be used
+    :type model_session: Any
+    :param img_data: It is the encoded image (png, jpg, etc.) to be processed
+    :type img_data: bytes
+    :param color: This color indicated the color of the stroke area
+    :type color: Union[List[int], Tuple[int, int, int]]
+    :param zooming_factor: It is the scaling factor to determing the outline stroke thickness.
+    Always use the value between 1.01 to 1.09
+    :type zooming_factor: float
+    :param out_ext: The extension of the output format, defaults to '.png'
+    :type out_ext: str, optional
+    :param mask_cache: The MaskCache that holds the already computed human masks, defaults to None
+    :type mask_cache: Any, optional
+    :param zoom_option: The zoom option of zoom_mask that selects the stroke algorithm. Use 3 (dilation) or
+    4 (anti-aliased distance transform) for the uniform stroke thickness, defaults to 1
+    :type zoom_option: int, optional
+    :param stroke_width: The stroke thickness in pixels for the zoom options 3 and 4. If 0 then it is
+    derived from the zooming factor, defaults to 0
+    :type stroke_width: int, optional
+    :param inference_policy: The preset name ('speed', 'balanced', 'quality') or the InferencePolicy of the
+    segmentation resolution. None segments the original resolution, defaults to None
+    :type inference_policy: Any, optional
+    :param kernel_shape: The shape that grows the mask for the zoom options 3 and 4, i.e. 'ellipse', 'rect' or
+    'cross', defaults to 'ellipse'
+    :type kernel_shape: str, optional
+    :param anti_alias: Whether the stroke of the zoom option 4 is anti-aliased, defaults to True
+    :type anti_alias: bool, optional
+    :return: Returns the encoded stroked image
+    :rtype: bytes
     """
-    global visual_debug
+    img_blended = add_img_stroke_array(model_session, img_data, color, zooming_factor, mask_cache, zoom_option,
+                                       stroke_width, inference_policy, kernel_shape, anti_alias)
+
+    with trace_stage('encode', img_blended):
+        return encode_img(img_blended, out_ext)
+
 
+def apply_img_stroke_with_bg(img_org: Any, img_bg: Any, img_org_mask: Any,
+                             color: Union[List[int], Tuple[int, int, int]], zooming_factor: float,
+                             zoom_option: int = 1, stroke_width: int = 0, out: Any = None,
+                             kernel_shape: str = 'ellipse', anti_alias: bool = True) -> Any:
+    """
+    It strokes the outline of the human in the given image using the already computed human mask and superimposes
+    the stroked human with the background image.
+
+    :param img_org: It is the decoded (BGR) image with human to be processed
+    :type img_org: Any
+    :param img_bg: It is the decoded (BGR) image or the encoded image bytes that holds the scenic (or some sort of)
+    backgorund information. The decoded image of the image size, e.g. the one of the BackgroundCache, is
+    composited as it is without being resized or modified
+    :type img_bg: Any
+    :param img_org_mask: It is the human mask of the image
+    :type img_org_mask: Any
+    :param color: This color indicated the color of the stroke area
+    :type color: Union[List[int], Tuple[int, int, int]]
+    :param zooming_factor: It is the scaling factor to determing the outline stroke thickness.
+    Always use the value between 1.01 to 1.09
+    :type zooming_factor: float
+    :param zoom_option: The zoom option of zoom_mask that selects the stroke algorithm, defaults to 1
+    :type zoom_option: int, optional
+    :param stroke_width: The stroke thickness in pixels for the zoom options 3 and 4, defaults to 0
+    :type stroke_width: int, optional
+    :param out: The preallocated output buffer of the image size to reuse across the images, defaults to None
+    :type out: Any, optional
+    :param kernel_shape: The shape that grows the mask for the zoom options 3 and 4, i.e. 'ellipse', 'rect' or
+    'cross', defaults to 'ellipse'
+    :type kernel_shape: str, optional
+    :param anti_alias: Whether the stroke of the zoom option 4 is anti-aliased, defaults to True
+    :type anti_alias: bool, optional
+    :return: Returns the stroked human superimposed with the background
+    :rtype: Any
+    """
     RChannel, GChannel, BChannel = color
 
-    img_org = cv2.imread(in_file_path)
-    img_org_mask = remove(img_org, session=model_session, alpha_matting=False, only_mask=True,
-                          post_process_mask=True)
+    with trace_stage('zoom_mask', img_org_mask):
+        img_scale_mask = zoom_mask(img_org_mask, zooming_factor, zoom_option=zoom_option, stroke_width=stroke_width,
+                                   kernel_shape=kernel_shape, anti_alias=anti_alias)
+
+    # The background is resized straight into the output buffer, which is then composited in place. The one already
+    # of the image size is composited into the output buffer as it is
+    img_bg = decode_img(img_bg)
+    if img_bg.shape[:2] != img_org.shape[:2]:
+        with trace_stage('resize_bg', img_org):
+            img_bg = cv2.resize(img_bg, (img_org.shape[1], img_org.shape[0]), dst=out, interpolation=cv2.INTER_LINEAR)
+        out = img_bg
+
+    img_blended = overlay_img_with_bg(img_org, img_bg, (BChannel, GChannel, RChannel), img_org_mask,
+                                      img_scale_mask, None, out, zoom_option)
 
-    img_scale_mask = zoom_mask(img_org_mask, zooming_factor)
-    Img_overlay_mask = cv2.bitwise_xor(img_org_mask, img_scale_mask)
+    dump_debug_img('d002_unet2_mask_image', img_org_mask, visual_debug_sink)
+    dump_debug_img('d003_unet2_mask_scaled_image', img_scale_mask, visual_debug_sink)
+    dump_debug_img('d005_overlay_image', img_blended, visual_debug_sink)
 
-    img_blend_color = np.zeros([img_org.shape[0], img_org.shape[1], 3], dtype=np.uint8)
-    img_blend_color[:, :] = [BChannel, GChannel, RChannel]
+    return img_blended
 
-    img_blended = overlay_img(img_org, img_blend_color, Img_overlay_mask)
 
-    if (visual_debug is True):
-        cv2.imwrite(os.path.join('debug', 'd001_overlay_image.png'), img_blend_color)
-        cv2.imwrite(os.path.join('debug', 'd002_unet2_mask_image.png'), img_org_mask)
-        cv2.imwrite(os.path.join('debug', 'd003_unet2_mask_scaled_image.png'), img_scale_mask)
-        cv2.imwrite(os.path.join('debug', 'd004_overlay_mask_image.png'), Img_overlay_mask)
-        cv2.imwrite(os.path.join('debug', 'd005_overlay_image.png'), img_blended)
+def add_img_stroke_with_bg_array(model_session: Any, img_org: Any, img_bg: Any,
+                                 color: Union[List[int], Tuple[int, int, int]],
+                                 zooming_factor: float, mask_cache: Any = None, zoom_option: int = 1,
+                                 stroke_width: int = 0, inference_policy: Any = None, kernel_shape: str = 'ellipse',
+                                 anti_alias: bool = True) -> Any:
+    """
+    This utility function implements the outline stroking feature for any human and superimpose the stroked
+    human with scenic (sort of) background image array.
+
+    :param model_session: The session that holds what unet2 familiy of the model to be used
+    :type model_session: Any
+    :param img_org: It is the decoded (BGR) image or the encoded image bytes with human to be processed
+    :type img_org: Any
+    :param img_bg: It is the decoded (BGR) image or the encoded image bytes that holds the scenic (or some sort of)
+    backgorund information
+    :type img_bg: Any
+    :param color: This color indicated the color of the stroke area
+    :type color: Union[List[int], Tuple[int, int, int]]
+    :param zooming_factor: It is the scaling factor to determing the outline stroke thickness.
+    Always use the value between 1.01 to 1.09
+    :type zooming_factor: float
+    :param mask_cache: The MaskCache that holds the already computed human masks, defaults to None
+    :type mask_cache: Any, optional
+    :param zoom_option: The zoom option of zoom_mask that selects the stroke algorithm. Use 3 (dilation) or
+    4 (anti-aliased distance transform) for the uniform stroke thickness, defaults to 1
+    :type zoom_option: int, optional
+    :param stroke_width: The stroke thickness in pixels for the zoom options 3 and 4. If 0 then it is
+    derived from the zooming factor, defaults to 0
+    :type stroke_width: int, optional
+    :param inference_policy: The preset name ('speed', 'balanced', 'quality') or the InferencePolicy of the
+    segmentation resolution. None segments the original resolution, defaults to None
+    :type inference_policy: Any, optional
+    :param kernel_shape: The shape that grows the mask for the zoom options 3 and 4, i.e. 'ellipse', 'rect' or
+    'cross', defaults to 'ellipse'
+    :type kernel_shape: str, optional
+    :param anti_alias: Whether the stroke of the zoom option 4 is anti-aliased, defaults to True
+    :type anti_alias: bool, optional
+    :return: Returns the stroked human superimposed with the background
+    :rtype: Any
+    """
+    with trace_stage('decode'):
+        img_org = decode_img(img_org)
+    Img_org_mask = get_human_mask(model_session, img_org, mask_cache, inference_policy)
 
-    cv2.imwrite(out_file_path, img_blended)
+    return apply_img_stroke_with_bg(img_org, img_bg, Img_org_mask, color, zooming_factor, zoom_option, stroke_width,
+                                    kernel_shape=kernel_shape, anti_alias=anti_alias)
 
 
 def add_img_stroke_with_bg(model_session: Any, in_file_path: str, bg_file_path: str,
                            out_file_path: str,
                            color: Union[List[int], Tuple[int, int, int]],
-                           zooming_factor: float) -> None:
+                           zooming_factor: float, mask_cache: Any = None, zoom_option: int = 1,
+                           stroke_width: int = 0, inference_policy: Any = None, bg_cache: Any = None,
+                           encode_options: Any = None, img_writer: Any = None, kernel_shape: str = 'ellipse',
+                           anti_alias: bool = True) -> None:
     """
     This utility function implements the outline stroking feature for any human and superimpose the stroked
     human with scenic (sort of) background image.
@@ -208,31 +574,90 @@ def add_img_stroke_with_bg(model_session: Any, in_file_path: str, bg_file_path:
     :param zooming_factor: It is the scaling factor to determing the outline stroke thickness.
     Always use the value between 1.01 to 1.09
     :type zooming_factor: float
+    :param mask_cache: The MaskCache that holds the already computed human masks, defaults to None
+    :type mask_cache: Any, optional
+    :param zoom_option: The zoom option of zoom_mask that selects the stroke algorithm. Use 3 (dilation) or
+    4 (anti-aliased distance transform) for the uniform stroke thickness, defaults to 1
+    :type zoom_option: int, optional
+    :param stroke_width: The stroke thickness in pixels for the zoom options 3 and 4. If 0 then it is
+    derived from the zooming factor, defaults to 0
+    :type stroke_width: int, optional
+    :param inference_policy: The preset name ('speed', 'balanced', 'quality') or the InferencePolicy of the
+    segmentation resolution. None segments the original resolution, defaults to None
+    :type inference_policy: Any, optional
+    :param bg_cache: The BackgroundCache that holds the already decoded and resized backgrounds, defaults to None
+    :type bg_cache: Any, optional
+    :param encode_options: The EncodeOptions of the output format and its compression or quality. None keeps the
+    extension of the output file with the OpenCV defaults, defaults to None
+    :type encode_options: Any, optional
+    :param img_writer: The AsyncImgWriter that encodes and writes the output in the background. None writes it
+    right away, defaults to None
+    :type img_writer: Any, optional
+    :param kernel_shape: The shape that grows the mask for the zoom options 3 and 4, i.e. 'ellipse', 'rect' or
+    'cross', defaults to 'ellipse'
+    :type kernel_shape: str, optional
+    :param anti_alias: Whether the stroke of the zoom option 4 is anti-aliased, defaults to True
+    :type anti_alias: bool, optional
     """
-    global visual_debug
-
-    RChannel, GChannel, BChannel = color
-
-    img_org = cv2.imread(in_file_path)
-    Img_org_mask = remove(img_org, session=model_session, alpha_matting=False, only_mask=True,
-                          post_process_mask=True)
-
-    img_scale_mask = zoom_mask(Img_org_mask, zooming_factor)
-    img_overlay_mask = cv2.bitwise_xor(Img_org_mask, img_scale_mask)
-
-    img_blend_color = np.zeros([img_org.shape[0], img_org.shape[1], 3], dtype=np.uint8)
-    img_blend_color[:, :] = [BChannel, GChannel, RChannel]
+    with trace_stage('imread'):
+        img_org = cv2.imread(in_file_path)
+        if bg_cache is None:
+            img_bg = cv2.imread(bg_file_path)
+        else:
+            img_bg = bg_cache.get(bg_file_path, (img_org.shape[1], img_org.shape[0]))
+
+    img_blended = add_img_stroke_with_bg_array(model_session, img_org, img_bg, color, zooming_factor, mask_cache,
+                                               zoom_option, stroke_width, inference_policy, kernel_shape, anti_alias)
+
+    if img_writer is not None:
+        img_writer.write(out_file_path, img_blended, encode_options)
+    else:
+        write_img(out_file_path, img_blended, encode_options)
 
-    img_bg = cv2.resize(cv2.imread(bg_file_path), (img_org.shape[1], img_org.shape[0]),
-                        interpolation=cv2.INTER_LINEAR)
 
-    img_blended = overlay_img_with_bg(img_org, img_bg, img_blend_color, Img_org_mask, img_scale_mask, img_overlay_mask)
+def add_img_stroke_with_bg_bytes(model_session: Any, img_data: bytes, bg_data: bytes,
+                                 color: Union[List[int], Tuple[int, int, int]],
+                                 zooming_factor: float, out_ext: str = '.png', mask_cache: Any = None,
+                                 zoom_option: int = 1, stroke_width: int = 0, inference_policy: Any = None,
+                                 kernel_shape: str = 'ellipse', anti_alias: bool = True) -> bytes:
+    """
+    This utility function implements the outline stroking feature for any human and superimpose the stroked
+    human with scenic (sort of) background image, both given as encoded image bytes, and returns the encoded result.
 
-    if (visual_debug is True):
-        cv2.imwrite(os.path.join('debug', 'd001_overlay_image.png'), img_blend_color)
-        cv2.imwrite(os.path.join('debug', 'd002_unet2_mask_image.png'), Img_org_mask)
-        cv2.imwrite(os.path.join('debug', 'd003_unet2_mask_scaled_image.png'), img_scale_mask)
-        cv2.imwrite(os.path.join('debug', 'd004_stroke_mask_image.png'), img_overlay_mask)
-        cv2.imwrite(os.path.join('debug', 'd005_overlay_image.png'), img_blended)
+    :param model_session: The session that holds what unet2 familiy of the model to be used
+    :type model_session: Any
+    :param img_data: It is the encoded image (png, jpg, etc.) with human to be processed
+    :type img_data: bytes
+    :param bg_data: It is the encoded image that holds the scenic (or some sort of) backgorund information
+    :type bg_data: bytes
+    :param color: This color indicated the color of the stroke area
+    :type color: Union[List[int], Tuple[int, int, int]]
+    :param zooming_factor: It is the scaling factor to determing the outline stroke thickness.
+    Always use the value between 1.01 to 1.09
+    :type zooming_factor: float
+    :param out_ext: The extension of the output format, defaults to '.png'
+    :type out_ext: str, optional
+    :param mask_cache: The MaskCache that holds the already computed human masks, defaults to None
+    :type mask_cache: Any, optional
+    :param zoom_option: The zoom option of zoom_mask that selects the stroke algorithm. Use 3 (dilation) or
+    4 (anti-aliased distance transform) for the uniform stroke thickness, defaults to 1
+    :type zoom_option: int, optional
+    :param stroke_width: The stroke thickness in pixels for the zoom options 3 and 4. If 0 then it is
+    derived from the zooming factor, defaults to 0
+    :type stroke_width: int, optional
+    :param inference_policy: The preset name ('speed', 'balanced', 'quality') or the InferencePolicy of the
+    segmentation resolution. None segments the original resolution, defaults to None
+    :type inference_policy: Any, optional
+    :param kernel_shape: The shape that grows the mask for the zoom options 3 and 4, i.e. 'ellipse', 'rect' or
+    'cross', defaults to 'ellipse'
+    :type kernel_shape: str, optional
+    :param anti_alias: Whether the stroke of the zoom option 4 is anti-aliased, defaults to True
+    :type anti_alias: bool, optional
+    :return: Returns the encoded stroked human superimposed with the background
+    :rtype: bytes
+    """
+    img_blended = add_img_stroke_with_bg_array(model_session, img_data, bg_data, color, zooming_factor, mask_cache,
+                                               zoom_option, stroke_width, inference_policy, kernel_shape, anti_alias)
 
-    cv2.imwrite(out_file_path, img_blended)
+    with trace_stage('encode', img_blended):
+        return encode_img(img_blended, out_ext)
@@ -0,0 +1,395 @@
+""" This module implements the tiled outline stroke for the very large images, e.g. the panoramas and the print
+resolution photos. The human is segmented on a downscaled proxy of the image and the masks are upsampled, composited
+and written strip by strip into a memory-mapped output buffer, so that the temporaries are bounded by the memory
+budget instead of the image size. The memory of the whole process is bounded only for the .npy input and output,
+which are memory-mapped. The encoded images (png, jpg, etc.) are decoded and encoded whole by OpenCV, which holds
+them in the memory at once.
+"""
+from ..composite.compact_mask import CompactMask
+from ..composite.composite_img import composite_img
+from ..composite.composite_img import merge_nonzero
+from ..imgio.img_writer import get_encode_options
+from ..imgio.img_writer import write_img
+from ..trace.tracer import dump_debug_img
+from ..trace.tracer import trace_stage
+from . import stroke_img
+from .stroke_engine import ZOOM_OPTION_DILATE
+from .stroke_engine import ZOOM_OPTION_DISTANCE
+from .stroke_img import get_human_mask
+from .stroke_img import get_stroke_mask
+from .stroke_img import zoom_mask
+from typing import Any
+from typing import Iterator
+from typing import List
+from typing import Tuple
+from typing import Union
+
+import os
+import tempfile
+import warnings
+import cv2
+import numpy as np
+
+# Bytes of the temporaries per pixel of a strip, i.e. the upsampled human, scaled and stroke masks and the
+# thresholded masks and the blend buffers of the compositing
+strip_bytes_per_pixel = 16
+
+encoded_input_warning = ('The encoded input image is decoded whole, so the memory grows with the image size. Only '
+                         'the .npy input is memory-mapped within the memory budget')
+encoded_output_warning = ('The encoded output image is encoded whole, so the memory grows with the image size. Only '
+                          'the .npy output is memory-mapped within the memory budget')
+
+
+def get_strip_rows(width: int, memory_budget_mb: int) -> int:
+    """
+    It returns the number of rows of each strip so that the temporaries of a strip fit in the memory budget.
+
+    :param width: The width of the image
+    :type width: int
+    :param memory_budget_mb: The memory budget of the temporaries in MiB
+    :type memory_budget_mb: int
+    :return: Returns the number of rows, at least 1
+    :rtype: int
+    """
+    return max(1, memory_budget_mb * 1024 * 1024 // (width * strip_bytes_per_pixel))
+
+
+def iter_strips(height: int, strip_rows: int) -> Iterator[Tuple[int, int]]:
+    """
+    It yields the first and the last (exclusive) row of each strip of the image.
+
+    :param height: The height of the image
+    :type height: int
+    :param strip_rows: Number of rows of each strip
+    :type strip_rows: int
+    """
+    for row_start in range(0, height, strip_rows):
+        yield row_start, min(row_start + strip_rows, height)
+
+
+def get_proxy_img(img_org: Any, proxy_size: int = 1024) -> Any:
+    """
+    It downscales the image so that its long edge is the proxy size. The smaller images are returned as they are.
+
+    :param img_org: It is the decoded (BGR) image
+    :type img_org: Any
+    :param proxy_size: The long edge of the proxy image in pixels, defaults to 1024
+    :type proxy_size: int, optional
+    :return: Returns the proxy image
+    :rtype: Any
+    """
+    height, width = img_org.shape[:2]
+    scale = proxy_size / max(height, width)
+    if scale >= 1.:
+        return img_org
+
+    proxy_width, proxy_height = max(1, int(round(width * scale))), max(1, int(round(height * scale)))
+    return cv2.resize(img_org, (proxy_width, proxy_height), interpolation=cv2.INTER_AREA)
+
+
+def resize_strip(img: Any, width: int, height: int, row_start: int, row_end: int, out: Any = None) -> Any:
+    """
+    It resizes the given image to the width and the height but computes the given rows only, like slicing the rows
+    out of cv2.resize with the bilinear interpolation without building the full size image.
+
+    :param img: The image or the mask to be resized
+    :type img: Any
+    :param width: The width of the full size image
+    :type width: int
+    :param height: The height of the full size image
+    :type height: int
+    :param row_start: The first row of the strip
+    :type row_start: int
+    :param row_end: The last row (exclusive) of the strip
+    :type row_end: int
+    :param out: The output buffer of the strip size, defaults to None
+    :type out: Any, optional
+    :return: Returns the resized rows
+    :rtype: Any
+    """
+    scaleX, scaleY = img.shape[1] / width, img.shape[0] / height
+    # The inverse map of the pixel centers of the strip in the full size image to the given image
+    inverse_mat = np.float32([[scaleX, 0, 0.5 * scaleX - 0.5], [0, scaleY, (row_start + 0.5) * scaleY - 0.5]])
+
+    return cv2.warpAffine(img, inverse_mat, (width, row_end - row_start), dst=out,
+                          flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP, borderMode=cv2.BORDER_REPLICATE)
+
+
+def get_proxy_masks(model_session: Any, img_org: Any, zooming_factor: float, zoom_option: int = 1,
+                    stroke_width: int = 0, proxy_size: int = 1024, mask_cache: Any = None,
+                    kernel_shape: str = 'ellipse', anti_alias: bool = True) -> Tuple[Any, Any]:
+    """
+    It segments the human on the proxy of the image and scales the mask at the proxy resolution. The stroke width
+    in the pixels of the full size image is scaled down to the proxy too.
+
+    :param model_session: The session that holds what unet2 familiy of the model to be used
+    :type model_session: Any
+    :param img_org: It is the decoded (BGR) full size image
+    :type img_org: Any
+    :param zooming_factor: It is the scaling factor to determing the outline stroke thickness.
+    :type zooming_factor: float
+    :param zoom_option: The zoom option of zoom_mask that selects the stroke algorithm, defaults to 1
+    :type zoom_option: int, optional
+    :param stroke_width: The stroke thickness in pixels of the full size image for the zoom options 3 and 4,
+    defaults to 0
+    :type stroke_width: int, optional
+    :param proxy_size: The long edge of the proxy image in pixels, defaults to 1024
+    :type proxy_size: int, optional
+    :param mask_cache: The MaskCache that holds the already computed human masks of the proxies, defaults to None
+    :type mask_cache: Any, optional
+    :param kernel_shape: The shape that grows the mask for the zoom options 3 and 4, i.e. 'ellipse', 'rect' or
+    'cross', defaults to 'ellipse'
+    :type kernel_shape: str, optional
+    :param anti_alias: Whether the stroke of the zoom option 4 is anti-aliased, defaults to True
+    :type anti_alias: bool, optional
+    :return: Returns the human mask and the scaled mask at the proxy resolution
+    :rtype: Tuple[Any, Any]
+    """
+    with trace_stage('proxy', img_org):
+        img_proxy = get_proxy_img(img_org, proxy_size)
+
+    proxy_mask = get_human_mask(model_session, img_proxy, mask_cache)
+
+    if stroke_width > 0 and (zoom_option == ZOOM_OPTION_DILATE or zoom_option == ZOOM_OPTION_DISTANCE):
+        stroke_width = max(1, int(round(stroke_width * img_proxy.shape[1] / img_org.shape[1])))
+
+    with trace_stage('zoom_mask', proxy_mask):
+        proxy_scale_mask = zoom_mask(proxy_mask, zooming_factor, zoom_option=zoom_option, stroke_width=stroke_width,
+                                     kernel_shape=kernel_shape, anti_alias=anti_alias)
+
+    return proxy_mask, proxy_scale_mask
+
+
+def apply_img_stroke_tiled(img_org: Any, proxy_mask: Any, proxy_scale_mask: Any,
+                           color: Union[List[int], Tuple[int, int, int]], zoom_option: int = 1, img_bg: Any = None,
+                           out: Any = None, memory_budget_mb: int = 256) -> Any:
+    """
+    It strokes the outline of the human strip by strip. The masks of the proxy are upsampled for the rows of each
+    strip only, the background (if any) is resized into the strip of the output buffer and the stroke color and
+    the human are composited over it in place.
+
+    :param img_org: It is the decoded (BGR) full size image, which may be memory-mapped
+    :type img_org: Any
+    :param proxy_mask: The human mask or its CompactMask at the proxy resolution
+    :type proxy_mask: Any
+    :param proxy_scale_mask: The scaled mask or its CompactMask at the proxy resolution
+    :type proxy_scale_mask: Any
+    :param color: This color indicated the color of the stroke area
+    :type color: Union[List[int], Tuple[int, int, int]]
+    :param zoom_option: The zoom option used for the scaled mask, defaults to 1
+    :type zoom_option: int, optional
+    :param img_bg: It is the decoded (BGR) background of any size. None strokes the human over the image itself,
+    defaults to None
+    :type img_bg: Any, optional
+    :param out: The output buffer of the image size, e.g. a numpy memmap. None allocates it in memory, defaults to
+    None
+    :type out: Any, optional
+    :param memory_budget_mb: The memory budget of the temporaries of a strip in MiB, defaults to 256
+    :type memory_budget_mb: int, optional
+    :return: Returns the output buffer that holds the stroked image
+    :rtype: Any
+    """
+    RChannel, GChannel, BChannel = color
+    height, width = img_org.shape[:2]
+    out = np.empty_like(img_org) if out is None else out
+
+    if isinstance(proxy_mask, CompactMask):
+        proxy_mask = proxy_mask.to_array()
+    if isinstance(proxy_scale_mask, CompactMask):
+        proxy_scale_mask = proxy_scale_mask.to_array()
+
+    for row_start, row_end in iter_strips(height, get_strip_rows(width, memory_budget_mb)):
+        img_strip, out_strip = img_org[row_start:row_end], out[row_start:row_end]
+
+        with trace_stage('upsample_mask'):
+            mask_strip = resize_strip(proxy_mask, width, height, row_start, row_end)
+            scale_mask_strip = resize_strip(proxy_scale_mask, width, height, row_start, row_end)
+
+        if img_bg is None:
+            stroke_mask_strip = get_stroke_mask(mask_strip, scale_mask_strip, zoom_option)
+            with trace_stage('overlay', out_strip):
+                composite_img(img_strip, (BChannel, GChannel, RChannel), stroke_mask_strip, out_strip,
+                              zoom_option == ZOOM_OPTION_DISTANCE)
+            continue
+
+        with trace_stage('resize_bg', out_strip):
+            resize_strip(img_bg, width, height, row_start, row_end, out_strip)
+
+        # The same merging as overlay_img_with_bg, strip by strip
+        with trace_stage('overlay', out_strip):
+            if zoom_option == ZOOM_OPTION_DISTANCE:
+                composite_img(out_strip, (BChannel, GChannel, RChannel), scale_mask_strip, out_strip)
+                composite_img(out_strip, img_strip, mask_strip, out_strip, partial_blend=False)
+            else:
+                composite_img(out_strip, 0, scale_mask_strip, out_strip, partial_blend=False)
+                merge_nonzero(out_strip, (BChannel, GChannel, RChannel),
+                              get_stroke_mask(mask_strip, scale_mask_strip, zoom_option))
+                merge_nonzero(out_strip, img_strip, mask_strip)
+
+    return out
+
+
+def write_tiled_output(out_file_path: str, shape: Tuple[int, ...], write_fn: Any,
+                       encode_options: Any = None) -> None:
+    """
+    It lets the write function fill the memory-mapped output buffer of the given shape and stores it. The .npy
+    output is the memory map itself, the other formats are encoded from a temporary memory map next to the output
+    file. OpenCV encodes them whole, so it warns that their encoding buffers grow with the image size.
+
+    :param out_file_path: It is the ouput path where the stroked image has to be placed
+    :type out_file_path: str
+    :param shape: The shape of the output image
+    :type shape: Tuple[int, ...]
+    :param write_fn: It fills the given output buffer
+    :type write_fn: Any
+    :param encode_options: The EncodeOptions of the output format and its compression or quality. The format
+    replaces the .npy output too, defaults to None
+    :type encode_options: Any, optional
+    """
+    out_file_path = get_encode_options(encode_options).get_output_path(out_file_path)
+    if out_file_path.lower().endswith('.npy'):
+        out = np.lib.format.open_memmap(out_file_path, mode='w+', dtype='uint8', shape=shape)
+        write_fn(out)
+        out.flush()
+        return
+
+    warnings.warn(encoded_output_warning, stacklevel=2)
+
+    temp_file, temp_file_path = tempfile.mkstemp(suffix='.raw', dir=os.path.dirname(os.path.abspath(out_file_path)))
+    os.close(temp_file)
+    try:
+        out = np.memmap(temp_file_path, mode='w+', dtype='uint8', shape=shape)
+        write_fn(out)
+
+        write_img(out_file_path, out, encode_options)
+        del out
+    finally:
+        os.remove(temp_file_path)
+
+
+def read_tiled_input(in_file_path: str) -> Any:
+    """
+    It reads the input image. The .npy input is memory-mapped instead of being read into the process memory. The
+    other formats are decoded whole, so it warns that they are not bounded by the memory budget.
+
+    :param in_file_path: It is the input path of the image file or the .npy array of the BGR image
+    :type in_file_path: str
+    :return: Returns the decoded (BGR) image
+    :rtype: Any
+    """
+    with trace_stage('imread'):
+        if in_file_path.lower().endswith('.npy'):
+            img = np.load(in_file_path, mmap_mode='r')
+        else:
+            warnings.warn(encoded_input_warning, stacklevel=2)
+            img = cv2.imread(in_file_path)
+
+    if img is None:
+        raise IOError('Unable to read the image file {}'.format(in_file_path))
+
+    return img
+
+
+def add_img_stroke_tiled(model_session: Any, in_file_path: str, out_file_path: str,
+                         color: Union[List[int], Tuple[int, int, int]], zooming_factor: float,
+                         mask_cache: Any = None, zoom_option: int = 1, stroke_width: int = 0,
+                         proxy_size: int = 1024, memory_budget_mb: int = 256, encode_options: Any = None,
+                         kernel_shape: str = 'ellipse', anti_alias: bool = True) -> None:
+    """
+    This utility function implements the outline stroking feature for any human in the given very large image
+    with the temporaries bounded by the memory budget. The .npy input and output (BGR uint8 arrays) are
+    memory-mapped, so that neither of them is held in the process memory.
+
+    :param model_session: The session that holds what unet2 familiy of the model to be used
+    :type model_session: Any
+    :param in_file_path: It is the input path of the file with human image to be processed
+    :type in_file_path: str
+    :param out_file_path: It is the ouput path where the stroked image has to be placed
+    :type out_file_path: str
+    :param color: This color indicated the color of the stroke area
+    :type color: Union[List[int], Tuple[int, int, int]]
+    :param zooming_factor: It is the scaling factor to determing the outline stroke thickness.
+    Always use the value between 1.01 to 1.09
+    :type zooming_factor: float
+    :param mask_cache: The MaskCache that holds the already computed human masks, defaults to None
+    :type mask_cache: Any, optional
+    :param zoom_option: The zoom option of zoom_mask that selects the stroke algorithm, defaults to 1
+    :type zoom_option: int, optional
+    :param stroke_width: The stroke thickness in pixels for the zoom options 3 and 4, defaults to 0
+    :type stroke_width: int, optional
+    :param proxy_size: The long edge of the proxy image that is segmented, defaults to 1024
+    :type proxy_size: int, optional
+    :param memory_budget_mb: The memory budget of the temporaries of a strip in MiB, defaults to 256
+    :type memory_budget_mb: int, optional
+    :param encode_options: The EncodeOptions of the output format and its compression or quality, defaults to None
+    :type encode_options: Any, optional
+    :param kernel_shape: The shape that grows the mask for the zoom options 3 and 4, i.e. 'ellipse', 'rect' or
+    'cross', defaults to 'ellipse'
+    :type kernel_shape: str, optional
+    :param anti_alias: Whether the stroke of the zoom option 4 is anti-aliased, defaults to True
+    :type anti_alias: bool, optional
+    """
+    img_org = read_tiled_input(in_file_path)
+    proxy_mask, proxy_scale_mask = get_proxy_masks(model_session, img_org, zooming_factor, zoom_option,
+                                                   stroke_width, proxy_size, mask_cache, kernel_shape, anti_alias)
+
+    dump_debug_img('d002_unet2_proxy_mask_image', proxy_mask, stroke_img.visual_debug_sink)
+    dump_debug_img('d003_unet2_proxy_mask_scaled_image', proxy_scale_mask, stroke_img.visual_debug_sink)
+
+    write_tiled_output(out_file_path, img_org.shape,
+                       lambda out: apply_img_stroke_tiled(img_org, proxy_mask, proxy_scale_mask, color, zoom_option,
+                                                          None, out, memory_budget_mb), encode_options)
+
+
+def add_img_stroke_with_bg_tiled(model_session: Any, in_file_path: str, bg_file_path: str, out_file_path: str,
+                                 color: Union[List[int], Tuple[int, int, int]], zooming_factor: float,
+                                 mask_cache: Any = None, zoom_option: int = 1, stroke_width: int = 0,
+                                 proxy_size: int = 1024, memory_budget_mb: int = 256,
+                                 encode_options: Any = None, kernel_shape: str = 'ellipse',
+                                 anti_alias: bool = True) -> None:
+    """
+    This utility function implements the outline stroking feature for any human and superimposes the stroked
+    human with the background image for the very large images with the temporaries bounded by the memory budget.
+    The background is resized strip by strip straight into the output buffer.
+
+    :param model_session: The session that holds what unet2 familiy of the model to be used
+    :type model_session: Any
+    :param in_file_path: It is the input path of the file with human image to be processed
+    :type in_file_path: str
+    :param bg_file_path: This image path that holds the scenic (or some sort of) backgorund information
+    :type bg_file_path: str
+    :param out_file_path: It is the ouput path where the merged image has to be placed
+    :type out_file_path: str
+    :param color: This color indicated the color of the stroke area
+    :type color: Union[List[int], Tuple[int, int, int]]
+    :param zooming_factor: It is the scaling factor to determing the outline stroke thickness.
+    Always use the value between 1.01 to 1.09
+    :type zooming_factor: float
+    :param mask_cache: The MaskCache that holds the already computed human masks, defaults to None
+    :type mask_cache: Any, optional
+    :param zoom_option: The zoom option of zoom_mask that selects the stroke algorithm, defaults to 1
+    :type zoom_option: int, optional
+    :param stroke_width: The stroke thickness in pixels for the zoom options 3 and 4, defaults to 0
+    :type stroke_width: int, optional
+    :param proxy_size: The long edge of the proxy image that is segmented, defaults to 1024
+    :type proxy_size: int, optional
+    :param memory_budget_mb: The memory budget of the temporaries of a strip in MiB, defaults to 256
+    :type memory_budget_mb: int, optional
+    :param encode_options: The EncodeOptions of the output format and its compression or quality, defaults to None
+    :type encode_options: Any, optional
+    :param kernel_shape: The shape that grows the mask for the zoom options 3 and 4, i.e. 'ellipse', 'rect' or
+    'cross', defaults to 'ellipse'
+    :type kernel_shape: str, optional
+    :param anti_alias: Whether the stroke of the zoom option 4 is anti-aliased, defaults to True
+    :type anti_alias: bool, optional
+    """
+    img_org, img_bg = read_tiled_input(in_file_path), read_tiled_input(bg_file_path)
+    proxy_mask, proxy_scale_mask = get_proxy_masks(model_session, img_org, zooming_factor, zoom_option,
+                                                   stroke_width, proxy_size, mask_cache, kernel_shape, anti_alias)
+
+    dump_debug_img('d002_unet2_proxy_mask_image', proxy_mask, stroke_img.visual_debug_sink)
+    dump_debug_img('d003_unet2_proxy_mask_scaled_image', proxy_scale_mask, stroke_img.visual_debug_sink)
+
+    write_tiled_output(out_file_path, img_org.shape,
+                       lambda out: apply_img_stroke_tiled(img_org, proxy_mask, proxy_scale_mask, color, zoom_option,
+                                                          img_bg, out, memory_budget_mb), encode_options)
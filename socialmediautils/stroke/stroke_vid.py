@@ -0,0 +1,241 @@
+""" This module implements the outline stroke feature for human in the given videos
+"""
+from ..imgio.video_io import get_frame_signature
+from ..imgio.video_io import get_video_info
+from ..imgio.video_io import open_video_writer
+from ..imgio.video_io import read_video_frames
+from .stroke_img import apply_img_stroke
+from .stroke_img import apply_img_stroke_with_bg
+from .stroke_img import get_human_mask
+from typing import Any
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+import cv2
+import numpy as np
+
+video_extensions = ('mp4', 'avi', 'mov', 'mkv')
+
+
+def get_flow_gray(frame: Any, flow_width: int = 320) -> Tuple[Any, float]:
+    """
+    It returns the downscaled grayscale frame used for tracking the motion between the frames.
+
+    :param frame: The decoded (BGR) frame
+    :type frame: Any
+    :param flow_width: The width of the downscaled frame, defaults to 320
+    :type flow_width: int, optional
+    :return: Returns the downscaled grayscale frame and its scale with respect to the given frame
+    :rtype: Tuple[Any, float]
+    """
+    scale = min(1.0, flow_width / frame.shape[1])
+    frame_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    if scale < 1.0:
+        frame_gray = cv2.resize(frame_gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    return frame_gray, scale
+
+
+def propagate_mask(prev_gray: Any, cur_gray: Any, scale: float, prev_mask: Any) -> Any:
+    """
+    It warps the mask of the previous frame to the current frame with the global motion (similarity transform)
+    estimated out of the sparse optical flow between the frames. The previous mask is returned as it is if the
+    motion cannot be estimated.
+
+    :param prev_gray: The downscaled grayscale previous frame
+    :type prev_gray: Any
+    :param cur_gray: The downscaled grayscale current frame
+    :type cur_gray: Any
+    :param scale: The scale of the downscaled frames with respect to the mask
+    :type scale: float
+    :param prev_mask: The human mask of the previous frame
+    :type prev_mask: Any
+    :return: Returns the human mask warped to the current frame
+    :rtype: Any
+    """
+    prev_points = cv2.goodFeaturesToTrack(prev_gray, maxCorners=200, qualityLevel=0.01, minDistance=8)
+    if prev_points is None or len(prev_points) < 6:
+        return prev_mask
+
+    cur_points, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, cur_gray, prev_points, None)
+    tracked = status.ravel() == 1
+    if tracked.sum() < 6:
+        return prev_mask
+
+    warp_mat, _ = cv2.estimateAffinePartial2D(prev_points[tracked], cur_points[tracked])
+    if warp_mat is None:
+        return prev_mask
+
+    warp_mat[:, 2] /= scale
+    height, width = prev_mask.shape[:2]
+
+    return cv2.warpAffine(prev_mask, warp_mat, (width, height), flags=cv2.INTER_LINEAR)
+
+
+def read_bg_frames(bg_file_path: str) -> Iterator[Any]:
+    """
+    It streams the background for every frame. A background video is looped if it is shorter than the input video
+    whereas a background image is repeated for every frame.
+
+    :param bg_file_path: The background image or video file with path
+    :type bg_file_path: str
+    :return: Yields the decoded (BGR) background frames
+    :rtype: Iterator[Any]
+    """
+    if not bg_file_path.lower().endswith(video_extensions):
+        img_bg = cv2.imread(bg_file_path)
+        if img_bg is None:
+            raise IOError('Unable to read the background image file {}'.format(bg_file_path))
+        while True:
+            yield img_bg
+
+    while True:
+        has_frames = False
+        for bg_frame in read_video_frames(bg_file_path):
+            has_frames = True
+            yield bg_frame
+
+        if not has_frames:
+            raise IOError('There is no frame in the background video file {}'.format(bg_file_path))
+
+
+def add_video_stroke(model_session: Any, in_file_path: str, out_file_path: str,
+                     color: Union[List[int], Tuple[int, int, int]], zooming_factor: float,
+                     bg_file_path: Optional[str] = None, resegment_interval: int = 1,
+                     diff_threshold: Optional[float] = None, fourcc: str = 'mp4v', zoom_option: int = 1,
+                     stroke_width: int = 0, kernel_shape: str = 'ellipse', anti_alias: bool = True) -> int:
+    """
+    This utility function implements the outline stroking feature for any human in the given video, optionally
+    superimposing the stroked human with a static background image or a per-frame background video. The frames are
+    streamed from the input video and into the output video, so that the memory usage does not depend on the length
+    of the video. The segmentation can be skipped for the frames close to the last segmented frame by warping the
+    previous mask along the motion between the frames.
+
+    :param model_session: The session that holds what unet2 familiy of the model to be used
+    :type model_session: Any
+    :param in_file_path: It is the input path of the video to be processed
+    :type in_file_path: str
+    :param out_file_path: It is the ouput path where the merged video has to be placed
+    :type out_file_path: str
+    :param color: This color indicated the color of the stroke area
+    :type color: Union[List[int], Tuple[int, int, int]]
+    :param zooming_factor: It is the scaling factor to determing the outline stroke thickness.
+    Always use the value between 1.01 to 1.09
+    :type zooming_factor: float
+    :param bg_file_path: The background image or video path. If None then there is no background, defaults to None
+    :type bg_file_path: Optional[str], optional
+    :param resegment_interval: The maximum frame interval at which the segmentation is run. 1 segments every frame,
+    defaults to 1
+    :type resegment_interval: int, optional
+    :param diff_threshold: The mean absolute frame difference (0-255) to the last segmented frame up to which the
+    previous mask is warped instead of segmenting. None segments at every resegment_interval only, defaults to None
+    :type diff_threshold: Optional[float], optional
+    :param fourcc: The four character code of the output video codec, defaults to 'mp4v'
+    :type fourcc: str, optional
+    :param zoom_option: The zoom option of zoom_mask that selects the stroke algorithm, defaults to 1
+    :type zoom_option: int, optional
+    :param stroke_width: The stroke thickness in pixels for the zoom options 3 and 4, defaults to 0
+    :type stroke_width: int, optional
+    :param kernel_shape: The shape that grows the mask for the zoom options 3 and 4, i.e. 'ellipse', 'rect' or
+    'cross', defaults to 'ellipse'
+    :type kernel_shape: str, optional
+    :param anti_alias: Whether the stroke of the zoom option 4 is anti-aliased, defaults to True
+    :type anti_alias: bool, optional
+    :return: Returns the number of frames written
+    :rtype: int
+    """
+    fps, width, height, _ = get_video_info(in_file_path)
+    video_writer = open_video_writer(out_file_path, fps, width, height, fourcc)
+    bg_frames = read_bg_frames(bg_file_path) if bg_file_path is not None else None
+
+    total_frames = 0
+    frames_since_segment = 0
+    key_signature = None
+    prev_gray = None
+    prev_mask = None
+
+    try:
+        for frame in read_video_frames(in_file_path):
+            total_frames += 1
+            frames_since_segment += 1
+
+            signature = get_frame_signature(frame)
+            cur_gray, scale = get_flow_gray(frame)
+
+            segment_frame = prev_mask is None or frames_since_segment >= resegment_interval
+            if not segment_frame and diff_threshold is not None:
+                segment_frame = float(np.mean(np.abs(signature - key_signature))) > diff_threshold
+
+            if segment_frame:
+                frame_mask = get_human_mask(model_session, frame)
+                key_signature = signature
+                frames_since_segment = 0
+            else:
+                frame_mask = propagate_mask(prev_gray, cur_gray, scale, prev_mask)
+
+            if bg_frames is not None:
+                img_blended = apply_img_stroke_with_bg(frame, next(bg_frames), frame_mask, color, zooming_factor,
+                                                       zoom_option, stroke_width, kernel_shape=kernel_shape,
+                                                       anti_alias=anti_alias)
+            else:
+                img_blended = apply_img_stroke(frame, frame_mask, color, zooming_factor, zoom_option, stroke_width,
+                                               kernel_shape=kernel_shape, anti_alias=anti_alias)
+
+            video_writer.write(img_blended)
+
+            prev_gray = cur_gray
+            prev_mask = frame_mask
+    finally:
+        video_writer.release()
+
+    return total_frames
+
+
+def add_video_stroke_with_bg(model_session: Any, in_file_path: str, bg_file_path: str, out_file_path: str,
+                             color: Union[List[int], Tuple[int, int, int]], zooming_factor: float,
+                             resegment_interval: int = 1, diff_threshold: Optional[float] = None,
+                             fourcc: str = 'mp4v', zoom_option: int = 1, stroke_width: int = 0,
+                             kernel_shape: str = 'ellipse', anti_alias: bool = True) -> int:
+    """
+    This utility function implements the outline stroking feature for any human in the given video and superimpose
+    the stroked human with the scenic (sort of) background image or the per-frame background video.
+
+    :param model_session: The session that holds what unet2 familiy of the model to be used
+    :type model_session: Any
+    :param in_file_path: It is the input path of the video with human to be processed
+    :type in_file_path: str
+    :param bg_file_path: This image or video path that holds the scenic (or some sort of) backgorund information
+    :type bg_file_path: str
+    :param out_file_path: It is the ouput path where the merged video has to be placed
+    :type out_file_path: str
+    :param color: This color indicated the color of the stroke area
+    :type color: Union[List[int], Tuple[int, int, int]]
+    :param zooming_factor: It is the scaling factor to determing the outline stroke thickness.
+    Always use the value between 1.01 to 1.09
+    :type zooming_factor: float
+    :param resegment_interval: The maximum frame interval at which the segmentation is run. 1 segments every frame,
+    defaults to 1
+    :type resegment_interval: int, optional
+    :param diff_threshold: The mean absolute frame difference (0-255) to the last segmented frame up to which the
+    previous mask is warped instead of segmenting. None segments at every resegment_interval only, defaults to None
+    :type diff_threshold: Optional[float], optional
+    :param fourcc: The four character code of the output video codec, defaults to 'mp4v'
+    :type fourcc: str, optional
+    :param zoom_option: The zoom option of zoom_mask that selects the stroke algorithm, defaults to 1
+    :type zoom_option: int, optional
+    :param stroke_width: The stroke thickness in pixels for the zoom options 3 and 4, defaults to 0
+    :type stroke_width: int, optional
+    :param kernel_shape: The shape that grows the mask for the zoom options 3 and 4, i.e. 'ellipse', 'rect' or
+    'cross', defaults to 'ellipse'
+    :type kernel_shape: str, optional
+    :param anti_alias: Whether the stroke of the zoom option 4 is anti-aliased, defaults to True
+    :type anti_alias: bool, optional
+    :return: Returns the number of frames written
+    :rtype: int
+    """
+    return add_video_stroke(model_session, in_file_path, out_file_path, color, zooming_factor, bg_file_path,
+                            resegment_interval, diff_threshold, fourcc, zoom_option, stroke_width, kernel_shape,
+                            anti_alias)
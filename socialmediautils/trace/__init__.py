@@ -0,0 +1,12 @@
+""" This module implements the per-stage instrumentation of the pipelines and the debug image sink
+"""
+from typing import Any
+from .tracer import DebugImageSink
+from .tracer import Tracer
+from .tracer import debug_images
+from .tracer import dump_debug_img
+from .tracer import get_peak_rss_mb
+from .tracer import get_rss_mb
+from .tracer import get_tracer
+from .tracer import trace_stage
+from .tracer import tracing
@@ -0,0 +1,344 @@
+""" This module implements the context scoped tracer that records the timing, the array shapes and the memory of
+each pipeline stage, and the debug image sink that stores the intermediate images under unique names. Both are off
+unless they are activated for the current context, in which case a stage costs only a context variable lookup.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+import cv2
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+current_tracer: ContextVar[Optional['Tracer']] = ContextVar('current_tracer', default=None)
+current_debug_sink: ContextVar[Optional['DebugImageSink']] = ContextVar('current_debug_sink', default=None)
+
+page_size = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def get_peak_rss_mb() -> Optional[float]:
+    """
+    It returns the peak resident memory of this process so far.
+
+    :return: Returns the peak RSS in MiB, None if the platform does not report it
+    :rtype: Optional[float]
+    """
+    if resource is None:
+        return None
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports the peak RSS in KiB, macOS in bytes
+    max_rss_bytes = max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+    return round(max_rss_bytes / (1024 * 1024), 1)
+
+
+def get_rss_mb() -> Optional[float]:
+    """
+    It returns the current resident memory of this process out of /proc/self/statm. Unlike the peak RSS, it drops
+    again once a stage frees its temporaries, so the RSS at the start and the end of a stage tell what it kept.
+
+    :return: Returns the current RSS in MiB, None if the platform has no /proc/self/statm
+    :rtype: Optional[float]
+    """
+    try:
+        with open('/proc/self/statm') as statm_file:
+            resident_pages = int(statm_file.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+
+    return round(resident_pages * page_size / (1024 * 1024), 1)
+
+
+class Tracer:
+    """
+    It records the stages traced within its context. Each stage event holds the name, the start and the duration
+    in milliseconds, the thread, the shapes of the given arrays, the current RSS at the end of the stage, its change
+    since the start of the stage and the exception type if the stage failed. The RSS is of the whole process, so the
+    change of a stage overlapping the stages of the other threads includes theirs. The events are also passed to the
+    callbacks, e.g. a metrics sink. It is safe to be shared between threads.
+    """
+
+    def __init__(self, callbacks: Optional[List[Callable[[Dict[str, Any]], None]]] = None,
+                 record_memory: bool = True) -> None:
+        """
+        :param callbacks: The functions called with each stage event as it is recorded, defaults to None
+        :type callbacks: Optional[List[Callable[[Dict[str, Any]], None]]], optional
+        :param record_memory: It records the RSS at the start and the end of each stage, defaults to True
+        :type record_memory: bool, optional
+        """
+        self.callbacks = list(callbacks or [])
+        self.record_memory = record_memory
+        self.events: List[Dict[str, Any]] = []
+        self.origin_ns = time.perf_counter_ns()
+        self.lock = threading.Lock()
+
+    def record(self, stage_name: str, start_ns: int, end_ns: int, arrays: tuple = (),
+               error: Optional[str] = None, start_rss_mb: Optional[float] = None) -> None:
+        """
+        It records a finished stage.
+
+        :param stage_name: Name of the stage
+        :type stage_name: str
+        :param start_ns: The perf_counter_ns at the start of the stage
+        :type start_ns: int
+        :param end_ns: The perf_counter_ns at the end of the stage
+        :type end_ns: int
+        :param arrays: The arrays (images, masks) the stage worked on, defaults to ()
+        :type arrays: tuple, optional
+        :param error: The exception type name if the stage failed, defaults to None
+        :type error: Optional[str], optional
+        :param start_rss_mb: The RSS in MiB at the start of the stage, defaults to None
+        :type start_rss_mb: Optional[float], optional
+        """
+        rss_mb = get_rss_mb() if self.record_memory else None
+        rss_delta_mb = round(rss_mb - start_rss_mb, 1) if rss_mb is not None and start_rss_mb is not None else None
+
+        event = {'name': stage_name, 'start_ms': (start_ns - self.origin_ns) / 1e6,
+                 'duration_ms': (end_ns - start_ns) / 1e6, 'thread': threading.get_ident(),
+                 'shapes': [list(array.shape) for array in arrays if hasattr(array, 'shape')],
+                 'rss_mb': rss_mb, 'rss_delta_mb': rss_delta_mb, 'error': error}
+
+        with self.lock:
+            self.events.append(event)
+
+        for callback in self.callbacks:
+            callback(event)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        It aggregates the recorded events by the stage name.
+
+        :return: Returns the count, the total, the mean and the max duration in milliseconds of each stage
+        :rtype: Dict[str, Dict[str, float]]
+        """
+        with self.lock:
+            events = list(self.events)
+
+        stage_summary: Dict[str, Dict[str, float]] = {}
+        for event in events:
+            stage_stats = stage_summary.setdefault(event['name'], {'count': 0, 'total_ms': 0., 'max_ms': 0.})
+            stage_stats['count'] += 1
+            stage_stats['total_ms'] += event['duration_ms']
+            stage_stats['max_ms'] = max(stage_stats['max_ms'], event['duration_ms'])
+
+        for stage_stats in stage_summary.values():
+            stage_stats['mean_ms'] = stage_stats['total_ms'] / stage_stats['count']
+
+        return stage_summary
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """
+        It converts the recorded events into the Chrome trace event format, to be opened in chrome://tracing or
+        Perfetto.
+
+        :return: Returns the trace as a JSON serializable dict
+        :rtype: Dict[str, Any]
+        """
+        with self.lock:
+            events = list(self.events)
+
+        pid = os.getpid()
+        trace_events = [{'name': event['name'], 'ph': 'X', 'ts': event['start_ms'] * 1000.,
+                         'dur': event['duration_ms'] * 1000., 'pid': pid, 'tid': event['thread'],
+                         'args': {'shapes': event['shapes'], 'rss_mb': event['rss_mb'],
+                                  'rss_delta_mb': event['rss_delta_mb'], 'error': event['error']}} for event in events]
+
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+
+    def save_chrome_trace(self, out_file_path: str) -> None:
+        """
+        It stores the recorded events as the Chrome trace JSON file.
+
+        :param out_file_path: The path of the JSON file
+        :type out_file_path: str
+        """
+        with open(out_file_path, 'w') as out_file:
+            json.dump(self.to_chrome_trace(), out_file)
+
+
+class TraceStage:
+    """
+    It is the context manager that measures a single stage for the given tracer.
+    """
+
+    __slots__ = ('tracer', 'stage_name', 'arrays', 'start_ns', 'start_rss_mb')
+
+    def __init__(self, tracer: Tracer, stage_name: str, arrays: tuple) -> None:
+        self.tracer = tracer
+        self.stage_name = stage_name
+        self.arrays = arrays
+        self.start_ns = 0
+        self.start_rss_mb: Optional[float] = None
+
+    def __enter__(self) -> 'TraceStage':
+        self.start_rss_mb = get_rss_mb() if self.tracer.record_memory else None
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type: Any, exc_value: Any, traceback: Any) -> bool:
+        self.tracer.record(self.stage_name, self.start_ns, time.perf_counter_ns(), self.arrays,
+                           exc_type.__name__ if exc_type is not None else None, self.start_rss_mb)
+        return False
+
+
+class NullStage:
+    """
+    It is the context manager of a stage when no tracer is active. It does nothing.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self) -> 'NullStage':
+        return self
+
+    def __exit__(self, exc_type: Any, exc_value: Any, traceback: Any) -> bool:
+        return False
+
+
+null_stage = NullStage()
+
+
+def get_tracer() -> Optional[Tracer]:
+    """
+    It returns the tracer active in the current context.
+
+    :return: Returns the tracer, None if the tracing is off
+    :rtype: Optional[Tracer]
+    """
+    return current_tracer.get()
+
+
+def trace_stage(stage_name: str, *arrays: Any) -> Any:
+    """
+    It returns the context manager that traces the code block as the given stage, if a tracer is active in the
+    current context. Otherwise it returns the shared no-op context manager.
+
+    :param stage_name: Name of the stage, e.g. 'imread', 'remove', 'zoom_mask', 'overlay' or 'imwrite'
+    :type stage_name: str
+    :param arrays: The arrays the stage works on, whose shapes are recorded
+    :type arrays: Any
+    :return: Returns the context manager of the stage
+    :rtype: Any
+    """
+    tracer = current_tracer.get()
+    if tracer is None:
+        return null_stage
+
+    return TraceStage(tracer, stage_name, arrays)
+
+
+@contextmanager
+def tracing(tracer: Optional[Tracer] = None) -> Iterator[Tracer]:
+    """
+    It activates the tracer for the code block. The worker threads started from the block are traced only if they
+    run in a copy of the context, like the ones of run_folder_pipeline.
+
+    :param tracer: The tracer to be activated. None creates a new one, defaults to None
+    :type tracer: Optional[Tracer], optional
+    :return: Returns the active tracer
+    :rtype: Iterator[Tracer]
+    """
+    tracer = tracer if tracer is not None else Tracer()
+    token = current_tracer.set(tracer)
+    try:
+        yield tracer
+    finally:
+        current_tracer.reset(token)
+
+
+class DebugImageSink:
+    """
+    It stores the intermediate images of the pipelines into the given folder. Each image gets a unique name out of
+    the run id of the sink and an increasing sequence number, so that the concurrent calls never overwrite each
+    other.
+    """
+
+    def __init__(self, folder_path: str = 'debug', run_id: Optional[str] = None) -> None:
+        """
+        :param folder_path: The folder where the images are stored, defaults to 'debug'
+        :type folder_path: str, optional
+        :param run_id: The prefix of the image names. None generates a random one, defaults to None
+        :type run_id: Optional[str], optional
+        """
+        self.folder_path = folder_path
+        self.run_id = run_id if run_id is not None else uuid.uuid4().hex[:8]
+        self.sequence = itertools.count()
+        self.lock = threading.Lock()
+
+        if not os.path.exists(folder_path):
+            os.makedirs(folder_path, exist_ok=True)
+
+    def save(self, img_name: str, img: Any) -> str:
+        """
+        It stores the given image under the unique name.
+
+        :param img_name: The name of the image within the pipeline, e.g. 'd003_face_mask'
+        :type img_name: str
+        :param img: The image or the CompactMask to be stored
+        :type img: Any
+        :return: Returns the path of the stored image
+        :rtype: str
+        """
+        if hasattr(img, 'to_array'):
+            img = img.to_array()
+
+        with self.lock:
+            sequence_number = next(self.sequence)
+
+        img_path = os.path.join(self.folder_path, '{}_{:05d}_{}.png'.format(self.run_id, sequence_number, img_name))
+        cv2.imwrite(img_path, img)
+
+        return img_path
+
+
+@contextmanager
+def debug_images(folder_path: str = 'debug', run_id: Optional[str] = None) -> Iterator[DebugImageSink]:
+    """
+    It activates the debug image sink for the code block, e.g. for a single call of add_img_stroke.
+
+    :param folder_path: The folder where the images are stored, defaults to 'debug'
+    :type folder_path: str, optional
+    :param run_id: The prefix of the image names. None generates a random one, defaults to None
+    :type run_id: Optional[str], optional
+    :return: Returns the active debug image sink
+    :rtype: Iterator[DebugImageSink]
+    """
+    debug_sink = DebugImageSink(folder_path, run_id)
+    token = current_debug_sink.set(debug_sink)
+    try:
+        yield debug_sink
+    finally:
+        current_debug_sink.reset(token)
+
+
+def dump_debug_img(img_name: str, img: Any, default_sink: Optional[DebugImageSink] = None) -> None:
+    """
+    It stores the given intermediate image into the debug image sink of the current context, or else into the
+    given default sink. It does nothing if there is no sink.
+
+    :param img_name: The name of the image within the pipeline
+    :type img_name: str
+    :param img: The image to be stored
+    :type img: Any
+    :param default_sink: The sink used when none is active in the current context, defaults to None
+    :type default_sink: Optional[DebugImageSink], optional
+    """
+    debug_sink = current_debug_sink.get() or default_sink
+    if debug_sink is not None:
+        debug_sink.save(img_name, img)
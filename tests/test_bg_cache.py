@@ -0,0 +1,91 @@
+""" This module tests the in-memory cache of the decoded and resized backgrounds
+"""
+from socialmediautils.benchmark.stub_models import make_synthetic_img
+from socialmediautils.cache.bg_cache import BackgroundCache
+from typing import Any
+
+import os
+import cv2
+import numpy as np
+import pytest
+
+
+def write_bg(folder_path: Any, seed: int = 0) -> str:
+    """
+    It writes a synthetic background image into the given folder.
+
+    :param folder_path: The folder of the background
+    :type folder_path: Any
+    :param seed: The seed of the synthetic image, defaults to 0
+    :type seed: int, optional
+    :return: Returns the path of the background
+    :rtype: str
+    """
+    bg_file_path = os.path.join(str(folder_path), 'bg.png')
+    cv2.imwrite(bg_file_path, make_synthetic_img(320, 240, seed))
+
+    return bg_file_path
+
+
+def test_hit_returns_the_resized_background(tmp_path: Any) -> None:
+    """
+    It checks that the background is decoded once, resized once per size and then returned out of the cache.
+    """
+    bg_file_path = write_bg(tmp_path)
+    bg_cache = BackgroundCache()
+
+    img_bg = bg_cache.get(bg_file_path, (160, 120))
+    assert np.array_equal(img_bg, cv2.resize(cv2.imread(bg_file_path), (160, 120), interpolation=cv2.INTER_LINEAR))
+    assert not img_bg.flags.writeable
+
+    assert bg_cache.get(bg_file_path, (160, 120)) is img_bg
+    bg_cache.get(bg_file_path, (640, 480))
+
+    stats = bg_cache.stats()
+    assert (stats['hits'], stats['decodes'], stats['resizes']) == (2, 1, 2)
+
+
+def test_replaced_file_is_decoded_again(tmp_path: Any) -> None:
+    """
+    It checks that the background whose file is replaced is not served out of the cache.
+    """
+    bg_file_path = write_bg(tmp_path)
+    bg_cache = BackgroundCache()
+    old_mtime_ns = os.stat(bg_file_path).st_mtime_ns
+
+    bg_cache.get(bg_file_path, (160, 120))
+    write_bg(tmp_path, seed=1)
+    os.utime(bg_file_path, ns=(old_mtime_ns + 10 ** 9, old_mtime_ns + 10 ** 9))
+
+    img_bg = bg_cache.get(bg_file_path, (160, 120))
+    assert np.array_equal(img_bg, cv2.resize(cv2.imread(bg_file_path), (160, 120), interpolation=cv2.INTER_LINEAR))
+    assert bg_cache.stats()['decodes'] == 2
+
+
+def test_memory_is_bounded(tmp_path: Any) -> None:
+    """
+    It checks that the least recently used backgrounds are evicted beyond the memory bound.
+    """
+    bg_file_path = write_bg(tmp_path)
+    bg_cache = BackgroundCache(max_memory_bytes=320 * 240 * 3 + 2 * 100 * 100 * 3)
+
+    for size in [(100, 100), (100, 100), (120, 120)]:
+        bg_cache.get(bg_file_path, size)
+
+    stats = bg_cache.stats()
+    assert stats['memory_bytes'] <= bg_cache.max_memory_bytes
+    assert (stats['memory_entries'], stats['hits'], stats['resizes']) == (2, 2, 2)
+
+    # The original was used to resize the second size, so the first size was the least recently used one
+    bg_cache.get(bg_file_path, (120, 120))
+    assert bg_cache.stats()['hits'] == 3
+    bg_cache.get(bg_file_path, (100, 100))
+    assert bg_cache.stats()['resizes'] == 3
+
+
+def test_missing_file(tmp_path: Any) -> None:
+    """
+    It checks that the missing background is refused.
+    """
+    with pytest.raises(IOError):
+        BackgroundCache().get(os.path.join(str(tmp_path), 'missing.png'), (160, 120))
@@ -0,0 +1,68 @@
+""" This module tests the blurring kernels of the face blur
+"""
+from socialmediautils.benchmark.stub_models import make_synthetic_img
+from socialmediautils.blur.blur_engine import blur_img
+from socialmediautils.blur.blur_engine import blur_region
+from socialmediautils.blur.blur_engine import get_blur_ksize
+from socialmediautils.blur.blur_engine import get_box_sigma
+from socialmediautils.blur.blur_engine import get_stacked_box_sizes
+
+import numpy as np
+import pytest
+
+
+def test_ksize_scales_with_image_and_face() -> None:
+    """
+    It checks that the kernel is the blurring factor at the face parser resolution and scales with the image and the
+    face size.
+    """
+    assert get_blur_ksize(33, 512, 512) == (33, 33)
+    assert get_blur_ksize(33, 1024, 512) == (66, 33)
+    assert get_blur_ksize(33, 512, 512, 0.25) == (33, 33)
+    assert get_blur_ksize(33, 512, 512, 0.125) == (16, 16)
+
+
+@pytest.mark.parametrize('box_size', [3, 9, 33, 101])
+def test_stacked_box_matches_box_sigma(box_size: int) -> None:
+    """
+    It checks that the stacked box kernels add up to the variance of the single box kernel.
+    """
+    sigma = get_box_sigma(box_size)
+    sizes = get_stacked_box_sizes(sigma)
+
+    assert all(size % 2 == 1 for size in sizes)
+    assert np.sqrt(sum(get_box_sigma(size) ** 2 for size in sizes)) == pytest.approx(sigma, rel=0.1, abs=0.5)
+
+
+@pytest.mark.parametrize('blur_kind', ['box', 'gaussian', 'stacked_box'])
+def test_region_matches_whole_blur(blur_kind: str) -> None:
+    """
+    It checks that the blurred box is the same as the box of the whole blurred image, also along the image border.
+    """
+    img = make_synthetic_img(320, 240)
+
+    img_blur = blur_img(img, (15, 15), blur_kind)
+
+    for minX, minY, maxX, maxY in [(100, 80, 180, 160), (0, 0, 60, 50), (280, 200, 320, 240)]:
+        assert np.array_equal(blur_region(img, (minX, minY, maxX, maxY), (15, 15), blur_kind),
+                              img_blur[minY:maxY, minX:maxX])
+
+
+def test_pixelate_fills_cells() -> None:
+    """
+    It checks that the pixelation fills the cells of the kernel size with a single color each.
+    """
+    img = make_synthetic_img(320, 240)
+
+    img_cells = blur_img(img, (16, 16), 'pixelate')
+
+    assert img_cells.shape == img.shape
+    assert len(np.unique(img_cells[:16, :16].reshape(-1, 3), axis=0)) == 1
+
+
+def test_unknown_blur_kind() -> None:
+    """
+    It checks that the unknown kernel is refused.
+    """
+    with pytest.raises(ValueError):
+        blur_img(make_synthetic_img(32, 32), (3, 3), 'median')
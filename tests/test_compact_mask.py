@@ -0,0 +1,87 @@
+""" This module tests the compact masks against the full size mask arrays
+"""
+from socialmediautils.benchmark.stub_models import get_stub_mask
+from socialmediautils.composite.compact_mask import CompactMask
+from socialmediautils.stroke.stroke_img import zoom_mask
+from socialmediautils.trace.tracer import debug_images
+from socialmediautils.trace.tracer import dump_debug_img
+from typing import Any
+
+import os
+import pickle
+import cv2
+import numpy as np
+import pytest
+
+
+def get_masks() -> list:
+    """
+    It returns the binary, the anti-aliased, the empty and the full masks.
+
+    :return: Returns the uint8 masks
+    :rtype: list
+    """
+    binary_mask = get_stub_mask(320, 240)
+
+    return [binary_mask, cv2.GaussianBlur(binary_mask, (9, 9), 0), np.zeros((240, 320), dtype='uint8'),
+            np.full((240, 320), 255, dtype='uint8')]
+
+
+@pytest.mark.parametrize('mask_index', range(4))
+def test_round_trip(mask_index: int) -> None:
+    """
+    It checks that the masks come back exactly as they are, also through pickling.
+    """
+    mask = get_masks()[mask_index]
+
+    compact_mask = CompactMask.from_array(mask)
+
+    assert np.array_equal(compact_mask.to_array(), mask)
+    assert np.array_equal(pickle.loads(pickle.dumps(compact_mask)).to_array(), mask)
+    assert compact_mask.packed == (mask_index != 1)
+    assert compact_mask.is_empty() == (mask_index == 2)
+
+
+def test_algebra_matches_arrays() -> None:
+    """
+    It checks that the mask algebra on the bounding boxes is the same as the one of the full size arrays.
+    """
+    mask = get_stub_mask(320, 240)
+    scale_mask = zoom_mask(mask, 1.05)
+
+    compact_mask, compact_scale_mask = CompactMask.from_array(mask), CompactMask.from_array(scale_mask)
+
+    assert np.array_equal(compact_mask.xor(compact_scale_mask).to_array(), cv2.bitwise_xor(mask, scale_mask))
+    assert np.array_equal(compact_scale_mask.subtract(compact_mask).to_array(), cv2.subtract(scale_mask, mask))
+    assert np.array_equal(compact_mask.invert().to_array(), cv2.bitwise_not(mask))
+    assert np.array_equal(compact_mask.scale(640, 480, cv2.INTER_NEAREST).to_array(),
+                          cv2.resize(mask, (640, 480), interpolation=cv2.INTER_NEAREST))
+
+
+@pytest.mark.parametrize('zoom_option', [1, 2, 3, 4])
+def test_zoom_mask_accepts_compact(zoom_option: int) -> None:
+    """
+    It checks that zoom_mask scales the compact mask like the mask array.
+    """
+    mask = get_stub_mask(320, 240)
+
+    compact_scale_mask = zoom_mask(CompactMask.from_array(mask), 1.05, zoom_option=zoom_option, stroke_width=6)
+
+    assert isinstance(compact_scale_mask, CompactMask)
+    assert np.array_equal(compact_scale_mask.to_array(), zoom_mask(mask, 1.05, zoom_option=zoom_option,
+                                                                   stroke_width=6))
+
+
+
+def test_debug_image_accepts_compact(tmp_path: Any) -> None:
+    """
+    It checks that the compact mask is stored as the full size debug image.
+    """
+    mask = get_stub_mask(320, 240)
+
+    with debug_images(str(tmp_path), 'run'):
+        dump_debug_img('mask', CompactMask.from_array(mask))
+
+    debug_file_names = os.listdir(str(tmp_path))
+    assert len(debug_file_names) == 1
+    assert np.array_equal(cv2.imread(os.path.join(str(tmp_path), debug_file_names[0]), cv2.IMREAD_UNCHANGED), mask)
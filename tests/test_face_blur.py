@@ -0,0 +1,138 @@
+""" This module tests the face blur against the baseline compositing and the batched face blur against the single one
+"""
+from facexlib.utils.misc import img2tensor
+from socialmediautils.benchmark.stub_models import StubFaceDetector
+from socialmediautils.benchmark.stub_models import StubFaceParser
+from socialmediautils.benchmark.stub_models import make_synthetic_img
+from socialmediautils.blur.face_blur_img import add_face_blur
+from socialmediautils.blur.face_blur_img import add_face_blur_array
+from socialmediautils.blur.face_blur_img import add_face_blur_batch
+from socialmediautils.blur.face_blur_img import get_face_boxes
+from torchvision.transforms.functional import normalize
+from typing import Any
+
+import os
+import cv2
+import numpy as np
+import torch
+
+
+def get_baseline_face_blur(net: Any, img_org: Any, blurring_factor: int) -> Any:
+    """
+    It blurs the face like the baseline add_face_blur did, i.e. the box blurred 512x512 image overlaid under the
+    nonzero face mask and resized back.
+
+    :param net: The face parser
+    :type net: Any
+    :param img_org: The BGR image
+    :type img_org: Any
+    :param blurring_factor: The kernel size of the box blur
+    :type blurring_factor: int
+    :return: Returns the face blurred image
+    :rtype: Any
+    """
+    height, width = img_org.shape[:2]
+    img_resized = cv2.resize(img_org, (512, 512), interpolation=cv2.INTER_LINEAR)
+
+    img = img2tensor(img_resized.astype('float32') / 255., bgr2rgb=True, float32=True)
+    normalize(img, (0.485, 0.456, 0.406), (0.229, 0.224, 0.225), inplace=True)
+    with torch.no_grad():
+        face_parsed = net(torch.unsqueeze(img, 0))[0].squeeze(0).cpu().numpy().argmax(0)
+
+    mask_face = np.where(np.isin(face_parsed, [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 17]), 255,
+                         0).astype('uint8')
+    img_input_blur = cv2.blur(img_resized, (blurring_factor, blurring_factor))
+    overlaid_img = cv2.bitwise_or(cv2.bitwise_or(img_input_blur, img_input_blur, mask=mask_face),
+                                  cv2.bitwise_or(img_resized, img_resized, mask=cv2.bitwise_not(mask_face)))
+
+    return cv2.resize(overlaid_img, (width, height), interpolation=cv2.INTER_LINEAR)
+
+
+def test_face_blur_matches_baseline() -> None:
+    """
+    It checks that the default face blur is the one of the baseline.
+    """
+    net = StubFaceParser()
+    img_org = make_synthetic_img(640, 480)
+
+    img_blurred = add_face_blur_array(net, 'cpu', img_org, 33)
+
+    assert np.array_equal(img_blurred, get_baseline_face_blur(net, img_org, 33))
+
+
+def assert_batch_matches_single(folder_path: str, **options: Any) -> None:
+    """
+    It blurs the same images one by one and in a single batch with the given options and checks that the outputs
+    are the same.
+
+    :param folder_path: The folder of the inputs and the outputs
+    :type folder_path: str
+    """
+    net = StubFaceParser()
+
+    in_file_paths, single_file_paths, batch_file_paths = [], [], []
+    for seed, (width, height) in enumerate([(640, 480), (480, 640), (800, 600)]):
+        in_file_path = os.path.join(folder_path, 'in_{}.png'.format(seed))
+        cv2.imwrite(in_file_path, make_synthetic_img(width, height, seed))
+
+        in_file_paths.append(in_file_path)
+        single_file_paths.append(os.path.join(folder_path, 'single_{}.png'.format(seed)))
+        batch_file_paths.append(os.path.join(folder_path, 'batch_{}.png'.format(seed)))
+
+    for in_file_path, single_file_path in zip(in_file_paths, single_file_paths):
+        add_face_blur(net, 'cpu', in_file_path, single_file_path, 33, **options)
+    add_face_blur_batch(net, 'cpu', in_file_paths, batch_file_paths, 33, **options)
+
+    for single_file_path, batch_file_path in zip(single_file_paths, batch_file_paths):
+        assert np.array_equal(cv2.imread(batch_file_path), cv2.imread(single_file_path))
+
+
+def test_batch_matches_single(tmp_path: Any) -> None:
+    """
+    It checks that the images blurred in a single batch are the same as the ones blurred one by one.
+    """
+    assert_batch_matches_single(str(tmp_path))
+
+
+def test_roi_blur_leaves_the_rest_untouched() -> None:
+    """
+    It checks that the ROI blur changes the pixels within the face boxes only and keeps the original resolution
+    elsewhere.
+    """
+    net = StubFaceParser()
+    img_org = make_synthetic_img(1280, 960)
+
+    img_blurred = add_face_blur_array(net, 'cpu', img_org, 33, roi_blur=True)
+
+    # The face box grown by the spread of the linearly upscaled face mask
+    face_mask = np.uint8(net.logits[1].numpy() * 255)
+    face_boxes = get_face_boxes(face_mask, 1280, 960, int(np.ceil(1280 / 512)) + 1)
+    assert len(face_boxes) == 1
+
+    minX, minY, maxX, maxY = face_boxes[0]
+    changed = np.any(img_blurred != img_org, axis=2)
+    assert changed[minY:maxY, minX:maxX].any()
+
+    changed[minY:maxY, minX:maxX] = False
+    assert not changed.any()
+
+
+def test_roi_blur_batch_matches_single(tmp_path: Any) -> None:
+    """
+    It checks that the ROI blur of a batch is the same as the one of the single images.
+    """
+    assert_batch_matches_single(str(tmp_path), roi_blur=True)
+
+
+def test_face_scaled_batch_matches_single(tmp_path: Any) -> None:
+    """
+    It checks that the kernels scaled with the face size blur a batch the same as the single images.
+    """
+    assert_batch_matches_single(str(tmp_path), roi_blur=True, face_scaled=True, blur_kind='gaussian')
+
+
+def test_face_detector_batch_matches_single(tmp_path: Any) -> None:
+    """
+    It checks that the face crops of a batch are parsed and blurred the same as the ones of the single images.
+    """
+    assert_batch_matches_single(str(tmp_path), face_detector=StubFaceDetector())
@@ -0,0 +1,100 @@
+""" This module tests the detector gated crop and parse face blur
+"""
+from socialmediautils.benchmark.stub_models import StubFaceDetector
+from socialmediautils.benchmark.stub_models import StubFaceParser
+from socialmediautils.benchmark.stub_models import make_synthetic_img
+from socialmediautils.blur.face_blur_img import add_face_blur_array
+from socialmediautils.blur.face_detector import crop_face
+from socialmediautils.blur.face_detector import detect_faces
+from socialmediautils.blur.face_detector import get_face_crop_box
+from typing import Any
+from typing import List
+from typing import Tuple
+
+import cv2
+import numpy as np
+
+
+class ListFaceDetector:
+    """
+    It returns the given face boxes for every image.
+    """
+
+    def __init__(self, face_boxes: List[Tuple[float, float, float, float]]) -> None:
+        self.face_boxes = face_boxes
+
+    def detect(self, img: Any) -> List[Tuple[float, float, float, float]]:
+        """
+        It returns the face boxes regardless of the given image.
+
+        :param img: The BGR image
+        :type img: Any
+        :return: Returns the (minX, minY, maxX, maxY) box of each face
+        :rtype: List[Tuple[float, float, float, float]]
+        """
+        return list(self.face_boxes)
+
+
+def test_face_crop_box_is_square_with_margin() -> None:
+    """
+    It checks that the crop is the square around the face grown by the margin on every side.
+    """
+    assert get_face_crop_box((100, 100, 140, 120), 0.5) == (80, 70, 160, 150)
+    assert get_face_crop_box((0, 0, 10, 10), 0.) == (0, 0, 10, 10)
+
+
+def test_crop_face_matches_resize() -> None:
+    """
+    It checks that the crop within the image is the resized crop, and that the crop beyond the image is black.
+    """
+    img = make_synthetic_img(640, 480)
+
+    img_crop = crop_face(img, (100, 50, 356, 306), 128)
+    img_resized = cv2.resize(img[50:306, 100:356], (128, 128), interpolation=cv2.INTER_LINEAR)
+    assert np.abs(img_crop.astype('int') - img_resized).max() <= 1
+
+    img_outside = crop_face(img, (-256, -256, 0, 0), 64)
+    assert not img_outside[:62, :62].any()
+
+
+def test_detect_faces_scales_boxes_back() -> None:
+    """
+    It checks that the faces detected on the downscaled image are scaled back to the original resolution.
+    """
+    img = make_synthetic_img(2048, 1536)
+
+    face_boxes = detect_faces(ListFaceDetector([(100.2, 50.5, 200.7, 150.1), (-10, -10, 5, 5)]), img, 1024)
+
+    assert face_boxes == [(200, 101, 402, 301), (0, 0, 10, 10)]
+
+
+def test_no_face_keeps_image() -> None:
+    """
+    It checks that the image without any detected face is kept as it is.
+    """
+    img = make_synthetic_img(640, 480)
+
+    img_blurred = add_face_blur_array(StubFaceParser(), 'cpu', img, 33, face_detector=ListFaceDetector([]))
+
+    assert np.array_equal(img_blurred, img)
+
+
+def test_faces_blurred_within_their_crops() -> None:
+    """
+    It checks that every detected face of a group photo is blurred and nothing outside their crops changes.
+    """
+    # The image is within the detection size, so the detected boxes are in the image resolution
+    img = make_synthetic_img(960, 360)
+    single_face_box = StubFaceDetector().detect(img[:, :480])[0]
+    face_boxes = [single_face_box, (single_face_box[0] + 480, single_face_box[1], single_face_box[2] + 480,
+                                    single_face_box[3])]
+
+    img_blurred = add_face_blur_array(StubFaceParser(), 'cpu', img, 33, face_detector=ListFaceDetector(face_boxes))
+
+    changed = np.any(img_blurred != img, axis=2)
+    for face_box in face_boxes:
+        cropMinX, cropMinY, cropMaxX, cropMaxY = get_face_crop_box(tuple(int(value) for value in face_box))
+        assert changed[max(0, cropMinY):cropMaxY, max(0, cropMinX):cropMaxX].any()
+        changed[max(0, cropMinY):cropMaxY, max(0, cropMinX):cropMaxX] = False
+
+    assert not changed.any()
@@ -0,0 +1,57 @@
+""" This module tests the selection of the face regions against the baseline list of the face labels
+"""
+from socialmediautils.blur.face_regions import face_parsing_labels
+from socialmediautils.blur.face_regions import get_face_region_labels
+from socialmediautils.blur.face_regions import get_face_region_lut
+from socialmediautils.blur.face_regions import select_face_regions
+from typing import Any
+
+import numpy as np
+import pytest
+
+# The labels that the baseline blurred out of the face parser output
+baseline_labels = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 17]
+
+
+def test_default_matches_baseline() -> None:
+    """
+    It checks that the default regions are the baseline labels and select the same mask as np.isin did, for every
+    label value.
+    """
+    face_parsed = np.random.default_rng(0).integers(0, 256, (512, 512), dtype='uint8')
+    face_parsed[0, :256] = np.arange(256)
+    baseline_mask = np.where(np.isin(face_parsed, baseline_labels), 255, 0).astype('uint8')
+
+    assert get_face_region_labels() == baseline_labels
+    assert get_face_region_labels('default') == baseline_labels
+    assert np.array_equal(select_face_regions(face_parsed), baseline_mask)
+    assert np.array_equal(select_face_regions(face_parsed, get_face_region_lut()), baseline_mask)
+
+
+def test_parser_labels_match_baseline() -> None:
+    """
+    It checks that the argmax of the face parser over its 19 labels, as int64, selects the same mask as np.isin.
+    """
+    face_parsed = np.random.default_rng(1).random((len(face_parsing_labels), 64, 48)).argmax(0)
+
+    assert np.array_equal(select_face_regions(face_parsed),
+                          np.where(np.isin(face_parsed, baseline_labels), 255, 0).astype('uint8'))
+
+
+@pytest.mark.parametrize('face_regions', ['skin,hair', ['skin', 'hair'], [1, 17], 'skin_hair'])
+def test_given_regions(face_regions: Any) -> None:
+    """
+    It checks that the region set, the names and the indices select the same labels.
+    """
+    face_parsed = np.arange(len(face_parsing_labels), dtype='uint8').reshape(1, -1)
+
+    assert np.array_equal(select_face_regions(face_parsed, face_regions)[0] != 0, np.isin(face_parsed[0], [1, 17]))
+
+
+@pytest.mark.parametrize('face_regions', ['ears', 'skin,beard', [256]])
+def test_unknown_regions(face_regions: Any) -> None:
+    """
+    It checks that the unknown region sets, labels and indices are refused.
+    """
+    with pytest.raises(ValueError):
+        get_face_region_labels(face_regions)
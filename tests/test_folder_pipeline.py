@@ -0,0 +1,86 @@
+""" This module tests the producer/consumer pipeline of the decoding, the inference and the encoding
+"""
+from socialmediautils.pipeline.folder_pipeline import run_folder_pipeline
+from typing import Any
+
+import threading
+import pytest
+
+
+def fail_on(failing_job: int, stage: str) -> Any:
+    """
+    It returns the stage function that raises for the given job and passes the others on.
+
+    :param failing_job: The job to fail
+    :type failing_job: int
+    :param stage: The name of the stage in the error
+    :type stage: str
+    :return: Returns the function of the stage
+    :rtype: Any
+    """
+    def run_stage(job: int, *data: Any) -> Any:
+        if job == failing_job:
+            raise ValueError('{} failed for {}'.format(stage, job))
+        return job if len(data) == 0 else data[0]
+
+    return run_stage
+
+
+@pytest.mark.parametrize('stage', ['decode', 'infer', 'encode'])
+def test_failures_are_returned(stage: str) -> None:
+    """
+    It checks that the job failing in any of the stages is returned along with its error, and that the other jobs
+    are still processed.
+    """
+    encoded: list = []
+    lock = threading.Lock()
+
+    def encode_fn(job: int, result: Any) -> None:
+        if stage == 'encode':
+            fail_on(3, stage)(job)
+        with lock:
+            encoded.append(result)
+
+    decode_fn = fail_on(3, stage) if stage == 'decode' else fail_on(-1, stage)
+    infer_fn = fail_on(3, stage) if stage == 'infer' else fail_on(-1, stage)
+
+    failures = run_folder_pipeline(list(range(10)), decode_fn, infer_fn, encode_fn, workers=2, queue_depth=2)
+
+    assert [job for job, _ in failures] == [3]
+    assert isinstance(failures[0][1], ValueError) and str(failures[0][1]) == '{} failed for 3'.format(stage)
+    assert sorted(encoded) == [job for job in range(10) if job != 3]
+
+
+def test_jobs_are_inferred_in_order() -> None:
+    """
+    It checks that the jobs are inferred in the given order in the calling thread, whatever the decoding order.
+    """
+    inferred: list = []
+
+    def infer_fn(job: int, decoded: int) -> int:
+        inferred.append((job, decoded, threading.current_thread() is threading.main_thread()))
+        return decoded
+
+    failures = run_folder_pipeline(list(range(20)), lambda job: job, infer_fn, lambda job, result: None, workers=4,
+                                   queue_depth=3)
+
+    assert failures == []
+    assert inferred == [(job, job, True) for job in range(20)]
+
+
+def test_interrupted_inference_stops_the_feeding() -> None:
+    """
+    It checks that the error escaping the inference stage is raised to the caller once the feeding stopped, without
+    decoding the remaining jobs.
+    """
+    decoded: list = []
+
+    def infer_fn(job: int, _: Any) -> None:
+        if job == 2:
+            raise KeyboardInterrupt()
+
+    with pytest.raises(KeyboardInterrupt):
+        run_folder_pipeline(list(range(100)), decoded.append, infer_fn, lambda job, result: None, workers=1,
+                            queue_depth=2)
+
+    assert len(decoded) < 100
@@ -0,0 +1,81 @@
+""" This module tests the background writer of the output images
+"""
+from socialmediautils.benchmark.stub_models import make_synthetic_img
+from socialmediautils.imgio.img_writer import AsyncImgWriter
+from socialmediautils.imgio.img_writer import EncodeOptions
+from typing import Any
+
+import os
+import threading
+import cv2
+import numpy as np
+import pytest
+
+
+def test_images_are_written(tmp_path: Any) -> None:
+    """
+    It checks that the images are on disk once the writer is closed, with the format of the encoding options, and
+    that on_written gets the output paths given to write.
+    """
+    written: list = []
+    imgs = [make_synthetic_img(64, 48, seed) for seed in range(6)]
+    out_file_paths = [os.path.join(str(tmp_path), 'out_{}.png'.format(index)) for index in range(len(imgs))]
+
+    with AsyncImgWriter(max_pending=2, workers=2, on_written=written.append) as img_writer:
+        futures = [img_writer.write(out_file_path, img) for out_file_path, img in zip(out_file_paths, imgs)]
+        webp_future = img_writer.write(out_file_paths[0], imgs[0], EncodeOptions('webp', quality=101))
+
+    assert sorted(written) == sorted(out_file_paths + [out_file_paths[0]])
+    assert [future.result() for future in futures] == out_file_paths
+    assert webp_future.result() == os.path.join(str(tmp_path), 'out_0.webp')
+    for out_file_path, img in zip(out_file_paths, imgs):
+        assert np.array_equal(cv2.imread(out_file_path), img)
+    assert np.array_equal(cv2.imread(webp_future.result()), imgs[0])
+    assert img_writer.failures == []
+
+
+def test_pending_images_are_bounded(tmp_path: Any) -> None:
+    """
+    It checks that the write blocks once max_pending images wait in the writer, and goes on once one is written.
+    """
+    released = threading.Event()
+    img_writer = AsyncImgWriter(max_pending=2, on_written=lambda _: released.wait(10.))
+    img = make_synthetic_img(64, 48)
+
+    try:
+        for index in range(2):
+            img_writer.write(os.path.join(str(tmp_path), 'out_{}.png'.format(index)), img)
+
+        blocked_write = threading.Thread(target=img_writer.write, args=(os.path.join(str(tmp_path), 'out_2.png'),
+                                                                         img))
+        blocked_write.start()
+        blocked_write.join(0.2)
+        assert blocked_write.is_alive()
+
+        released.set()
+        blocked_write.join(10.)
+        assert not blocked_write.is_alive()
+    finally:
+        released.set()
+        img_writer.close()
+
+    assert sorted(os.listdir(str(tmp_path))) == ['out_0.png', 'out_1.png', 'out_2.png']
+
+
+def test_failures_are_recorded(tmp_path: Any) -> None:
+    """
+    It checks that the failed write is recorded and raised by its future, and that the writer goes on with the next
+    images.
+    """
+    written: list = []
+    missing_file_path = os.path.join(str(tmp_path), 'missing', 'out.png')
+    out_file_path = os.path.join(str(tmp_path), 'out.png')
+
+    with AsyncImgWriter(on_written=written.append) as img_writer:
+        failed_future = img_writer.write(missing_file_path, make_synthetic_img(64, 48))
+        img_writer.write(out_file_path, make_synthetic_img(64, 48))
+
+    with pytest.raises(IOError):
+        failed_future.result()
+    assert [failed_file_path for failed_file_path, _ in img_writer.failures] == [missing_file_path]
+    assert written == [out_file_path] and os.path.exists(out_file_path)
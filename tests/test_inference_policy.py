@@ -0,0 +1,54 @@
+""" This module tests the inference resolution policy and the mask refinement
+"""
+from socialmediautils.benchmark.stub_models import StubStrokeSession
+from socialmediautils.benchmark.stub_models import get_stub_mask
+from socialmediautils.benchmark.stub_models import make_synthetic_img
+from socialmediautils.inference.inference_policy import refine_mask
+from socialmediautils.stroke.stroke_img import add_img_stroke_array
+
+import cv2
+import numpy as np
+import pytest
+
+
+def test_refine_mask_binary() -> None:
+    """
+    It checks that the binary mask is refined along its boundary only.
+    """
+    img_org = make_synthetic_img(320, 240)
+    mask_img = get_stub_mask(320, 240)
+
+    refined_mask = refine_mask(mask_img.copy(), img_org, 4)
+
+    changed = refined_mask != mask_img
+    assert changed.any()
+
+    # Nothing changes farther from the boundary than the padding of the filtered box
+    boundary = cv2.morphologyEx(mask_img, cv2.MORPH_GRADIENT, np.ones((3, 3), np.uint8))
+    near_boundary = cv2.dilate(boundary, np.ones((4 * 4 + 3, 4 * 4 + 3), np.uint8)) > 0
+    assert not (changed & ~near_boundary).any()
+
+
+def test_refine_mask_without_edges() -> None:
+    """
+    It checks that the masks without any boundary are kept as they are.
+    """
+    img_org = make_synthetic_img(64, 48)
+
+    for fill_value in (0, 255):
+        mask_img = np.full((48, 64), fill_value, dtype='uint8')
+        assert np.array_equal(refine_mask(mask_img.copy(), img_org, 4), mask_img)
+
+
+@pytest.mark.parametrize('inference_policy', ['balanced', 'quality'])
+def test_refined_presets_differ_from_default(inference_policy: str) -> None:
+    """
+    It checks that the presets with the refinement change the stroke of the binary rembg mask.
+    """
+    img_org = make_synthetic_img(640, 480)
+
+    img_default = add_img_stroke_array(StubStrokeSession(), img_org, [255, 255, 0], 1.03)
+    img_preset = add_img_stroke_array(StubStrokeSession(), img_org, [255, 255, 0], 1.03,
+                                      inference_policy=inference_policy)
+
+    assert not np.array_equal(img_preset, img_default)
@@ -0,0 +1,108 @@
+""" This module tests the resuming of a folder out of its manifest
+"""
+from socialmediautils.pipeline.manifest import MANIFEST_FILE_NAME
+from socialmediautils.pipeline.manifest import FolderManifest
+from typing import Any
+from typing import List
+from typing import Tuple
+
+import os
+
+
+def make_jobs(folder_path: str, count: int) -> Tuple[List[str], List[str]]:
+    """
+    It writes the given number of inputs into the folder and returns them with their outputs.
+
+    :param folder_path: The folder of the inputs and the outputs
+    :type folder_path: str
+    :param count: The number of the inputs
+    :type count: int
+    :return: Returns the input files and the output files
+    :rtype: Tuple[List[str], List[str]]
+    """
+    in_file_paths = [os.path.join(folder_path, 'in_{}.png'.format(index)) for index in range(count)]
+    for index, in_file_path in enumerate(in_file_paths):
+        with open(in_file_path, 'wb') as in_file:
+            in_file.write(bytes([index]) * 64)
+
+    return in_file_paths, [os.path.join(folder_path, 'out_{}.png'.format(index)) for index in range(count)]
+
+
+def process(manifest: FolderManifest, in_file_path: str, out_file_path: str) -> None:
+    """
+    It writes the output of the given input and records it as done.
+
+    :param manifest: The manifest of the folder
+    :type manifest: FolderManifest
+    :param in_file_path: The path of the input file
+    :type in_file_path: str
+    :param out_file_path: The path of the output file
+    :type out_file_path: str
+    """
+    with open(out_file_path, 'wb') as out_file:
+        out_file.write(b'out')
+    manifest.mark_done(in_file_path, out_file_path)
+
+
+def test_resume_processes_only_pending(tmp_path: Any) -> None:
+    """
+    It checks that a rerun processes the failed, the unprocessed and the changed inputs only.
+    """
+    manifest_path = os.path.join(str(tmp_path), MANIFEST_FILE_NAME)
+    in_file_paths, out_file_paths = make_jobs(str(tmp_path), 5)
+
+    manifest = FolderManifest(manifest_path, {'color': 'yellow'})
+    assert manifest.filter_jobs(in_file_paths, out_file_paths) == (in_file_paths, out_file_paths)
+
+    # The run stops after the first three inputs, the third one failed
+    process(manifest, in_file_paths[0], out_file_paths[0])
+    process(manifest, in_file_paths[1], out_file_paths[1])
+    manifest.mark_failed(in_file_paths[2], out_file_paths[2], ValueError('broken'))
+    assert manifest.stats() == {'skipped': 0, 'done': 2, 'failed': 1}
+    manifest.close()
+
+    manifest = FolderManifest(manifest_path, {'color': 'yellow'})
+    assert manifest.filter_jobs(in_file_paths, out_file_paths) == (in_file_paths[2:], out_file_paths[2:])
+    assert manifest.stats()['skipped'] == 2
+    manifest.close()
+
+    # The touched but unchanged input is skipped, the changed one and the one without its output are not
+    in_file_stat = os.stat(in_file_paths[0])
+    os.utime(in_file_paths[0], ns=(in_file_stat.st_atime_ns, in_file_stat.st_mtime_ns + 10**9))
+    with open(in_file_paths[1], 'wb') as in_file:
+        in_file.write(b'changed')
+
+    manifest = FolderManifest(manifest_path, {'color': 'yellow'})
+    assert manifest.filter_jobs(in_file_paths[:2], out_file_paths[:2]) == ([in_file_paths[1]], [out_file_paths[1]])
+    manifest.close()
+
+    os.remove(out_file_paths[0])
+    manifest = FolderManifest(manifest_path, {'color': 'yellow'})
+    assert manifest.filter_jobs(in_file_paths[:1], out_file_paths[:1]) == (in_file_paths[:1], out_file_paths[:1])
+    manifest.close()
+
+    # The other parameters process everything again
+    manifest = FolderManifest(manifest_path, {'color': 'red'})
+    assert manifest.filter_jobs(in_file_paths, out_file_paths) == (in_file_paths, out_file_paths)
+    manifest.close()
+
+
+def test_input_changed_during_processing(tmp_path: Any) -> None:
+    """
+    It checks that an input changed after it was claimed is processed again on the rerun.
+    """
+    manifest_path = os.path.join(str(tmp_path), MANIFEST_FILE_NAME)
+    in_file_paths, out_file_paths = make_jobs(str(tmp_path), 2)
+
+    manifest = FolderManifest(manifest_path, {})
+    manifest.filter_jobs(in_file_paths, out_file_paths)
+
+    with open(in_file_paths[0], 'wb') as in_file:
+        in_file.write(b'changed while processed')
+    for in_file_path, out_file_path in zip(in_file_paths, out_file_paths):
+        process(manifest, in_file_path, out_file_path)
+    manifest.close()
+
+    manifest = FolderManifest(manifest_path, {})
+    assert manifest.filter_jobs(in_file_paths, out_file_paths) == (in_file_paths[:1], out_file_paths[:1])
+    manifest.close()
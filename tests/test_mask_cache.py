@@ -0,0 +1,102 @@
+""" This module tests the two tier mask cache
+"""
+from socialmediautils.benchmark.stub_models import StubStrokeSession
+from socialmediautils.benchmark.stub_models import get_stub_mask
+from socialmediautils.benchmark.stub_models import make_synthetic_img
+from socialmediautils.cache.mask_cache import MaskCache
+from socialmediautils.composite.compact_mask import CompactMask
+from socialmediautils.stroke.stroke_img import add_img_stroke_array
+from typing import Any
+
+import numpy as np
+
+
+def get_disk_bytes(folder_path: Any) -> int:
+    """
+    It returns the size of the mask files in the given folder.
+
+    :param folder_path: The folder of the disk tier
+    :type folder_path: Any
+    :return: Returns the size in bytes
+    :rtype: int
+    """
+    return sum(file_path.stat().st_size for file_path in folder_path.iterdir() if file_path.suffix == '.png')
+
+
+def test_key_follows_content_and_options() -> None:
+    """
+    It checks that the key changes with the image content, the model and the options only.
+    """
+    img = make_synthetic_img(64, 48)
+
+    key = MaskCache.make_key(img, 'u2net', post_process=True)
+
+    assert MaskCache.make_key(img.copy(), 'u2net', post_process=True) == key
+    assert MaskCache.make_key(make_synthetic_img(64, 48, seed=1), 'u2net', post_process=True) != key
+    assert MaskCache.make_key(img, 'u2netp', post_process=True) != key
+    assert MaskCache.make_key(img, 'u2net', post_process=False) != key
+
+
+def test_round_trip_through_both_tiers(tmp_path: Any) -> None:
+    """
+    It checks that the cached mask comes back exactly out of the memory tier and, in a new cache, out of the disk
+    tier.
+    """
+    mask = get_stub_mask(320, 240)
+
+    mask_cache = MaskCache(str(tmp_path))
+    mask_cache.put('key', mask)
+    assert np.array_equal(mask_cache.get('key'), mask)
+    assert isinstance(mask_cache.get('key', compact=True), CompactMask)
+
+    disk_cache = MaskCache(str(tmp_path))
+    assert np.array_equal(disk_cache.get('key'), mask)
+    assert disk_cache.get('missing') is None
+    assert disk_cache.stats()['disk_hits'] == 1 and disk_cache.stats()['misses'] == 1
+
+
+def test_memory_tier_is_bounded() -> None:
+    """
+    It checks that the memory tier evicts the least recently used masks beyond its size.
+    """
+    mask = get_stub_mask(320, 240)
+    mask_bytes = CompactMask.from_array(mask).nbytes
+
+    mask_cache = MaskCache(None, max_memory_bytes=2 * mask_bytes)
+    mask_cache.put('first', mask)
+    mask_cache.put('second', mask)
+    mask_cache.get('first')
+    mask_cache.put('third', mask)
+
+    assert mask_cache.get('second') is None
+    assert mask_cache.get('first') is not None and mask_cache.get('third') is not None
+    assert mask_cache.stats()['memory_bytes'] <= 2 * mask_bytes
+
+
+def test_overwritten_key_is_counted_once(tmp_path: Any) -> None:
+    """
+    It checks that overwriting a key does not count its old file on the disk tier.
+    """
+    mask = get_stub_mask(320, 240)
+    mask_cache = MaskCache(str(tmp_path))
+
+    for _ in range(3):
+        mask_cache.put('key', CompactMask.from_array(mask))
+    mask_cache.put('key', np.random.default_rng(0).integers(0, 256, (240, 320), dtype='uint8'))
+
+    assert mask_cache.stats()['disk_bytes'] == get_disk_bytes(tmp_path)
+
+
+def test_cached_stroke_matches_uncached(tmp_path: Any) -> None:
+    """
+    It checks that the stroke of a cached mask is the same as the one segmented again.
+    """
+    img_org = make_synthetic_img(320, 240)
+    mask_cache = MaskCache(str(tmp_path))
+
+    img_uncached = add_img_stroke_array(StubStrokeSession(), img_org, [255, 255, 0], 1.03)
+    add_img_stroke_array(StubStrokeSession(), img_org, [255, 255, 0], 1.03, mask_cache)
+    img_cached = add_img_stroke_array(StubStrokeSession(), img_org, [255, 255, 0], 1.03, mask_cache)
+
+    assert mask_cache.stats()['memory_hits'] == 1
+    assert np.array_equal(img_cached, img_uncached)
@@ -0,0 +1,182 @@
+""" This module tests the job API of the model server
+"""
+from socialmediautils.benchmark.stub_models import StubStrokeSession
+from socialmediautils.benchmark.stub_models import make_synthetic_img
+from socialmediautils.server.model_client import read_token
+from socialmediautils.server.model_client import send_request
+from socialmediautils.server.model_client import shutdown_server
+from socialmediautils.server.model_client import submit_job
+from socialmediautils.server.model_server import ModelServer
+from socialmediautils.server.model_server import get_job_options
+from socialmediautils.server.model_server import get_token_file
+from socialmediautils.stroke.stroke_img import add_img_stroke_array
+from typing import Any
+from typing import Tuple
+
+import json
+import os
+import stat
+import threading
+import time
+import numpy as np
+import pytest
+
+
+def start_server(folder_path: str, **serve_options: Any) -> Tuple[ModelServer, str, threading.Thread]:
+    """
+    It serves the stub stroke model on a Unix socket in the given folder and waits until the server accepts the jobs.
+
+    :param folder_path: The folder of the socket and the token file
+    :type folder_path: str
+    :return: Returns the server, its address and the thread serving it
+    :rtype: Tuple[ModelServer, str, threading.Thread]
+    """
+    model_server = ModelServer('', '')
+    model_server.models['stroke'] = StubStrokeSession()
+    address = os.path.join(folder_path, 'iveu.sock')
+
+    serve_thread = threading.Thread(target=model_server.serve, args=(address,), kwargs=dict(serve_options,
+                                                                                             warmup=False))
+    serve_thread.start()
+    while not model_server.accepting:
+        assert serve_thread.is_alive()
+        time.sleep(0.01)
+
+    return model_server, address, serve_thread
+
+
+def test_token_is_required(tmp_path: Any) -> None:
+    """
+    It checks that the token file is readable by its user only and that the jobs and the shutdown without the token
+    are refused.
+    """
+    model_server, address, serve_thread = start_server(str(tmp_path))
+    try:
+        token_file = get_token_file(address)
+        assert stat.S_IMODE(os.stat(token_file).st_mode) == 0o600
+
+        for path in ('/jobs/stroke', '/shutdown'):
+            assert send_request(address, 'POST', path, b'{}')[0] == 403
+            assert send_request(address, 'POST', path, b'{}', token='0' * 64)[0] == 403
+
+        img = make_synthetic_img(64, 48)
+        assert np.array_equal(submit_job(address, 'stroke', {}, img),
+                              add_img_stroke_array(StubStrokeSession(), img, [255, 255, 0], 1.03))
+        assert model_server.accepting
+    finally:
+        shutdown_server(address)
+        serve_thread.join()
+
+    assert not os.path.exists(token_file)
+
+
+def test_given_token_file(tmp_path: Any) -> None:
+    """
+    It checks that the token of the given token file is accepted, and that the client does not find it by the
+    address.
+    """
+    token_file = os.path.join(str(tmp_path), 'token')
+    _, address, serve_thread = start_server(str(tmp_path), token_file=token_file)
+    with open(token_file) as token_fd:
+        token = token_fd.read()
+
+    try:
+        img = make_synthetic_img(64, 48)
+        with pytest.raises(PermissionError):
+            submit_job(address, 'stroke', {}, img)
+
+        assert submit_job(address, 'stroke', {}, img, token=token).shape == img.shape
+    finally:
+        shutdown_server(address, token=token)
+        serve_thread.join()
+
+
+class BlockingStrokeSession(StubStrokeSession):
+    """
+    It holds the predict until it is released, so that the jobs pile up in the queue of the server.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.started = threading.Event()
+        self.released = threading.Event()
+
+    def predict(self, img: Any, *args: Any, **kwargs: Any) -> Any:
+        self.started.set()
+        self.released.wait(10.)
+        return super().predict(img, *args, **kwargs)
+
+
+def test_job_options_are_validated() -> None:
+    """
+    It checks that the query string values are converted and the invalid jobs are refused.
+    """
+    options = get_job_options('stroke', {'color': '0,128,255', 'zoom_option': '3', 'roi_blur': 'yes'})
+    assert options['color'] == [0, 128, 255] and options['zoom_option'] == 3 and options['roi_blur'] is True
+    assert options['kernel_shape'] == 'ellipse' and options['anti_alias'] is True
+    assert get_job_options('stroke', {'kernel_shape': 'rect', 'anti_alias': 'False'})['anti_alias'] is False
+
+    for kind, params in [('resize', {}), ('stroke', {'color': '1,2'}), ('face_blur', {'blur_kind': 'median'}),
+                         ('stroke_with_bg', {}), ('stroke', {'zoom_option': 'three'}),
+                         ('face_blur', {'face_regions': 'ears'}), ('stroke', {'kernel_shape': 'star'})]:
+        with pytest.raises(ValueError):
+            get_job_options(kind, params)
+
+    assert get_job_options('stroke_with_bg', {}, has_bg=True)['bg_file'] == ''
+
+
+def test_large_request_is_refused(tmp_path: Any) -> None:
+    """
+    It checks that the body larger than the limit gets 413 before it is read, and that the server keeps serving.
+    """
+    _, address, serve_thread = start_server(str(tmp_path), max_request_mb=1)
+    try:
+        token = read_token(address)
+        status, _, response = send_request(address, 'POST', '/jobs/stroke', b'\0' * (1024 * 1024 + 1),
+                                           'application/octet-stream', token=token)
+        assert status == 413 and 'larger than' in json.loads(response)['error']
+
+        img = make_synthetic_img(64, 48)
+        assert submit_job(address, 'stroke', {}, img).shape == img.shape
+    finally:
+        shutdown_server(address)
+        serve_thread.join()
+
+
+def test_full_queue_is_refused(tmp_path: Any) -> None:
+    """
+    It checks that the job beyond the queue depth gets 503 with Retry-After, and that the queued jobs are finished.
+    """
+    model_server = ModelServer('', '', workers=1, queue_depth=1)
+    session = BlockingStrokeSession()
+    model_server.models['stroke'] = session
+    address = os.path.join(str(tmp_path), 'iveu.sock')
+    serve_thread = threading.Thread(target=model_server.serve, args=(address,), kwargs={'warmup': False})
+    serve_thread.start()
+    while not model_server.accepting:
+        time.sleep(0.01)
+
+    img = make_synthetic_img(64, 48)
+    results: list = []
+    job_threads = [threading.Thread(target=lambda: results.append(submit_job(address, 'stroke', {}, img, 0)))
+                   for _ in range(2)]
+    try:
+        # The first job runs in the only worker and the second one waits in the queue
+        job_threads[0].start()
+        assert session.started.wait(10.)
+        job_threads[1].start()
+        while model_server.jobs.qsize() != 1:
+            time.sleep(0.01)
+
+        status, headers, _ = send_request(address, 'POST', '/jobs/stroke', np.zeros(16, dtype='uint8').tobytes(),
+                                          'application/octet-stream', token=read_token(address))
+        assert status == 503 and headers['Retry-After'] == '1'
+        assert model_server.get_stats()['rejected'] == 1
+    finally:
+        session.released.set()
+        for job_thread in job_threads:
+            job_thread.join()
+        shutdown_server(address)
+        serve_thread.join()
+
+    assert len(results) == 2 and all(result.shape == img.shape for result in results)
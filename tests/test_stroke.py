@@ -0,0 +1,86 @@
+""" This module tests the outline stroke against the baseline compositing
+"""
+from rembg import remove
+from socialmediautils.benchmark.stub_models import StubStrokeSession
+from socialmediautils.benchmark.stub_models import make_synthetic_img
+from socialmediautils.stroke.stroke_img import add_img_stroke_array
+from socialmediautils.stroke.stroke_img import add_img_stroke_with_bg_array
+from typing import Any
+
+import cv2
+import numpy as np
+
+stroke_color = [255, 255, 0]
+
+
+def get_baseline_masks(img_org: Any, zooming_factor: float) -> tuple:
+    """
+    It segments the image and scales its mask like the baseline add_img_stroke did.
+
+    :param img_org: The BGR image
+    :type img_org: Any
+    :param zooming_factor: The scaling factor of the stroke
+    :type zooming_factor: float
+    :return: Returns the human mask, the scaled mask and the stroke mask
+    :rtype: tuple
+    """
+    mask = remove(img_org, session=StubStrokeSession(), alpha_matting=False, only_mask=True, post_process_mask=True)
+
+    height, width = mask.shape
+    rot_mat = cv2.getRotationMatrix2D((width / 2, height / 2), 0, zooming_factor)
+    scale_mask = cv2.warpAffine(mask, rot_mat, (width, height), flags=cv2.INTER_LANCZOS4)
+
+    return mask, scale_mask, cv2.bitwise_xor(mask, scale_mask)
+
+
+def get_color_img(img_org: Any) -> Any:
+    """
+    It returns the image of the stroke color like the baseline did.
+
+    :param img_org: The BGR image
+    :type img_org: Any
+    :return: Returns the stroke color image of the image size
+    :rtype: Any
+    """
+    RChannel, GChannel, BChannel = stroke_color
+    img_blend_color = np.zeros([img_org.shape[0], img_org.shape[1], 3], dtype=np.uint8)
+    img_blend_color[:, :] = [BChannel, GChannel, RChannel]
+
+    return img_blend_color
+
+
+def test_stroke_matches_baseline() -> None:
+    """
+    It checks that the default stroke is the nonzero mask overlay of the baseline.
+    """
+    img_org = make_synthetic_img(640, 480)
+    _, _, stroke_mask = get_baseline_masks(img_org, 1.03)
+
+    img_color = get_color_img(img_org)
+    img_expected = cv2.bitwise_or(cv2.bitwise_or(img_color, img_color, mask=stroke_mask),
+                                  cv2.bitwise_or(img_org, img_org, mask=cv2.bitwise_not(stroke_mask)))
+
+    img_stroked = add_img_stroke_array(StubStrokeSession(), img_org, stroke_color, 1.03)
+
+    assert np.array_equal(img_stroked, img_expected)
+
+
+def test_stroke_with_bg_matches_baseline() -> None:
+    """
+    It checks that the default stroke over the background is the nonzero mask overlay of the baseline.
+    """
+    img_org = make_synthetic_img(640, 480)
+    img_bg = make_synthetic_img(400, 300, seed=1)
+    mask, scale_mask, stroke_mask = get_baseline_masks(img_org, 1.03)
+
+    img_color = get_color_img(img_org)
+    img_bg_resized = cv2.resize(img_bg, (640, 480), interpolation=cv2.INTER_LINEAR)
+    img_stroke_human = cv2.bitwise_or(cv2.bitwise_or(img_org, img_org, mask=mask),
+                                      cv2.bitwise_or(img_color, img_color, mask=stroke_mask))
+    img_expected = cv2.bitwise_or(img_stroke_human,
+                                  cv2.bitwise_or(img_bg_resized, img_bg_resized, mask=cv2.bitwise_not(scale_mask)))
+
+    img_stroked = add_img_stroke_with_bg_array(StubStrokeSession(), img_org, img_bg, stroke_color, 1.03)
+
+    assert np.array_equal(img_stroked, img_expected)
+
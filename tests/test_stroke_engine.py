@@ -0,0 +1,138 @@
+""" This module tests the stroke engine that grows the human mask by the stroke width
+"""
+from socialmediautils.benchmark.stub_models import StubStrokeSession
+from socialmediautils.benchmark.stub_models import get_stub_mask
+from socialmediautils.benchmark.stub_models import make_synthetic_img
+from socialmediautils.stroke.stroke_engine import grow_mask
+from socialmediautils.stroke.stroke_img import add_img_stroke_array
+from socialmediautils.stroke.stroke_img import zoom_mask
+
+import cv2
+import numpy as np
+import pytest
+
+
+def get_dot_mask(size: int = 41) -> np.ndarray:
+    """
+    It returns the mask of a single pixel in the middle of the square image.
+
+    :param size: The width and the height of the mask, defaults to 41
+    :type size: int, optional
+    :return: Returns the mask
+    :rtype: np.ndarray
+    """
+    mask = np.zeros((size, size), dtype='uint8')
+    mask[size // 2, size // 2] = 255
+
+    return mask
+
+
+@pytest.mark.parametrize('method', ['dilate', 'distance'])
+@pytest.mark.parametrize('kernel_shape', ['ellipse', 'rect', 'cross'])
+@pytest.mark.parametrize('stroke_width', [1, 9])
+def test_grow_mask_width(method: str, kernel_shape: str, stroke_width: int) -> None:
+    """
+    It checks that the mask grows by exactly the stroke width along the axes, whatever the shape.
+    """
+    mask = np.zeros((80, 100), dtype='uint8')
+    mask[30:50, 40:60] = 255
+
+    grown_mask = grow_mask(mask, stroke_width, method, kernel_shape)
+
+    assert set(np.unique(grown_mask)) <= {0, 255}
+    assert cv2.boundingRect(grown_mask) == (40 - stroke_width, 30 - stroke_width, 20 + 2 * stroke_width,
+                                            20 + 2 * stroke_width)
+    assert np.all(grown_mask[mask != 0] == 255)
+
+
+@pytest.mark.parametrize('method', ['dilate', 'distance'])
+def test_grow_mask_shape(method: str) -> None:
+    """
+    It checks that the pixel grows into the square of the rect shape, the rounded square of the ellipse shape and
+    the smaller cross of the cross shape.
+    """
+    stroke_width = 6
+    grown_masks = {kernel_shape: grow_mask(get_dot_mask(), stroke_width, method, kernel_shape) != 0
+                   for kernel_shape in ['ellipse', 'rect', 'cross']}
+
+    assert np.count_nonzero(grown_masks['rect']) == (2 * stroke_width + 1) ** 2
+    assert np.count_nonzero(grown_masks['cross']) < np.count_nonzero(grown_masks['ellipse'])
+    assert np.count_nonzero(grown_masks['ellipse']) < np.count_nonzero(grown_masks['rect'])
+    assert not grown_masks['ellipse'][20 - stroke_width, 20 - stroke_width]
+    assert np.all(grown_masks['ellipse'] <= grown_masks['rect'])
+    assert np.all(grown_masks['cross'] <= grown_masks['ellipse'])
+
+
+def test_grow_mask_distance_shapes() -> None:
+    """
+    It checks that the distance transform grows the pixel into the disc, the square and the diamond of the stroke
+    width radius.
+    """
+    stroke_width = 6
+    offsetY, offsetX = np.mgrid[-20:21, -20:21]
+
+    assert np.array_equal(grow_mask(get_dot_mask(), stroke_width, 'distance', 'ellipse') != 0,
+                          offsetX ** 2 + offsetY ** 2 <= stroke_width ** 2)
+    assert np.array_equal(grow_mask(get_dot_mask(), stroke_width, 'distance', 'rect') != 0,
+                          np.maximum(np.abs(offsetX), np.abs(offsetY)) <= stroke_width)
+    assert np.array_equal(grow_mask(get_dot_mask(), stroke_width, 'distance', 'cross') != 0,
+                          np.abs(offsetX) + np.abs(offsetY) <= stroke_width)
+
+
+def test_anti_alias_smooths_the_edge_only() -> None:
+    """
+    It checks that the anti-aliasing only adds the partial pixels along the edge of the binary grown mask.
+    """
+    mask = get_stub_mask(320, 240)
+
+    grown_mask = grow_mask(mask, 8, 'distance')
+    smooth_mask = grow_mask(mask, 8, 'distance', anti_alias=True)
+
+    assert np.any((smooth_mask != 0) & (smooth_mask != 255))
+    assert np.all(smooth_mask[grown_mask == 0] <= 128)
+    assert np.all(smooth_mask[grown_mask == 255] >= 127)
+
+
+def test_unknown_kernel_shape() -> None:
+    """
+    It checks that the unknown shape and method are refused.
+    """
+    with pytest.raises(ValueError):
+        grow_mask(get_dot_mask(), 3, 'dilate', 'star')
+
+    with pytest.raises(ValueError):
+        grow_mask(get_dot_mask(), 3, 'erode')
+
+
+@pytest.mark.parametrize('zoom_option', [3, 4])
+@pytest.mark.parametrize('kernel_shape', ['ellipse', 'rect', 'cross'])
+@pytest.mark.parametrize('anti_alias', [False, True])
+def test_zoom_mask_passes_shape(zoom_option: int, kernel_shape: str, anti_alias: bool) -> None:
+    """
+    It checks that zoom_mask grows the mask with the given shape, and anti-aliases the distance transform only if
+    asked.
+    """
+    mask = get_stub_mask(320, 240)
+
+    scale_mask = zoom_mask(mask, zoom_option=zoom_option, stroke_width=8, kernel_shape=kernel_shape,
+                           anti_alias=anti_alias)
+
+    method = 'dilate' if zoom_option == 3 else 'distance'
+    assert np.array_equal(scale_mask, grow_mask(mask, 8, method, kernel_shape, anti_alias and zoom_option == 4))
+
+
+def test_stroke_defaults_are_kept() -> None:
+    """
+    It checks that the stroke without the shape options is the round and, for the zoom option 4, anti-aliased one.
+    """
+    img_org = make_synthetic_img(320, 240)
+
+    for zoom_option, anti_alias in [(3, False), (4, True)]:
+        img_default = add_img_stroke_array(StubStrokeSession(), img_org, [255, 255, 0], 1.03, None, zoom_option, 8)
+        img_given = add_img_stroke_array(StubStrokeSession(), img_org, [255, 255, 0], 1.03, None, zoom_option, 8,
+                                         kernel_shape='ellipse', anti_alias=anti_alias)
+        img_rect = add_img_stroke_array(StubStrokeSession(), img_org, [255, 255, 0], 1.03, None, zoom_option, 8,
+                                        kernel_shape='rect')
+
+        assert np.array_equal(img_default, img_given)
+        assert not np.array_equal(img_default, img_rect)
@@ -0,0 +1,70 @@
+""" This module tests the tiled stroke against the stroke of the whole image
+"""
+from socialmediautils.benchmark.stub_models import StubStrokeSession
+from socialmediautils.benchmark.stub_models import make_synthetic_img
+from socialmediautils.stroke.stroke_img import apply_img_stroke
+from socialmediautils.stroke.stroke_img import get_human_mask
+from socialmediautils.stroke.stroke_tiled import add_img_stroke_tiled
+from socialmediautils.stroke.stroke_tiled import apply_img_stroke_tiled
+from socialmediautils.stroke.stroke_tiled import get_proxy_masks
+from socialmediautils.stroke.stroke_tiled import get_strip_rows
+from typing import Any
+
+import os
+import cv2
+import numpy as np
+import pytest
+
+stroke_color = [255, 255, 0]
+
+
+@pytest.mark.parametrize('zoom_option', [1, 2, 3, 4])
+def test_tiled_stroke_matches_whole_image(zoom_option: int) -> None:
+    """
+    It checks that the stroke done strip by strip is the same as the one of the whole image when the proxy is the
+    image itself.
+    """
+    img_org = make_synthetic_img(640, 480)
+    session = StubStrokeSession()
+    assert get_strip_rows(640, 1) < 480
+
+    proxy_mask, proxy_scale_mask = get_proxy_masks(session, img_org, 1.03, zoom_option, 8)
+    img_tiled = apply_img_stroke_tiled(img_org, proxy_mask, proxy_scale_mask, stroke_color, zoom_option,
+                                       memory_budget_mb=1)
+
+    img_whole = apply_img_stroke(img_org, get_human_mask(session, img_org), stroke_color, 1.03, zoom_option, 8)
+
+    assert np.array_equal(img_tiled, img_whole)
+
+
+def test_memory_mapped_npy(tmp_path: Any) -> None:
+    """
+    It checks that the .npy output of the .npy input holds the stroke of the whole image.
+    """
+    img_org = make_synthetic_img(640, 480)
+    in_file_path = os.path.join(str(tmp_path), 'in.npy')
+    out_file_path = os.path.join(str(tmp_path), 'out.npy')
+    np.save(in_file_path, img_org)
+
+    add_img_stroke_tiled(StubStrokeSession(), in_file_path, out_file_path, stroke_color, 1.03, memory_budget_mb=1)
+
+    img_whole = apply_img_stroke(img_org, get_human_mask(StubStrokeSession(), img_org), stroke_color, 1.03)
+    assert np.array_equal(np.load(out_file_path, mmap_mode='r'), img_whole)
+
+
+def test_encoded_images_warn(tmp_path: Any) -> None:
+    """
+    It checks that the encoded input and output, which are not bounded by the memory budget, are warned about.
+    """
+    img_org = make_synthetic_img(640, 480)
+    in_file_path = os.path.join(str(tmp_path), 'in.png')
+    out_file_path = os.path.join(str(tmp_path), 'out.png')
+    cv2.imwrite(in_file_path, img_org)
+
+    with pytest.warns(UserWarning) as warning_records:
+        add_img_stroke_tiled(StubStrokeSession(), in_file_path, out_file_path, stroke_color, 1.03, memory_budget_mb=1)
+
+    assert [str(record.message).split(',')[0] for record in warning_records] == [
+        'The encoded input image is decoded whole', 'The encoded output image is encoded whole']
+    img_whole = apply_img_stroke(img_org, get_human_mask(StubStrokeSession(), img_org), stroke_color, 1.03)
+    assert np.array_equal(cv2.imread(out_file_path), img_whole)